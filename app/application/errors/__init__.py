@@ -1,9 +1,10 @@
-from .exceptions import AppException, BasRequestException, NotFoundException, ValidationException, TooManyRequestsException, InternalServerException
+from .exceptions import AppException, BasRequestException, ForbiddenException, NotFoundException, ValidationException, TooManyRequestsException, InternalServerException
 
 
 __all__ = [
     "AppException",
     "BasRequestException",
+    "ForbiddenException",
     "NotFoundException",
     "ValidationException",
     "TooManyRequestsException",
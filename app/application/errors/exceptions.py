@@ -28,6 +28,16 @@ class BasRequestException(AppException):
         super().__init__(msg=msg, code=400, status_code=400)
 
 
+class ForbiddenException(AppException):
+    """ 无权访问异常类，继承自 AppException """
+
+    def __init__(self, msg: str = '没有访问权限.'):
+        """ 初始化无权访问异常实例
+        :param msg: 错误消息，默认 '没有访问权限.'
+        """
+        super().__init__(msg=msg, code=403, status_code=403)
+
+
 class NotFoundException(AppException):
     """ 资源未找到异常类，继承自 AppException """
 
@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 23:10
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 问答服务
+"""
+from .service import AnswerEvent, AnswerService, build_messages, get_answer_service
+
+__all__ = [
+    "AnswerEvent",
+    "AnswerService",
+    "build_messages",
+    "get_answer_service",
+]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 23:10
+@Author : YangFei
+@File   : service.py
+@Desc   : 问答服务：先检索相关分块，再由大模型根据分块生成回答，检索结果和回答都以事件流的方式产出
+
+事件依次为:
+    retrieval  检索结果，检索完成后立即产出，调用方不必等待回答生成
+    token      回答的一段增量文本，可能有多个
+    done       回答结束，包含结束原因、增量数量和各阶段耗时
+调用方停止迭代或被取消时，正在进行的检索或生成随之取消，大模型服务的连接被关闭。
+"""
+import time
+import logging
+from contextlib import aclosing
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Optional
+
+from app.infrastructure.external.llm import ChatDelta, get_llm_client
+from core.system_config import get_settings
+
+from ..retrieval import RetrievalQuery, RetrievedChunk, HybridRetrievalService, get_hybrid_retrieval_service
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = (
+    "你是企业知识库的问答助手。请只根据给出的参考资料回答用户的问题，"
+    "引用资料时在句末标注资料编号，例如 [1]。参考资料中没有答案时，直接说明无法从知识库中找到答案，不要编造。"
+)
+
+
+@dataclass(slots=True)
+class AnswerEvent:
+    """ 问答过程中产出的一个事件 """
+    event: str  # 事件类型: retrieval / token / done
+    data: Any
+
+
+def build_messages(question: str, chunks: list[RetrievedChunk], max_chars: int) -> list[dict[str, str]]:
+    """ 组装大模型的对话消息，参考资料按检索排名编号，总长度超过上限时丢弃排名靠后的分块
+    :param question: 用户的问题
+    :param chunks: 检索结果
+    :param max_chars: 参考资料的最大字符数
+    """
+    sections, total = [], 0
+    for number, chunk in enumerate(chunks, start=1):
+        section = f"[{number}] {chunk.content}"
+        if sections and total + len(section) > max_chars:
+            break
+        sections.append(section[:max_chars])
+        total += len(section)
+    context = "\n\n".join(sections)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"参考资料:\n{context}\n\n问题: {question}"},
+    ]
+
+
+class AnswerService:
+    """ 问答服务 """
+
+    def __init__(
+            self,
+            retrieval: Optional[HybridRetrievalService] = None,
+            generate: Optional[Callable[[list[dict[str, str]]], AsyncIterator[ChatDelta]]] = None,
+    ):
+        """ 构造函数
+        :param retrieval: 检索服务，默认使用全局实例
+        :param generate: 根据对话消息流式生成回答的函数，默认调用大模型服务
+        """
+        self._retrieval = retrieval
+        self._generate = generate
+        self._context_max_chars = get_settings().answer_context_max_chars
+
+    async def stream(self, query: RetrievalQuery) -> AsyncIterator[AnswerEvent]:
+        """ 检索并生成回答
+        :param query: 检索请求，text 即用户的问题
+        :return: 事件的异步迭代器
+        """
+        start = time.perf_counter()
+        retrieval = self._retrieval or get_hybrid_retrieval_service()
+        result = await retrieval.retrieve(query)
+        timings = {"retrieval": round((time.perf_counter() - start) * 1000, 3)}
+        yield AnswerEvent("retrieval", result)
+
+        if not result.chunks:
+            timings["total"] = timings["retrieval"]
+            yield AnswerEvent("done", {"finish_reason": "no_context", "deltas": 0, "timings": timings})
+            return
+
+        messages = build_messages(query.text, result.chunks, self._context_max_chars)
+        generate = self._generate or get_llm_client().stream_chat
+        deltas, finish_reason = 0, None
+        # 提前结束迭代时 aclosing 立即关闭生成器，释放大模型服务的连接
+        async with aclosing(generate(messages)) as stream:
+            async for delta in stream:
+                if deltas == 0:
+                    timings["first_token"] = round((time.perf_counter() - start) * 1000, 3)
+                deltas += 1
+                finish_reason = delta.finish_reason or finish_reason
+                if delta.text:
+                    yield AnswerEvent("token", {"text": delta.text})
+
+        timings["total"] = round((time.perf_counter() - start) * 1000, 3)
+        logger.info("问答完成, tenant_id=%s, 增量数: %d, 耗时: %s", query.tenant_id, deltas, timings)
+        yield AnswerEvent("done", {"finish_reason": finish_reason or "stop", "deltas": deltas, "timings": timings})
+
+
+@lru_cache()
+def get_answer_service() -> AnswerService:
+    """ 获取问答服务实例，使用 lru_cache 缓存以提高性能，避免重复创建实例 """
+    return AnswerService()
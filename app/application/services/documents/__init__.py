@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 22:25
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 文档服务
+"""
+from .export import open_chunk_export
+
+__all__ = [
+    "open_chunk_export",
+]
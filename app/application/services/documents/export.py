@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 22:25
+@Author : YangFei
+@File   : export.py
+@Desc   : 文档分块导出，使用服务端游标分批读取，内存占用与文档大小无关
+"""
+import uuid
+import logging
+from typing import AsyncIterator
+
+from sqlalchemy import select
+
+from app.application.errors import NotFoundException
+from app.infrastructure.models import Document, DocumentChunk
+from app.infrastructure.storage.postgres import Postgres
+from app.infrastructure.storage.tenant_router import get_tenant_router
+
+logger = logging.getLogger(__name__)
+
+# 每次从游标读取的行数
+EXPORT_BATCH_SIZE = 500
+
+
+async def open_chunk_export(tenant_id: str, document_id: uuid.UUID) -> AsyncIterator[dict]:
+    """ 导出文档的所有分块，文档不存在时在开始导出前抛出 NotFoundException
+    :param tenant_id: 租户ID
+    :param document_id: 文档ID
+    :return: 按分块序号排列的分块
+    """
+    postgres = (await get_tenant_router().resolve(tenant_id)).postgres
+    async with postgres.session_factory() as session:
+        found = await session.scalar(
+            select(Document.id).where(Document.id == document_id, Document.tenant_id == tenant_id)
+        )
+    if found is None:
+        raise NotFoundException(f"文档不存在: {document_id}")
+    return _iter_chunks(postgres, tenant_id, document_id)
+
+
+async def _iter_chunks(postgres: Postgres, tenant_id: str, document_id: uuid.UUID) -> AsyncIterator[dict]:
+    """ 通过服务端游标逐批读取分块，客户端断开时关闭游标 """
+    stmt = (
+        select(
+            DocumentChunk.id,
+            DocumentChunk.document_id,
+            DocumentChunk.chunk_index,
+            DocumentChunk.content,
+            DocumentChunk.keywords,
+            DocumentChunk.meta,
+        )
+        .where(DocumentChunk.document_id == document_id, DocumentChunk.tenant_id == tenant_id)
+        .order_by(DocumentChunk.chunk_index)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    async with postgres.session_factory() as session:
+        result = await session.stream(stmt)
+        try:
+            async for row in result:
+                yield {
+                    "id": row.id,
+                    "document_id": row.document_id,
+                    "chunk_index": row.chunk_index,
+                    "content": row.content,
+                    "keywords": row.keywords,
+                    "metadata": row.meta,
+                }
+        finally:
+            await result.close()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 11:10
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 健康检查服务
+"""
+from .service import (
+    DependencyHealth,
+    HealthReport,
+    HealthService,
+    NotReadyError,
+    Probe,
+    default_probes,
+    get_health_service,
+)
+
+__all__ = [
+    "DependencyHealth",
+    "HealthReport",
+    "HealthService",
+    "NotReadyError",
+    "Probe",
+    "default_probes",
+    "get_health_service",
+]
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 11:10
+@Author : YangFei
+@File   : service.py
+@Desc   : 健康检查服务：并发探测 Postgres、Redis、MinIO 和分词模型，汇总结果在短时间内缓存
+
+负载均衡器通常每秒探测一次，多个实例、多个探测方叠加后，直接探测会给数据库等依赖带来额外压力:
+    - 汇总结果缓存 health_cache_ttl 秒，有效期内的请求直接返回缓存
+    - 缓存过期时只有一次刷新在进行，同时到达的请求等待同一次刷新的结果(单飞)，请求被取消不影响刷新
+    - 每个依赖有各自的超时时间，超时的依赖不会拖慢其它依赖的结果
+    - 同一个依赖上一次的探测还没有结束(例如卡在网络请求中的 MinIO 线程)时不再发起新的探测，
+      而是继续等待上一次的探测，依赖无响应时探测占用的连接和线程不会越积越多
+关键依赖(数据库、缓存、对象存储)异常时整体状态为 down，非关键依赖(分词模型)异常时为 degraded。
+"""
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import text
+
+from app.infrastructure.external.fenci import get_fenci_client
+from app.infrastructure.storage.minio import get_minio
+from app.infrastructure.storage.postgres import get_postgres
+from app.infrastructure.storage.redis import get_redis
+from app.infrastructure.storage.shards import DEFAULT_SHARD, get_shard_configs
+from core.metrics import get_metrics_registry
+from core.system_config import get_settings, Settings
+
+logger = logging.getLogger(__name__)
+
+# 依赖是否可用(1 可用, 0 不可用)以及最近一次探测的耗时
+DEPENDENCY_UP = get_metrics_registry().gauge(
+    "neon_dependency_up", "依赖最近一次健康检查是否正常", ["dependency"],
+)
+DEPENDENCY_PROBE_SECONDS = get_metrics_registry().gauge(
+    "neon_dependency_probe_seconds", "依赖最近一次健康检查的耗时(秒)", ["dependency"],
+)
+
+
+class NotReadyError(RuntimeError):
+    """ 依赖尚未就绪，例如分词模型还没有加载 """
+
+
+@dataclass(slots=True)
+class Probe:
+    """ 单个依赖的探测 """
+    name: str  # 依赖名称，其它分片的依赖带有分片后缀，例如 postgres:s1
+    kind: str  # 依赖类型: postgres / redis / minio / tokenizer，用于查找超时时间
+    check: Callable[[], Awaitable[None]]  # 探测函数，依赖异常时抛出异常
+    critical: bool = True  # 是否为关键依赖
+
+
+@dataclass(slots=True)
+class DependencyHealth:
+    """ 单个依赖的探测结果 """
+    name: str
+    status: str  # ok / error / timeout / not_ready
+    latency_ms: float
+    critical: bool
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+@dataclass(slots=True)
+class HealthReport:
+    """ 健康检查的汇总结果 """
+    status: str  # ok / degraded / down
+    checked_at: float  # 完成探测的时间戳(秒)
+    duration_ms: float  # 本次探测的总耗时
+    dependencies: list[DependencyHealth] = field(default_factory=list)
+
+    @property
+    def healthy(self) -> bool:
+        """ 是否可以接收流量，只有关键依赖异常时才视为不健康 """
+        return self.status != "down"
+
+
+async def _check_postgres(shard: str) -> None:
+    async with get_postgres(shard).session_factory() as session:
+        await session.execute(text("SELECT 1"))
+
+
+async def _check_redis() -> None:
+    await get_redis().client.ping()  # type: ignore
+
+
+async def _check_minio(shard: str) -> None:
+    minio = get_minio(shard)
+    # MinIO 客户端是同步的，在线程中执行
+    if not await asyncio.to_thread(minio.client.bucket_exists, minio.bucket_name):
+        raise RuntimeError(f"存储桶 {minio.bucket_name} 不存在")
+
+
+async def _check_tokenizer() -> None:
+    # 只检查模型是否已经加载，不在健康检查中触发耗时的加载
+    if get_fenci_client.cache_info().currsize == 0:
+        raise NotReadyError("分词模型尚未加载")
+
+
+def default_probes() -> list[Probe]:
+    """ 默认的探测：每个存储分片的 Postgres 和 MinIO、Redis 以及分词模型 """
+    probes = [Probe("redis", "redis", _check_redis)]
+    for shard in get_shard_configs():
+        suffix = "" if shard == DEFAULT_SHARD else f":{shard}"
+        probes.append(Probe(f"postgres{suffix}", "postgres", lambda shard=shard: _check_postgres(shard)))
+        probes.append(Probe(f"minio{suffix}", "minio", lambda shard=shard: _check_minio(shard)))
+    probes.append(Probe("tokenizer", "tokenizer", _check_tokenizer, critical=False))
+    return probes
+
+
+def _consume_result(task: asyncio.Task) -> None:
+    """ 读取探测任务的异常，超时后没有等待者时避免 "Task exception was never retrieved" 警告 """
+    if not task.cancelled():
+        task.exception()
+
+
+class HealthService:
+    """ 健康检查服务 """
+
+    def __init__(self, probes: Optional[list[Probe]] = None):
+        """ 构造函数
+        :param probes: 探测列表，默认探测所有存储分片、Redis 和分词模型
+        """
+        self._settings: Settings = get_settings()
+        self._probes = probes if probes is not None else default_probes()
+        self._ttl = self._settings.health_cache_ttl
+        self._report: Optional[HealthReport] = None
+        # 缓存的过期时间(time.monotonic)
+        self._expires_at = 0.0
+        # 正在进行的刷新，同时到达的请求共用
+        self._refresh: Optional[asyncio.Task] = None
+        # 依赖名称 -> 尚未结束的探测任务
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def check(self) -> HealthReport:
+        """ 获取健康检查结果，缓存未过期时直接返回缓存 """
+        if self._report is not None and time.monotonic() < self._expires_at:
+            return self._report
+
+        if self._refresh is None:
+            # 刷新在独立的任务中执行，发起刷新的请求被取消(客户端断开)时不影响其它等待者
+            self._refresh = asyncio.create_task(self._run())
+        return await asyncio.shield(self._refresh)
+
+    async def _run(self) -> HealthReport:
+        """ 并发探测所有依赖并汇总 """
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(self._probe(probe) for probe in self._probes))
+            if any(not r.ok and r.critical for r in results):
+                status = "down"
+            elif any(not r.ok for r in results):
+                status = "degraded"
+            else:
+                status = "ok"
+            report = HealthReport(status, time.time(), round((time.perf_counter() - start) * 1000, 2), results)
+
+            # 只在状态变化时记录日志，依赖持续异常时不会每次刷新都输出
+            previous = self._report.status if self._report is not None else "ok"
+            if status != previous:
+                failed = ", ".join(f"{r.name}({r.status})" for r in results if not r.ok) or "无"
+                logger.warning("健康检查状态由 %s 变为 %s, 异常的依赖: %s", previous, status, failed)
+            self._report = report
+            self._expires_at = time.monotonic() + self._ttl
+            return report
+        finally:
+            self._refresh = None
+
+    async def _probe(self, probe: Probe) -> DependencyHealth:
+        """ 探测单个依赖，上一次的探测还没有结束时继续等待它，而不是再发起一次 """
+        timeout = self._settings.health_probe_timeouts.get(probe.kind, self._settings.health_probe_timeout)
+        task = self._inflight.get(probe.name)
+        if task is None or task.done():
+            task = asyncio.create_task(probe.check())
+            task.add_done_callback(_consume_result)
+            self._inflight[probe.name] = task
+
+        start = time.perf_counter()
+        error = None
+        try:
+            # shield: 超时只结束等待，探测任务继续运行直到自行结束
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+            status = "ok"
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"超过 {timeout:g} 秒未响应"
+        except NotReadyError as e:
+            status, error = "not_ready", str(e)
+        except Exception as e:
+            status, error = "error", str(e) or type(e).__name__
+        latency = time.perf_counter() - start
+
+        DEPENDENCY_UP.set(1 if status == "ok" else 0, (probe.name,))
+        DEPENDENCY_PROBE_SECONDS.set(latency, (probe.name,))
+        return DependencyHealth(probe.name, status, round(latency * 1000, 2), probe.critical, error)
+
+    async def shutdown(self) -> None:
+        """ 取消尚未结束的探测 """
+        for task in self._inflight.values():
+            task.cancel()
+        await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        self._inflight.clear()
+        get_health_service.cache_clear()
+
+
+@lru_cache()
+def get_health_service() -> HealthService:
+    """ 获取健康检查服务实例，使用 lru_cache 缓存以确保单例模式，缓存在进程内共享 """
+    return HealthService()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 11:02
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 文档入库服务
+"""
+from .entities import IngestionTask, DocumentElement, Chunk, ChunkBatch, IngestionResult
+from .progress import ProgressTracker, StorageProgressTracker, InMemoryProgressTracker
+from .chunker import TokenChunker, TokenEstimator
+from .dedup import MinHasher, MinHashLSH, MinHashDeduplicator
+from .pipeline import IngestionPipeline, IngestionStages, PipelineConfig, create_ingestion_pipeline
+
+__all__ = [
+    "IngestionTask",
+    "DocumentElement",
+    "Chunk",
+    "ChunkBatch",
+    "IngestionResult",
+    "ProgressTracker",
+    "StorageProgressTracker",
+    "InMemoryProgressTracker",
+    "TokenChunker",
+    "TokenEstimator",
+    "MinHasher",
+    "MinHashLSH",
+    "MinHashDeduplicator",
+    "IngestionPipeline",
+    "IngestionStages",
+    "PipelineConfig",
+    "create_ingestion_pipeline",
+]
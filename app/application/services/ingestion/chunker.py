@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 16:02
+@Author : YangFei
+@File   : chunker.py
+@Desc   : 按 token 数分块，支持中英文混排文本和分块重叠
+
+分块需要同时满足嵌入模型和 HanLP 分词模型的输入长度限制。按字符数切分要么浪费上下文，
+要么超出限制被静默截断。这里按段落和句子边界切分，使用一个经过校准的快速估算器衡量长度，
+估算器用 Fenci 所用分词模型的 tokenizer 校准，保证估算值不低于实际 token 数。
+"""
+import re
+import math
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Optional, Sequence
+
+from core.system_config import get_settings
+
+from .entities import IngestionTask, DocumentElement, Chunk
+
+logger = logging.getLogger(__name__)
+
+# 拉丁字母、数字组成的单词，子词 tokenizer 切出的 token 数随单词长度增长
+_WORD_RE = re.compile(r"[A-Za-z0-9À-ɏ]+")
+# 单词按每 4 个字符计为一个单位，短单词通常是一个 token，长单词、数字串和编号会被切成多个子词
+_WORD_UNIT_CHARS = 4
+# 中日韩文字，每个字符通常对应一个 token
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+# 句子：以中英文句末标点(可带后引号)、换行或文本结尾结束，英文句点后需要跟空白才算句末，避免切开小数和缩写
+_SENTENCE_RE = re.compile(r".+?(?:[。！？；!?;…]+[”’\"』」）)]*[ \t]*|\.(?=\s|$)[ \t]*|\n+|$)", re.S)
+# 超长句子强制切分时的最小单位：一个中日韩字符、一个单词(含后续空白)或一个其它字符
+_UNIT_RE = re.compile(
+    r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]\s*|[A-Za-z0-9À-ɏ]+\s*|\S\s*|\s+"
+)
+# 段落之间的分隔
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+# Fenci 中两个 HanLP 分词模型使用的 transformer 主干，校准时使用它们的 tokenizer 统计实际 token 数
+FENCI_TRANSFORMERS = (
+    "hfl/chinese-electra-180g-small-discriminator",  # COARSE_ELECTRA_SMALL_ZH
+    "nreimers/mMiniLMv2-L6-H384-distilled-from-XLMR-Large",  # UD_TOK_MMINILMV2L6
+)
+
+
+@dataclass(frozen=True, slots=True)
+class TokenEstimator:
+    """ token 数估算器，按中日韩字符、单词长度和其它符号的数量加权求和，只使用正则统计，速度远高于真实 tokenizer """
+    cjk_weight: float = 1.0
+    word_weight: float = 1.5
+    other_weight: float = 1.0
+
+    @classmethod
+    def from_settings(cls) -> "TokenEstimator":
+        """ 使用系统配置中的权重，校准结果通过配置项生效 """
+        settings = get_settings()
+        return cls(settings.chunk_token_cjk_weight, settings.chunk_token_word_weight, settings.chunk_token_other_weight)
+
+    @staticmethod
+    def features(text: str) -> tuple[int, int, int]:
+        """ 统计文本中的中日韩字符数、单词单位数(每个单词按长度折算)和其它非空白符号数 """
+        words = sum(-(-len(word) // _WORD_UNIT_CHARS) for word in _WORD_RE.findall(text))
+        rest = _WORD_RE.sub("", text)
+        rest, cjk = _CJK_RE.subn("", rest)
+        return cjk, words, len("".join(rest.split()))
+
+    def estimate(self, text: str) -> int:
+        """ 估算文本的 token 数，向上取整 """
+        cjk, words, other = self.features(text)
+        return math.ceil(cjk * self.cjk_weight + words * self.word_weight + other * self.other_weight)
+
+    @property
+    def signature(self) -> str:
+        """ 估算器签名，参与分块内容哈希的计算 """
+        return f"{self.cjk_weight:.3f}/{self.word_weight:.3f}/{self.other_weight:.3f}"
+
+    @classmethod
+    def calibrate(
+            cls,
+            samples: Sequence[str],
+            count_tokens: Callable[[str], int],
+            quantile: float = 0.99,
+    ) -> "TokenEstimator":
+        """ 使用真实 tokenizer 校准各项权重
+        先用最小二乘拟合各项权重，再整体放大，使绝大多数样本的估算值不低于实际值
+        :param samples: 校准样本，应覆盖中文、英文和中英混排文本
+        :param count_tokens: 统计真实 token 数的函数
+        :param quantile: 估算值不低于实际值的样本比例
+        :return: 校准后的估算器
+        """
+        import numpy as np
+
+        samples = [sample for sample in samples if sample.strip()]
+        if not samples:
+            raise ValueError("校准样本不能为空")
+
+        features = np.array([cls.features(sample) for sample in samples], dtype=np.float64)
+        actual = np.array([count_tokens(sample) for sample in samples], dtype=np.float64)
+        weights = np.clip(np.linalg.lstsq(features, actual, rcond=None)[0], 0.0, None)
+        # 某一类特征在样本中没有出现时权重无法拟合，沿用默认值
+        defaults = np.array([cls.cjk_weight, cls.word_weight, cls.other_weight])
+        weights = np.where(features.sum(axis=0) > 0, weights, defaults)
+
+        estimated = np.maximum(features @ weights, 1.0)
+        scale = max(float(np.quantile(actual / estimated, quantile)), 1.0)
+        estimator = cls(*(float(weight) * scale for weight in weights))
+        logger.info("token 估算器校准完成: %s, 样本数: %d", estimator.signature, len(samples))
+        return estimator
+
+
+def load_fenci_token_counter() -> Callable[[str], int]:
+    """ 加载 Fenci 所用分词模型的 tokenizer，返回统计 token 数的函数，取两个 tokenizer 中的较大值 """
+    from transformers import AutoTokenizer
+
+    tokenizers = [AutoTokenizer.from_pretrained(name) for name in FENCI_TRANSFORMERS]
+
+    def _count(text: str) -> int:
+        return max(len(tokenizer(text, add_special_tokens=True)["input_ids"]) for tokenizer in tokenizers)
+
+    return _count
+
+
+def split_sentences(text: str) -> Iterator[str]:
+    """ 将段落切分为句子，保留句末标点和空白，句子依次拼接后与原文相同 """
+    for match in _SENTENCE_RE.finditer(text):
+        if match.group():
+            yield match.group()
+
+
+class TokenChunker:
+    """ 按 token 数分块，优先在段落和句子边界切分，相邻分块之间有重叠 """
+
+    def __init__(
+            self,
+            max_tokens: Optional[int] = None,
+            overlap_tokens: Optional[int] = None,
+            estimator: Optional[TokenEstimator] = None,
+    ):
+        """ 构造函数
+        :param max_tokens: 单个分块的最大 token 数，默认取系统配置
+        :param overlap_tokens: 相邻分块重叠的最大 token 数，按整句重叠，默认取系统配置
+        :param estimator: token 数估算器，默认使用系统配置中的权重
+        """
+        settings = get_settings()
+        self._max_tokens = max_tokens or settings.chunk_max_tokens
+        self._overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+        if self._overlap_tokens >= self._max_tokens:
+            raise ValueError("分块重叠的 token 数必须小于分块的最大 token 数")
+        self._estimator = estimator or TokenEstimator.from_settings()
+        self.signature = f"token:max={self._max_tokens},overlap={self._overlap_tokens},est={self._estimator.signature}"
+
+    async def chunk(self, task: IngestionTask, elements: AsyncIterable[DocumentElement]) -> AsyncIterator[Chunk]:
+        """ 边接收元素边产出分块，不需要等整个文档解析完成，分块的元数据取自分块起始位置所在的元素 """
+        splitter = _Splitter(self)
+        index = 0
+        async for element in elements:
+            metadata = self._chunk_metadata(element)
+            for paragraph in _PARAGRAPH_RE.split(element.text):
+                for text, tag in splitter.feed(paragraph, metadata):
+                    yield self._make_chunk(task, index, text, tag)
+                    index += 1
+        for text, tag in splitter.flush():
+            yield self._make_chunk(task, index, text, tag)
+
+    def split(self, paragraphs: Iterable[str]) -> Iterator[str]:
+        """ 将段落流切分为分块文本，以生成器的方式逐个产出，可以流式处理超大文档
+        :param paragraphs: 段落文本
+        :return: 分块文本
+        """
+        splitter = _Splitter(self)
+        for paragraph in paragraphs:
+            for text, _ in splitter.feed(paragraph, None):
+                yield text
+        for text, _ in splitter.flush():
+            yield text
+
+    @staticmethod
+    def _make_chunk(task: IngestionTask, index: int, text: str, metadata: Optional[dict]) -> Chunk:
+        """ 组装分块 """
+        return Chunk(
+            document_id=task.document_id,
+            tenant_id=task.tenant_id,
+            chunk_index=index,
+            content=text,
+            metadata=metadata or {},
+        )
+
+    def _overlap(self, pieces: list[tuple[str, int, Any]]) -> list[tuple[str, int, Any]]:
+        """ 从上一个分块的末尾取整句作为下一个分块的开头，总 token 数不超过重叠上限 """
+        if self._overlap_tokens <= 0:
+            return []
+
+        overlap: list[tuple[str, int, Any]] = []
+        size = 0
+        for piece in reversed(pieces):
+            if size + piece[1] > self._overlap_tokens:
+                break
+            overlap.append(piece)
+            size += piece[1]
+        overlap.reverse()
+        # 重叠部分不以段落分隔符开头
+        while overlap and overlap[0][1] == 0:
+            overlap.pop(0)
+        return overlap
+
+    def _split_long(self, sentence: str) -> list[tuple[str, int]]:
+        """ 将超出上限的句子按最小单位切分为多个不超过上限的片段 """
+        estimate = self._estimator.estimate
+        parts: list[tuple[str, int]] = []
+        buffer: list[str] = []
+        size = 0
+        for unit in _UNIT_RE.findall(sentence):
+            tokens = estimate(unit)
+            if size + tokens > self._max_tokens and buffer:
+                parts.append(("".join(buffer), size))
+                buffer, size = [], 0
+            buffer.append(unit)
+            size += tokens
+        if buffer:
+            parts.append(("".join(buffer), size))
+        return parts
+
+    @staticmethod
+    def _join(pieces: list[tuple[str, int, Any]]) -> str:
+        """ 拼接片段为分块文本 """
+        return "".join(piece[0] for piece in pieces).strip()
+
+    @staticmethod
+    def _chunk_metadata(element: DocumentElement) -> dict:
+        """ 分块只保留元素元数据中检索时需要展示的字段 """
+        metadata = {"category": element.category}
+        for key in ("page_number", "filename", "filetype"):
+            if element.metadata.get(key) is not None:
+                metadata[key] = element.metadata[key]
+        return metadata
+
+
+class _Splitter:
+    """ 一次切分的状态，逐个输入段落，产出已经凑满的分块，输入结束后调用 flush 产出最后一个分块
+
+    每个段落带有一个标记，产出分块文本及其第一个片段的标记。
+    """
+
+    __slots__ = ("_chunker", "_pieces", "_size")
+
+    def __init__(self, chunker: TokenChunker):
+        self._chunker = chunker
+        # 当前分块中的片段，包括文本、token 数和所属段落的标记，段落分隔符的 token 数为 0
+        self._pieces: list[tuple[str, int, Any]] = []
+        self._size = 0
+
+    def feed(self, paragraph: str, tag: Any) -> Iterator[tuple[str, Any]]:
+        """ 输入一个段落，产出因超出上限而结束的分块 """
+        if not paragraph.strip():
+            return
+
+        chunker = self._chunker
+        max_tokens = chunker._max_tokens
+        estimate = chunker._estimator.estimate
+        # 段落之间用空行分隔，分隔符本身不计入 token 数
+        if self._pieces:
+            self._pieces.append(("\n\n", 0, tag))
+
+        for sentence in split_sentences(paragraph):
+            tokens = estimate(sentence)
+            # 超长句子强制切分为多个片段
+            parts = chunker._split_long(sentence) if tokens > max_tokens else [(sentence, tokens)]
+            for part, part_tokens in parts:
+                if self._size + part_tokens > max_tokens and self._size > 0:
+                    yield chunker._join(self._pieces), self._pieces[0][2]
+                    self._pieces = chunker._overlap(self._pieces)
+                    self._size = sum(piece[1] for piece in self._pieces)
+                    # 重叠部分加上当前片段仍然超限时，放弃重叠
+                    if self._size + part_tokens > max_tokens:
+                        self._pieces, self._size = [], 0
+                self._pieces.append((part, part_tokens, tag))
+                self._size += part_tokens
+
+    def flush(self) -> Iterator[tuple[str, Any]]:
+        """ 输入结束，产出剩余内容组成的最后一个分块 """
+        if self._size > 0:
+            yield self._chunker._join(self._pieces), self._pieces[0][2]
+        self._pieces, self._size = [], 0
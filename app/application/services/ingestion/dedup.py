@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 19:05
+@Author : YangFei
+@File   : dedup.py
+@Desc   : 基于 MinHash 和 LSH 的近似重复分块检测，在嵌入之前跳过或关联同一租户中的重复分块
+
+企业文档中有大量页眉、免责声明和复制的章节，这些分块会重复占用嵌入调用、向量索引和存储。
+分块的 Fenci 分词结果按 shingle 个连续词组成片段，MinHash 签名中相同位置取值相等的比例是片段集合 Jaccard 相似度的无偏估计。
+签名切分为 bands 段，任意一段完全相同的分块成为候选，再用完整签名估算相似度，达到阈值即视为重复。
+每段 rows = num_perm / bands 个取值，相似度为 s 的两个分块成为候选的概率为 1 - (1 - s^rows)^bands。
+
+每个租户的索引保存在进程内存中，签名同时写入 Redis 的哈希表，进程重启或首次处理某个租户时从 Redis 重建索引。
+只在不同文档之间查找重复：同一文档重新入库时旧版本的分块仍在索引中，不能与之匹配。
+link 模式下重复分块只写入 Postgres，被关联的分块删除时由流水线把其中一个重复分块提升为独立分块，重新嵌入并加入索引。
+"""
+import zlib
+import base64
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from app.infrastructure.storage.redis import get_redis
+from app.infrastructure.external.fenci import get_fenci_client
+from core.system_config import get_settings
+
+from .entities import IngestionTask, Chunk
+
+logger = logging.getLogger(__name__)
+
+# Redis 中租户分块签名的键前缀，字段为分块ID，值为 "文档ID:签名(base64)"
+SIGNATURE_KEY_PREFIX = "ingestion:minhash:"
+# 从 Redis 加载签名时每次扫描的数量
+_SCAN_COUNT = 1000
+# 片段内各个词之间的分隔符
+_SHINGLE_SEPARATOR = "\x1f"
+
+
+def signature_key(tenant_id: str) -> str:
+    """ 获取租户分块签名在 Redis 中的键 """
+    return f"{SIGNATURE_KEY_PREFIX}{tenant_id}"
+
+
+class MinHasher:
+    """ MinHash 签名计算，使用 multiply-shift 哈希族模拟随机排列，全部计算向量化 """
+
+    def __init__(self, num_perm: int = 128, shingle: int = 3, seed: int = 1):
+        """ 构造函数
+        :param num_perm: 签名长度(哈希函数数量)
+        :param shingle: 每个片段包含的连续词数
+        :param seed: 随机种子，签名需要持久化，相同配置必须得到相同的哈希函数
+        """
+        rng = np.random.default_rng(seed)
+        # 乘数必须为奇数
+        self._a = rng.integers(0, 2 ** 64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 64, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.shingle = shingle
+
+    def shingles(self, tokens: list[str]) -> np.ndarray:
+        """ 将分词结果转换为去重后的片段哈希值(32 位) """
+        tokens = [token.lower() for token in tokens]
+        width = min(self.shingle, len(tokens))
+        pieces = {
+            _SHINGLE_SEPARATOR.join(tokens[start:start + width])
+            for start in range(len(tokens) - width + 1)
+        } if width else set()
+        return np.fromiter((zlib.crc32(piece.encode("utf-8")) for piece in pieces), dtype=np.uint64, count=len(pieces))
+
+    def signature(self, tokens: list[str]) -> Optional[np.ndarray]:
+        """ 计算 MinHash 签名，没有分词结果时返回 None
+        :param tokens: 分词结果
+        :return: 长度为 num_perm 的 uint32 数组
+        """
+        values = self.shingles(tokens)
+        if not values.size:
+            return None
+        # (a * x + b) mod 2^64 的高 32 位，uint64 乘法溢出即为取模
+        hashed = (values[:, None] * self._a + self._b) >> np.uint64(32)
+        return hashed.min(axis=0).astype(np.uint32)
+
+
+def similarity(left: np.ndarray, right: np.ndarray) -> float:
+    """ 用两个 MinHash 签名估算 Jaccard 相似度 """
+    return float(np.count_nonzero(left == right)) / len(left)
+
+
+class MinHashLSH:
+    """ 单个租户的 LSH 索引 """
+
+    def __init__(self, bands: int, rows: int):
+        """ 构造函数
+        :param bands: 签名切分的段数
+        :param rows: 每段包含的取值数量
+        """
+        self._bands = bands
+        self._rows = rows
+        self._buckets: list[dict[bytes, set[uuid.UUID]]] = [{} for _ in range(bands)]
+        # 分块ID到(文档ID, 签名)的映射
+        self._entries: dict[uuid.UUID, tuple[uuid.UUID, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _keys(self, signature: np.ndarray) -> list[bytes]:
+        """ 每一段的桶键 """
+        return [signature[band * self._rows:(band + 1) * self._rows].tobytes() for band in range(self._bands)]
+
+    def query(
+            self,
+            signature: np.ndarray,
+            threshold: float,
+            exclude_document: Optional[uuid.UUID] = None,
+    ) -> Optional[tuple[uuid.UUID, float]]:
+        """ 查找相似度最高且达到阈值的分块
+        :param signature: 查询签名
+        :param threshold: 相似度阈值
+        :param exclude_document: 排除该文档中的分块
+        :return: 分块ID和估算的相似度，没有满足条件的分块时返回 None
+        """
+        candidates: set[uuid.UUID] = set()
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            candidates.update(bucket.get(key, ()))
+
+        best: Optional[tuple[uuid.UUID, float]] = None
+        for chunk_id in candidates:
+            document_id, other = self._entries[chunk_id]
+            if document_id == exclude_document:
+                continue
+            score = similarity(signature, other)
+            if score >= threshold and (best is None or score > best[1]):
+                best = (chunk_id, score)
+        return best
+
+    def insert(self, chunk_id: uuid.UUID, document_id: uuid.UUID, signature: np.ndarray) -> None:
+        """ 加入索引，ID 已存在时覆盖 """
+        self.remove(chunk_id)
+        self._entries[chunk_id] = (document_id, signature)
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            bucket.setdefault(key, set()).add(chunk_id)
+
+    def remove(self, chunk_id: uuid.UUID) -> None:
+        """ 从索引中移除 """
+        entry = self._entries.pop(chunk_id, None)
+        if entry is None:
+            return
+        for bucket, key in zip(self._buckets, self._keys(entry[1])):
+            members = bucket.get(key)
+            if members is not None:
+                members.discard(chunk_id)
+                if not members:
+                    del bucket[key]
+
+
+class MinHashDeduplicator:
+    """ 近似重复分块检测阶段，同时负责分词，分词结果供关键词提取复用
+
+    mode 为 skip 时重复分块不再写入；为 link 时跳过嵌入和向量写入，只写入 Postgres，
+    并在元数据 duplicate_of 中记录与之重复的分块ID；为 off 时只分词，不检测重复。
+    """
+
+    def __init__(
+            self,
+            tokenize: Optional[Callable[[str], list[str]]] = None,
+            mode: Optional[str] = None,
+            threshold: Optional[float] = None,
+            persistent: bool = True,
+    ):
+        """ 构造函数
+        :param tokenize: 分词函数，默认使用 Fenci
+        :param mode: 重复分块的处理方式，skip / link / off，默认取系统配置
+        :param threshold: 估算的 Jaccard 相似度达到该值时视为重复，默认取系统配置
+        :param persistent: 是否将签名持久化到 Redis，测试和压测时可以关闭
+        """
+        settings = get_settings()
+        self._tokenize = tokenize or self._tokenize_with_fenci
+        self._mode = mode or settings.ingestion_dedup_mode
+        if self._mode not in ("skip", "link", "off"):
+            raise ValueError(f"不支持的重复分块处理方式: {self._mode}")
+        self._threshold = threshold or settings.ingestion_dedup_threshold
+        self._persistent = persistent
+        self._hasher = MinHasher(settings.ingestion_dedup_num_perm, settings.ingestion_dedup_shingle)
+        self._bands = settings.ingestion_dedup_bands
+        self._rows = settings.ingestion_dedup_num_perm // self._bands
+        self._max_tenants = settings.ingestion_dedup_max_tenants
+        self._indexes: OrderedDict[str, MinHashLSH] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+        # 文档ID -> 已插入索引、尚未写入的分块签名(分块ID -> Redis 中的值)，写入成功后持久化，文档失败时从索引中移除
+        self._pending: dict[uuid.UUID, dict[str, str]] = {}
+
+    @staticmethod
+    def _tokenize_with_fenci(text: str) -> list[str]:
+        """ 使用 Fenci 分词 """
+        return get_fenci_client().get_tokens(text)
+
+    def _prepare(self, texts: list[str]) -> tuple[list[list[str]], list[Optional[np.ndarray]]]:
+        """ 分词并计算签名，在线程中执行 """
+        tokens = [self._tokenize(text) for text in texts]
+        if self._mode == "off":
+            return tokens, [None] * len(tokens)
+        return tokens, [self._hasher.signature(chunk_tokens) for chunk_tokens in tokens]
+
+    async def deduplicate(self, task: IngestionTask, chunks: list[Chunk]) -> list[Chunk]:
+        """ 为分块分词并检测重复
+        :return: 需要继续处理的分块，skip 模式下不包括重复分块
+        """
+        tokens, signatures = await asyncio.to_thread(self._prepare, [chunk.content for chunk in chunks])
+        for chunk, chunk_tokens in zip(chunks, tokens):
+            chunk.tokens = chunk_tokens
+        if self._mode == "off":
+            return chunks
+
+        index = await self._index(task.tenant_id)
+        kept: list[Chunk] = []
+        pending = self._pending.setdefault(task.document_id, {})
+        # 查找和插入之间没有 await，同一租户的并发批次不会互相漏检；签名先插入内存索引，写入成功后才持久化
+        for chunk, signature in zip(chunks, signatures):
+            # 图片分块已经按感知哈希去重
+            if signature is None or chunk.image is not None:
+                kept.append(chunk)
+                continue
+            match = index.query(signature, self._threshold, exclude_document=task.document_id)
+            if match is None:
+                index.insert(chunk.id, task.document_id, signature)
+                pending[str(chunk.id)] = f"{task.document_id}:{base64.b64encode(signature.tobytes()).decode()}"
+                kept.append(chunk)
+                continue
+
+            chunk.duplicate_of = match[0]
+            chunk.metadata["duplicate_of"] = str(match[0])
+            if self._mode == "link":
+                kept.append(chunk)
+
+        if not pending:
+            del self._pending[task.document_id]
+        return kept
+
+    async def commit(self, task: IngestionTask, chunks: list[Chunk]) -> None:
+        """ 一批分块写入成功后持久化它们的签名，其它进程和重启后的进程从 Redis 加载时才能看到这些分块 """
+        pending = self._pending.get(task.document_id)
+        if not pending:
+            return
+        committed = {key: pending.pop(key) for key in (str(chunk.id) for chunk in chunks) if key in pending}
+        if not pending:
+            del self._pending[task.document_id]
+        if committed and self._persistent:
+            try:
+                await get_redis().client.hset(signature_key(task.tenant_id), mapping=committed)
+            except Exception as e:
+                logger.warning("保存分块签名到 Redis 失败: %s", e)
+
+    async def discard(self, task: IngestionTask) -> None:
+        """ 文档入库失败后从索引中移除尚未写入的分块签名，避免之后的分块被判定为与从未写入的分块重复 """
+        pending = self._pending.pop(task.document_id, None)
+        if not pending:
+            return
+        index = self._indexes.get(task.tenant_id)
+        if index is not None:
+            for key in pending:
+                index.remove(uuid.UUID(key))
+
+    async def remove(self, task: IngestionTask, chunk_ids: list[uuid.UUID]) -> None:
+        """ 分块被删除后从索引中移除 """
+        if not chunk_ids or self._mode == "off":
+            return
+        index = self._indexes.get(task.tenant_id)
+        if index is not None:
+            for chunk_id in chunk_ids:
+                index.remove(chunk_id)
+        if self._persistent:
+            try:
+                await get_redis().client.hdel(signature_key(task.tenant_id), *(str(chunk_id) for chunk_id in chunk_ids))
+            except Exception as e:
+                logger.warning("从 Redis 删除分块签名失败: %s", e)
+
+    async def promote(self, task: IngestionTask, chunks: list[Chunk]) -> None:
+        """ 重复分块提升为独立分块并已写入后，将它们的签名加入索引并持久化，之后的分块可以与之关联 """
+        if not chunks or self._mode == "off":
+            return
+        _, signatures = await asyncio.to_thread(self._prepare, [chunk.content for chunk in chunks])
+        index = await self._index(task.tenant_id)
+        promoted: dict[str, str] = {}
+        for chunk, signature in zip(chunks, signatures):
+            if signature is None:
+                continue
+            index.insert(chunk.id, chunk.document_id, signature)
+            promoted[str(chunk.id)] = f"{chunk.document_id}:{base64.b64encode(signature.tobytes()).decode()}"
+        if promoted and self._persistent:
+            try:
+                await get_redis().client.hset(signature_key(task.tenant_id), mapping=promoted)
+            except Exception as e:
+                logger.warning("保存分块签名到 Redis 失败: %s", e)
+
+    async def _index(self, tenant_id: str) -> MinHashLSH:
+        """ 获取租户的索引，首次使用时从 Redis 加载，并发调用只加载一次 """
+        index = self._indexes.get(tenant_id)
+        if index is not None:
+            self._indexes.move_to_end(tenant_id)
+            return index
+
+        loading = self._loading.get(tenant_id)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[tenant_id] = loading
+        try:
+            index = MinHashLSH(self._bands, self._rows)
+            if self._persistent:
+                await self._load(tenant_id, index)
+            self._indexes[tenant_id] = index
+            while len(self._indexes) > self._max_tenants:
+                self._indexes.popitem(last=False)
+            loading.set_result(index)
+            return index
+        except BaseException as e:
+            loading.set_exception(e)
+            # 没有其它调用方等待时避免未获取异常的警告
+            loading.exception()
+            raise
+        finally:
+            self._loading.pop(tenant_id, None)
+
+    async def _load(self, tenant_id: str, index: MinHashLSH) -> None:
+        """ 从 Redis 加载租户的全部签名，Redis 不可用时从空索引开始 """
+        try:
+            async for field, value in get_redis().client.hscan_iter(signature_key(tenant_id), count=_SCAN_COUNT):
+                document_id, encoded = value.split(":", 1)
+                signature = np.frombuffer(base64.b64decode(encoded), dtype=np.uint32)
+                # 修改签名长度后旧签名无法比较，忽略
+                if len(signature) != self._hasher.num_perm:
+                    continue
+                index.insert(uuid.UUID(field), uuid.UUID(document_id), signature)
+            logger.info("租户 %s 的分块签名加载完成, 数量: %d", tenant_id, len(index))
+        except Exception as e:
+            logger.warning("从 Redis 加载分块签名失败，使用空索引: %s", e)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 11:05
+@Author : YangFei
+@File   : entities.py
+@Desc   : 文档入库流水线中流转的数据结构
+"""
+import re
+import uuid
+import hashlib
+import unicodedata
+from typing import Optional
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class IngestionTask:
+    """ 入库任务，对应对象存储中的一个源文件 """
+    document_id: uuid.UUID  # 文档ID，对应 document 表主键
+    tenant_id: str  # 租户ID
+    object_name: str  # 文件在对象存储中的路径
+    file_name: str = ""  # 原始文件名，解析器根据扩展名判断文件类型
+    bucket_name: Optional[str] = None  # 存储桶名称，为空时使用租户所在分片的存储桶
+
+
+@dataclass(slots=True)
+class DocumentElement:
+    """ 文档解析后得到的元素，例如标题、段落、表格 """
+    text: str
+    category: str = ""
+    metadata: dict = field(default_factory=dict)
+
+
+# 规范化文本时合并的连续空白
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """ 规范化分块文本：统一全角半角等兼容字符，合并连续空白，去除首尾空白 """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def chunk_hash(text: str, signature: str) -> str:
+    """ 计算分块的内容哈希，分块参数变化时即使文本相同也视为不同的分块
+    :param text: 分块文本
+    :param signature: 分块器签名，包含分块器类型和参数
+    :return: 十六进制的 sha256 哈希值
+    """
+    return hashlib.sha256(f"{signature}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True)
+class Chunk:
+    """ 文档分块，是关键词提取、嵌入和写入的最小单位 """
+    document_id: uuid.UUID
+    tenant_id: str
+    chunk_index: int
+    content: str
+    metadata: dict = field(default_factory=dict)
+    # 分块ID和内容哈希由流水线在分块后统一生成
+    id: Optional[uuid.UUID] = None
+    content_hash: str = ""
+    keywords: list[str] = field(default_factory=list)
+    vector: Optional[list[float]] = None
+    # 分词结果，由去重阶段生成并供关键词提取复用，不写入存储
+    tokens: Optional[list[str]] = None
+    # 与之近似重复的已有分块ID，重复分块跳过嵌入和向量写入
+    duplicate_of: Optional[uuid.UUID] = None
+    # 预处理后的图片，嵌入阶段据此生成图片向量，不写入存储
+    image: Optional[bytes] = None
+
+    @staticmethod
+    def make_id(document_id: uuid.UUID, content_hash: str, occurrence: int = 0) -> uuid.UUID:
+        """ 根据文档ID和内容哈希生成稳定的分块ID，内容不变的分块在重新入库时 ID 不变
+        :param document_id: 文档ID
+        :param content_hash: 分块内容哈希
+        :param occurrence: 同一文档中相同内容出现的次序，用于区分重复的分块
+        """
+        return uuid.uuid5(document_id, f"{content_hash}:{occurrence}")
+
+
+@dataclass(slots=True)
+class ChunkBatch:
+    """ 同一文档的一批分块，流水线后半段按批次处理以摊薄每次调用的开销 """
+    task: IngestionTask
+    chunks: list[Chunk]
+
+
+@dataclass(slots=True)
+class IngestionResult:
+    """ 单个文档的入库结果 """
+    document_id: uuid.UUID
+    success: bool
+    chunk_count: int = 0  # 文档当前版本的分块总数
+    written_chunks: int = 0  # 新增或内容变化、重新处理并写入的分块数
+    skipped_chunks: int = 0  # 内容未变化、跳过分词、嵌入和写入的分块数
+    removed_chunks: int = 0  # 旧版本中已不存在、被删除的分块数
+    duplicate_chunks: int = 0  # 与其它文档中的分块近似重复的分块数
+    duplicate_image: bool = False  # 图片与已入库的图片相同，整个文档被跳过
+    error: str = ""
+    elapsed: float = 0.0  # 耗时(秒)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 20:35
+@Author : YangFei
+@File   : images.py
+@Desc   : 图片入库预处理：在进程池中缩小、统一颜色模式并重新编码，按感知哈希跳过已入库的图片，缩略图写入 MinIO
+
+感知哈希的汉明距离不超过 d 时视为同一张图片(缩放、重新压缩、轻微裁剪后哈希只有少量位不同)。
+按鸽巢原理把 64 位哈希切分为 d + 1 段，距离不超过 d 的两个哈希至少有一段完全相同，
+每段分别建立倒排表，查找时只需要比较至少一段相同的候选。
+每个租户的索引保存在进程内存中，首次处理某个租户时从 Redis 的哈希表重建。
+新图片的哈希在检测时立即加入内存索引，使并发处理的相同图片只有一张入库；文档入库完成后才写入 Redis，
+文档失败时从内存索引中移除，避免之后的图片被判定为与从未入库的图片重复。
+"""
+import io
+import uuid
+import asyncio
+import logging
+import posixpath
+from collections import OrderedDict
+from typing import Optional
+
+from app.infrastructure.storage.redis import get_redis
+from app.infrastructure.storage.tenant_router import get_tenant_router
+from app.infrastructure.external.image_pool import IMAGE_EXTENSIONS, PreprocessedImage, get_image_processor
+from core.system_config import get_settings
+
+from .entities import IngestionTask
+
+logger = logging.getLogger(__name__)
+
+# Redis 中租户图片感知哈希的键前缀，字段为十六进制哈希，值为文档ID
+PHASH_KEY_PREFIX = "ingestion:phash:"
+# 从 Redis 加载哈希时每次扫描的数量
+_SCAN_COUNT = 1000
+
+
+def phash_key(tenant_id: str) -> str:
+    """ 获取租户图片感知哈希在 Redis 中的键 """
+    return f"{PHASH_KEY_PREFIX}{tenant_id}"
+
+
+def is_image(file_name: str) -> bool:
+    """ 根据扩展名判断是否为图片 """
+    return posixpath.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def thumbnail_object_name(object_name: str) -> str:
+    """ 缩略图与原图放在同一目录，例如 a/b/photo.png 的缩略图为 a/b/photo.thumb.jpg """
+    return f"{posixpath.splitext(object_name)[0]}.thumb.jpg"
+
+
+class PerceptualHashIndex:
+    """ 单个租户的 64 位感知哈希索引，按汉明距离查找 """
+
+    def __init__(self, max_distance: int):
+        """ 构造函数
+        :param max_distance: 视为同一张图片的最大汉明距离
+        """
+        self._max_distance = max_distance
+        segments = max_distance + 1
+        # 每段的(位移, 掩码)，64 位尽量平均分配
+        widths = [64 // segments + (1 if i < 64 % segments else 0) for i in range(segments)]
+        shifts = [sum(widths[i + 1:]) for i in range(segments)]
+        self._segments = [(shift, (1 << width) - 1) for shift, width in zip(shifts, widths)]
+        self._tables: list[dict[int, set[int]]] = [{} for _ in range(segments)]
+        self._documents: dict[int, uuid.UUID] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def query(self, value: int, exclude_document: Optional[uuid.UUID] = None) -> Optional[uuid.UUID]:
+        """ 查找汉明距离不超过上限的图片
+        :param value: 感知哈希
+        :param exclude_document: 排除该文档，文档重新入库时不与自身旧版本匹配
+        :return: 已有图片所属的文档ID，没有时返回 None
+        """
+        best: Optional[tuple[int, uuid.UUID]] = None
+        for table, (shift, mask) in zip(self._tables, self._segments):
+            for candidate in table.get((value >> shift) & mask, ()):
+                document_id = self._documents[candidate]
+                if document_id == exclude_document:
+                    continue
+                distance = (candidate ^ value).bit_count()
+                if distance <= self._max_distance and (best is None or distance < best[0]):
+                    best = (distance, document_id)
+        return best[1] if best else None
+
+    def insert(self, value: int, document_id: uuid.UUID) -> None:
+        """ 加入索引，相同的哈希只保留最后一次的文档ID """
+        self._documents[value] = document_id
+        for table, (shift, mask) in zip(self._tables, self._segments):
+            table.setdefault((value >> shift) & mask, set()).add(value)
+
+    def remove(self, value: int, document_id: uuid.UUID) -> None:
+        """ 从索引中移除，哈希已被其它文档覆盖时不移除 """
+        if self._documents.get(value) != document_id:
+            return
+        del self._documents[value]
+        for table, (shift, mask) in zip(self._tables, self._segments):
+            key = (value >> shift) & mask
+            values = table.get(key)
+            if values is not None:
+                values.discard(value)
+                if not values:
+                    del table[key]
+
+
+class PoolImagePreprocessor:
+    """ 图片预处理阶段，已入库的图片返回 None """
+
+    def __init__(self, dedup: Optional[bool] = None, persistent: bool = True):
+        """ 构造函数
+        :param dedup: 是否按感知哈希跳过已入库的图片，默认取系统配置
+        :param persistent: 是否将感知哈希持久化到 Redis 并上传缩略图，测试和压测时可以关闭
+        """
+        settings = get_settings()
+        self._dedup = settings.image_dedup_enabled if dedup is None else dedup
+        self._persistent = persistent
+        self._max_distance = settings.image_phash_distance
+        self._max_tenants = settings.ingestion_dedup_max_tenants
+        self._indexes: OrderedDict[str, PerceptualHashIndex] = OrderedDict()
+        self._load_lock = asyncio.Lock()
+        # 文档ID -> 已加入内存索引、尚未写入 Redis 的感知哈希
+        self._pending: dict[uuid.UUID, int] = {}
+
+    async def process(self, task: IngestionTask, data: bytes) -> Optional[PreprocessedImage]:
+        """ 预处理图片
+        :return: 预处理后的图片，图片与同一租户其它文档中的图片相同时返回 None
+        """
+        image = await get_image_processor().process(data)
+        if self._dedup:
+            index = await self._index(task.tenant_id)
+            # 查找和插入之间没有 await，并发处理的相同图片只有一张会入库
+            known = index.query(image.phash, exclude_document=task.document_id)
+            if known is not None:
+                logger.info("图片与文档 %s 中的图片重复, document_id=%s", known, task.document_id)
+                return None
+            index.insert(image.phash, task.document_id)
+            self._pending[task.document_id] = image.phash
+
+        if self._persistent:
+            route = await get_tenant_router().resolve_for_write(task.tenant_id)
+            image.thumbnail_object = thumbnail_object_name(task.object_name)
+            bucket_name = task.bucket_name or route.bucket_name
+            await asyncio.to_thread(
+                route.minio.client.put_object,
+                bucket_name,
+                image.thumbnail_object,
+                io.BytesIO(image.thumbnail),
+                len(image.thumbnail),
+                content_type="image/jpeg",
+            )
+        return image
+
+    async def commit(self, task: IngestionTask) -> None:
+        """ 文档入库完成后把图片的感知哈希写入 Redis """
+        phash = self._pending.pop(task.document_id, None)
+        if phash is None or not self._persistent:
+            return
+        try:
+            await get_redis().client.hset(phash_key(task.tenant_id), f"{phash:016x}", str(task.document_id))
+        except Exception as e:
+            logger.warning("保存图片感知哈希到 Redis 失败: %s", e)
+
+    async def discard(self, task: IngestionTask) -> None:
+        """ 文档入库失败后从内存索引中移除图片的感知哈希 """
+        phash = self._pending.pop(task.document_id, None)
+        if phash is None:
+            return
+        index = self._indexes.get(task.tenant_id)
+        if index is not None:
+            index.remove(phash, task.document_id)
+
+    async def _index(self, tenant_id: str) -> PerceptualHashIndex:
+        """ 获取租户的索引，首次使用时从 Redis 加载 """
+        index = self._indexes.get(tenant_id)
+        if index is None:
+            async with self._load_lock:
+                index = self._indexes.get(tenant_id)
+                if index is None:
+                    index = PerceptualHashIndex(self._max_distance)
+                    if self._persistent:
+                        await self._load(tenant_id, index)
+                    self._indexes[tenant_id] = index
+                    while len(self._indexes) > self._max_tenants:
+                        self._indexes.popitem(last=False)
+        self._indexes.move_to_end(tenant_id)
+        return index
+
+    @staticmethod
+    async def _load(tenant_id: str, index: PerceptualHashIndex) -> None:
+        """ 从 Redis 加载租户的全部感知哈希，Redis 不可用时从空索引开始 """
+        try:
+            async for field, value in get_redis().client.hscan_iter(phash_key(tenant_id), count=_SCAN_COUNT):
+                index.insert(int(field, 16), uuid.UUID(value))
+            logger.info("租户 %s 的图片感知哈希加载完成, 数量: %d", tenant_id, len(index))
+        except Exception as e:
+            logger.warning("从 Redis 加载图片感知哈希失败，使用空索引: %s", e)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 13:02
+@Author : YangFei
+@File   : local.py
+@Desc   : 入库流水线各阶段的本地实现，不依赖外部服务，用于测试和压测
+"""
+import re
+import uuid
+import hashlib
+from collections import Counter
+from typing import AsyncIterator, Optional
+
+from .entities import IngestionTask, DocumentElement, Chunk
+
+
+class LocalFetcher:
+    """ 从内存中读取源文件，键为对象路径 """
+
+    def __init__(self, objects: dict[str, bytes]):
+        """ 构造函数
+        :param objects: 对象路径到文件内容的映射
+        """
+        self.objects = objects
+
+    async def fetch(self, task: IngestionTask) -> bytes:
+        """ 读取对象内容，对象不存在时抛出 FileNotFoundError """
+        if task.object_name not in self.objects:
+            raise FileNotFoundError(f"未找到文件: {task.object_name}")
+        return self.objects[task.object_name]
+
+
+class PlainTextPartitioner:
+    """ 将文件内容按 UTF-8 解码，以空行划分段落 """
+
+    async def partition(self, task: IngestionTask, data: bytes) -> AsyncIterator[DocumentElement]:
+        """ 解析纯文本，逐个产出段落 """
+        for paragraph in re.split(r"\n\s*\n", data.decode("utf-8", errors="ignore")):
+            if paragraph.strip():
+                yield DocumentElement(text=paragraph.strip(), category="NarrativeText")
+
+
+def tokenize_words(text: str) -> list[str]:
+    """ 按空白和标点切词，不加载分词模型 """
+    return re.findall(r"\w+", text.lower())
+
+
+class SimpleKeywordExtractor:
+    """ 按空白和标点切词后统计词频，不加载分词模型 """
+
+    def __init__(self, top_n: int = 10):
+        """ 构造函数
+        :param top_n: 每个分块提取的关键词数量
+        """
+        self._top_n = top_n
+
+    async def extract(self, texts: list[str], tokens: Optional[list[list[str]]] = None) -> list[list[str]]:
+        """ 提取高频词，传入分词结果时直接统计 """
+        if tokens is None:
+            tokens = [tokenize_words(text) for text in texts]
+        return [[token for token, _ in Counter(chunk_tokens).most_common(self._top_n)] for chunk_tokens in tokens]
+
+
+class HashEmbedder:
+    """ 根据文本哈希生成确定性的伪向量，相同文本总是得到相同的向量 """
+
+    def __init__(self, dim: int = 512):
+        """ 构造函数
+        :param dim: 向量维度
+        """
+        self._dim = dim
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """ 批量生成伪向量 """
+        return [self._embed(text.encode("utf-8")) for text in texts]
+
+    async def embed_images(self, images: list[bytes]) -> list[list[float]]:
+        """ 批量生成图片的伪向量 """
+        return [self._embed(image) for image in images]
+
+    def _embed(self, data: bytes) -> list[float]:
+        """ 使用哈希值作为字节流，映射到 [-1, 1) 区间 """
+        digest = b""
+        counter = 0
+        while len(digest) < self._dim:
+            digest += hashlib.sha256(f"{counter}:".encode("utf-8") + data).digest()
+            counter += 1
+        return [byte / 128.0 - 1.0 for byte in digest[:self._dim]]
+
+
+class InMemoryChunkWriter:
+    """ 将分块写入内存，重复写入时覆盖 """
+
+    def __init__(self):
+        """ 构造函数 """
+        self.chunks: dict[uuid.UUID, Chunk] = {}
+
+    async def write(self, task: IngestionTask, chunks: list[Chunk]) -> None:
+        """ 写入分块 """
+        for chunk in chunks:
+            self.chunks[chunk.id] = chunk
+
+    async def load_existing(self, task: IngestionTask) -> dict[uuid.UUID, int]:
+        """ 查询文档已写入的分块 """
+        return {
+            chunk.id: chunk.chunk_index
+            for chunk in self.chunks.values()
+            if chunk.document_id == task.document_id
+        }
+
+    async def reindex(self, task: IngestionTask, positions: dict[uuid.UUID, int]) -> None:
+        """ 更新分块序号 """
+        for chunk_id, index in positions.items():
+            self.chunks[chunk_id].chunk_index = index
+
+    async def delete(self, task: IngestionTask, chunk_ids: list[uuid.UUID]) -> None:
+        """ 删除分块 """
+        for chunk_id in chunk_ids:
+            self.chunks.pop(chunk_id, None)
+
+    async def load_duplicates(self, task: IngestionTask, chunk_ids: list[uuid.UUID]) -> list[Chunk]:
+        """ 查询与这些分块关联的重复分块 """
+        targets = set(chunk_ids)
+        return sorted(
+            (chunk for chunk in self.chunks.values()
+             if chunk.tenant_id == task.tenant_id and chunk.duplicate_of in targets),
+            key=lambda chunk: (str(chunk.document_id), chunk.chunk_index),
+        )
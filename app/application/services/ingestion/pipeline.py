@@ -0,0 +1,570 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 12:10
+@Author : YangFei
+@File   : pipeline.py
+@Desc   : 分阶段的异步文档入库流水线
+
+拉取 -> 解析 -> 分块 -> 去重 -> 关键词提取 -> 嵌入 -> 写入，相邻阶段之间通过有界队列连接，
+每个阶段有独立的并发数。下游阶段处理变慢时队列被填满，上游阶段在 put 时等待，
+从而形成背压，内存占用由队列长度和批次大小决定，而不会随待处理文档数量增长。
+"""
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from collections import Counter, deque
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+from app.infrastructure.external.image_pool import PreprocessedImage
+from core.system_config import get_settings
+
+from .entities import IngestionTask, DocumentElement, Chunk, ChunkBatch, IngestionResult, chunk_hash
+from .progress import ProgressTracker, StorageProgressTracker
+from .stages import (
+    Fetcher, ImagePreprocessor, Partitioner, Chunker, Deduplicator, KeywordExtractor, Embedder, ChunkWriter,
+    MinIOFetcher, PoolPartitioner, FenciKeywordExtractor, ServiceEmbedder, VectorPostgresWriter,
+)
+from .chunker import TokenChunker
+from .dedup import MinHashDeduplicator
+from .images import PoolImagePreprocessor, is_image
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记，上游阶段全部完成后为下游的每个工作协程放入一个
+_STOP = object()
+
+# 阶段名称及先后顺序
+STAGES = ("fetch", "partition", "chunk", "dedup", "keyword", "embed", "write")
+
+
+@dataclass(slots=True)
+class IngestionStages:
+    """ 流水线各阶段的实现，任意阶段都可以替换 """
+    fetcher: Fetcher = field(default_factory=MinIOFetcher)
+    image_preprocessor: ImagePreprocessor = field(default_factory=PoolImagePreprocessor)
+    partitioner: Partitioner = field(default_factory=PoolPartitioner)
+    chunker: Chunker = field(default_factory=TokenChunker)
+    deduplicator: Deduplicator = field(default_factory=MinHashDeduplicator)
+    keyword_extractor: KeywordExtractor = field(default_factory=FenciKeywordExtractor)
+    embedder: Embedder = field(default_factory=ServiceEmbedder)
+    writer: ChunkWriter = field(default_factory=VectorPostgresWriter)
+    tracker: ProgressTracker = field(default_factory=StorageProgressTracker)
+
+
+@dataclass(slots=True)
+class PipelineConfig:
+    """ 流水线参数，默认值取自系统配置 """
+    queue_size: int
+    batch_size: int
+    fetch_concurrency: int
+    partition_concurrency: int
+    chunk_concurrency: int
+    dedup_concurrency: int
+    keyword_concurrency: int
+    embed_concurrency: int
+    write_concurrency: int
+    incremental: bool = True
+    delete_batch_size: int = 500
+
+    @classmethod
+    def from_settings(cls) -> "PipelineConfig":
+        """ 从系统配置中读取流水线参数 """
+        settings = get_settings()
+        return cls(
+            queue_size=settings.ingestion_queue_size,
+            batch_size=settings.ingestion_chunk_batch_size,
+            fetch_concurrency=settings.ingestion_fetch_concurrency,
+            partition_concurrency=settings.ingestion_partition_concurrency,
+            chunk_concurrency=settings.ingestion_chunk_concurrency,
+            dedup_concurrency=settings.ingestion_dedup_concurrency,
+            keyword_concurrency=settings.ingestion_keyword_concurrency,
+            embed_concurrency=settings.ingestion_embed_concurrency,
+            write_concurrency=settings.ingestion_write_concurrency,
+            incremental=settings.ingestion_incremental,
+            delete_batch_size=settings.ingestion_delete_batch_size,
+        )
+
+
+class _ElementStream:
+    """ 解析阶段和分块阶段之间单个文档的元素流，解析阶段边解析边放入，分块阶段边取出边分块
+
+    缓冲区有界，分块跟不上解析时解析阶段等待，单个文档占用的内存不随文档大小增长。
+    文档失败时关闭元素流：解析阶段停止解析，分块阶段抛出失败原因，不会把不完整的文档当作解析完成。
+    """
+
+    __slots__ = ("_buffer", "_maxsize", "_condition", "_finished", "_error")
+
+    def __init__(self, maxsize: int):
+        self._buffer: deque[DocumentElement] = deque()
+        self._maxsize = max(maxsize, 1)
+        self._condition = asyncio.Condition()
+        self._finished = False
+        self._error: Optional[BaseException] = None
+
+    async def put(self, element: DocumentElement) -> bool:
+        """ 放入一个元素，缓冲区满时等待；元素流已关闭时返回 False，解析阶段应停止解析 """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._error is not None or len(self._buffer) < self._maxsize)
+            if self._error is not None:
+                return False
+            self._buffer.append(element)
+            self._condition.notify_all()
+            return True
+
+    async def finish(self) -> None:
+        """ 解析完成 """
+        async with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+
+    async def close(self, error: BaseException) -> None:
+        """ 文档失败，丢弃缓冲区中的元素，唤醒两端 """
+        async with self._condition:
+            if self._error is None:
+                self._error = error
+                self._buffer.clear()
+            self._condition.notify_all()
+
+    def __aiter__(self) -> "_ElementStream":
+        return self
+
+    async def __anext__(self) -> DocumentElement:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._buffer or self._finished or self._error is not None)
+            if self._error is not None:
+                raise self._error
+            if not self._buffer:
+                raise StopAsyncIteration
+            element = self._buffer.popleft()
+            self._condition.notify_all()
+            return element
+
+
+@dataclass(slots=True)
+class _DocumentState:
+    """ 单个文档在流水线中的状态，分块批次在写入阶段可能乱序完成，需要计数判断是否全部写完 """
+    task: IngestionTask
+    started_at: float
+    chunk_count: int = 0  # 分块总数，分块阶段结束后才能确定
+    written_chunks: int = 0
+    skipped_chunks: int = 0
+    removed_chunks: int = 0
+    duplicate_chunks: int = 0
+    duplicate_image: bool = False  # 图片与已入库的图片相同，跳过整个文档
+    elements: Optional[_ElementStream] = None  # 解析阶段产出的元素流
+    total_batches: Optional[int] = None  # 需要写入的批次数，分块阶段结束后才能确定
+    written_batches: int = 0
+    stage_index: int = -1  # 已记录的最靠后的阶段
+    failed: bool = False
+    done: bool = False
+
+
+# 阶段处理函数：接收一个上游元素，产出零个或多个下游元素
+StageHandler = Callable[[Any], AsyncIterator[Any]]
+
+
+class IngestionPipeline:
+    """ 文档入库流水线 """
+
+    def __init__(self, stages: Optional[IngestionStages] = None, config: Optional[PipelineConfig] = None):
+        """ 构造函数
+        :param stages: 各阶段实现，默认使用 MinIO、解析进程池、Fenci、嵌入服务、Weaviate 和 Postgres
+        :param config: 流水线参数，默认从系统配置读取
+        """
+        self._stages = stages or IngestionStages()
+        self._config = config or PipelineConfig.from_settings()
+        self._states: dict[uuid.UUID, _DocumentState] = {}
+        self._results: list[IngestionResult] = []
+
+    async def run(self, tasks: Iterable[IngestionTask]) -> list[IngestionResult]:
+        """ 处理一组入库任务，所有文档处理结束(成功或失败)后返回结果
+        :param tasks: 入库任务
+        :return: 每个文档的入库结果，顺序与任务完成顺序一致
+        """
+        config = self._config
+        self._states = {}
+        self._results = []
+
+        # 按阶段顺序定义处理函数和并发数，相邻阶段之间放一个有界队列
+        pipeline: list[tuple[str, StageHandler, int]] = list(zip(STAGES, (
+            self._fetch, self._partition, self._chunk, self._dedup, self._keyword, self._embed, self._write,
+        ), (
+            config.fetch_concurrency, config.partition_concurrency, config.chunk_concurrency,
+            config.dedup_concurrency, config.keyword_concurrency, config.embed_concurrency, config.write_concurrency,
+        )))
+        concurrencies = [max(concurrency, 1) for _, _, concurrency in pipeline]
+        # 第 i 个队列是第 i 个阶段的输入，写入阶段没有下游
+        queues: list[Optional[asyncio.Queue]] = [asyncio.Queue(maxsize=config.queue_size) for _ in pipeline]
+        queues.append(None)
+
+        stage_runs = [
+            asyncio.create_task(self._run_stage(
+                name, handler, concurrencies[i], queues[i], queues[i + 1],
+                concurrencies[i + 1] if i + 1 < len(pipeline) else 0,
+            ))
+            for i, (name, handler, _) in enumerate(pipeline)
+        ]
+
+        try:
+            # 投递任务，第一个队列满时在这里等待
+            for task in tasks:
+                self._states[task.document_id] = _DocumentState(task=task, started_at=time.perf_counter())
+                await self._stages.tracker.on_start(task)
+                await queues[0].put(task)
+            for _ in range(concurrencies[0]):
+                await queues[0].put(_STOP)
+
+            await asyncio.gather(*stage_runs)
+        except BaseException:
+            for run in stage_runs:
+                run.cancel()
+            await asyncio.gather(*stage_runs, return_exceptions=True)
+            # 流水线在工作进程中复用，未结束文档的分块签名和图片感知哈希不能留在内存索引中
+            for state in self._states.values():
+                if not state.done and not state.failed:
+                    await self._stages.deduplicator.discard(state.task)
+                    await self._stages.image_preprocessor.discard(state.task)
+            raise
+
+        return self._results
+
+    async def _run_stage(
+            self,
+            name: str,
+            handler: StageHandler,
+            concurrency: int,
+            in_queue: asyncio.Queue,
+            out_queue: Optional[asyncio.Queue],
+            downstream_concurrency: int,
+    ) -> None:
+        """ 启动一个阶段的所有工作协程，全部结束后向下游传递结束标记 """
+        workers = [
+            asyncio.create_task(self._worker(name, handler, in_queue, out_queue))
+            for _ in range(concurrency)
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+
+        # 下游每个工作协程需要一个结束标记
+        for _ in range(downstream_concurrency):
+            await out_queue.put(_STOP)
+
+    async def _worker(
+            self,
+            name: str,
+            handler: StageHandler,
+            in_queue: asyncio.Queue,
+            out_queue: Optional[asyncio.Queue],
+    ) -> None:
+        """ 工作协程，循环处理上游元素直到收到结束标记 """
+        while True:
+            item = await in_queue.get()
+            if item is _STOP:
+                return
+
+            task = self._task_of(item)
+            state = self._states[task.document_id]
+            # 文档已在其它阶段失败，丢弃剩余的元素
+            if state.failed:
+                continue
+
+            try:
+                # 同一文档的多个批次分布在不同阶段，只在首次进入更靠后的阶段时记录
+                stage_index = STAGES.index(name)
+                if stage_index > state.stage_index:
+                    state.stage_index = stage_index
+                    await self._stages.tracker.on_stage(task, name)
+                async for output in handler(item):
+                    # 下游队列满时在这里等待，形成背压
+                    await out_queue.put(output)
+            except Exception as e:
+                # 文档已在其它阶段失败时(例如解析失败后关闭了元素流)不重复记录
+                if not state.failed:
+                    logger.error("文档入库失败, document_id=%s, stage=%s: %s", task.document_id, name, e)
+                await self._fail(state, name, e)
+
+    @staticmethod
+    def _task_of(item: Any) -> IngestionTask:
+        """ 获取队列元素所属的入库任务 """
+        if isinstance(item, IngestionTask):
+            return item
+        if isinstance(item, ChunkBatch):
+            return item.task
+        return item[0]
+
+    async def _fetch(self, task: IngestionTask) -> AsyncIterator[tuple[IngestionTask, bytes]]:
+        """ 拉取阶段 """
+        data = await self._stages.fetcher.fetch(task)
+        yield task, data
+
+    async def _partition(
+            self,
+            item: tuple[IngestionTask, bytes],
+    ) -> AsyncIterator[tuple[IngestionTask, _ElementStream, Optional[PreprocessedImage]]]:
+        """ 解析阶段，图片先做预处理，与已入库的图片相同时跳过整个文档
+
+        开始解析前就把元素流交给分块阶段，之后每解析出一个元素就放入元素流，分块与解析同时进行。
+        """
+        task, data = item
+        state = self._states[task.document_id]
+        image = None
+        if is_image(task.file_name or task.object_name):
+            image = await self._stages.image_preprocessor.process(task, data)
+            if image is None:
+                state.duplicate_image = True
+                state.total_batches = 0
+                await self._complete_if_done(state)
+                return
+
+        stream = state.elements = _ElementStream(self._config.queue_size)
+        yield task, stream, image
+        try:
+            async with aclosing(self._stages.partitioner.partition(task, data)) as elements:
+                async for element in elements:
+                    # 文档已失败，停止解析
+                    if not await stream.put(element):
+                        return
+        except Exception as e:
+            await stream.close(e)
+            raise
+        await stream.finish()
+
+    async def _chunks(
+            self,
+            task: IngestionTask,
+            elements: _ElementStream,
+            image: Optional[PreprocessedImage],
+    ) -> AsyncIterator[Chunk]:
+        """ 文本分块，图片文档最后追加一个图片分块，内容为文件名，元数据中记录缩略图和尺寸 """
+        index = 0
+        async for chunk in self._stages.chunker.chunk(task, elements):
+            index = chunk.chunk_index + 1
+            yield chunk
+        if image is not None:
+            yield Chunk(
+                document_id=task.document_id,
+                tenant_id=task.tenant_id,
+                chunk_index=index,
+                content=task.file_name or task.object_name,
+                metadata={
+                    "category": "Image",
+                    "thumbnail": image.thumbnail_object,
+                    "width": image.source_width,
+                    "height": image.source_height,
+                    "phash": f"{image.phash:016x}",
+                },
+                # 图片变化时即使文件名相同也要重新生成向量
+                content_hash=hashlib.sha256(image.data).hexdigest(),
+                image=image.data,
+            )
+
+    async def _chunk(
+            self,
+            item: tuple[IngestionTask, _ElementStream, Optional[PreprocessedImage]],
+    ) -> AsyncIterator[ChunkBatch]:
+        """ 分块阶段，为分块生成内容哈希和ID，只把新增或内容变化的分块按批次向下游传递
+
+        重新入库时，ID 已存在的分块内容未变化，跳过关键词提取、嵌入和写入，位置变化时只更新序号；
+        旧版本中有、新版本中没有的分块在分块结束后分批删除。
+        """
+        task, elements, image = item
+        state = self._states[task.document_id]
+        chunker = self._stages.chunker
+        writer = self._stages.writer
+
+        # 旧版本的分块ID到序号的映射，非增量模式下视为没有旧分块
+        existing = await writer.load_existing(task) if self._config.incremental else {}
+        seen: set[uuid.UUID] = set()
+        moved: dict[uuid.UUID, int] = {}
+        occurrences: Counter[str] = Counter()
+
+        batch: list[Chunk] = []
+        batches = 0
+        async for chunk in self._chunks(task, elements, image):
+            chunk.content_hash = chunk.content_hash or chunk_hash(chunk.content, chunker.signature)
+            chunk.id = Chunk.make_id(task.document_id, chunk.content_hash, occurrences[chunk.content_hash])
+            occurrences[chunk.content_hash] += 1
+            seen.add(chunk.id)
+            state.chunk_count += 1
+
+            if chunk.id in existing:
+                state.skipped_chunks += 1
+                if existing[chunk.id] != chunk.chunk_index:
+                    moved[chunk.id] = chunk.chunk_index
+                continue
+
+            batch.append(chunk)
+            if len(batch) >= self._config.batch_size:
+                batches += 1
+                yield ChunkBatch(task=task, chunks=batch)
+                batch = []
+        if batch:
+            batches += 1
+            yield ChunkBatch(task=task, chunks=batch)
+
+        # 删除旧版本中已不存在的分块，更新位置变化的分块序号
+        removed = [chunk_id for chunk_id in existing if chunk_id not in seen]
+        for start in range(0, len(removed), self._config.delete_batch_size):
+            chunk_ids = removed[start:start + self._config.delete_batch_size]
+            await writer.delete(task, chunk_ids)
+            await self._stages.deduplicator.remove(task, chunk_ids)
+            await self._promote_duplicates(task, chunk_ids)
+        await writer.reindex(task, moved)
+        state.removed_chunks = len(removed)
+
+        state.total_batches = batches
+        await self._complete_if_done(state)
+
+    async def _promote_duplicates(self, task: IngestionTask, chunk_ids: list[uuid.UUID]) -> None:
+        """ 被删除分块的重复分块(link 模式下只写入了 Postgres，没有向量)需要提升为独立分块，否则不会再被向量检索到
+
+        每个被删除的分块只提升第一个重复分块，为它生成向量并加入去重索引，其余重复分块改为关联到它。
+        """
+        writer = self._stages.writer
+        duplicates = await writer.load_duplicates(task, chunk_ids)
+        if not duplicates:
+            return
+
+        promoted: dict[uuid.UUID, Chunk] = {}
+        for chunk in duplicates:
+            canonical = promoted.get(chunk.duplicate_of)
+            if canonical is None:
+                promoted[chunk.duplicate_of] = chunk
+                chunk.duplicate_of = None
+                chunk.metadata.pop("duplicate_of", None)
+            else:
+                chunk.duplicate_of = canonical.id
+                chunk.metadata["duplicate_of"] = str(canonical.id)
+
+        heads = list(promoted.values())
+        vectors = await self._stages.embedder.embed([chunk.content for chunk in heads])
+        for chunk, vector in zip(heads, vectors):
+            chunk.vector = vector
+        await writer.write(task, duplicates)
+        await self._stages.deduplicator.promote(task, heads)
+        logger.info(
+            "被删除分块的重复分块已提升为独立分块, document_id=%s, 提升=%d, 重新关联=%d",
+            task.document_id, len(heads), len(duplicates) - len(heads),
+        )
+
+    async def _dedup(self, batch: ChunkBatch) -> AsyncIterator[ChunkBatch]:
+        """ 去重阶段，为分块分词并标记近似重复的分块；被跳过的重复分块从批次中移除，空批次也要向下游传递以便计数 """
+        chunks = batch.chunks
+        deduplicator = self._stages.deduplicator
+        batch.chunks = await deduplicator.deduplicate(batch.task, chunks)
+        state = self._states[batch.task.document_id]
+        # 检测期间文档在其它阶段失败，撤销本批次刚插入的签名
+        if state.failed:
+            await deduplicator.discard(batch.task)
+            return
+        state.duplicate_chunks += sum(chunk.duplicate_of is not None for chunk in chunks)
+        yield batch
+
+    async def _keyword(self, batch: ChunkBatch) -> AsyncIterator[ChunkBatch]:
+        """ 关键词提取阶段，复用去重阶段的分词结果 """
+        tokens = [chunk.tokens for chunk in batch.chunks]
+        keywords = await self._stages.keyword_extractor.extract(
+            [chunk.content for chunk in batch.chunks],
+            tokens if all(chunk_tokens is not None for chunk_tokens in tokens) else None,
+        )
+        for chunk, chunk_keywords in zip(batch.chunks, keywords):
+            chunk.keywords = chunk_keywords
+        yield batch
+
+    async def _embed(self, batch: ChunkBatch) -> AsyncIterator[ChunkBatch]:
+        """ 嵌入阶段，重复分块不生成向量，图片分块生成图片向量 """
+        embedder = self._stages.embedder
+        chunks = [chunk for chunk in batch.chunks if chunk.duplicate_of is None and chunk.image is None]
+        if chunks:
+            vectors = await embedder.embed([chunk.content for chunk in chunks])
+            for chunk, vector in zip(chunks, vectors):
+                chunk.vector = vector
+        images = [chunk for chunk in batch.chunks if chunk.image is not None]
+        if images:
+            vectors = await embedder.embed_images([chunk.image for chunk in images])
+            for chunk, vector in zip(images, vectors):
+                chunk.vector = vector
+        yield batch
+
+    async def _write(self, batch: ChunkBatch) -> AsyncIterator[Any]:
+        """ 写入阶段，没有下游输出，文档全部批次写入后记录结果 """
+        await self._stages.writer.write(batch.task, batch.chunks)
+        # 写入成功后才持久化分块签名
+        await self._stages.deduplicator.commit(batch.task, batch.chunks)
+        await self._stages.tracker.on_chunks(batch.task, len(batch.chunks))
+
+        state = self._states[batch.task.document_id]
+        state.written_batches += 1
+        state.written_chunks += len(batch.chunks)
+        await self._complete_if_done(state)
+        return
+        yield  # 保留 yield 使其成为异步生成器，与其它阶段的处理函数保持一致
+
+    async def _complete_if_done(self, state: _DocumentState) -> None:
+        """ 分块阶段已结束且所有批次都已写入时，标记文档入库完成 """
+        if state.done or state.failed or state.total_batches is None:
+            return
+        if state.written_batches < state.total_batches:
+            return
+
+        state.done = True
+        # 所有分块都已写入，图片的去重记录才能持久化
+        await self._stages.image_preprocessor.commit(state.task)
+        result = IngestionResult(
+            document_id=state.task.document_id,
+            success=True,
+            chunk_count=state.chunk_count,
+            written_chunks=state.written_chunks,
+            skipped_chunks=state.skipped_chunks,
+            removed_chunks=state.removed_chunks,
+            duplicate_chunks=state.duplicate_chunks,
+            duplicate_image=state.duplicate_image,
+            elapsed=time.perf_counter() - state.started_at,
+        )
+        await self._stages.tracker.on_complete(state.task, result)
+        self._results.append(result)
+        logger.info(
+            "文档入库完成, document_id=%s, 分块数=%d, 写入=%d, 跳过=%d, 删除=%d, 重复=%d",
+            state.task.document_id, state.chunk_count, state.written_chunks, state.skipped_chunks, state.removed_chunks,
+            state.duplicate_chunks,
+        )
+
+    async def _fail(self, state: _DocumentState, stage: str, error: Exception) -> None:
+        """ 标记文档入库失败，同一文档只记录一次 """
+        if state.failed or state.done:
+            return
+
+        state.failed = True
+        # 解析阶段可能还在产出元素，关闭元素流使其停止
+        if state.elements is not None:
+            await state.elements.close(error)
+        # 撤销尚未写入的分块签名和图片感知哈希
+        await self._stages.deduplicator.discard(state.task)
+        await self._stages.image_preprocessor.discard(state.task)
+        result = IngestionResult(
+            document_id=state.task.document_id,
+            success=False,
+            chunk_count=state.chunk_count,
+            written_chunks=state.written_chunks,
+            skipped_chunks=state.skipped_chunks,
+            removed_chunks=state.removed_chunks,
+            duplicate_chunks=state.duplicate_chunks,
+            error=f"{stage}: {error}",
+            elapsed=time.perf_counter() - state.started_at,
+        )
+        await self._stages.tracker.on_fail(state.task, stage, result)
+        self._results.append(result)
+
+
+def create_ingestion_pipeline(**stages: Any) -> IngestionPipeline:
+    """ 创建入库流水线，可以通过关键字参数替换任意阶段，例如 create_ingestion_pipeline(embedder=...) """
+    return IngestionPipeline(stages=IngestionStages(**stages))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 11:46
+@Author : YangFei
+@File   : progress.py
+@Desc   : 文档入库进度记录，细粒度的阶段和计数写入 Redis，状态变更写入 Postgres
+"""
+import time
+import uuid
+import logging
+from typing import Protocol
+
+from sqlalchemy import update
+
+from app.infrastructure.models import Document, DocumentStatus
+from app.infrastructure.storage.redis import get_redis
+from app.infrastructure.storage.tenant_router import get_tenant_router
+
+from .entities import IngestionTask, IngestionResult
+
+logger = logging.getLogger(__name__)
+
+# Redis 中入库进度的键前缀及过期时间(秒)
+PROGRESS_KEY_PREFIX = "ingestion:progress:"
+PROGRESS_KEY_TTL = 24 * 60 * 60
+
+
+class ProgressTracker(Protocol):
+    """ 入库进度记录接口 """
+
+    async def on_start(self, task: IngestionTask) -> None: ...
+
+    async def on_stage(self, task: IngestionTask, stage: str) -> None: ...
+
+    async def on_chunks(self, task: IngestionTask, written: int) -> None: ...
+
+    async def on_complete(self, task: IngestionTask, result: IngestionResult) -> None: ...
+
+    async def on_fail(self, task: IngestionTask, stage: str, result: IngestionResult) -> None: ...
+
+
+def progress_key(document_id: uuid.UUID) -> str:
+    """ 获取文档入库进度在 Redis 中的键 """
+    return f"{PROGRESS_KEY_PREFIX}{document_id}"
+
+
+class StorageProgressTracker:
+    """ 基于 Redis 和 Postgres 的入库进度记录，进度记录失败只输出日志，不影响入库本身 """
+
+    async def on_start(self, task: IngestionTask) -> None:
+        """ 文档开始入库 """
+        await self._set_redis(task, status=DocumentStatus.PROCESSING.value, stage="", written=0, error="")
+        await self._set_postgres(task, status=DocumentStatus.PROCESSING.value, stage="", error="")
+
+    async def on_stage(self, task: IngestionTask, stage: str) -> None:
+        """ 文档进入新的阶段，只更新 Redis """
+        await self._set_redis(task, stage=stage)
+
+    async def on_chunks(self, task: IngestionTask, written: int) -> None:
+        """ 一批分块写入完成，累加已写入的分块数量 """
+        try:
+            client = get_redis().client
+            await client.hincrby(progress_key(task.document_id), "written", written)
+        except Exception as e:
+            logger.warning("记录入库进度到 Redis 失败: %s", e)
+
+    async def on_complete(self, task: IngestionTask, result: IngestionResult) -> None:
+        """ 文档入库完成，记录分块总数以及跳过、删除、重复的分块数 """
+        await self._set_redis(
+            task,
+            status=DocumentStatus.COMPLETED.value,
+            stage="",
+            total=result.chunk_count,
+            skipped=result.skipped_chunks,
+            removed=result.removed_chunks,
+            duplicates=result.duplicate_chunks,
+        )
+        await self._set_postgres(task, status=DocumentStatus.COMPLETED.value, stage="", chunk_count=result.chunk_count)
+
+    async def on_fail(self, task: IngestionTask, stage: str, result: IngestionResult) -> None:
+        """ 文档入库失败，记录失败的阶段、原因，以及失败前跳过、删除、重复的分块数 """
+        await self._set_redis(
+            task,
+            status=DocumentStatus.FAILED.value,
+            stage=stage,
+            error=result.error,
+            skipped=result.skipped_chunks,
+            removed=result.removed_chunks,
+            duplicates=result.duplicate_chunks,
+        )
+        await self._set_postgres(task, status=DocumentStatus.FAILED.value, stage=stage, error=result.error)
+
+    @staticmethod
+    async def _set_redis(task: IngestionTask, **fields) -> None:
+        """ 更新 Redis 中的进度字段，并刷新过期时间 """
+        try:
+            client = get_redis().client
+            key = progress_key(task.document_id)
+            fields["updated_at"] = time.time()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=fields)
+                pipe.expire(key, PROGRESS_KEY_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("记录入库进度到 Redis 失败: %s", e)
+
+    @staticmethod
+    async def _set_postgres(task: IngestionTask, **values) -> None:
+        """ 更新租户所在分片的 document 表中的入库状态，租户迁移中不能写入时只输出日志 """
+        try:
+            route = await get_tenant_router().resolve_for_write(task.tenant_id)
+            async with route.postgres.session_factory() as session:
+                await session.execute(update(Document).where(Document.id == task.document_id).values(**values))
+                await session.commit()
+        except Exception as e:
+            logger.warning("记录入库状态到 Postgres 失败: %s", e)
+
+
+class InMemoryProgressTracker:
+    """ 基于内存的入库进度记录，用于测试和本地运行 """
+
+    def __init__(self):
+        """ 构造函数 """
+        self.progress: dict[uuid.UUID, dict] = {}
+
+    async def on_start(self, task: IngestionTask) -> None:
+        """ 文档开始入库 """
+        self.progress[task.document_id] = {"status": DocumentStatus.PROCESSING.value, "stage": "", "written": 0}
+
+    async def on_stage(self, task: IngestionTask, stage: str) -> None:
+        """ 文档进入新的阶段 """
+        self.progress[task.document_id]["stage"] = stage
+
+    async def on_chunks(self, task: IngestionTask, written: int) -> None:
+        """ 一批分块写入完成 """
+        self.progress[task.document_id]["written"] += written
+
+    async def on_complete(self, task: IngestionTask, result: IngestionResult) -> None:
+        """ 文档入库完成 """
+        self.progress[task.document_id].update(
+            status=DocumentStatus.COMPLETED.value,
+            stage="",
+            total=result.chunk_count,
+            skipped=result.skipped_chunks,
+            removed=result.removed_chunks,
+            duplicates=result.duplicate_chunks,
+        )
+
+    async def on_fail(self, task: IngestionTask, stage: str, result: IngestionResult) -> None:
+        """ 文档入库失败 """
+        self.progress[task.document_id].update(
+            status=DocumentStatus.FAILED.value,
+            stage=stage,
+            error=result.error,
+            skipped=result.skipped_chunks,
+            removed=result.removed_chunks,
+            duplicates=result.duplicate_chunks,
+        )
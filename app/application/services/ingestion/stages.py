@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 11:18
+@Author : YangFei
+@File   : stages.py
+@Desc   : 文档入库流水线各阶段的接口定义及默认实现，每个阶段都可以替换为本地实现用于测试
+"""
+import io
+import uuid
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Protocol, AsyncIterable, AsyncIterator, Optional
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+
+from app.infrastructure.models import DocumentChunk
+from app.infrastructure.storage.minio import MinIO
+from app.infrastructure.storage.postgres import Postgres
+from app.infrastructure.storage.tenant_router import get_tenant_router
+from app.infrastructure.external.fenci import get_fenci_client
+from app.infrastructure.external.embedding import get_embedding_client
+from app.infrastructure.external.parser_pool import get_parser_pool
+from app.infrastructure.external.image_pool import PreprocessedImage
+from app.infrastructure.vector import VectorStore, VectorRecord
+from app.application.services.retrieval.cache import bump_collection_version
+from core.startup import import_on_first_use
+
+from .entities import IngestionTask, DocumentElement, Chunk
+
+logger = logging.getLogger(__name__)
+
+
+class Fetcher(Protocol):
+    """ 拉取阶段：读取源文件内容 """
+
+    async def fetch(self, task: IngestionTask) -> bytes: ...
+
+
+class Partitioner(Protocol):
+    """ 解析阶段：将源文件拆分为文档元素，以异步生成器的方式逐个产出 """
+
+    def partition(self, task: IngestionTask, data: bytes) -> AsyncIterator[DocumentElement]: ...
+
+
+class ImagePreprocessor(Protocol):
+    """ 图片预处理阶段：缩小图片、生成缩略图，与已入库的图片相同时返回 None
+
+    图片的去重记录在文档入库完成后调用 commit 持久化，文档失败时调用 discard 撤销。
+    """
+
+    async def process(self, task: IngestionTask, data: bytes) -> Optional[PreprocessedImage]: ...
+
+    async def commit(self, task: IngestionTask) -> None: ...
+
+    async def discard(self, task: IngestionTask) -> None: ...
+
+
+class Chunker(Protocol):
+    """ 分块阶段：边接收文档元素边合并、切分为分块，以异步生成器的方式逐个产出 """
+
+    # 分块器签名，包含分块器类型和影响分块结果的参数，参与分块内容哈希的计算
+    signature: str
+
+    def chunk(self, task: IngestionTask, elements: AsyncIterable[DocumentElement]) -> AsyncIterator[Chunk]: ...
+
+
+class Deduplicator(Protocol):
+    """ 去重阶段：为分块分词，检测与同一租户其它文档中的分块近似重复的分块
+
+    新分块的签名在检测时立即生效，分块写入成功后调用 commit 持久化，文档失败时调用 discard 撤销。
+    被删除分块的重复分块提升为独立分块并写入后，调用 promote 将它们加入索引。
+    """
+
+    async def deduplicate(self, task: IngestionTask, chunks: list[Chunk]) -> list[Chunk]: ...
+
+    async def commit(self, task: IngestionTask, chunks: list[Chunk]) -> None: ...
+
+    async def discard(self, task: IngestionTask) -> None: ...
+
+    async def remove(self, task: IngestionTask, chunk_ids: list[uuid.UUID]) -> None: ...
+
+    async def promote(self, task: IngestionTask, chunks: list[Chunk]) -> None: ...
+
+
+class KeywordExtractor(Protocol):
+    """ 关键词提取阶段：为每个分块提取关键词，用于关键词检索，传入分词结果时不再重复分词 """
+
+    async def extract(self, texts: list[str], tokens: Optional[list[list[str]]] = None) -> list[list[str]]: ...
+
+
+class Embedder(Protocol):
+    """ 嵌入阶段：为每个分块生成向量，图片分块生成图片向量 """
+
+    async def embed(self, texts: list[str]) -> list[list[float]]: ...
+
+    async def embed_images(self, images: list[bytes]) -> list[list[float]]: ...
+
+
+class ChunkWriter(Protocol):
+    """ 写入阶段：将分块写入向量数据库和 Postgres，并负责增量入库时旧分块的查询、重排和删除，
+    以及查询与被删除分块关联的重复分块 """
+
+    async def write(self, task: IngestionTask, chunks: list[Chunk]) -> None: ...
+
+    async def load_existing(self, task: IngestionTask) -> dict[uuid.UUID, int]: ...
+
+    async def reindex(self, task: IngestionTask, positions: dict[uuid.UUID, int]) -> None: ...
+
+    async def delete(self, task: IngestionTask, chunk_ids: list[uuid.UUID]) -> None: ...
+
+    async def load_duplicates(self, task: IngestionTask, chunk_ids: list[uuid.UUID]) -> list[Chunk]: ...
+
+
+class MinIOFetcher:
+    """ 从 MinIO 拉取源文件 """
+
+    async def fetch(self, task: IngestionTask) -> bytes:
+        """ 从租户所在分片读取对象内容，MinIO 客户端是同步的，放到线程中执行避免阻塞事件循环 """
+        route = await get_tenant_router().resolve(task.tenant_id)
+        bucket_name = task.bucket_name or route.bucket_name
+        return await asyncio.to_thread(self._get_object, route.minio, bucket_name, task.object_name)
+
+    @staticmethod
+    def _get_object(minio: MinIO, bucket_name: str, object_name: str) -> bytes:
+        """ 读取对象内容并释放连接 """
+        response = minio.client.get_object(bucket_name, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+
+class UnstructuredPartitioner:
+    """ 使用 unstructured 解析 PDF、Office、图片等文件 """
+
+    async def partition(self, task: IngestionTask, data: bytes) -> AsyncIterator[DocumentElement]:
+        """ 解析是 CPU 密集操作，放到线程中执行避免阻塞事件循环，解析完成后逐个产出元素 """
+        for element in await asyncio.to_thread(self._partition, task.file_name or task.object_name, data):
+            yield element
+
+    @staticmethod
+    def _partition(file_name: str, data: bytes) -> list[DocumentElement]:
+        """ 自动识别文件类型并解析，过滤掉没有文本的元素 """
+        partition = import_on_first_use("unstructured.partition.auto").partition
+
+        elements = partition(file=io.BytesIO(data), metadata_filename=file_name)
+        return [
+            DocumentElement(text=element.text, category=element.category, metadata=element.metadata.to_dict())
+            for element in elements
+            if element.text and element.text.strip()
+        ]
+
+
+class PoolPartitioner:
+    """ 在解析进程池中解析文件，解析超时、内存超限或进程崩溃只影响当前文档 """
+
+    async def partition(self, task: IngestionTask, data: bytes) -> AsyncIterator[DocumentElement]:
+        """ 子进程每返回一个元素就产出一个，不在内存中收集整个文档的元素 """
+        async with aclosing(get_parser_pool().parse(task.file_name or task.object_name, data)) as elements:
+            async for element in elements:
+                yield DocumentElement(text=element["text"], category=element["category"], metadata=element["metadata"])
+
+
+class ElementChunker:
+    """ 按字符数合并相邻元素的简单分块器，超长元素会被切分 """
+
+    def __init__(self, max_chars: int = 1000):
+        """ 构造函数
+        :param max_chars: 单个分块的最大字符数
+        """
+        self._max_chars = max_chars
+        self.signature = f"element:max_chars={max_chars}"
+
+    async def chunk(self, task: IngestionTask, elements: AsyncIterable[DocumentElement]) -> AsyncIterator[Chunk]:
+        """ 边接收元素边产出分块 """
+        index = 0
+        buffer: list[str] = []
+        size = 0
+        async for element in elements:
+            # 超长元素按最大字符数切分
+            for start in range(0, len(element.text), self._max_chars):
+                piece = element.text[start:start + self._max_chars]
+                if size + len(piece) > self._max_chars and buffer:
+                    yield self._make_chunk(task, index, buffer)
+                    index += 1
+                    buffer, size = [], 0
+                buffer.append(piece)
+                size += len(piece)
+
+        if buffer:
+            yield self._make_chunk(task, index, buffer)
+
+    @staticmethod
+    def _make_chunk(task: IngestionTask, index: int, pieces: list[str]) -> Chunk:
+        """ 组装分块 """
+        return Chunk(
+            document_id=task.document_id,
+            tenant_id=task.tenant_id,
+            chunk_index=index,
+            content="\n".join(pieces),
+        )
+
+
+class FenciKeywordExtractor:
+    """ 使用 Fenci 分词提取高频关键词 """
+
+    def __init__(self, top_n: int = 10):
+        """ 构造函数
+        :param top_n: 每个分块提取的关键词数量
+        """
+        self._top_n = top_n
+
+    async def extract(self, texts: list[str], tokens: Optional[list[list[str]]] = None) -> list[list[str]]:
+        """ 已有分词结果时只统计词频；否则分词是 CPU 密集操作，整批放到线程中执行 """
+        if tokens is not None:
+            return [get_fenci_client().top_n_tokens(chunk_tokens, self._top_n) for chunk_tokens in tokens]
+        return await asyncio.to_thread(self._extract, texts)
+
+    def _extract(self, texts: list[str]) -> list[list[str]]:
+        """ 逐个分块提取关键词 """
+        fenci = get_fenci_client()
+        return [fenci.get_top_n_tokens(text, self._top_n) for text in texts]
+
+
+class ServiceEmbedder:
+    """ 调用嵌入模型服务生成向量 """
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """ 批量生成向量 """
+        return await get_embedding_client().embed_texts(texts)
+
+    async def embed_images(self, images: list[bytes]) -> list[list[float]]:
+        """ 批量生成图片向量 """
+        return await get_embedding_client().embed_images(images)
+
+
+class VectorPostgresWriter:
+    """ 将分块写入向量存储和 Postgres，两边使用相同的分块ID，重复写入时覆盖
+
+    分块在文档中的顺序只保存在 Postgres 中，内容不变、仅位置变化的分块只需要更新 Postgres。
+    Postgres 中的分块是两边都已写入的分块，增量入库据此(load_existing)跳过未变化的分块，
+    因此先写向量存储，再提交 Postgres：向量写入失败时 Postgres 中没有这些分块，重新入库时会重新生成向量；
+    Postgres 写入失败时向量存储中已写入的记录在重新入库时以相同的分块ID覆盖。
+    """
+
+    def __init__(self, store: Optional[VectorStore] = None):
+        """ 构造函数
+        :param store: 向量存储，默认使用租户所在分片的向量存储
+        """
+        self._store = store
+
+    async def _route(self, task: IngestionTask) -> tuple[Postgres, VectorStore]:
+        """ 获取租户所在分片的 Postgres 和向量存储，租户迁移中时抛出 TenantMovingError """
+        route = await get_tenant_router().resolve_for_write(task.tenant_id)
+        return route.postgres, self._store or route.vector_store
+
+    async def write(self, task: IngestionTask, chunks: list[Chunk]) -> None:
+        """ 先写入向量存储再写入 Postgres，重复分块没有向量，只写入 Postgres """
+        if not chunks:
+            return
+
+        postgres, store = await self._route(task)
+        await store.upsert(
+            task.tenant_id,
+            [
+                VectorRecord(
+                    id=chunk.id,
+                    vector=chunk.vector,
+                    # 与 Postgres 的 meta 列包含相同的元数据字段，两个检索来源可以按相同的字段过滤
+                    metadata={
+                        **chunk.metadata,
+                        "document_id": str(chunk.document_id),
+                        "content": chunk.content,
+                        "keywords": chunk.keywords,
+                    },
+                )
+                for chunk in chunks
+                if chunk.vector is not None
+            ],
+        )
+        await self._write_postgres(postgres, chunks)
+        # 分块变化后递增集合版本号，使该租户的语义查询缓存失效
+        await bump_collection_version(task.tenant_id)
+
+    @staticmethod
+    async def _write_postgres(postgres: Postgres, chunks: list[Chunk]) -> None:
+        """ 批量插入分块，主键冲突时更新内容 """
+        rows = [
+            {
+                "id": chunk.id,
+                "document_id": chunk.document_id,
+                "tenant_id": chunk.tenant_id,
+                "chunk_index": chunk.chunk_index,
+                "content": chunk.content,
+                "content_hash": chunk.content_hash,
+                "keywords": chunk.keywords,
+                "meta": chunk.metadata,
+            }
+            for chunk in chunks
+        ]
+        stmt = insert(DocumentChunk).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DocumentChunk.id],
+            set_={
+                "chunk_index": stmt.excluded.chunk_index,
+                "content": stmt.excluded.content,
+                "keywords": stmt.excluded.keywords,
+                "meta": stmt.excluded.meta,
+            },
+        )
+        async with postgres.session_factory() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def load_existing(self, task: IngestionTask) -> dict[uuid.UUID, int]:
+        """ 查询文档已入库的分块，即已写入 Postgres 的分块，它们的向量在此之前已经写入
+        :return: 分块ID到分块序号的映射
+        """
+        route = await get_tenant_router().resolve(task.tenant_id)
+        async with route.postgres.session_factory() as session:
+            result = await session.execute(
+                select(DocumentChunk.id, DocumentChunk.chunk_index).where(DocumentChunk.document_id == task.document_id)
+            )
+            return {chunk_id: chunk_index for chunk_id, chunk_index in result.all()}
+
+    async def reindex(self, task: IngestionTask, positions: dict[uuid.UUID, int]) -> None:
+        """ 批量更新内容未变化、位置发生变化的分块序号 """
+        if not positions:
+            return
+
+        postgres, _ = await self._route(task)
+        async with postgres.session_factory() as session:
+            # 按主键批量更新(SQLAlchemy 2.0 的 bulk UPDATE)，一次往返完成
+            await session.execute(
+                update(DocumentChunk),
+                [{"id": chunk_id, "chunk_index": index} for chunk_id, index in positions.items()],
+            )
+            await session.commit()
+
+    async def delete(self, task: IngestionTask, chunk_ids: list[uuid.UUID]) -> None:
+        """ 删除一批分块，先删除向量存储中的记录，避免检索到已删除的分块 """
+        if not chunk_ids:
+            return
+
+        postgres, store = await self._route(task)
+        await store.delete(task.tenant_id, chunk_ids)
+        async with postgres.session_factory() as session:
+            await session.execute(delete(DocumentChunk).where(DocumentChunk.id.in_(chunk_ids)))
+            await session.commit()
+        await bump_collection_version(task.tenant_id)
+
+    async def load_duplicates(self, task: IngestionTask, chunk_ids: list[uuid.UUID]) -> list[Chunk]:
+        """ 查询同一租户中元数据 duplicate_of 指向这些分块的重复分块(只写入了 Postgres，没有向量)
+        :return: 重复分块，按文档和序号排列
+        """
+        if not chunk_ids:
+            return []
+
+        postgres, _ = await self._route(task)
+        async with postgres.session_factory() as session:
+            rows = (await session.execute(
+                select(DocumentChunk)
+                .where(
+                    DocumentChunk.tenant_id == task.tenant_id,
+                    DocumentChunk.meta["duplicate_of"].astext.in_([str(chunk_id) for chunk_id in chunk_ids]),
+                )
+                .order_by(DocumentChunk.document_id, DocumentChunk.chunk_index)
+            )).scalars().all()
+        return [
+            Chunk(
+                document_id=row.document_id,
+                tenant_id=row.tenant_id,
+                chunk_index=row.chunk_index,
+                content=row.content,
+                metadata=dict(row.meta),
+                id=row.id,
+                content_hash=row.content_hash,
+                keywords=list(row.keywords),
+                duplicate_of=uuid.UUID(row.meta["duplicate_of"]),
+            )
+            for row in rows
+        ]
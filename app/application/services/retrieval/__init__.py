@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 15:28
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 检索服务
+"""
+from .entities import RetrievalQuery, SourceHit, RetrievedChunk, RetrievalResult
+from .cache import SemanticQueryCache, get_semantic_query_cache, bump_collection_version
+from .fusion import reciprocal_rank_fusion, weighted_score_fusion
+from .sources import RetrievalSource, VectorSource, KeywordSource
+from .service import HybridRetrievalService, get_hybrid_retrieval_service
+
+__all__ = [
+    "RetrievalQuery",
+    "SourceHit",
+    "RetrievedChunk",
+    "RetrievalResult",
+    "SemanticQueryCache",
+    "get_semantic_query_cache",
+    "bump_collection_version",
+    "reciprocal_rank_fusion",
+    "weighted_score_fusion",
+    "RetrievalSource",
+    "VectorSource",
+    "KeywordSource",
+    "HybridRetrievalService",
+    "get_hybrid_retrieval_service",
+]
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 17:05
+@Author : YangFei
+@File   : cache.py
+@Desc   : 语义查询缓存，查询向量与近期查询足够相近时直接返回缓存的检索结果
+
+很多查询是彼此的近似改写，按查询文本做精确缓存几乎不会命中。这里按租户保存最近的查询向量，
+新查询与其中某个向量的余弦相似度达到阈值、并且 top_k 和过滤条件相同时视为命中。
+每个租户最多保存 retrieval_cache_capacity 条，写满后循环覆盖最早的条目；条目数量很小，直接做一次矩阵乘法即可。
+
+缓存条目有过期时间；此外每个租户在 Redis 中有一个集合版本号，分块写入或删除时递增，
+条目记录检索开始之前读取的版本号，版本号变化后条目失效，多个进程之间的失效也由此保持一致。
+检索期间有分块写入时，结果按旧版本号写入，不会在新版本下被命中。
+查找次数(按命中、未命中区分)、查找耗时和节省的时间输出到 core/metrics.py 的指标中。
+"""
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.infrastructure.storage.redis import get_redis
+from core.metrics import get_metrics_registry
+from core.system_config import get_settings
+
+from .entities import RetrievalQuery, RetrievalResult
+
+logger = logging.getLogger(__name__)
+
+# Redis 中租户集合版本号的键前缀
+VERSION_KEY_PREFIX = "retrieval:version:"
+
+# 查找次数，result 为 hit(命中) 或 miss(未命中)
+RETRIEVAL_CACHE_LOOKUPS = get_metrics_registry().counter(
+    "neon_retrieval_cache_lookups_total", "语义查询缓存查找次数", ["result"],
+)
+RETRIEVAL_CACHE_LOOKUP_SECONDS = get_metrics_registry().histogram(
+    "neon_retrieval_cache_lookup_seconds", "语义查询缓存查找耗时(秒)",
+)
+# 命中时节省的时间: 原始检索的耗时减去查找的耗时
+RETRIEVAL_CACHE_SAVED_SECONDS = get_metrics_registry().counter(
+    "neon_retrieval_cache_saved_seconds_total", "语义查询缓存命中节省的检索时间(秒)",
+)
+RETRIEVAL_CACHE_TENANTS = get_metrics_registry().gauge(
+    "neon_retrieval_cache_tenants", "语义查询缓存中的租户数量",
+)
+
+
+def version_key(tenant_id: str) -> str:
+    """ 获取租户集合版本号在 Redis 中的键 """
+    return f"{VERSION_KEY_PREFIX}{tenant_id}"
+
+
+async def get_collection_version(tenant_id: str) -> Optional[int]:
+    """ 读取租户的集合版本号，Redis 不可用时返回 None(此时不使用缓存) """
+    try:
+        value = await get_redis().client.get(version_key(tenant_id))
+        return int(value or 0)
+    except Exception as e:
+        logger.warning("读取集合版本号失败: %s", e)
+        return None
+
+
+async def bump_collection_version(tenant_id: str) -> None:
+    """ 租户的分块发生变化后递增集合版本号，使该租户的语义缓存全部失效，失败只输出日志 """
+    try:
+        await get_redis().client.incr(version_key(tenant_id))
+    except Exception as e:
+        logger.warning("更新集合版本号失败: %s", e)
+
+
+@dataclass(slots=True)
+class _Entry:
+    """ 缓存条目 """
+    signature: str  # top_k 和过滤条件，只有相同的查询参数才能复用结果
+    version: int  # 写入时的集合版本号
+    expires_at: float
+    result: RetrievalResult
+
+
+class _TenantCache:
+    """ 单个租户的缓存，查询向量保存在固定容量的矩阵中，写满后循环覆盖 """
+
+    def __init__(self, capacity: int):
+        """ 构造函数
+        :param capacity: 最多保存的查询数量
+        """
+        self.capacity = capacity
+        self.vectors: Optional[np.ndarray] = None
+        self.entries: list[Optional[_Entry]] = [None] * capacity
+        self.cursor = 0
+
+    def lookup(self, vector: np.ndarray, signature: str, version: int, threshold: float) -> Optional[_Entry]:
+        """ 查找相似度最高且仍然有效的条目 """
+        if self.vectors is None or self.vectors.shape[1] != len(vector):
+            return None
+
+        now = time.time()
+        valid = np.fromiter(
+            (
+                entry is not None and entry.signature == signature and entry.version == version and entry.expires_at > now
+                for entry in self.entries
+            ),
+            dtype=bool,
+            count=self.capacity,
+        )
+        if not valid.any():
+            return None
+
+        scores = self.vectors @ vector
+        scores[~valid] = -np.inf
+        best = int(scores.argmax())
+        return self.entries[best] if scores[best] >= threshold else None
+
+    def store(self, vector: np.ndarray, entry: _Entry) -> None:
+        """ 写入条目，覆盖最早的位置 """
+        if self.vectors is None or self.vectors.shape[1] != len(vector):
+            self.vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+            self.entries = [None] * self.capacity
+            self.cursor = 0
+        self.vectors[self.cursor] = vector
+        self.entries[self.cursor] = entry
+        self.cursor = (self.cursor + 1) % self.capacity
+
+
+class SemanticQueryCache:
+    """ 语义查询缓存，按租户隔离，只在当前进程内保存 """
+
+    def __init__(
+            self,
+            threshold: Optional[float] = None,
+            ttl: Optional[float] = None,
+            capacity: Optional[int] = None,
+            max_tenants: Optional[int] = None,
+    ):
+        """ 构造函数
+        :param threshold: 命中所需的最小余弦相似度，默认取系统配置
+        :param ttl: 条目的有效时间(秒)，默认取系统配置
+        :param capacity: 每个租户最多保存的查询数量，默认取系统配置
+        :param max_tenants: 最多保存的租户数量，超出后淘汰最久未使用的租户，默认取系统配置
+        """
+        settings = get_settings()
+        self._threshold = threshold or settings.retrieval_cache_threshold
+        self._ttl = ttl or settings.retrieval_cache_ttl
+        self._capacity = capacity or settings.retrieval_cache_capacity
+        self._max_tenants = max_tenants or settings.retrieval_cache_max_tenants
+        self._tenants: OrderedDict[str, _TenantCache] = OrderedDict()
+        # 查找和写入都是纯内存计算，耗时很短，用一个锁保护即可
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _signature(query: RetrievalQuery) -> str:
+        """ 查询参数签名 """
+        return json.dumps({"top_k": query.top_k, "filters": query.filters or {}}, sort_keys=True, default=str)
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        """ 归一化后内积即为余弦相似度 """
+        array = np.asarray(vector, dtype=np.float32)
+        return array / max(float(np.linalg.norm(array)), 1e-12)
+
+    async def lookup(self, query: RetrievalQuery, vector: Sequence[float], version: int) -> Optional[RetrievalResult]:
+        """ 查找缓存，命中时返回缓存的检索结果(cached 标记为 True)
+        :param version: 检索开始之前读取的集合版本号(见 get_collection_version)
+        """
+        start = time.perf_counter()
+        entry = None
+        async with self._lock:
+            tenant = self._tenants.get(query.tenant_id)
+            if tenant is not None:
+                self._tenants.move_to_end(query.tenant_id)
+                entry = tenant.lookup(self._normalize(vector), self._signature(query), version, self._threshold)
+
+        elapsed = time.perf_counter() - start
+        RETRIEVAL_CACHE_LOOKUP_SECONDS.observe(elapsed)
+        if entry is None:
+            RETRIEVAL_CACHE_LOOKUPS.inc(("miss",))
+            return None
+
+        RETRIEVAL_CACHE_LOOKUPS.inc(("hit",))
+        RETRIEVAL_CACHE_SAVED_SECONDS.inc(amount=max(entry.result.timings.get("total", 0.0) / 1000 - elapsed, 0.0))
+        return replace(entry.result, cached=True)
+
+    async def store(self, query: RetrievalQuery, vector: Sequence[float], result: RetrievalResult, version: int) -> None:
+        """ 写入缓存，降级的结果不缓存，避免在来源恢复后继续返回不完整的结果
+        :param version: 检索开始之前读取的集合版本号，检索期间分块发生变化时条目在新版本下不会被命中
+        """
+        if result.degraded:
+            return
+
+        entry = _Entry(
+            signature=self._signature(query),
+            version=version,
+            expires_at=time.time() + self._ttl,
+            result=result,
+        )
+        async with self._lock:
+            tenant = self._tenants.get(query.tenant_id)
+            if tenant is None:
+                tenant = _TenantCache(self._capacity)
+                self._tenants[query.tenant_id] = tenant
+                while len(self._tenants) > self._max_tenants:
+                    self._tenants.popitem(last=False)
+                RETRIEVAL_CACHE_TENANTS.set(len(self._tenants))
+            self._tenants.move_to_end(query.tenant_id)
+            tenant.store(self._normalize(vector), entry)
+
+    def invalidate(self, tenant_id: Optional[str] = None) -> None:
+        """ 清除当前进程中指定租户或全部租户的缓存 """
+        if tenant_id is None:
+            self._tenants.clear()
+        else:
+            self._tenants.pop(tenant_id, None)
+        RETRIEVAL_CACHE_TENANTS.set(len(self._tenants))
+
+
+@lru_cache()
+def get_semantic_query_cache() -> SemanticQueryCache:
+    """ 获取语义查询缓存实例，使用 lru_cache 缓存以提高性能，避免重复创建实例 """
+    return SemanticQueryCache()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 15:30
+@Author : YangFei
+@File   : entities.py
+@Desc   : 检索服务的数据结构
+"""
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from app.infrastructure.vector import MetadataFilter
+from core.tracing import record_span
+
+
+@dataclass(slots=True)
+class RetrievalQuery:
+    """ 一次检索请求 """
+    tenant_id: str
+    text: str
+    top_k: int = 10
+    filters: Optional[MetadataFilter] = None  # 元数据过滤条件，例如 {"document_id": [...]}
+    vector: Optional[list[float]] = None  # 已经生成的查询向量，向量检索时不再重复生成
+
+
+@dataclass(slots=True)
+class SourceHit:
+    """ 单个检索来源返回的一条结果，分数只在同一来源内可比 """
+    id: uuid.UUID
+    score: float
+    document_id: str
+    content: str
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class RetrievedChunk:
+    """ 融合后的一条检索结果 """
+    id: uuid.UUID
+    score: float  # 融合分数
+    document_id: str
+    content: str
+    metadata: dict = field(default_factory=dict)
+    ranks: dict[str, int] = field(default_factory=dict)  # 在各来源中的排名，从 1 开始
+    scores: dict[str, float] = field(default_factory=dict)  # 在各来源中的原始分数
+
+
+@dataclass(slots=True)
+class RetrievalResult:
+    """ 检索结果及各阶段耗时 """
+    chunks: list[RetrievedChunk]
+    timings: dict[str, float]  # 各阶段耗时(毫秒)
+    degraded: dict[str, str] = field(default_factory=dict)  # 超时或失败而被跳过的来源及原因
+    cached: bool = False  # 是否来自语义查询缓存
+
+
+@contextmanager
+def stage_timer(timings: dict[str, float], stage: str) -> Iterator[None]:
+    """ 记录一个阶段的耗时(毫秒)，阶段中途失败或被取消时同样记录，同时累加到所属请求的 retrieval.<stage> 阶段 """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings[stage] = round(elapsed * 1000, 3)
+        record_span(f"retrieval.{stage}", elapsed)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 15:42
+@Author : YangFei
+@File   : fusion.py
+@Desc   : 多路检索结果融合，向量检索和关键词检索的分数不在同一量纲，按排名或归一化后的分数融合
+"""
+import uuid
+from typing import Optional
+
+from .entities import SourceHit, RetrievedChunk
+
+# 倒数排名融合的平滑常数，取值越大，排名靠后的结果权重衰减越慢
+RRF_K = 60
+
+
+def _accumulate(
+        results: dict[str, list[SourceHit]],
+        contribution,
+) -> list[RetrievedChunk]:
+    """ 合并各来源的结果，同一分块的分数累加
+    :param results: 来源名称到结果列表的映射，结果已按分数从高到低排列
+    :param contribution: 计算一条结果对融合分数的贡献，参数为来源名称、排名和结果
+    :return: 按融合分数从高到低排列的结果
+    """
+    fused: dict[uuid.UUID, RetrievedChunk] = {}
+    for source, hits in results.items():
+        for rank, hit in enumerate(hits, start=1):
+            chunk = fused.get(hit.id)
+            if chunk is None:
+                chunk = RetrievedChunk(
+                    id=hit.id,
+                    score=0.0,
+                    document_id=hit.document_id,
+                    content=hit.content,
+                    metadata=hit.metadata,
+                )
+                fused[hit.id] = chunk
+            chunk.score += contribution(source, rank, hit)
+            chunk.ranks[source] = rank
+            chunk.scores[source] = hit.score
+    return sorted(fused.values(), key=lambda chunk: chunk.score, reverse=True)
+
+
+def reciprocal_rank_fusion(
+        results: dict[str, list[SourceHit]],
+        weights: Optional[dict[str, float]] = None,
+        k: int = RRF_K,
+) -> list[RetrievedChunk]:
+    """ 倒数排名融合(RRF)，每条结果贡献 weight / (k + rank)，只依赖排名，不受各来源分数分布的影响 """
+    weights = weights or {}
+    return _accumulate(results, lambda source, rank, hit: weights.get(source, 1.0) / (k + rank))
+
+
+def weighted_score_fusion(
+        results: dict[str, list[SourceHit]],
+        weights: Optional[dict[str, float]] = None,
+) -> list[RetrievedChunk]:
+    """ 加权分数融合，各来源的分数先按最小值、最大值归一化到 [0, 1] 再加权求和 """
+    weights = weights or {}
+    bounds: dict[str, tuple[float, float]] = {}
+    for source, hits in results.items():
+        if hits:
+            scores = [hit.score for hit in hits]
+            bounds[source] = (min(scores), max(scores))
+
+    def _contribution(source: str, rank: int, hit: SourceHit) -> float:
+        low, high = bounds[source]
+        normalized = (hit.score - low) / (high - low) if high > low else 1.0
+        return weights.get(source, 1.0) * normalized
+
+    return _accumulate(results, _contribution)
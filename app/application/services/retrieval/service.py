@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 16:20
+@Author : YangFei
+@File   : service.py
+@Desc   : 混合检索服务，并发查询向量检索和关键词检索并融合结果
+
+各来源并发执行，每个来源有独立的截止时间，从检索开始计算，包括读取集合版本号、生成查询向量、提取关键词等前置步骤。
+某个来源超时或失败时跳过该来源，只融合其余来源的结果，并在结果中标记降级原因；所有来源都失败时才报错。
+开启语义查询缓存时，先生成查询向量并查找缓存，命中则直接返回；未命中时查询向量传给向量检索复用。
+不使用查询向量的来源(关键词检索)不等待生成向量和查找缓存，与它们同时开始，命中缓存时取消。
+集合版本号在所有来源开始检索之前读取，缓存的查找和写入都使用这个版本号；缓存只是优化，
+读取超过 retrieval_cache_timeout_ms 时本次检索不使用缓存。生成查询向量超时时向量检索直接降级，不再重新生成。
+"""
+import time
+import asyncio
+import logging
+from dataclasses import replace
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
+
+from app.application.errors import InternalServerException, ValidationException
+from app.infrastructure.vector import FILTERABLE_METADATA
+from core.system_config import get_settings
+
+from .cache import SemanticQueryCache, get_semantic_query_cache, get_collection_version
+from .entities import RetrievalQuery, SourceHit, RetrievalResult, stage_timer
+from .fusion import reciprocal_rank_fusion, weighted_score_fusion
+from .sources import RetrievalSource, VectorSource, KeywordSource
+
+logger = logging.getLogger(__name__)
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    """ 距离截止时间的剩余秒数，没有截止时间时返回 None """
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+
+class HybridRetrievalService:
+    """ 混合检索服务 """
+
+    def __init__(
+            self,
+            sources: Optional[list[RetrievalSource]] = None,
+            fusion: Optional[str] = None,
+            weights: Optional[dict[str, float]] = None,
+            timeouts: Optional[dict[str, float]] = None,
+            cache: Optional[SemanticQueryCache] = None,
+            embed: Optional[Callable[[str], Awaitable[list[float]]]] = None,
+    ):
+        """ 构造函数
+        :param sources: 检索来源，默认为向量检索和关键词检索
+        :param fusion: 融合方式，rrf(倒数排名融合) 或 weighted(加权分数融合)，默认取系统配置
+        :param weights: 各来源的融合权重，默认取系统配置
+        :param timeouts: 各来源的截止时间(秒)，默认取系统配置
+        :param cache: 语义查询缓存，默认根据配置决定是否开启
+        :param embed: 查找缓存时生成查询向量的函数，默认调用嵌入服务
+        """
+        settings = get_settings()
+        self._cache = cache if cache is not None else (
+            get_semantic_query_cache() if settings.retrieval_cache_enabled else None
+        )
+        self._embed = embed or VectorSource._embed_with_service
+        self._sources = sources if sources is not None else [VectorSource(), KeywordSource()]
+        self._fusion = fusion or settings.retrieval_fusion
+        if self._fusion not in ("rrf", "weighted"):
+            raise ValueError(f"不支持的融合方式: {self._fusion}")
+        self._weights = weights or {
+            VectorSource.name: settings.retrieval_vector_weight,
+            KeywordSource.name: settings.retrieval_keyword_weight,
+        }
+        self._timeouts = timeouts or {
+            VectorSource.name: settings.retrieval_vector_timeout_ms / 1000,
+            KeywordSource.name: settings.retrieval_keyword_timeout_ms / 1000,
+        }
+        self._candidates = settings.retrieval_candidates
+        self._cache_timeout = settings.retrieval_cache_timeout_ms / 1000
+
+    async def retrieve(self, query: RetrievalQuery) -> RetrievalResult:
+        """ 并发查询所有来源并融合结果
+        :param query: 检索请求
+        :return: 融合后的 top_k 条结果、各阶段耗时以及被降级的来源
+        """
+        self._check_filters(query)
+        start = time.perf_counter()
+        timings: dict[str, float] = {}
+        degraded: dict[str, str] = {}
+        # 每个来源多召回一些候选，融合后再截取 top_k
+        limit = max(query.top_k, self._candidates)
+        # 每个来源的绝对截止时间，前置步骤和检索共用同一个预算
+        now = asyncio.get_running_loop().time()
+        deadlines: dict[str, Optional[float]] = {}
+        for source in self._sources:
+            timeout = self._timeouts.get(source.name)
+            deadlines[source.name] = None if timeout is None else now + timeout
+
+        # 版本号必须在任何来源开始读取之前获取，检索期间分块发生变化时，结果按旧版本号缓存，之后不会被命中
+        version = None
+        if self._cache is not None:
+            with stage_timer(timings, "cache_version"):
+                version = await self._read_version(query.tenant_id)
+        # Redis 不可用或响应慢时 version 为 None，不使用缓存
+        lookup = version is not None and query.vector is None
+
+        # 需要等待查询向量的来源之外，其余来源立即开始
+        tasks: dict[str, asyncio.Task] = {
+            source.name: asyncio.create_task(
+                self._search_source(source, query, limit, timings, degraded, deadlines[source.name])
+            )
+            for source in self._sources
+            if not (lookup and source.uses_vector)
+        }
+        try:
+            if lookup:
+                vector, timed_out = await self._embed_query(query, timings, deadlines.get(VectorSource.name))
+                if vector is not None:
+                    with stage_timer(timings, "cache"):
+                        cached = await self._cache.lookup(query, vector, version)
+                    if cached is not None:
+                        for task in tasks.values():
+                            task.cancel()
+                        timings["total"] = round((time.perf_counter() - start) * 1000, 3)
+                        return replace(cached, timings=timings)
+                    query = replace(query, vector=vector)
+                for source in self._sources:
+                    if source.name in tasks:
+                        continue
+                    if source.uses_vector and timed_out:
+                        # 截止时间已经用完，不再重新生成查询向量
+                        degraded[source.name] = "timeout"
+                        continue
+                    tasks[source.name] = asyncio.create_task(
+                        self._search_source(source, query, limit, timings, degraded, deadlines[source.name])
+                    )
+            outcomes = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        results = {
+            source.name: outcomes[source.name]
+            for source in self._sources
+            if outcomes.get(source.name) is not None
+        }
+        if not results:
+            raise InternalServerException(f"检索服务暂不可用: {degraded}")
+
+        with stage_timer(timings, "fusion"):
+            if self._fusion == "rrf":
+                chunks = reciprocal_rank_fusion(results, self._weights, get_settings().retrieval_rrf_k)
+            else:
+                chunks = weighted_score_fusion(results, self._weights)
+
+        timings["total"] = round((time.perf_counter() - start) * 1000, 3)
+        result = RetrievalResult(chunks=chunks[:query.top_k], timings=timings, degraded=degraded)
+        if version is not None and query.vector is not None:
+            await self._cache.store(query, query.vector, result, version)
+        return result
+
+    @staticmethod
+    def _check_filters(query: RetrievalQuery) -> None:
+        """ 只允许按两个检索来源都能判断的字段过滤，否则两个来源的过滤结果不一致，融合后的结果没有意义 """
+        unsupported = [key for key in (query.filters or {}) if key not in FILTERABLE_METADATA]
+        if unsupported:
+            raise ValidationException(
+                f"不支持按字段 {', '.join(unsupported)} 过滤，可以过滤的字段: {', '.join(FILTERABLE_METADATA)}"
+            )
+
+    async def _read_version(self, tenant_id: str) -> Optional[int]:
+        """ 在缓存的超时时间内读取集合版本号，超时返回 None(本次检索不使用缓存) """
+        try:
+            return await asyncio.wait_for(get_collection_version(tenant_id), self._cache_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("读取集合版本号超时(%.0fms)，本次检索不使用缓存", self._cache_timeout * 1000)
+            return None
+
+    async def _embed_query(
+            self,
+            query: RetrievalQuery,
+            timings: dict[str, float],
+            deadline: Optional[float],
+    ) -> tuple[Optional[list[float]], bool]:
+        """ 在向量检索的截止时间内生成查询向量
+        :return: (查询向量, 是否超时)。超时时向量检索直接降级；其它失败时向量为 None，由向量检索来源在剩余时间内重试
+        """
+        try:
+            with stage_timer(timings, "embed"):
+                return await asyncio.wait_for(self._embed(query.text), _remaining(deadline)), False
+        except asyncio.TimeoutError:
+            logger.warning("生成查询向量超时，跳过语义缓存和向量检索")
+            return None, True
+        except Exception as e:
+            logger.warning("生成查询向量失败，跳过语义缓存: %s", e or type(e).__name__)
+            return None, False
+
+    async def _search_source(
+            self,
+            source: RetrievalSource,
+            query: RetrievalQuery,
+            limit: int,
+            timings: dict[str, float],
+            degraded: dict[str, str],
+            deadline: Optional[float],
+    ) -> Optional[list[SourceHit]]:
+        """ 在截止时间内查询单个来源，超时或失败时返回 None 并记录降级原因 """
+        timeout = self._timeouts.get(source.name)
+        try:
+            remaining = _remaining(deadline)
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError
+            with stage_timer(timings, f"{source.name}_total"):
+                return await asyncio.wait_for(source.search(query, limit, timings), remaining)
+        except asyncio.TimeoutError:
+            degraded[source.name] = "timeout"
+            logger.warning("检索来源 %s 超时(%.0fms)，已跳过", source.name, (timeout or 0) * 1000)
+        except Exception as e:
+            degraded[source.name] = str(e) or type(e).__name__
+            logger.warning("检索来源 %s 失败，已跳过: %s", source.name, e)
+        return None
+
+
+@lru_cache()
+def get_hybrid_retrieval_service() -> HybridRetrievalService:
+    """ 获取混合检索服务实例，使用 lru_cache 缓存以提高性能，避免重复创建实例 """
+    return HybridRetrievalService()
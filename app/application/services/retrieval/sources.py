@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 15:55
+@Author : YangFei
+@File   : sources.py
+@Desc   : 检索来源，包括向量检索和基于分块关键词的关键词检索
+"""
+import uuid
+import asyncio
+from typing import Awaitable, Callable, Optional, Protocol
+
+from sqlalchemy import select, cast, desc, or_, any_, literal, Integer
+
+from app.infrastructure.models import DocumentChunk
+from app.infrastructure.storage.tenant_router import get_tenant_router
+from app.infrastructure.external.fenci import get_fenci_client
+from app.infrastructure.external.embedding import get_embedding_client
+from app.infrastructure.vector import VectorStore, MetadataFilter
+from core.system_config import get_settings
+
+from .entities import RetrievalQuery, SourceHit, stage_timer
+
+
+class RetrievalSource(Protocol):
+    """ 检索来源接口，name 用于区分各来源的耗时、排名和权重 """
+    name: str
+    # 是否使用查询向量，使用查询向量的来源在检索服务生成向量、查找语义缓存之后才开始，其它来源立即开始
+    uses_vector: bool
+
+    async def search(self, query: RetrievalQuery, limit: int, timings: dict[str, float]) -> list[SourceHit]: ...
+
+
+class VectorSource:
+    """ 向量检索：先生成查询语句的向量，再检索向量存储 """
+    name = "vector"
+    uses_vector = True
+
+    def __init__(
+            self,
+            store: Optional[VectorStore] = None,
+            embed: Optional[Callable[[str], Awaitable[list[float]]]] = None,
+    ):
+        """ 构造函数
+        :param store: 向量存储，默认使用租户所在分片的向量存储
+        :param embed: 生成查询向量的函数，默认调用嵌入服务
+        """
+        self._store = store
+        self._embed = embed or self._embed_with_service
+
+    @staticmethod
+    async def _embed_with_service(text: str) -> list[float]:
+        """ 调用嵌入服务生成查询向量，并发的查询会被客户端合并为批次 """
+        return await get_embedding_client().embed_text(text)
+
+    async def search(self, query: RetrievalQuery, limit: int, timings: dict[str, float]) -> list[SourceHit]:
+        """ 检索与查询语句语义最相近的分块 """
+        vector = query.vector
+        if vector is None:
+            with stage_timer(timings, "embed"):
+                vector = await self._embed(query.text)
+        with stage_timer(timings, "vector"):
+            store = self._store or (await get_tenant_router().resolve(query.tenant_id)).vector_store
+            hits = await store.search(query.tenant_id, vector, limit, query.filters)
+        return [
+            SourceHit(
+                id=hit.id,
+                score=hit.score,
+                document_id=str(hit.metadata.get("document_id", "")),
+                content=hit.metadata.get("content", ""),
+                metadata=hit.metadata,
+            )
+            for hit in hits
+        ]
+
+
+class KeywordSource:
+    """ 关键词检索：用分词器提取查询语句的关键词，按命中的分块关键词数量排序 """
+    name = "keyword"
+    uses_vector = False
+
+    def __init__(self, extract: Optional[Callable[[str, int], list[str]]] = None, top_n: Optional[int] = None):
+        """ 构造函数
+        :param extract: 提取关键词的同步函数，参数为文本和关键词数量，默认使用 Fenci
+        :param top_n: 提取的关键词数量，默认取系统配置
+        """
+        self._extract = extract or self._extract_with_fenci
+        self._top_n = top_n or get_settings().retrieval_keyword_top_n
+
+    @staticmethod
+    def _extract_with_fenci(text: str, top_n: int) -> list[str]:
+        """ 使用 Fenci 提取高频词 """
+        return get_fenci_client().get_top_n_tokens(text, top_n)
+
+    async def search(self, query: RetrievalQuery, limit: int, timings: dict[str, float]) -> list[SourceHit]:
+        """ 检索关键词命中最多的分块，分数为命中的关键词占查询关键词的比例 """
+        with stage_timer(timings, "keywords"):
+            # 分词是 CPU 密集操作，放到线程中执行避免阻塞事件循环
+            keywords = await asyncio.to_thread(self._extract, query.text, self._top_n)
+        if not keywords:
+            return []
+
+        with stage_timer(timings, "keyword"):
+            # 命中的关键词数量: (:k1 = ANY(keywords))::int + (:k2 = ANY(keywords))::int + ...
+            matched = sum(
+                (cast(literal(keyword) == any_(DocumentChunk.keywords), Integer) for keyword in keywords[1:]),
+                start=cast(literal(keywords[0]) == any_(DocumentChunk.keywords), Integer),
+            )
+            stmt = (
+                select(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.content, DocumentChunk.meta, matched.label("matched"))
+                .where(DocumentChunk.tenant_id == query.tenant_id)
+                # && 运算符可以使用关键词列上的 GIN 索引，先过滤出至少命中一个关键词的分块
+                .where(DocumentChunk.keywords.overlap(keywords))
+                .where(*self._filter_clauses(query.filters))
+                .order_by(desc("matched"), DocumentChunk.id)
+                .limit(limit)
+            )
+            route = await get_tenant_router().resolve(query.tenant_id)
+            async with route.postgres.session_factory() as session:
+                rows = (await session.execute(stmt)).all()
+
+        return [
+            SourceHit(
+                id=row.id,
+                score=row.matched / len(keywords),
+                document_id=str(row.document_id),
+                content=row.content,
+                metadata=row.meta,
+            )
+            for row in rows
+        ]
+
+    @staticmethod
+    def _filter_clauses(filters: Optional[MetadataFilter]) -> list:
+        """ 将元数据过滤条件转换为查询条件，document_id 对应分块表的列，其它字段对应 meta 中的键 """
+        clauses = []
+        for key, value in (filters or {}).items():
+            values = list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+            if key == "document_id":
+                clauses.append(DocumentChunk.document_id.in_([uuid.UUID(str(item)) for item in values]))
+            else:
+                clauses.append(or_(*(DocumentChunk.meta.contains({key: item}) for item in values)))
+        return clauses
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 21:45
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 租户分片服务，在存储分片之间在线迁移租户
+"""
+from .mover import MoveReport, TenantMover, get_tenant_mover
+
+__all__ = [
+    "MoveReport",
+    "TenantMover",
+    "get_tenant_mover",
+]
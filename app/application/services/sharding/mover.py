@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 21:50
+@Author : YangFei
+@File   : mover.py
+@Desc   : 在线迁移租户：将租户的 Postgres 数据、对象和向量从源分片复制到目标分片，然后切换路由
+
+迁移流程:
+    1. 目录库中的映射变为 moving，租户只读，等待所有进程的路由缓存过期、在途的写入完成
+    2. 按主键分批复制 document、document_chunk 表中的行，复制文档源文件和缩略图，分批读取并写入向量
+    3. 映射切换到目标分片并恢复读写，任何一步失败时放弃迁移，租户留在源分片
+    4. 再次等待所有进程切换到目标分片、旧路由上的读请求完成后，删除源分片中的数据
+两个分片共用同一个数据库、存储桶或向量集合时跳过对应部分的复制和清理。
+复制使用覆盖写入，失败后重新迁移不会产生重复数据。
+"""
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional
+
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+from sqlalchemy import Table, select, delete
+from sqlalchemy.dialects.postgresql import insert
+
+from app.infrastructure.models import Document, DocumentChunk
+from app.infrastructure.storage.minio import MinIO
+from app.infrastructure.storage.postgres import Postgres
+from app.infrastructure.storage.shards import get_shard_config
+from app.infrastructure.storage.tenant_router import TenantRouter, ShardRoute, get_tenant_router
+from core.system_config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# 按租户存储的表，按复制顺序排列，清理时逆序删除
+TENANT_TABLES: tuple[Table, ...] = (Document.__table__, DocumentChunk.__table__)
+
+
+@dataclass(slots=True)
+class MoveReport:
+    """ 租户迁移结果 """
+    tenant_id: str
+    source_shard: str
+    target_shard: str
+    rows: dict[str, int] = field(default_factory=dict)  # 表名 -> 复制的行数
+    objects: int = 0  # 复制的对象数
+    vectors: int = 0  # 复制的向量数
+    cleaned: bool = False  # 是否已删除源分片中的数据
+    elapsed: float = 0.0  # 总耗时(秒)
+
+
+class TenantMover:
+    """ 租户迁移服务 """
+
+    def __init__(
+            self,
+            router: Optional[TenantRouter] = None,
+            batch_size: Optional[int] = None,
+            grace_period: Optional[float] = None,
+    ):
+        """ 构造函数
+        :param router: 租户路由，默认使用全局实例
+        :param batch_size: 每批复制的行数、对象数和向量数，默认取系统配置
+        :param grace_period: 改变映射状态后的等待时间(秒)，默认为路由缓存有效期的两倍
+        """
+        self._router = router or get_tenant_router()
+        self._batch_size = batch_size or get_settings().storage_shard_move_batch_size
+        self._grace_period = self._router.grace_period if grace_period is None else grace_period
+
+    async def move(self, tenant_id: str, target_shard: str, cleanup: bool = True) -> MoveReport:
+        """ 将租户迁移到目标分片
+        :param tenant_id: 租户ID
+        :param target_shard: 目标分片
+        :param cleanup: 迁移完成后是否删除源分片中的数据
+        :return: 迁移结果
+        """
+        start = time.perf_counter()
+        route = await self._router.begin_move(tenant_id, target_shard)
+        report = MoveReport(tenant_id, route.shard, target_shard)
+        logger.info("开始迁移租户 %s: %s -> %s", tenant_id, route.shard, target_shard)
+
+        try:
+            # 等待所有进程的路由缓存过期，之后不会再有新的写入
+            await asyncio.sleep(self._grace_period)
+            await self._copy(route, report)
+        except BaseException as e:
+            logger.error("迁移租户 %s 失败，租户留在分片 %s: %s", tenant_id, route.shard, e)
+            await self._router.abort_move(route)
+            raise
+
+        try:
+            await self._router.complete_move(route)
+        except BaseException as e:
+            # 切换失败时映射仍为 moving，放弃迁移使租户在源分片恢复读写，放弃也失败时租户保持只读，不会丢失数据
+            logger.error("切换租户 %s 到分片 %s 失败，放弃迁移: %s", tenant_id, target_shard, e)
+            await self._router.abort_move(route)
+            raise
+        logger.info("租户 %s 已切换到分片 %s, 复制行数: %s, 对象数: %d, 向量数: %d",
+                    tenant_id, target_shard, report.rows, report.objects, report.vectors)
+
+        if cleanup:
+            # 等待所有进程切换到目标分片，旧路由上的读请求完成后再删除源数据
+            await asyncio.sleep(self._grace_period)
+            await self._cleanup(route)
+            report.cleaned = True
+
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    async def _copy(self, route: ShardRoute, report: MoveReport) -> None:
+        """ 复制租户的行、对象和向量 """
+        source, target = get_shard_config(route.shard), get_shard_config(route.target_shard)
+        source_route = ShardRoute(route.tenant_id, route.shard)
+        target_route = ShardRoute(route.tenant_id, route.target_shard)
+
+        if source.database_key != target.database_key:
+            for table in TENANT_TABLES:
+                report.rows[table.name] = await self._copy_table(
+                    table, route.tenant_id, source_route.postgres, target_route.postgres
+                )
+        if source.bucket_key != target.bucket_key:
+            report.objects = await self._copy_objects(route.tenant_id, source_route, target_route)
+        if source.vector_key != target.vector_key:
+            target_store = target_route.vector_store
+            async for records in source_route.vector_store.scan(route.tenant_id, self._batch_size):
+                await target_store.upsert(route.tenant_id, records)
+                report.vectors += len(records)
+
+    async def _copy_table(self, table: Table, tenant_id: str, source: Postgres, target: Postgres) -> int:
+        """ 按主键分批复制一张表中租户的所有行，目标中已存在的行被覆盖 """
+        copied, last_id = 0, None
+        while True:
+            stmt = select(table).where(table.c.tenant_id == tenant_id).order_by(table.c.id).limit(self._batch_size)
+            if last_id is not None:
+                stmt = stmt.where(table.c.id > last_id)
+            async with source.session_factory() as session:
+                rows = [dict(row) for row in (await session.execute(stmt)).mappings().all()]
+            if not rows:
+                return copied
+
+            upsert = insert(table).values(rows)
+            upsert = upsert.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={column.name: upsert.excluded[column.name] for column in table.columns if column.name != "id"},
+            )
+            async with target.session_factory() as session:
+                await session.execute(upsert)
+                await session.commit()
+            copied += len(rows)
+            last_id = rows[-1]["id"]
+
+    async def _object_names(self, tenant_id: str, postgres: Postgres) -> list[str]:
+        """ 租户的所有对象：文档源文件和图片缩略图 """
+        async with postgres.session_factory() as session:
+            documents = await session.execute(select(Document.object_name).where(Document.tenant_id == tenant_id))
+            thumbnails = await session.execute(
+                select(DocumentChunk.meta["thumbnail"].astext)
+                .where(DocumentChunk.tenant_id == tenant_id, DocumentChunk.meta.has_key("thumbnail"))
+            )
+            names = {name for name in documents.scalars() if name}
+            names.update(name for name in thumbnails.scalars() if name)
+        return sorted(names)
+
+    async def _copy_objects(self, tenant_id: str, source: ShardRoute, target: ShardRoute) -> int:
+        """ 复制租户的所有对象，每批并发复制 """
+        names = await self._object_names(tenant_id, source.postgres)
+        await asyncio.to_thread(_ensure_bucket, target.minio, target.bucket_name)
+        copied = 0
+        for start in range(0, len(names), self._batch_size):
+            results = await asyncio.gather(*(
+                asyncio.to_thread(_copy_object, source.minio, source.bucket_name, target.minio, target.bucket_name, name)
+                for name in names[start:start + self._batch_size]
+            ))
+            copied += sum(results)
+        return copied
+
+    async def _cleanup(self, route: ShardRoute) -> None:
+        """ 删除源分片中租户的数据，与目标分片共用的部分不删除 """
+        source, target = get_shard_config(route.shard), get_shard_config(route.target_shard)
+        source_route = ShardRoute(route.tenant_id, route.shard)
+
+        if source.vector_key != target.vector_key:
+            store = source_route.vector_store
+            ids: list[uuid.UUID] = []
+            async for records in store.scan(route.tenant_id, self._batch_size):
+                ids.extend(record.id for record in records)
+            for start in range(0, len(ids), self._batch_size):
+                await store.delete(route.tenant_id, ids[start:start + self._batch_size])
+        if source.bucket_key != target.bucket_key:
+            names = await self._object_names(route.tenant_id, source_route.postgres)
+            await asyncio.to_thread(_remove_objects, source_route.minio, source_route.bucket_name, names)
+        if source.database_key != target.database_key:
+            async with source_route.postgres.session_factory() as session:
+                for table in reversed(TENANT_TABLES):
+                    await session.execute(delete(table).where(table.c.tenant_id == route.tenant_id))
+                await session.commit()
+        logger.info("已删除租户 %s 在分片 %s 中的数据", route.tenant_id, route.shard)
+
+
+def _ensure_bucket(minio: MinIO, bucket_name: str) -> None:
+    """ 存储桶不存在时创建 """
+    if not minio.client.bucket_exists(bucket_name):
+        minio.client.make_bucket(bucket_name)
+
+
+def _copy_object(source: MinIO, source_bucket: str, target: MinIO, target_bucket: str, object_name: str) -> bool:
+    """ 以流的方式复制一个对象，两个分片可以是不同的 MinIO 集群
+    :return: 源对象不存在时返回 False
+    """
+    try:
+        stat = source.client.stat_object(source_bucket, object_name)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            logger.warning("迁移时对象不存在，跳过: %s/%s", source_bucket, object_name)
+            return False
+        raise
+
+    response = source.client.get_object(source_bucket, object_name)
+    try:
+        target.client.put_object(
+            target_bucket,
+            object_name,
+            response,
+            stat.size,
+            content_type=stat.content_type or "application/octet-stream",
+        )
+    finally:
+        response.close()
+        response.release_conn()
+    return True
+
+
+def _remove_objects(minio: MinIO, bucket_name: str, names: list[str]) -> None:
+    """ 批量删除对象，remove_objects 是惰性的，需要遍历结果才会执行 """
+    for error in minio.client.remove_objects(bucket_name, (DeleteObject(name) for name in names)):
+        logger.warning("删除源分片对象失败: %s", error)
+
+
+@lru_cache()
+def get_tenant_mover() -> TenantMover:
+    """ 获取租户迁移服务实例，使用 lru_cache 缓存以确保单例模式 """
+    return TenantMover()
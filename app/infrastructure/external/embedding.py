@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 10:26
+@Author : YangFei
+@File   : embedding.py
+@Desc   : 嵌入模型服务客户端，调用部署在 AI 计算节点上的 Chinese-CLIP 服务生成向量
+
+并发的 embed_texts 调用会被合并为批量请求(动态微批处理)：文本进入队列，后台协程在攒够
+embedding_max_batch_size 条或等待超过 embedding_max_wait_ms 后发送一个批次，结果再按文本拆分给各个调用方。
+所有请求共用一个连接池；可重试的错误按指数退避加随机抖动重试；请求耗时超过近期耗时的高分位数时，
+再发送一个相同的对冲请求，取先返回的结果，降低长尾延迟。
+图片由调用方按批次传入(已经预处理为模型输入尺寸的 JPEG)，不再合并，但同样占用并发槽位并按相同的策略重试和对冲。
+"""
+import time
+import base64
+import random
+import asyncio
+import logging
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Optional
+from functools import lru_cache
+
+import httpx
+
+from core.system_config import get_settings, Settings
+
+logger = logging.getLogger(__name__)
+
+# 计算对冲延迟至少需要的耗时样本数，以及保留的最近耗时样本数
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+# 重试退避时间的上限(秒)
+RETRY_BACKOFF_CAP = 2.0
+
+
+@dataclass(slots=True)
+class _PendingText:
+    """ 等待嵌入的一条文本及接收结果的 future """
+    text: str
+    future: asyncio.Future
+
+
+def _retryable(error: Exception) -> bool:
+    """ 网络错误、超时、限流和服务端错误可以重试 """
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+class EmbeddingClient:
+    """ 嵌入模型服务客户端封装类 """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """ 构造函数，完成嵌入服务客户端的初始化
+        :param transport: 自定义 HTTP 传输层，测试和压测时可以传入 httpx.ASGITransport 直接调用本地替身服务
+        """
+        self._client: Optional[httpx.AsyncClient] = None
+        self._settings: Settings = get_settings()
+        self._transport = transport
+        self._queue: Optional[asyncio.Queue[_PendingText]] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight: set[asyncio.Task] = set()
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        # 请求数、批次数、文本数、重试次数、对冲次数等计数
+        self.stats: Counter = Counter()
+
+    async def init(self) -> None:
+        """ 初始化 HTTP 连接池，并启动合并批次的后台协程 """
+        if self._client:
+            logger.warning("嵌入服务客户端已初始化，跳过重复初始化")
+            return
+
+        concurrency = self._settings.embedding_max_concurrency
+        self._client = httpx.AsyncClient(
+            base_url=self._settings.embedding_service_url,
+            timeout=self._settings.embedding_timeout,
+            # 对冲请求会额外占用连接，连接数按并发批次数的两倍预留
+            limits=httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2),
+            transport=self._transport,
+        )
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._batcher = asyncio.create_task(self._run_batcher())
+        logger.info("嵌入服务客户端初始化成功")
+
+    async def shutdown(self) -> None:
+        """ 停止合并批次，等待已发出的批次完成，再关闭 HTTP 连接池 """
+        if self._batcher:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+            self._batcher = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        # 队列中尚未发送的文本直接失败，避免调用方一直等待
+        while self._queue and not self._queue.empty():
+            pending = self._queue.get_nowait()
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError("嵌入服务客户端已关闭"))
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+        # 清除缓存(避免重复使用已关闭的客户端)
+        get_embedding_client.cache_clear()
+        logger.info("嵌入服务客户端连接已关闭")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """ 获取 HTTP 客户端实例, 只读属性 """
+        if not self._client:
+            raise RuntimeError("嵌入服务客户端未初始化，请先调用 init 方法")
+        return self._client
+
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """ 批量生成文本向量，文本会与其它并发调用的文本合并发送
+        :param texts: 文本列表
+        :return: 与文本一一对应的向量列表
+        """
+        if not texts:
+            return []
+        if self._queue is None:
+            raise RuntimeError("嵌入服务客户端未初始化，请先调用 init 方法")
+
+        loop = asyncio.get_running_loop()
+        pending = [_PendingText(text, loop.create_future()) for text in texts]
+        for item in pending:
+            self._queue.put_nowait(item)
+        return list(await asyncio.gather(*(item.future for item in pending)))
+
+    async def embed_text(self, text: str) -> list[float]:
+        """ 生成单条文本的向量，例如检索时的查询语句 """
+        return (await self.embed_texts([text]))[0]
+
+    async def embed_images(self, images: list[bytes]) -> list[list[float]]:
+        """ 批量生成图片向量
+        :param images: 图片内容列表，应先缩小到模型输入尺寸以减少传输和解码
+        :return: 与图片一一对应的向量列表
+        """
+        if not images:
+            return []
+        if self._slots is None:
+            raise RuntimeError("嵌入服务客户端未初始化，请先调用 init 方法")
+
+        self.stats["images"] += len(images)
+        payload = {"images": [base64.b64encode(image).decode("ascii") for image in images]}
+        async with self._slots:
+            return await self._post_with_retry("/embeddings/image", payload, len(images))
+
+    async def _run_batcher(self) -> None:
+        """ 从队列中取出文本合并为批次，批次已满或等待超时后发送
+        所有并发槽位都被占用时先等待空闲槽位，期间到达的文本会进入下一个批次，负载越高批次越大
+        """
+        loop = asyncio.get_running_loop()
+        max_size = self._settings.embedding_max_batch_size
+        max_wait = self._settings.embedding_max_wait_ms / 1000
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + max_wait
+            while len(batch) < max_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # 调用方已取消的文本不再发送
+            batch = [item for item in batch if not item.future.done()]
+            if not batch:
+                continue
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._flush(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._on_flushed)
+
+    def _on_flushed(self, task: asyncio.Task) -> None:
+        """ 批次完成后释放并发槽位 """
+        self._inflight.discard(task)
+        self._slots.release()
+
+    async def _flush(self, batch: list[_PendingText]) -> None:
+        """ 发送一个批次，并把结果或异常分发给每条文本的调用方 """
+        self.stats["batches"] += 1
+        self.stats["texts"] += len(batch)
+        try:
+            embeddings = await self._post_with_retry("/embeddings/text", {"texts": [item.text for item in batch]}, len(batch))
+        except Exception as e:
+            logger.error("嵌入请求失败, 批次大小: %d, 错误: %s", len(batch), e)
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, embedding in zip(batch, embeddings):
+            if not item.future.done():
+                item.future.set_result(embedding)
+
+    async def _post_with_retry(self, path: str, payload: dict, count: int) -> list[list[float]]:
+        """ 发送请求，可重试的错误按指数退避加随机抖动(full jitter)重试 """
+        max_retries = self._settings.embedding_max_retries
+        base = self._settings.embedding_retry_backoff
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged_post(path, payload, count)
+            except Exception as e:
+                if attempt >= max_retries or not _retryable(e):
+                    raise
+                delay = random.uniform(0, min(RETRY_BACKOFF_CAP, base * 2 ** attempt))
+                attempt += 1
+                self.stats["retries"] += 1
+                logger.warning("嵌入请求失败，%.0fms 后第 %d 次重试: %s", delay * 1000, attempt, e)
+                await asyncio.sleep(delay)
+
+    def _hedge_delay(self) -> Optional[float]:
+        """ 对冲延迟取近期请求耗时的高分位数，耗时样本不足或未开启对冲时返回 None """
+        quantile = self._settings.embedding_hedge_quantile
+        if quantile <= 0 or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        value = latencies[min(len(latencies) - 1, int(len(latencies) * quantile))]
+        return max(value, self._settings.embedding_hedge_min_delay_ms / 1000)
+
+    async def _hedged_post(self, path: str, payload: dict, count: int) -> list[list[float]]:
+        """ 发送请求，超过对冲延迟仍未返回时再发送一个相同的请求，取先成功的结果，另一个请求被取消 """
+        delay = self._hedge_delay()
+        tasks = {asyncio.create_task(self._post(path, payload, count))}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.stats["hedges"] += 1
+                    tasks.add(asyncio.create_task(self._post(path, payload, count)))
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _post(self, path: str, payload: dict, count: int) -> list[list[float]]:
+        """ 发送一次嵌入请求，并记录耗时
+        :param path: 接口路径
+        :param payload: 请求体
+        :param count: 期望返回的向量数量
+        """
+        self.stats["requests"] += 1
+        start = time.perf_counter()
+        response = await self.client.post(path, json=payload)
+        response.raise_for_status()
+        embeddings = response.json()["embeddings"]
+        if len(embeddings) != count:
+            raise RuntimeError(f"嵌入服务返回的向量数量不匹配: 期望 {count}，实际 {len(embeddings)}")
+        self._latencies.append(time.perf_counter() - start)
+        return embeddings
+
+
+@lru_cache()
+def get_embedding_client() -> EmbeddingClient:
+    """ 获取嵌入服务客户端实例，使用 lru_cache 缓存以提高性能，避免重复创建实例 """
+    return EmbeddingClient()
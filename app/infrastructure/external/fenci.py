@@ -8,16 +8,31 @@
 """
 
 import os
+import time
 from pathlib import Path
 import logging
 import unicodedata
 from langdetect import detect, LangDetectException, DetectorFactory
 from core.consts import STOPWORD_SET
-import hanlp
-import opencc
+from core.metrics import get_metrics_registry
+from core.tracing import record_span
+from core.startup import import_on_first_use
 from collections import Counter
 from functools import lru_cache
 
+logger = logging.getLogger(__name__)
+
+# 分词耗时，按使用的分词模型区分: zh(简体中文) / zh-hant(繁体中文，含繁简转换) / multilingual(多语言)
+FENCI_TOKENIZE_SECONDS = get_metrics_registry().histogram(
+    "neon_fenci_tokenize_seconds", "单段文本的分词耗时(秒)，包括语言检测和清洗", ["tokenizer"],
+)
+FENCI_TOKENS = get_metrics_registry().counter(
+    "neon_fenci_tokens_total", "分词并清洗后产出的词数", ["tokenizer"],
+)
+FENCI_MODEL_LOAD_SECONDS = get_metrics_registry().gauge(
+    "neon_fenci_model_load_seconds", "分词模型的加载耗时(秒)",
+)
+
 
 class Fenci:
     """ 分词 """
@@ -27,6 +42,9 @@ class Fenci:
         """ 初始化分词器 """
         # 设置语言检测的随机种子，保证结果一致性
         DetectorFactory.seed = 0
+        # hanlp 会连带导入深度学习框架，耗时数秒，在第一次创建分词器时才导入
+        hanlp = import_on_first_use("hanlp")
+        opencc = import_on_first_use("opencc")
         # 初始化繁体转简体转换器
         self.t2s_converter = opencc.OpenCC('t2s')  # 繁体转简体
         self.s2t_converter = opencc.OpenCC('s2t')  # 简体转繁体
@@ -35,21 +53,23 @@ class Fenci:
         hanlp_model_dir = Path(os.getenv("HANLP_HOME", "/neon_assistant/.hanlp"))
 
         # 初始化时加载模型（已经在 docker 构建的时候进行了预加载，这里直接使用即可）
-        logging.info("加载中文分词模型...")
+        start = time.perf_counter()
+        logger.info("加载中文分词模型...")
         # 加载中文分词模型
         self.chinese_tokenizer = hanlp.load(
             hanlp.pretrained.tok.COARSE_ELECTRA_SMALL_ZH,
             cache_dir=hanlp_model_dir  # 显式指定路径
         )
-        logging.info("中文分词模型加载完成.")
+        logger.info("中文分词模型加载完成.")
 
         # 加载多语言分词模型
-        logging.info("加载多语言分词模型...")
+        logger.info("加载多语言分词模型...")
         self.multilingual_tokenizer = hanlp.load(
             hanlp.pretrained.tok.UD_TOK_MMINILMV2L6,
             cache_dir=hanlp_model_dir  # 显式指定路径
         )
-        logging.info('多语言分词模型加载完成.')
+        logger.info('多语言分词模型加载完成.')
+        FENCI_MODEL_LOAD_SECONDS.set(time.perf_counter() - start)
 
     def _clean_tokens(self, tokens: list[str]) -> list[str]:
         """ 清洗分词列表 """
@@ -91,11 +111,11 @@ class Fenci:
 
     def _convert_and_tokenize(self, text, lang):
         """ 繁简转换和分词 """
-        logging.debug(f"繁简转换和分词: lang={lang}")
+        logger.debug("繁简转换和分词: lang=%s", lang)
 
         # 如果是繁体中文，先转换为简体中文
         if lang in ['zh-tw', 'zh-hant']:
-            logging.debug(f"使用繁体中文分词器处理")
+            logger.debug("使用繁体中文分词器处理")
             # 转换为简体中文
             text = self.t2s_converter.convert(text)
             # 使用简体中文分词器
@@ -103,35 +123,64 @@ class Fenci:
             # 分词结果转换回繁体中文
             return [self.s2t_converter.convert(token) for token in tokens]
         elif lang == 'zh-cn':
-            logging.debug(f"使用中文分词器处理")
+            logger.debug("使用中文分词器处理")
             # 简体中文，直接分词
             return self.chinese_tokenizer(text)
         else:
             try:
-                logging.debug(f"使用多语言分词器处理")
+                logger.debug("使用多语言分词器处理")
                 # 其他语言，使用多语言分词器
                 return self.multilingual_tokenizer(text)
             except Exception as e:
-                logging.error(f"多语言分词器处理失败: {e}, 尝试使用中文分词器处理")
+                logger.error("多语言分词器处理失败: %s, 尝试使用中文分词器处理", e)
                 # 简体中文，直接分词
                 return self.chinese_tokenizer(text)
 
     def _split_tokens(self, text: str) -> list[str]:
         """ 分割文本 """
-        logging.debug(f"开始分割文本: {text[:20]}...")
+        # 日志参数在日志输出时才格式化，%.20s 只截取前 20 个字符，DEBUG 关闭时没有额外开销
+        logger.debug("开始分割文本: %.20s...", text)
+        start = time.perf_counter()
 
         # 检测语言
         lang = self._detect_language(text)
-        logging.debug(f"检测到的文本语言: {lang}")
+        logger.debug("检测到的文本语言: %s", lang)
+        tokenizer = self._tokenizer_label(lang)
 
         # 转换并分词
         tokens = self._convert_and_tokenize(text, lang)
         if not tokens:
-            logging.debug("分词结果为空")
+            logger.debug("分词结果为空")
+            self._observe(tokenizer, time.perf_counter() - start)
             return []
 
         # 清洗分词列表，返回结果
-        return self._clean_tokens(tokens)
+        tokens = self._clean_tokens(tokens)
+        self._observe(tokenizer, time.perf_counter() - start)
+        FENCI_TOKENS.inc((tokenizer,), len(tokens))
+        return tokens
+
+    @staticmethod
+    def _observe(tokenizer: str, elapsed: float) -> None:
+        """ 记录分词耗时的指标，并累加到所属请求的 fenci 阶段 """
+        FENCI_TOKENIZE_SECONDS.observe(elapsed, (tokenizer,))
+        record_span("fenci", elapsed)
+
+    @staticmethod
+    def _tokenizer_label(lang: str) -> str:
+        """ 语言对应的分词模型，作为指标的标签 """
+        if lang in ['zh-tw', 'zh-hant']:
+            return "zh-hant"
+        return "zh" if lang == 'zh-cn' else "multilingual"
+
+    def get_tokens(self, text: str) -> list[str]:
+        """
+        获取清洗后的分词列表（保留原有顺序和重复），用于计算文本指纹等需要完整分词结果的场景。
+
+        :param text: 输入文本
+        :return: 分词列表
+        """
+        return self._split_tokens(text)
 
     def get_top_n_tokens(self, text: str, top_n: int = 10) -> list[str]:
         """
@@ -142,9 +191,19 @@ class Fenci:
         :return: 出现次数最多的 N 个分词，格式为 [token1, token2, ...]
         """
         # 分词并清洗
-        tokens = self._split_tokens(text)
+        return self.top_n_tokens(self._split_tokens(text), top_n)
+
+    @staticmethod
+    def top_n_tokens(tokens: list[str], top_n: int = 10) -> list[str]:
+        """
+        从已有的分词结果中获取出现次数最多的 N 个分词，避免重复分词。
+
+        :param tokens: 清洗后的分词列表
+        :param top_n: 返回的分词数量，默认为 10
+        :return: 出现次数最多的 N 个分词，格式为 [token1, token2, ...]
+        """
         if not tokens:
-            logging.debug("分词结果为空")
+            logger.debug("分词结果为空")
             return []
 
         # 统计词频
@@ -152,7 +211,7 @@ class Fenci:
 
         # 提取出现次数最多的 N 个分词, 并转换为小写
         top_tokens = [str(token).lower() for token, _ in token_counts.most_common(top_n)]
-        logging.debug(f"提取的分词: {top_tokens}")
+        logger.debug("提取的分词: %s", top_tokens)
 
         # 返回结果
         return top_tokens
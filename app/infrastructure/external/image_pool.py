@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 20:10
+@Author : YangFei
+@File   : image_pool.py
+@Desc   : 图片预处理进程池：解码、缩小到模型输入尺寸、统一颜色模式、重新编码、生成缩略图和感知哈希
+
+用户上传的图片通常是相机原始分辨率，直接发送给嵌入服务既浪费带宽，也让服务端花大量时间解码。
+Chinese-CLIP 的输入只有 224x224，这里先把短边缩小到模型输入尺寸，统一为 RGB 后重新编码为 JPEG。
+解码和缩放是 CPU 密集操作，放在独立的进程池中执行，不占用事件循环所在进程的 GIL。
+
+JPEG 解码时通过 draft 直接按 1/2、1/4、1/8 缩小，大图的解码耗时和内存占用可以降低一个数量级。
+感知哈希使用 dHash：灰度图缩小到 9x8，比较水平相邻像素的亮度得到 64 位哈希，缩放、重新编码后基本不变。
+"""
+import io
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from typing import Optional
+
+from core.system_config import get_settings, Settings
+
+logger = logging.getLogger(__name__)
+
+# 常见的图片扩展名，入库时据此判断是否需要预处理
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff"})
+
+
+class ImageProcessError(RuntimeError):
+    """ 图片预处理失败，例如格式无法识别、像素数超出上限 """
+
+
+@dataclass(slots=True)
+class PreprocessedImage:
+    """ 预处理后的图片 """
+    data: bytes  # 缩小到模型输入尺寸并重新编码的 JPEG
+    thumbnail: bytes  # 缩略图 JPEG
+    width: int
+    height: int
+    source_width: int  # 原图宽度
+    source_height: int  # 原图高度
+    phash: int  # 64 位 dHash
+    thumbnail_object: str = ""  # 缩略图在对象存储中的路径，上传后填写
+
+
+def _to_rgb(image):
+    """ 统一为 RGB，带透明通道的图片合成到白色背景上 """
+    from PIL import Image
+
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    if image.mode in ("I;16", "I;16B", "I;16L", "I"):
+        # 16 位灰度图直接转换会被截断为全白，先缩放到 8 位
+        image = image.point(lambda value: value / 256).convert("L")
+    return image.convert("RGB")
+
+
+def _dhash(image) -> int:
+    """ 计算 64 位 dHash """
+    from PIL import Image
+
+    pixels = list(image.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] < pixels[row * 9 + column + 1])
+    return value
+
+
+def preprocess_image(
+        data: bytes,
+        model_size: int,
+        thumbnail_size: int,
+        quality: int,
+        thumbnail_quality: int,
+        max_pixels: int,
+) -> PreprocessedImage:
+    """ 在子进程中预处理一张图片
+    :param data: 原图内容
+    :param model_size: 模型输入尺寸，短边缩小到该值，小图不放大
+    :param thumbnail_size: 缩略图长边的最大值
+    :param quality: 模型输入图片的 JPEG 质量
+    :param thumbnail_quality: 缩略图的 JPEG 质量
+    :param max_pixels: 允许的最大像素数，防止解压炸弹
+    :return: 预处理后的图片
+    """
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(io.BytesIO(data)) as source:
+        source_width, source_height = source.size
+        # 只影响支持按比例解码的格式(JPEG)，解码结果不小于请求的尺寸
+        scale = max(model_size, thumbnail_size) / min(source_width, source_height)
+        if scale < 1:
+            source.draft("RGB", (int(source_width * scale) + 1, int(source_height * scale) + 1))
+        # 只处理多帧图片(GIF、TIFF)的第一帧
+        image = _to_rgb(ImageOps.exif_transpose(source))
+
+    scale = model_size / min(image.size)
+    if scale < 1:
+        model_image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.Resampling.BICUBIC,
+            reducing_gap=3.0,
+        )
+    else:
+        model_image = image
+    thumbnail = image.copy()
+    thumbnail.thumbnail((thumbnail_size, thumbnail_size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    encoded, thumbnail_encoded = io.BytesIO(), io.BytesIO()
+    model_image.save(encoded, format="JPEG", quality=quality, optimize=True)
+    thumbnail.save(thumbnail_encoded, format="JPEG", quality=thumbnail_quality, optimize=True)
+    return PreprocessedImage(
+        data=encoded.getvalue(),
+        thumbnail=thumbnail_encoded.getvalue(),
+        width=model_image.width,
+        height=model_image.height,
+        source_width=source_width,
+        source_height=source_height,
+        phash=_dhash(thumbnail),
+    )
+
+
+def _warm_up() -> None:
+    """ 子进程启动时导入 Pillow，避免第一张图片承担导入耗时 """
+    import PIL.Image  # noqa: F401
+    import PIL.ImageOps  # noqa: F401
+
+
+class ImageProcessor:
+    """ 图片预处理进程池 """
+
+    def __init__(self):
+        """ 构造函数，读取进程池配置 """
+        self._settings: Settings = get_settings()
+        self._size = self._settings.image_workers or multiprocessing.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def init(self) -> None:
+        """ 启动预处理进程 """
+        if self._executor is not None:
+            logger.warning("图片预处理进程池已初始化，跳过重复初始化")
+            return
+
+        self._executor = self._create_executor()
+        logger.info("图片预处理进程池初始化成功, 进程数: %d", self._size)
+
+    async def shutdown(self) -> None:
+        """ 停止所有预处理进程，尚未开始的任务直接取消 """
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+        get_image_processor.cache_clear()
+        logger.info("图片预处理进程池已关闭")
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        """ 创建进程池，使用 spawn 启动子进程，避免复制父进程中的事件循环、连接池和线程 """
+        return ProcessPoolExecutor(
+            max_workers=self._size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up,
+            max_tasks_per_child=self._settings.image_max_tasks_per_worker,
+        )
+
+    async def process(self, data: bytes) -> PreprocessedImage:
+        """ 在子进程中预处理图片
+        :param data: 原图内容
+        :return: 预处理后的图片
+        """
+        if self._executor is None:
+            raise RuntimeError("图片预处理进程池未初始化，请先调用 init 方法")
+
+        settings = self._settings
+        job = partial(
+            preprocess_image,
+            data,
+            settings.image_model_size,
+            settings.image_thumbnail_size,
+            settings.image_jpeg_quality,
+            settings.image_thumbnail_quality,
+            settings.image_max_pixels,
+        )
+        executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, job)
+        except BrokenProcessPool as e:
+            # 子进程崩溃后整个进程池不可用，重建进程池，只有当前图片失败；
+            # 同一个进程池上并发失败的调用只由第一个重建，不能再替换并关闭已经重建好的进程池
+            if self._executor is executor:
+                logger.error("图片预处理进程意外退出，重建进程池: %s", e)
+                self._executor = self._create_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise ImageProcessError(f"图片预处理进程意外退出: {e}") from e
+        except Exception as e:
+            raise ImageProcessError(f"图片预处理失败: {type(e).__name__}: {e}") from e
+
+
+@lru_cache()
+def get_image_processor() -> ImageProcessor:
+    """ 获取图片预处理进程池实例，使用 lru_cache 缓存以确保单例模式 """
+    return ImageProcessor()
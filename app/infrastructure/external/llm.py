@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 23:05
+@Author : YangFei
+@File   : llm.py
+@Desc   : 大模型服务客户端，以流的方式调用 OpenAI 兼容的 /chat/completions 接口(vLLM、Ollama、Xinference 等)
+
+服务端以 Server-Sent Events 逐个返回增量文本，客户端边读取边产出，调用方不必等待完整回答。
+调用方停止迭代或被取消时关闭连接，服务端随之停止生成，不再占用推理资源。
+网络错误、429 和 5xx 在收到第一段文本之前按指数退避加随机抖动重试，之后不再重试，避免重复输出。
+"""
+import json
+import random
+import asyncio
+import logging
+from collections import Counter
+from contextlib import aclosing
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from core.system_config import get_settings, Settings
+
+from .embedding import RETRY_BACKOFF_CAP, _retryable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ChatDelta:
+    """ 流式回答中的一段增量 """
+    text: str
+    finish_reason: Optional[str] = None  # 最后一段的结束原因: stop / length 等
+
+
+class LLMClient:
+    """ 大模型服务客户端封装类 """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """ 构造函数，完成大模型服务客户端的初始化
+        :param transport: 自定义 HTTP 传输层，测试和压测时可以传入 httpx.ASGITransport 直接调用本地替身服务
+        """
+        self._client: Optional[httpx.AsyncClient] = None
+        self._settings: Settings = get_settings()
+        self._transport = transport
+        self._slots: Optional[asyncio.Semaphore] = None
+        # 请求数、重试次数、产出的增量数、被取消的请求数等计数
+        self.stats: Counter = Counter()
+
+    async def init(self) -> None:
+        """ 初始化 HTTP 连接池 """
+        if self._client:
+            logger.warning("大模型服务客户端已初始化，跳过重复初始化")
+            return
+
+        concurrency = self._settings.llm_max_concurrency
+        headers = {"Authorization": f"Bearer {self._settings.llm_api_key}"} if self._settings.llm_api_key else None
+        self._client = httpx.AsyncClient(
+            base_url=self._settings.llm_service_url,
+            headers=headers,
+            # 读超时是两段增量之间的最长间隔，而不是整个回答的生成时间
+            timeout=httpx.Timeout(self._settings.llm_timeout, connect=self._settings.llm_connect_timeout),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            transport=self._transport,
+        )
+        self._slots = asyncio.Semaphore(concurrency)
+        logger.info("大模型服务客户端初始化成功")
+
+    async def shutdown(self) -> None:
+        """ 关闭 HTTP 连接池 """
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+        # 清除缓存(避免重复使用已关闭的客户端)
+        get_llm_client.cache_clear()
+        logger.info("大模型服务客户端连接已关闭")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """ 获取 HTTP 客户端实例, 只读属性 """
+        if not self._client:
+            raise RuntimeError("大模型服务客户端未初始化，请先调用 init 方法")
+        return self._client
+
+    async def stream_chat(
+            self,
+            messages: list[dict[str, str]],
+            max_tokens: Optional[int] = None,
+            temperature: Optional[float] = None,
+    ) -> AsyncIterator[ChatDelta]:
+        """ 以流的方式生成回答
+        :param messages: 对话消息，例如 [{"role": "system", "content": ...}, {"role": "user", "content": ...}]
+        :param max_tokens: 最多生成的 token 数，默认取系统配置
+        :param temperature: 采样温度，默认取系统配置
+        :return: 增量文本的异步迭代器
+        """
+        if self._slots is None:
+            raise RuntimeError("大模型服务客户端未初始化，请先调用 init 方法")
+
+        payload = {
+            "model": self._settings.llm_model,
+            "messages": messages,
+            "max_tokens": max_tokens or self._settings.llm_max_tokens,
+            "temperature": self._settings.llm_temperature if temperature is None else temperature,
+            "stream": True,
+        }
+        max_retries = self._settings.llm_max_retries
+        base = self._settings.llm_retry_backoff
+        attempt = 0
+        async with self._slots:
+            while True:
+                started = False
+                try:
+                    # 调用方提前结束迭代时，生成器停在 yield 处，需要显式关闭内层生成器才会立即断开连接
+                    async with aclosing(self._stream(payload)) as stream:
+                        async for delta in stream:
+                            started = True
+                            yield delta
+                    return
+                except asyncio.CancelledError:
+                    self.stats["cancelled"] += 1
+                    raise
+                except Exception as e:
+                    if started or attempt >= max_retries or not _retryable(e):
+                        raise
+                    delay = random.uniform(0, min(RETRY_BACKOFF_CAP, base * 2 ** attempt))
+                    attempt += 1
+                    self.stats["retries"] += 1
+                    logger.warning("大模型请求失败，%.0fms 后第 %d 次重试: %s", delay * 1000, attempt, e)
+                    await asyncio.sleep(delay)
+
+    async def _stream(self, payload: dict) -> AsyncIterator[ChatDelta]:
+        """ 发送一次流式请求，逐行解析 data: 事件，退出时关闭连接 """
+        self.stats["requests"] += 1
+        async with self.client.stream("POST", "/chat/completions", json=payload) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                choices = json.loads(data).get("choices") or []
+                if not choices:
+                    continue
+                text = (choices[0].get("delta") or {}).get("content") or ""
+                finish_reason = choices[0].get("finish_reason")
+                if text or finish_reason:
+                    self.stats["deltas"] += 1
+                    yield ChatDelta(text, finish_reason)
+
+
+@lru_cache()
+def get_llm_client() -> LLMClient:
+    """ 获取大模型服务客户端实例，使用 lru_cache 缓存以提高性能，避免重复创建实例 """
+    return LLMClient()
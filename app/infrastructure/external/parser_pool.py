@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 14:05
+@Author : YangFei
+@File   : parser_pool.py
+@Desc   : 进程隔离的文档解析池
+
+unstructured 解析 PDF、Office、图片是 CPU 密集操作，遇到畸形文件时可能长时间运行或占满内存。
+解析放在独立的子进程中执行：每个进程处理一定数量的文档后重建，单个文档有超时时间和内存上限，
+子进程崩溃只影响当前文档。解析结果按元素逐个通过管道传回，不需要一次性序列化整个列表。
+父进程在调用方取走上一个元素后才读取下一个元素，调用方处理得慢时子进程阻塞在管道写入上，大文档不会堆积在父进程中。
+解析超时只计算等待子进程的时间，调用方处理元素的时间不计入。
+"""
+import io
+import os
+import asyncio
+import logging
+import multiprocessing
+from contextlib import aclosing
+from multiprocessing.connection import Connection
+from typing import Optional, AsyncIterator
+from functools import lru_cache
+
+import psutil
+
+from core.system_config import get_settings, Settings
+
+logger = logging.getLogger(__name__)
+
+# 子进程发送给父进程的消息类型
+_MSG_ELEMENT = "element"
+_MSG_DONE = "done"
+_MSG_ERROR = "error"
+
+# 等待子进程消息时检查内存和存活状态的间隔(秒)
+_CHECK_INTERVAL = 0.5
+
+
+def _receive(conn: Connection, timeout: float) -> Optional[tuple[str, Optional[dict | str]]]:
+    """ 在线程中等待并读取一条消息，超时返回 None，子进程退出时返回没有错误信息的错误消息 """
+    try:
+        if not conn.poll(timeout):
+            return None
+        return conn.recv()
+    except (EOFError, OSError):
+        return _MSG_ERROR, None
+
+
+class DocumentParseError(RuntimeError):
+    """ 文档解析失败 """
+
+
+class ParseTimeoutError(DocumentParseError):
+    """ 文档解析超时 """
+
+
+class ParseMemoryError(DocumentParseError):
+    """ 解析进程内存占用超出上限 """
+
+
+class ParseCrashError(DocumentParseError):
+    """ 解析进程意外退出 """
+
+
+def _worker_main(conn: Connection) -> None:
+    """ 子进程入口，循环接收解析任务，收到 None 时退出 """
+    # 提前导入解析库，避免第一个文档承担导入耗时
+    from unstructured.partition.auto import partition
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+
+        file_name, data = message
+        try:
+            for element in partition(file=io.BytesIO(data), metadata_filename=file_name):
+                if not element.text or not element.text.strip():
+                    continue
+                conn.send((_MSG_ELEMENT, {
+                    "text": element.text,
+                    "category": element.category,
+                    "metadata": element.metadata.to_dict(),
+                }))
+            conn.send((_MSG_DONE, None))
+        except Exception as e:
+            conn.send((_MSG_ERROR, f"{type(e).__name__}: {e}"))
+
+    conn.close()
+
+
+class _Worker:
+    """ 解析子进程及其通信管道 """
+
+    def __init__(self, context: multiprocessing.context.BaseContext):
+        """ 启动子进程 """
+        self.conn, child_conn = context.Pipe(duplex=True)
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        # 子进程持有另一端即可，父进程关闭自己的副本，子进程退出时父进程才能读到 EOF
+        child_conn.close()
+        self.tasks_done = 0
+
+    def rss(self) -> int:
+        """ 子进程及其所有子孙进程的物理内存之和(字节) """
+        try:
+            process = psutil.Process(self.process.pid)
+            return sum(p.memory_info().rss for p in [process, *process.children(recursive=True)])
+        except psutil.NoSuchProcess:
+            return 0
+
+    def stop(self) -> None:
+        """ 通知子进程正常退出 """
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self) -> None:
+        """ 强制终止子进程及其子孙进程 """
+        try:
+            process = psutil.Process(self.process.pid)
+            for child in process.children(recursive=True):
+                child.kill()
+        except psutil.NoSuchProcess:
+            pass
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ParserPool:
+    """ 文档解析进程池 """
+
+    def __init__(self):
+        """ 构造函数，读取进程池配置 """
+        self._settings: Settings = get_settings()
+        self._size = self._settings.parser_workers or os.cpu_count() or 1
+        # 使用 spawn 启动子进程，避免复制父进程中的事件循环、连接池和线程
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue[_Worker]] = None
+        self._workers: set[_Worker] = set()
+
+    async def init(self) -> None:
+        """ 启动解析进程 """
+        if self._idle is not None:
+            logger.warning("文档解析进程池已初始化，跳过重复初始化")
+            return
+
+        self._idle = asyncio.Queue()
+        workers = await asyncio.gather(*(asyncio.to_thread(self._spawn) for _ in range(self._size)))
+        for worker in workers:
+            self._idle.put_nowait(worker)
+        logger.info("文档解析进程池初始化成功, 进程数: %d", self._size)
+
+    async def shutdown(self) -> None:
+        """ 停止所有解析进程 """
+        workers = list(self._workers)
+        self._workers.clear()
+        self._idle = None
+        await asyncio.gather(*(asyncio.to_thread(worker.stop) for worker in workers))
+
+        get_parser_pool.cache_clear()
+        logger.info("文档解析进程池已关闭")
+
+    @property
+    def size(self) -> int:
+        """ 进程数量 """
+        return self._size
+
+    async def parse(self, file_name: str, data: bytes) -> AsyncIterator[dict]:
+        """ 在子进程中解析文档，逐个产出元素
+        :param file_name: 文件名，用于判断文件类型
+        :param data: 文件内容
+        :return: 元素字典，包含 text、category、metadata
+        """
+        if self._idle is None:
+            raise RuntimeError("文档解析进程池未初始化，请先调用 init 方法")
+
+        worker = await self._idle.get()
+        # 只有正常读完结束消息的进程才能放回池中，超时、崩溃或调用方中途放弃时都要重建进程
+        reusable = False
+        try:
+            # 调用方中途放弃时，确保内部生成器先结束，再终止进程
+            async with aclosing(self._communicate(worker, file_name, data)) as elements:
+                async for element in elements:
+                    yield element
+            reusable = True
+        finally:
+            worker.tasks_done += 1
+            if not reusable:
+                await asyncio.to_thread(worker.kill)
+            elif worker.tasks_done >= self._settings.parser_max_tasks_per_worker:
+                await asyncio.to_thread(worker.stop)
+                reusable = False
+            if not reusable:
+                self._workers.discard(worker)
+                worker = await asyncio.to_thread(self._spawn)
+            if self._idle is not None:
+                self._idle.put_nowait(worker)
+
+    async def _communicate(self, worker: _Worker, file_name: str, data: bytes) -> AsyncIterator[dict]:
+        """ 发送解析任务并逐个读取结果，同时检查超时、内存和进程存活状态
+
+        每次只读取一条消息，产出后等调用方取下一个元素时再读取，未读取的元素留在管道和子进程中。
+        元素可能很大，等待和读取都在线程中执行，不阻塞事件循环。
+        """
+        loop = asyncio.get_running_loop()
+        # 文件内容可能很大，发送可能阻塞到子进程读取为止，放到线程中执行
+        await asyncio.to_thread(worker.conn.send, (file_name, data))
+
+        timeout = self._settings.parser_timeout
+        max_rss = self._settings.parser_max_rss_mb * 1024 * 1024
+        # 等待子进程的累计时间，不包括调用方处理元素的时间
+        waited = 0.0
+        next_check = 0.0
+        while True:
+            if waited >= timeout:
+                raise ParseTimeoutError(f"解析文档超时({timeout}s): {file_name}")
+            # 按等待时间的固定间隔检查内存，不论子进程是否在持续返回元素
+            if waited >= next_check:
+                next_check = waited + _CHECK_INTERVAL
+                if worker.rss() > max_rss:
+                    raise ParseMemoryError(f"解析文档内存超出上限({self._settings.parser_max_rss_mb}MB): {file_name}")
+
+            start = loop.time()
+            message = await asyncio.to_thread(_receive, worker.conn, min(timeout, next_check) - waited)
+            waited += loop.time() - start
+            if message is None:
+                continue
+
+            kind, payload = message
+            if kind == _MSG_ELEMENT:
+                yield payload
+            elif kind == _MSG_DONE:
+                return
+            elif payload is None:
+                raise ParseCrashError(f"解析进程意外退出, exitcode={worker.process.exitcode}: {file_name}")
+            else:
+                raise DocumentParseError(f"解析文档失败: {file_name}, {payload}")
+
+    def _spawn(self) -> _Worker:
+        """ 启动一个新的解析进程 """
+        worker = _Worker(self._context)
+        self._workers.add(worker)
+        return worker
+
+
+@lru_cache()
+def get_parser_pool() -> ParserPool:
+    """ 获取文档解析进程池实例，使用 lru_cache 缓存以确保单例模式 """
+    return ParserPool()
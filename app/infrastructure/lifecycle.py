@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 19:05
+@Author : YangFei
+@File   : lifecycle.py
+@Desc   : 进程启动时初始化、关闭时释放的基础设施组件，API 进程和 Celery 工作进程共用
+"""
+from typing import Iterable, Optional
+
+from core.metrics import get_metrics_registry
+from core.startup import StartupStep
+
+from app.infrastructure.storage.redis import get_redis
+from app.infrastructure.storage.postgres import get_postgres
+from app.infrastructure.storage.minio import get_minio
+from app.infrastructure.storage.tenant_router import get_tenant_router
+from app.infrastructure.vector import init_vector_stores, shutdown_vector_stores
+from app.infrastructure.external.embedding import get_embedding_client
+from app.infrastructure.external.llm import get_llm_client
+from app.infrastructure.external.parser_pool import get_parser_pool
+from app.infrastructure.external.image_pool import get_image_processor
+
+
+# 入库流水线使用的子进程池，只在执行入库任务的 Celery 工作进程中启动，API 进程没有入库接口，不启动
+PROCESS_POOL_STEPS = ("parser_pool", "image_pool")
+
+
+def startup_steps(names: Optional[Iterable[str]] = None, exclude: Iterable[str] = ()) -> list[StartupStep]:
+    """ 启动时初始化的组件，互不依赖，并发初始化。每次都重新获取实例，关闭后实例缓存会被清除
+    :param names: 只返回指定名称的组件，默认返回全部
+    :param exclude: 排除指定名称的组件
+    """
+    steps = [
+        StartupStep("redis", lambda: get_redis().init(), lambda: get_redis().shutdown()),
+        StartupStep("postgres", lambda: get_postgres().init(), lambda: get_postgres().shutdown()),
+        StartupStep("minio", lambda: get_minio().init(), lambda: get_minio().shutdown()),
+        # 默认分片以外的其它存储分片的 Postgres 和 MinIO
+        StartupStep("shards", lambda: get_tenant_router().init(), lambda: get_tenant_router().shutdown()),
+        # 所有存储分片的向量存储(Weaviate 或本地索引)
+        StartupStep("vector", init_vector_stores, shutdown_vector_stores),
+        StartupStep("embedding", lambda: get_embedding_client().init(), lambda: get_embedding_client().shutdown()),
+        StartupStep("llm", lambda: get_llm_client().init(), lambda: get_llm_client().shutdown()),
+        # 文档解析子进程，入库流水线的解析阶段使用
+        StartupStep("parser_pool", lambda: get_parser_pool().init(), lambda: get_parser_pool().shutdown()),
+        # 图片预处理子进程，入库流水线处理图片时使用
+        StartupStep("image_pool", lambda: get_image_processor().init(), lambda: get_image_processor().shutdown()),
+        # 多进程部署时定期写入本进程的指标
+        StartupStep("metrics", lambda: get_metrics_registry().start(), lambda: get_metrics_registry().stop()),
+    ]
+    exclude = set(exclude)
+    steps = [step for step in steps if step.name not in exclude]
+    if names is None:
+        return steps
+    names = set(names)
+    return [step for step in steps if step.name in names]
@@ -8,8 +8,16 @@
 """
 from .base import Base
 from .demo import Demo
+from .document import Document, DocumentChunk, DocumentStatus
+from .vector_import import VectorImportCheckpoint
+from .tenant_shard import TenantShard
 
 __all__ = [
     "Base",
     "Demo",
+    "Document",
+    "DocumentChunk",
+    "DocumentStatus",
+    "VectorImportCheckpoint",
+    "TenantShard",
 ]
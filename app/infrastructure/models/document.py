@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 10:40
+@Author : YangFei
+@File   : document.py
+@Desc   : 文档及文档分块模型，记录文档入库进度和分块内容
+"""
+import uuid
+from enum import Enum
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import UUID, String, Text, Integer, DateTime
+from sqlalchemy import PrimaryKeyConstraint, Index, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+from .base import Base
+
+
+class DocumentStatus(str, Enum):
+    """ 文档入库状态 """
+    PENDING = "pending"  # 等待处理
+    PROCESSING = "processing"  # 处理中
+    COMPLETED = "completed"  # 处理完成
+    FAILED = "failed"  # 处理失败
+
+
+class Document(Base):
+    """ 文档模型，一条记录对应 MinIO 中的一个源文件 """
+    __tablename__ = 'document'
+    __table_args__ = (
+        PrimaryKeyConstraint('id', name='pk_document_id'),
+        Index('idx_document_tenant_id', 'tenant_id'),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        server_default=text('uuid_generate_v4()'),
+        comment="主键ID"
+    )
+    tenant_id: Mapped[str] = mapped_column(
+        String(255),
+        nullable=False,
+        server_default=text("''::character varying"),
+        comment="租户ID"
+    )
+    name: Mapped[str] = mapped_column(
+        String(255),
+        nullable=False,
+        server_default=text("''::character varying"),
+        comment="文件名称"
+    )
+    object_name: Mapped[str] = mapped_column(
+        String(1024),
+        nullable=False,
+        server_default=text("''::character varying"),
+        comment="文件在对象存储中的路径"
+    )
+    status: Mapped[str] = mapped_column(
+        String(32),
+        nullable=False,
+        server_default=text("'pending'::character varying"),
+        comment="入库状态: pending/processing/completed/failed"
+    )
+    stage: Mapped[str] = mapped_column(
+        String(32),
+        nullable=False,
+        server_default=text("''::character varying"),
+        comment="当前所处的入库阶段"
+    )
+    chunk_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        server_default=text('0'),
+        comment="分块数量"
+    )
+    error: Mapped[str] = mapped_column(
+        Text,
+        nullable=False,
+        server_default=text("''::text"),
+        comment="失败原因"
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP(0)'),
+        onupdate=datetime.now,
+        comment="更新时间"
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP(0)'),
+        comment="创建时间"
+    )
+
+
+class DocumentChunk(Base):
+    """ 文档分块模型，主键与向量数据库中的对象 ID 保持一致 """
+    __tablename__ = 'document_chunk'
+    __table_args__ = (
+        PrimaryKeyConstraint('id', name='pk_document_chunk_id'),
+        Index('idx_document_chunk_document_id', 'document_id'),
+        Index('idx_document_chunk_tenant_id', 'tenant_id'),
+        # 关键词检索使用 && 运算符匹配关键词数组，需要 GIN 索引
+        Index('idx_document_chunk_keywords', 'keywords', postgresql_using='gin'),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        comment="主键ID，与向量数据库中的对象 ID 相同"
+    )
+    document_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=False,
+        comment="所属文档ID"
+    )
+    tenant_id: Mapped[str] = mapped_column(
+        String(255),
+        nullable=False,
+        server_default=text("''::character varying"),
+        comment="租户ID"
+    )
+    chunk_index: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        server_default=text('0'),
+        comment="分块在文档中的序号"
+    )
+    content: Mapped[str] = mapped_column(
+        Text,
+        nullable=False,
+        server_default=text("''::text"),
+        comment="分块内容"
+    )
+    content_hash: Mapped[str] = mapped_column(
+        String(64),
+        nullable=False,
+        server_default=text("''::character varying"),
+        comment="分块内容哈希(规范化文本加分块参数)，重新入库时据此跳过未变化的分块"
+    )
+    keywords: Mapped[list[str]] = mapped_column(
+        ARRAY(String(255)),
+        nullable=False,
+        server_default=text("'{}'::character varying[]"),
+        comment="分块关键词"
+    )
+    meta: Mapped[dict] = mapped_column(
+        JSONB,
+        nullable=False,
+        server_default=text("'{}'::jsonb"),
+        comment="分块元数据，例如页码、元素类型"
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP(0)'),
+        comment="创建时间"
+    )
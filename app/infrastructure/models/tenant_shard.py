@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 21:20
+@Author : YangFei
+@File   : tenant_shard.py
+@Desc   : 租户分片映射模型，保存在默认分片(目录库)中，记录每个租户所在的存储分片和迁移状态
+"""
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, DateTime
+from sqlalchemy import PrimaryKeyConstraint, text
+
+from .base import Base
+
+
+class TenantShard(Base):
+    """ 租户分片映射模型，一条记录对应一个租户 """
+    __tablename__ = 'tenant_shard'
+    __table_args__ = (
+        PrimaryKeyConstraint('tenant_id', name='pk_tenant_shard_tenant_id'),
+    )
+
+    tenant_id: Mapped[str] = mapped_column(
+        String(255),
+        nullable=False,
+        comment="租户ID"
+    )
+    shard: Mapped[str] = mapped_column(
+        String(64),
+        nullable=False,
+        comment="租户数据所在的存储分片"
+    )
+    target_shard: Mapped[str] = mapped_column(
+        String(64),
+        nullable=False,
+        server_default=text("''::character varying"),
+        comment="迁移中的目标分片，没有迁移时为空"
+    )
+    status: Mapped[str] = mapped_column(
+        String(32),
+        nullable=False,
+        server_default=text("'active'::character varying"),
+        comment="分片状态: active(正常读写)/moving(迁移中，只读)"
+    )
+    version: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        server_default=text('1'),
+        comment="映射版本号，每次状态变化时递增，用于乐观并发控制"
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP(0)'),
+        onupdate=datetime.now,
+        comment="更新时间"
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP(0)'),
+        comment="创建时间"
+    )
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 18:10
+@Author : YangFei
+@File   : vector_import.py
+@Desc   : 向量批量导入检查点模型，记录每个导入任务在每个租户下已经完成的位置，中断后从该位置继续
+"""
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Text, Integer, DateTime
+from sqlalchemy import PrimaryKeyConstraint, text
+
+from .base import Base
+
+
+class VectorImportCheckpoint(Base):
+    """ 向量批量导入检查点模型，一条记录对应一个导入任务中的一个租户 """
+    __tablename__ = 'vector_import_checkpoint'
+    __table_args__ = (
+        PrimaryKeyConstraint('job_id', 'tenant_id', name='pk_vector_import_checkpoint'),
+    )
+
+    job_id: Mapped[str] = mapped_column(
+        String(255),
+        nullable=False,
+        comment="导入任务ID"
+    )
+    tenant_id: Mapped[str] = mapped_column(
+        String(255),
+        nullable=False,
+        comment="租户ID"
+    )
+    position: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        server_default=text('0'),
+        comment="已完成的记录数，该位置之前的记录都已写入或确认失败"
+    )
+    imported: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        server_default=text('0'),
+        comment="写入成功的记录数"
+    )
+    failed: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        server_default=text('0'),
+        comment="重试后仍然写入失败的记录数"
+    )
+    status: Mapped[str] = mapped_column(
+        String(32),
+        nullable=False,
+        server_default=text("'running'::character varying"),
+        comment="导入状态: running/completed/failed"
+    )
+    error: Mapped[str] = mapped_column(
+        Text,
+        nullable=False,
+        server_default=text("''::text"),
+        comment="失败原因"
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP(0)'),
+        onupdate=datetime.now,
+        comment="更新时间"
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP(0)'),
+        comment="创建时间"
+    )
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 16:05
+@Author : YangFei
+@File   : prefork.py
+@Desc   : 预先 fork 的多进程部署(gunicorn)：主进程加载只读数据，工作进程以写时复制的方式共享
+
+每个工作进程各自加载 HanLP 分词模型时，内存随进程数线性增长。主进程在 fork 之前加载一次，
+工作进程只要不写入这部分内存，就与主进程共享同一份物理内存页:
+    - 主进程尽早关闭自动垃圾回收，避免回收过程在堆中留下空洞，fork 后工作进程新分配的对象填进这些空洞时会复制整页
+    - fork 之前冻结堆(gc.freeze)，已有对象移入永久代，工作进程的垃圾回收不再遍历它们，
+      否则遍历时写入对象头中的回收标记会让几乎所有页面都被复制
+    - 工作进程 fork 后重新开启垃圾回收，并丢弃从主进程继承的连接类单例，由工作进程的启动流程重新创建，
+      多个进程共用同一个套接字会导致协议错乱
+主进程只加载数据，不执行推理，避免在 fork 之前启动深度学习框架的线程池(fork 后子进程中的线程池不可用)。
+"""
+import gc
+import logging
+
+from core.startup import import_on_first_use
+from core.system_config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def preload_shared_data() -> None:
+    """ 在主进程中加载工作进程共享的只读数据，加载失败时工作进程在第一次使用时各自加载 """
+    from app.infrastructure.storage.shards import get_shard_configs
+    from app.infrastructure.external.fenci import get_fenci_client
+
+    settings = get_settings()
+    get_shard_configs()
+    if settings.vector_store_backend == "weaviate":
+        import_on_first_use("weaviate")
+        import_on_first_use("app.infrastructure.vector.weaviate_store")
+    try:
+        get_fenci_client()
+    except Exception as e:
+        logger.warning("主进程加载分词模型失败，工作进程将各自加载: %s", e)
+
+
+def freeze_heap() -> None:
+    """ fork 之前冻结堆，已有对象不再参与工作进程的垃圾回收 """
+    gc.freeze()
+    logger.info("已冻结主进程的堆, 对象数: %d", gc.get_freeze_count())
+
+
+def reset_after_fork() -> None:
+    """ 工作进程 fork 后立即调用：重新开启垃圾回收，丢弃从主进程继承的连接类单例 """
+    from app.infrastructure.storage import postgres, minio, weaviate
+    from app.infrastructure.storage.redis import get_redis
+    from app.infrastructure.storage.tenant_router import get_tenant_router
+    from app.infrastructure.vector import local_index
+    from app.infrastructure.external.embedding import get_embedding_client
+    from app.infrastructure.external.llm import get_llm_client
+    from app.infrastructure.external.parser_pool import get_parser_pool
+    from app.infrastructure.external.image_pool import get_image_processor
+    from app.application.services.health import get_health_service
+
+    gc.enable()
+    # 只清除缓存，不调用 shutdown：关闭继承的连接会向服务端发送断开消息，影响主进程和其它工作进程
+    for getter in (get_redis, get_tenant_router, get_embedding_client, get_llm_client,
+                   get_parser_pool, get_image_processor, get_health_service):
+        getter.cache_clear()
+    for module in (postgres, minio, weaviate, local_index):
+        module._instances.clear()
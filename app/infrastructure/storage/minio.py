@@ -6,24 +6,61 @@
 @File   : minio.py
 @Desc   : 本地 MinIO 存储实现类，用于与 MinIO 对象存储服务交互
 """
+import time
+import asyncio
 import logging
 from typing import Optional
-from functools import lru_cache
 
 from minio import Minio
 from minio.error import S3Error
 
+from core.metrics import get_metrics_registry
 from core.system_config import get_settings
+from core.tracing import record_span
+from .shards import DEFAULT_SHARD, ShardConfig, get_shard_config
 
 logger = logging.getLogger(__name__)
 
+# MinIO 请求耗时，按分片和 HTTP 方法区分；下载对象时只计到收到响应头为止
+MINIO_REQUEST_SECONDS = get_metrics_registry().histogram(
+    "neon_minio_request_seconds", "MinIO 请求耗时(秒)", ["shard", "method"],
+)
+MINIO_REQUEST_ERRORS = get_metrics_registry().counter(
+    "neon_minio_request_errors_total", "MinIO 请求失败次数", ["shard", "method"],
+)
+
+
+class InstrumentedMinio(Minio):
+    """ 记录每个请求耗时的 MinIO 客户端，所有接口最终都通过 _url_open 发送请求 """
+
+    def __init__(self, *args, shard: str = DEFAULT_SHARD, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metric_shard = shard
+
+    def _url_open(self, method: str, *args, **kwargs):
+        labels = (self._metric_shard, method)
+        start = time.perf_counter()
+        try:
+            return super()._url_open(method, *args, **kwargs)
+        except Exception:
+            MINIO_REQUEST_ERRORS.inc(labels)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            MINIO_REQUEST_SECONDS.observe(elapsed, labels)
+            record_span("minio", elapsed)
+
+
 class MinIO:
     """ MinIO 客户端封装类 """
 
-    def __init__(self):
-        """ 构造函数，完成 MinIO 客户端的初始化 """
+    def __init__(self, shard: Optional[ShardConfig] = None):
+        """ 构造函数，完成 MinIO 客户端的初始化
+        :param shard: 所属的存储分片，默认为默认分片
+        """
         self._client: Optional[Minio] = None
         self._settings = get_settings()
+        self._shard = shard or get_shard_config(DEFAULT_SHARD)
 
     async def init(self) -> None:
         """ 初始化 MinIO 连接 """
@@ -33,15 +70,16 @@ class MinIO:
 
         try:
             # 创建 MinIO 客户端实例
-            self._client = Minio(
-                endpoint=self._settings.minio_endpoint,
-                access_key=self._settings.minio_access_key,
-                secret_key=self._settings.minio_secret_key,
-                secure=self._settings.minio_secure,
+            self._client = InstrumentedMinio(
+                endpoint=self._shard.minio_endpoint,
+                access_key=self._shard.minio_access_key,
+                secret_key=self._shard.minio_secret_key,
+                secure=self._shard.minio_secure,
+                shard=self._shard.name,  # 指标中区分分片
             )
-            # 测试连接
-            self._client.list_buckets()
-            logger.info("MinIO 客户端初始化成功")
+            # 测试连接(同步请求，在线程中执行，避免阻塞事件循环和并发初始化的其它组件)
+            await asyncio.to_thread(self._client.list_buckets)
+            logger.info("MinIO 客户端初始化成功, 分片: %s", self._shard.name)
         except S3Error as e:
             logger.error("初始化 MinIO 客户端失败: %s", e)
             raise
@@ -51,8 +89,8 @@ class MinIO:
         if self._client:
             self._client = None
 
-        get_minio.cache_clear()
-        logger.info("MinIO 客户端连接已关闭")
+        _instances.pop(self._shard.name, None)
+        logger.info("MinIO 客户端连接已关闭, 分片: %s", self._shard.name)
 
     @property
     def client(self) -> Minio:
@@ -61,8 +99,22 @@ class MinIO:
             raise RuntimeError("MinIO 客户端未初始化，请先调用 init 方法")
         return self._client
 
+    @property
+    def bucket_name(self) -> str:
+        """ 分片的默认存储桶 """
+        return self._shard.minio_bucket_name
+
+
+# 每个存储分片一个 MinIO 客户端实例
+_instances: dict[str, MinIO] = {}
+
 
-@lru_cache()
-def get_minio() -> MinIO:
-    """ 获取 MinIO 客户端实例，使用 lru_cache 缓存以提高性能，避免重复创建实例 """
-    return MinIO()
\ No newline at end of file
+def get_minio(shard: Optional[str] = None) -> MinIO:
+    """ 获取存储分片的 MinIO 客户端实例，每个分片只创建一次
+    :param shard: 分片名称，默认为默认分片，租户数据应通过租户路由获取所在分片
+    """
+    name = shard or DEFAULT_SHARD
+    instance = _instances.get(name)
+    if instance is None:
+        instance = _instances.setdefault(name, MinIO(get_shard_config(name)))
+    return instance
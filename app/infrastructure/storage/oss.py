@@ -7,16 +7,22 @@
 @Desc   :
 """
 import logging
-from typing import Optional
+from typing import Optional, Callable
 from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
-from oss2 import Bucket, Auth
-from oss2.models import LifecycleExpiration, LifecycleRule, BucketLifecycle
+from oss2 import Bucket, Auth, ResumableStore, ResumableDownloadStore, resumable_upload, resumable_download
+from oss2 import determine_part_size
+from oss2.exceptions import NoSuchKey
+from oss2.models import LifecycleExpiration, LifecycleRule, BucketLifecycle, PartInfo
 
 from core.system_config import get_settings, Settings
 
 logger = logging.getLogger(__name__)
 
+# OSS 批量删除接口单次请求最多允许删除的文件数量
+BATCH_DELETE_LIMIT = 1000
+
 
 class OSS:
     """ 阿里云对象存储服务封装类 """
@@ -96,10 +102,16 @@ class OSS:
         return self._client.object_exists(file_path)
 
     def file_upload(self, file_path: str, file_content: bytes, header: Optional[dict] = None):
-        """ 上传文件到 OSS, 并返回文件的访问 URL """
+        """ 上传文件到 OSS, 超过分片阈值的内容会自动切换为并行分片上传 """
         if not self._client:
             raise RuntimeError("OSS 客户端未初始化，请先调用初始化方法。")
 
+        # 大文件走并行分片上传，避免单个请求过大导致超时
+        if len(file_content) >= self._settings.oss_multipart_threshold:
+            self._multipart_upload(file_path, file_content, header)
+            logger.info("文件成功分片上传到 OSS，路径: %s", file_path)
+            return
+
         # 上传文件到指定路径
         result = self._client.put_object(
             file_path, file_content, headers=header or {})
@@ -109,6 +121,80 @@ class OSS:
         else:
             logger.info("文件成功上传到 OSS，路径: %s", file_path)
 
+    def _multipart_upload(self, file_path: str, file_content: bytes, header: Optional[dict] = None):
+        """ 将内存中的内容切分为多个分片，并行上传后合并
+        :param file_path: 文件在 OSS 中的路径
+        :param file_content: 文件内容
+        :param header: 请求头，例如 Content-Type
+        """
+        total_size = len(file_content)
+        # 根据文件大小计算分片大小，保证分片数量不超过 OSS 的上限
+        part_size = determine_part_size(total_size, preferred_size=self._settings.oss_part_size)
+        offsets = range(0, total_size, part_size)
+
+        # 初始化分片上传任务
+        upload_id = self._client.init_multipart_upload(file_path, headers=header or {}).upload_id
+
+        def _upload_part(part_number: int, offset: int) -> PartInfo:
+            """ 上传单个分片，分片编号从 1 开始，分片数据在工作线程中按需切出，同一时刻只复制在途的分片 """
+            data = file_content[offset:offset + part_size]
+            result = self._client.upload_part(file_path, upload_id, part_number, data)
+            return PartInfo(part_number, result.etag, size=len(data))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self._settings.oss_num_threads) as executor:
+                futures = [
+                    executor.submit(_upload_part, part_number, offset)
+                    for part_number, offset in enumerate(offsets, start=1)
+                ]
+                parts = [future.result() for future in futures]
+
+            # 合并分片
+            self._client.complete_multipart_upload(file_path, upload_id, parts)
+        except Exception as e:
+            # 取消分片上传任务，避免残留的分片占用存储空间
+            logger.error("分片上传文件到 OSS 失败: %s", e)
+            try:
+                self._client.abort_multipart_upload(file_path, upload_id)
+            except Exception as abort_error:
+                # 取消失败只记录日志，向调用方抛出上传失败的原始异常
+                logger.error("取消 OSS 分片上传任务失败, upload_id: %s, 错误: %s", upload_id, abort_error)
+            raise e
+
+    def file_upload_resumable(
+            self,
+            file_path: str,
+            local_file_path: str,
+            header: Optional[dict] = None,
+            progress_callback: Optional[Callable[[int, int], None]] = None,
+    ):
+        """ 断点续传上传本地文件到 OSS，大文件并行分片上传，中断后再次调用会从断点处继续
+        :param file_path: 文件在 OSS 中的路径
+        :param local_file_path: 本地文件路径
+        :param header: 请求头，例如 Content-Type
+        :param progress_callback: 进度回调函数，参数为 (已上传字节数, 总字节数)
+        """
+        if not self._client:
+            raise RuntimeError("OSS 客户端未初始化，请先调用初始化方法。")
+
+        try:
+            resumable_upload(
+                self._client,
+                file_path,
+                local_file_path,
+                # 断点记录保存在本地目录，进程重启后依然可以续传
+                store=ResumableStore(root=self._settings.oss_checkpoint_dir),
+                headers=header,
+                multipart_threshold=self._settings.oss_multipart_threshold,
+                part_size=self._settings.oss_part_size,
+                progress_callback=progress_callback,
+                num_threads=self._settings.oss_num_threads,
+            )
+            logger.info("文件成功断点续传上传到 OSS，路径: %s", file_path)
+        except Exception as e:
+            logger.error("断点续传上传文件到 OSS 失败: %s", e)
+            raise
+
     def upload_temp_file(self, file_path: str, file_content: bytes, header: Optional[dict] = None):
         """ 上传临时文件到 OSS, 并返回文件的访问 URL """
         if not self._client:
@@ -123,16 +209,48 @@ class OSS:
             raise RuntimeError("OSS 客户端未初始化，请先调用初始化方法。")
 
         try:
-            # 检查文件是否存在
-            if not self.file_exists(file_path):
-                raise FileNotFoundError(f"OSS 上未找到文件: {file_path}")
-
-            # 下载文件到本地指定路径
+            # 直接下载文件到本地指定路径，文件不存在时由服务端返回 NoSuchKey，省去一次存在性检查请求
             self._client.get_object_to_file(file_path, local_file_path)
+        except NoSuchKey:
+            logger.error("从 OSS 下载文件失败, 文件不存在: %s", file_path)
+            raise FileNotFoundError(f"OSS 上未找到文件: {file_path}")
         except Exception as e:
             logger.error("从 OSS 下载文件失败: %s", e)
             raise
 
+    def file_download_resumable(
+            self,
+            file_path: str,
+            local_file_path: str,
+            progress_callback: Optional[Callable[[int, int], None]] = None,
+    ):
+        """ 断点续传下载 OSS 文件到本地，大文件并行分片下载，中断后再次调用会从断点处继续
+        :param file_path: 文件在 OSS 中的路径
+        :param local_file_path: 本地文件路径
+        :param progress_callback: 进度回调函数，参数为 (已下载字节数, 总字节数)
+        """
+        if not self._client:
+            raise RuntimeError("OSS 客户端未初始化，请先调用初始化方法。")
+
+        try:
+            resumable_download(
+                self._client,
+                file_path,
+                local_file_path,
+                multiget_threshold=self._settings.oss_multipart_threshold,
+                part_size=self._settings.oss_part_size,
+                progress_callback=progress_callback,
+                num_threads=self._settings.oss_num_threads,
+                # 断点记录保存在本地目录，进程重启后依然可以续传
+                store=ResumableDownloadStore(root=self._settings.oss_checkpoint_dir),
+            )
+        except NoSuchKey:
+            logger.error("从 OSS 断点续传下载文件失败, 文件不存在: %s", file_path)
+            raise FileNotFoundError(f"OSS 上未找到文件: {file_path}")
+        except Exception as e:
+            logger.error("从 OSS 断点续传下载文件失败: %s", e)
+            raise
+
     def file_rename(self, old_file_path: str, new_file_path: str):
         """ 重命名 OSS 上的文件 """
         if not self._client:
@@ -165,14 +283,31 @@ class OSS:
             logger.error("删除 OSS 文件失败: %s", e)
             raise
 
-    def delete_files(self, file_paths: list[str]):
-        """ 批量删除 OSS 上的文件 """
+    def delete_files(self, file_paths: list[str]) -> list[str]:
+        """ 批量删除 OSS 上的文件，超过单次请求上限时自动分批并发删除
+        :param file_paths: 需要删除的文件路径列表
+        :return: 成功删除的文件路径列表
+        """
         if not self._client:
             raise RuntimeError("OSS 客户端未初始化，请先调用初始化方法。")
 
+        # 去重并过滤空路径，空列表直接返回（OSS 不接受空的删除列表）
+        keys = list(dict.fromkeys(path for path in file_paths if path))
+        if not keys:
+            return []
+
+        # 按单次请求上限切分批次
+        batches = [keys[i:i + BATCH_DELETE_LIMIT] for i in range(0, len(keys), BATCH_DELETE_LIMIT)]
+
         try:
-            # 批量删除文件
-            self._client.batch_delete_objects(file_paths)
+            # 单批次无需线程池，直接删除
+            if len(batches) == 1:
+                return list(self._client.batch_delete_objects(batches[0]).deleted_keys)
+
+            # 多批次并发删除
+            with ThreadPoolExecutor(max_workers=min(len(batches), self._settings.oss_num_threads)) as executor:
+                results = executor.map(self._client.batch_delete_objects, batches)
+                return [key for result in results for key in result.deleted_keys]
         except Exception as e:
             logger.error("批量删除 OSS 文件失败: %s", e)
             raise
@@ -1,21 +1,70 @@
+import time
 import logging
 from typing import Optional, AsyncGenerator
-from sqlalchemy import text
+from sqlalchemy import text, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
-from functools import lru_cache
 
+from core.metrics import get_metrics_registry
+from core.tracing import record_span
 from core.system_config import get_settings
+from .shards import DEFAULT_SHARD, ShardConfig, get_shard_config
 
 # 为该模块配置日志记录器
 logger = logging.getLogger(__name__)
 
+# 连接池状态: size(池大小) / checked_out(使用中) / idle(空闲) / overflow(超出池大小临时创建的连接)
+POSTGRES_POOL_CONNECTIONS = get_metrics_registry().gauge(
+    "neon_postgres_pool_connections", "Postgres 连接池中的连接数", ["shard", "state"],
+)
+# SQL 语句耗时，按分片和语句类型区分
+POSTGRES_QUERY_SECONDS = get_metrics_registry().histogram(
+    "neon_postgres_query_seconds", "Postgres 语句执行耗时(秒)", ["shard", "operation"],
+)
+POSTGRES_QUERY_ERRORS = get_metrics_registry().counter(
+    "neon_postgres_query_errors_total", "Postgres 语句执行失败次数", ["shard"],
+)
+_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+
+
+def _operation(statement: str) -> str:
+    """ 语句类型，限定为有限的取值，避免指标的标签组合无限增长 """
+    head = statement.lstrip()[:6].upper()
+    return head if head in _OPERATIONS else ("WITH" if head.startswith("WITH") else "OTHER")
+
+
+def _instrument_engine(engine: Engine, shard: str) -> None:
+    """ 通过引擎事件记录每条语句的耗时，开始时间保存在连接上，事务内的语句依次执行
+    语句在 greenlet 中执行，greenlet 沿用调用方的 ContextVar，耗时同样累加到所属请求的 postgres 阶段
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        POSTGRES_QUERY_SECONDS.observe(elapsed, (shard, _operation(statement)))
+        record_span("postgres", elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        POSTGRES_QUERY_ERRORS.inc((shard,))
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
+
 
 class Postgres:
     """  Postgres 存储实现类，用于与 PostgreSQL 数据库交互"""
 
-    def __init__(self):
-        """ 完成 postgres 存储的初始化工作，如建立数据库连接等 """
+    def __init__(self, shard: Optional[ShardConfig] = None):
+        """ 完成 postgres 存储的初始化工作，如建立数据库连接等
+        :param shard: 所属的存储分片，默认为默认分片
+        """
         # 初始化成员变量
+        # 所属的存储分片，决定连接哪个数据库
+        self._shard = shard or get_shard_config(DEFAULT_SHARD)
         # 异步引擎，用于与数据库进行异步通信
         self._engine: Optional[AsyncEngine] = None
         # 创建异步会话工厂，async_sessionmaker 是 SQLAlchemy 提供的异步会话生成器
@@ -32,11 +81,13 @@ class Postgres:
         try:
             # 创建异步引擎
             self._engine = create_async_engine(
-                self._settings.sqlalchemy_database_uri,
+                self._shard.sqlalchemy_database_uri,
                 # 根据环境决定是否启用 SQLAlchemy 的 SQL 语句日志记录(调试模式下启用，打印所有执行的 SQL 语句)
                 echo=True if self._settings.env == "development" else False,
             )
-            logger.info("Postgres引擎初始化成功.")
+            # 记录语句耗时
+            _instrument_engine(self._engine.sync_engine, self._shard.name)
+            logger.info("Postgres引擎初始化成功, 分片: %s.", self._shard.name)
 
             # 创建异步会话工厂
             self._session_factory = async_sessionmaker(
@@ -67,10 +118,10 @@ class Postgres:
         self._engine = None
         self._session_factory = None
 
-        # 清除缓存以确保下次获取实例时重新创建
-        get_postgres.cache_clear()
+        # 移除实例以确保下次获取时重新创建
+        _instances.pop(self._shard.name, None)
 
-        logger.info("Postgres 连接已成功关闭.")
+        logger.info("Postgres 连接已成功关闭, 分片: %s.", self._shard.name)
 
     @property
     def session_factory(self) -> async_sessionmaker[AsyncSession]:
@@ -80,10 +131,36 @@ class Postgres:
         return self._session_factory
 
 
-@lru_cache()
-def get_postgres() -> Postgres:
-    """ 获取 Postgres 存储实例，使用 LRU 缓存以确保单例模式 """
-    return Postgres()
+# 每个存储分片一个 Postgres 实例
+_instances: dict[str, Postgres] = {}
+
+
+def _collect_pool_metrics() -> None:
+    """ 输出指标前读取各分片连接池的状态 """
+    POSTGRES_POOL_CONNECTIONS.clear()
+    for name, instance in list(_instances.items()):
+        pool = instance._engine.pool if instance._engine is not None else None
+        # NullPool 等不保留连接的连接池没有这些状态
+        if pool is None or not hasattr(pool, "checkedout"):
+            continue
+        POSTGRES_POOL_CONNECTIONS.set(pool.size(), (name, "size"))
+        POSTGRES_POOL_CONNECTIONS.set(pool.checkedout(), (name, "checked_out"))
+        POSTGRES_POOL_CONNECTIONS.set(pool.checkedin(), (name, "idle"))
+        POSTGRES_POOL_CONNECTIONS.set(max(pool.overflow(), 0), (name, "overflow"))
+
+
+get_metrics_registry().add_collector(_collect_pool_metrics)
+
+
+def get_postgres(shard: Optional[str] = None) -> Postgres:
+    """ 获取存储分片的 Postgres 实例，每个分片只创建一次
+    :param shard: 分片名称，默认为默认分片(同时也是保存租户分片映射的目录库)，租户数据应通过租户路由获取所在分片
+    """
+    name = shard or DEFAULT_SHARD
+    instance = _instances.get(name)
+    if instance is None:
+        instance = _instances.setdefault(name, Postgres(get_shard_config(name)))
+    return instance
 
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
@@ -1,11 +1,59 @@
+import time
 import logging
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 from functools import lru_cache
 
+from core.metrics import get_metrics_registry
+from core.tracing import record_span
 from core.system_config import get_settings, Settings
 
 logger = logging.getLogger(__name__)
 
+# Redis 命令耗时，按命令名称区分，流水线整体记为 PIPELINE
+REDIS_COMMAND_SECONDS = get_metrics_registry().histogram(
+    "neon_redis_command_seconds", "Redis 命令耗时(秒)", ["command"],
+)
+REDIS_COMMAND_ERRORS = get_metrics_registry().counter(
+    "neon_redis_command_errors_total", "Redis 命令失败次数", ["command"],
+)
+
+
+class InstrumentedPipeline(Pipeline):
+    """ 记录整体耗时的 Redis 流水线 """
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        except Exception:
+            REDIS_COMMAND_ERRORS.inc(("PIPELINE",))
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            REDIS_COMMAND_SECONDS.observe(elapsed, ("PIPELINE",))
+            record_span("redis", elapsed)
+
+
+class InstrumentedRedis(Redis):
+    """ 记录每个命令耗时的 Redis 客户端 """
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper() if args else "UNKNOWN"
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            REDIS_COMMAND_ERRORS.inc((command,))
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            REDIS_COMMAND_SECONDS.observe(elapsed, (command,))
+            record_span("redis", elapsed)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
 
 class RedisClient:
     """ Redis 客户端封装类 """
@@ -23,8 +71,8 @@ class RedisClient:
             return
 
         try:
-            # 创建 Redis 客户端实例
-            self._client = Redis(
+            # 创建 Redis 客户端实例(记录命令耗时)
+            self._client = InstrumentedRedis(
                 host=self._settings.redis_host,
                 port=self._settings.redis_port,
                 db=self._settings.redis_db,
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 21:05
+@Author : YangFei
+@File   : shards.py
+@Desc   : 存储分片配置，每个分片包含一个 Postgres 数据库、一个对象存储桶和一个向量集合
+
+默认分片(default)直接使用系统配置中的连接参数，其它分片通过 storage_shards 配置，
+只需要填写与默认分片不同的字段，例如:
+    STORAGE_SHARDS='{"s1": {"sqlalchemy_database_uri": "postgresql+asyncpg://...", "minio_bucket_name": "neon-rag-s1"}}'
+默认分片同时保存租户到分片的映射表，是整个系统的目录库。
+"""
+import dataclasses
+from dataclasses import dataclass
+from functools import lru_cache
+
+from core.system_config import get_settings
+
+# 默认分片名称
+DEFAULT_SHARD = "default"
+
+
+@dataclass(frozen=True, slots=True)
+class ShardConfig:
+    """ 单个分片的连接配置，字段名与系统配置中的同名字段对应 """
+    name: str
+    sqlalchemy_database_uri: str
+    minio_endpoint: str
+    minio_access_key: str
+    minio_secret_key: str
+    minio_secure: bool
+    minio_bucket_name: str
+    weaviate_http_host: str
+    weaviate_http_port: int
+    weaviate_http_secure: bool
+    weaviate_grpc_host: str
+    weaviate_grpc_port: int
+    weaviate_grpc_secure: bool
+    weaviate_collection_name: str
+    local_vector_dir: str
+    weight: float = 1.0  # 新租户分配到该分片的权重，0 表示不再接收新租户
+
+    @property
+    def database_key(self) -> str:
+        """ 数据库的标识，两个分片的标识相同时表示共用同一个数据库 """
+        return self.sqlalchemy_database_uri
+
+    @property
+    def bucket_key(self) -> str:
+        """ 存储桶的标识 """
+        return f"{self.minio_endpoint}/{self.minio_bucket_name}"
+
+    @property
+    def vector_key(self) -> str:
+        """ 向量集合的标识 """
+        if get_settings().vector_store_backend == "local":
+            return self.local_vector_dir
+        return f"{self.weaviate_http_host}:{self.weaviate_http_port}/{self.weaviate_collection_name}"
+
+
+@lru_cache()
+def get_shard_configs() -> dict[str, ShardConfig]:
+    """ 获取所有分片的配置，使用 lru_cache 缓存，配置在进程运行期间不变 """
+    settings = get_settings()
+    fields = [field.name for field in dataclasses.fields(ShardConfig) if field.name not in ("name", "weight")]
+    default = ShardConfig(name=DEFAULT_SHARD, **{name: getattr(settings, name) for name in fields})
+
+    shards = {DEFAULT_SHARD: default}
+    for name, overrides in settings.storage_shards.items():
+        unknown = set(overrides) - set(fields) - {"weight"}
+        if unknown:
+            raise ValueError(f"分片 {name} 的配置包含未知字段: {', '.join(sorted(unknown))}")
+        values = dict(overrides)
+        if name != DEFAULT_SHARD:
+            # 本地向量索引目录不能与默认分片相同，否则迁移后清理源分片会删除目标分片的数据
+            values.setdefault("local_vector_dir", f"{settings.local_vector_dir}-{name}")
+        shards[name] = dataclasses.replace(shards.get(name, default), name=name, **values)
+    return shards
+
+
+def get_shard_config(name: str) -> ShardConfig:
+    """ 获取指定分片的配置
+    :param name: 分片名称
+    :return: 分片配置
+    """
+    config = get_shard_configs().get(name)
+    if config is None:
+        raise ValueError(f"未配置的存储分片: {name}")
+    return config
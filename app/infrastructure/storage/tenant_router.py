@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 21:30
+@Author : YangFei
+@File   : tenant_router.py
+@Desc   : 租户路由：确定租户数据所在的存储分片，映射关系缓存在进程内存和 Redis 中，支持在线迁移租户
+
+查找顺序为进程内缓存 -> Redis -> 目录库(默认分片的 tenant_shard 表)，都没有时按权重的最高随机权重哈希
+(rendezvous hashing)为新租户分配分片并写入目录库，之后增加分片不会改变已有租户的位置。
+只配置了默认分片时直接返回默认分片，不访问 Redis 和目录库。
+
+迁移租户时映射状态变为 moving，此时读请求仍然访问源分片，写请求抛出 TenantMovingError。
+进程内缓存有有效期，迁移流程在每次改变状态后等待两倍有效期，确保所有进程都已看到新状态再继续。
+Redis 中的缓存只在迁移流程中覆盖写入，查找时使用 NX 写入，避免用旧状态覆盖新状态。
+迁移流程中覆盖 Redis 失败时目录库回退到原状态并抛出异常，否则其它进程在 Redis 缓存过期前一直读到旧状态，
+迁移后写入源分片的数据会在清理时被删除。
+"""
+import json
+import math
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.infrastructure.models import TenantShard
+from core.system_config import get_settings, Settings
+
+from .redis import get_redis
+from .minio import MinIO, get_minio
+from .postgres import Postgres, get_postgres
+from .shards import DEFAULT_SHARD, ShardConfig, get_shard_config, get_shard_configs
+
+logger = logging.getLogger(__name__)
+
+# Redis 中租户所在分片的键前缀
+ROUTE_KEY_PREFIX = "storage:tenant_shard:"
+
+
+class ShardStatus:
+    """ 租户的分片状态 """
+    ACTIVE = "active"  # 正常读写
+    MOVING = "moving"  # 迁移中，只读
+
+
+class TenantMovingError(RuntimeError):
+    """ 租户正在迁移到其它分片，暂时不能写入 """
+
+
+def route_key(tenant_id: str) -> str:
+    """ 获取租户所在分片在 Redis 中的键 """
+    return f"{ROUTE_KEY_PREFIX}{tenant_id}"
+
+
+@dataclass(frozen=True, slots=True)
+class ShardRoute:
+    """ 租户的路由结果 """
+    tenant_id: str
+    shard: str  # 数据所在的分片
+    status: str = ShardStatus.ACTIVE
+    target_shard: str = ""  # 迁移中的目标分片
+    version: int = 0  # 映射版本号，0 表示未写入目录库(只有默认分片时)
+
+    @property
+    def config(self) -> ShardConfig:
+        """ 分片的连接配置 """
+        return get_shard_config(self.shard)
+
+    @property
+    def postgres(self) -> Postgres:
+        """ 分片的 Postgres 实例 """
+        return get_postgres(self.shard)
+
+    @property
+    def minio(self) -> MinIO:
+        """ 分片的 MinIO 客户端实例 """
+        return get_minio(self.shard)
+
+    @property
+    def bucket_name(self) -> str:
+        """ 分片的存储桶 """
+        return self.config.minio_bucket_name
+
+    @property
+    def vector_store(self):
+        """ 分片的向量存储，按需导入，使用本地索引时不需要安装 Weaviate 客户端 """
+        from app.infrastructure.vector import get_vector_store
+        return get_vector_store(self.shard)
+
+    @property
+    def writable(self) -> bool:
+        """ 是否可以写入 """
+        return self.status == ShardStatus.ACTIVE
+
+    def dumps(self) -> str:
+        """ 序列化后写入 Redis """
+        return json.dumps([self.shard, self.status, self.target_shard, self.version])
+
+    @classmethod
+    def loads(cls, tenant_id: str, value: str) -> "ShardRoute":
+        """ 从 Redis 中的值恢复 """
+        shard, status, target_shard, version = json.loads(value)
+        return cls(tenant_id, shard, status, target_shard, version)
+
+
+def rendezvous_shard(tenant_id: str, shards: list[ShardConfig]) -> str:
+    """ 带权重的最高随机权重哈希，为租户选择分片，增删分片时只有涉及的分片上的租户会改变选择 """
+    best_name, best_score = DEFAULT_SHARD, -math.inf
+    for shard in shards:
+        if shard.weight <= 0:
+            continue
+        digest = hashlib.sha256(f"{tenant_id}:{shard.name}".encode("utf-8")).digest()
+        # 映射到 (0, 1) 区间的均匀分布
+        value = (int.from_bytes(digest[:8], "big") + 1) / (2 ** 64 + 2)
+        score = -shard.weight / math.log(value)
+        if score > best_score:
+            best_name, best_score = shard.name, score
+    return best_name
+
+
+class TenantRouter:
+    """ 租户路由 """
+
+    def __init__(self):
+        """ 构造函数，读取分片配置 """
+        self._settings: Settings = get_settings()
+        self._shards = get_shard_configs()
+        self._ttl = self._settings.storage_shard_cache_ttl
+        self._capacity = self._settings.storage_shard_cache_size
+        # 租户ID -> (过期时间, 路由)
+        self._cache: OrderedDict[str, tuple[float, ShardRoute]] = OrderedDict()
+        # 正在查找的租户，同一租户的并发查找只访问一次 Redis 和目录库
+        self._pending: dict[str, asyncio.Future] = {}
+
+    @property
+    def sharded(self) -> bool:
+        """ 是否配置了多个分片 """
+        return len(self._shards) > 1
+
+    @property
+    def grace_period(self) -> float:
+        """ 改变映射状态后需要等待的时间，超过该时间后所有进程的缓存都已过期，
+        查找与状态变化并发时写入缓存的时间可能略晚于状态变化，因此取两倍有效期 """
+        return self._ttl * 2
+
+    async def init(self) -> None:
+        """ 初始化默认分片以外的所有分片的 Postgres 和 MinIO 连接，默认分片由应用启动流程初始化 """
+        others = [name for name in self._shards if name != DEFAULT_SHARD]
+        await asyncio.gather(*(get_postgres(name).init() for name in others))
+        await asyncio.gather(*(get_minio(name).init() for name in others))
+        logger.info("租户路由初始化成功, 分片: %s", ", ".join(self._shards))
+
+    async def shutdown(self) -> None:
+        """ 关闭默认分片以外的所有分片的连接 """
+        for name in self._shards:
+            if name != DEFAULT_SHARD:
+                await get_postgres(name).shutdown()
+                await get_minio(name).shutdown()
+        self._cache.clear()
+
+        get_tenant_router.cache_clear()
+        logger.info("租户路由已关闭")
+
+    async def resolve(self, tenant_id: str) -> ShardRoute:
+        """ 获取租户所在的分片，用于读取
+        :param tenant_id: 租户ID
+        :return: 路由结果
+        """
+        if not self.sharded:
+            return ShardRoute(tenant_id, DEFAULT_SHARD)
+
+        cached = self._cache.get(tenant_id)
+        if cached is not None and cached[0] > time.monotonic():
+            self._cache.move_to_end(tenant_id)
+            return cached[1]
+
+        pending = self._pending.get(tenant_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tenant_id] = future
+        try:
+            route = await self._lookup(tenant_id)
+            self._remember(route)
+            future.set_result(route)
+            return route
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其它等待者时避免 "Future exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(tenant_id, None)
+
+    async def resolve_for_write(self, tenant_id: str) -> ShardRoute:
+        """ 获取租户所在的分片，用于写入，租户正在迁移时抛出 TenantMovingError """
+        route = await self.resolve(tenant_id)
+        if not route.writable:
+            raise TenantMovingError(f"租户 {tenant_id} 正在从分片 {route.shard} 迁移到 {route.target_shard}，暂时不能写入")
+        return route
+
+    def invalidate(self, tenant_id: Optional[str] = None) -> None:
+        """ 清除进程内缓存，tenant_id 为空时清除全部 """
+        if tenant_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(tenant_id, None)
+
+    async def begin_move(self, tenant_id: str, target_shard: str) -> ShardRoute:
+        """ 开始迁移，租户变为只读
+        :param tenant_id: 租户ID
+        :param target_shard: 目标分片
+        :return: 迁移中的路由
+        """
+        get_shard_config(target_shard)
+        current = await self._load_catalog(tenant_id) or await self._assign(tenant_id)
+        if current.status != ShardStatus.ACTIVE:
+            raise TenantMovingError(f"租户 {tenant_id} 已经在迁移中，目标分片: {current.target_shard}")
+        if current.shard == target_shard:
+            raise ValueError(f"租户 {tenant_id} 已经在分片 {target_shard} 中")
+        return await self._transition(
+            current,
+            ShardRoute(tenant_id, current.shard, ShardStatus.MOVING, target_shard, current.version + 1),
+        )
+
+    async def complete_move(self, route: ShardRoute) -> ShardRoute:
+        """ 数据复制完成，租户切换到目标分片并恢复读写 """
+        return await self._transition(
+            route,
+            ShardRoute(route.tenant_id, route.target_shard, ShardStatus.ACTIVE, "", route.version + 1),
+        )
+
+    async def abort_move(self, route: ShardRoute) -> ShardRoute:
+        """ 放弃迁移，租户留在源分片并恢复读写 """
+        return await self._transition(
+            route,
+            ShardRoute(route.tenant_id, route.shard, ShardStatus.ACTIVE, "", route.version + 1),
+        )
+
+    async def _transition(self, current: ShardRoute, new: ShardRoute) -> ShardRoute:
+        """ 以版本号做乐观并发控制更新目录库，并覆盖 Redis 中的缓存。
+        覆盖 Redis 失败时目录库回退到原状态并抛出异常，Redis 和目录库保持一致 """
+        if not await self._update_catalog(current, new):
+            raise RuntimeError(f"租户 {current.tenant_id} 的分片映射已被其它进程修改，请重试")
+
+        try:
+            await get_redis().client.set(route_key(new.tenant_id), new.dumps(), ex=self._settings.storage_shard_redis_ttl)
+        except Exception as e:
+            logger.error("更新 Redis 中的租户分片映射失败，目录库回退到: %s", current)
+            try:
+                await self._update_catalog(new, current)
+            except Exception as revert_error:
+                logger.error("回退租户 %s 的分片映射失败: %s", current.tenant_id, revert_error)
+            raise RuntimeError(f"更新 Redis 中的租户 {current.tenant_id} 的分片映射失败: {e}") from e
+        self._remember(new)
+        logger.info("租户 %s 的分片映射更新为: %s", new.tenant_id, new)
+        return new
+
+    @staticmethod
+    async def _update_catalog(current: ShardRoute, new: ShardRoute) -> bool:
+        """ 目录库中的映射仍为 current 的版本时更新为 new
+        :return: 是否更新成功
+        """
+        async with get_postgres().session_factory() as session:
+            result = await session.execute(
+                update(TenantShard)
+                .where(TenantShard.tenant_id == current.tenant_id, TenantShard.version == current.version)
+                .values(shard=new.shard, target_shard=new.target_shard, status=new.status, version=new.version)
+            )
+            await session.commit()
+        return result.rowcount == 1
+
+    async def _lookup(self, tenant_id: str) -> ShardRoute:
+        """ 依次查找 Redis 和目录库，都没有时分配分片 """
+        redis_client = None
+        try:
+            redis_client = get_redis().client
+            value = await redis_client.get(route_key(tenant_id))
+            if value:
+                return ShardRoute.loads(tenant_id, value)
+        except Exception as e:
+            logger.warning("从 Redis 读取租户分片映射失败: %s", e)
+
+        route = await self._load_catalog(tenant_id) or await self._assign(tenant_id)
+        if redis_client is not None:
+            try:
+                await redis_client.set(route_key(tenant_id), route.dumps(), ex=self._settings.storage_shard_redis_ttl, nx=True)
+            except Exception as e:
+                logger.warning("缓存租户分片映射到 Redis 失败: %s", e)
+        return route
+
+    @staticmethod
+    async def _load_catalog(tenant_id: str) -> Optional[ShardRoute]:
+        """ 从目录库读取租户的分片映射 """
+        async with get_postgres().session_factory() as session:
+            row = (await session.execute(select(TenantShard).where(TenantShard.tenant_id == tenant_id))).scalar_one_or_none()
+        if row is None:
+            return None
+        return ShardRoute(row.tenant_id, row.shard, row.status, row.target_shard, row.version)
+
+    async def _assign(self, tenant_id: str) -> ShardRoute:
+        """ 为新租户分配分片，多个进程同时分配时以先写入目录库的为准 """
+        shard = rendezvous_shard(tenant_id, list(self._shards.values()))
+        async with get_postgres().session_factory() as session:
+            await session.execute(
+                insert(TenantShard)
+                .values(tenant_id=tenant_id, shard=shard, status=ShardStatus.ACTIVE, version=1)
+                .on_conflict_do_nothing(index_elements=[TenantShard.tenant_id])
+            )
+            await session.commit()
+        route = await self._load_catalog(tenant_id)
+        logger.info("租户 %s 分配到分片 %s", tenant_id, route.shard)
+        return route
+
+    def _remember(self, route: ShardRoute) -> None:
+        """ 写入进程内缓存，超出容量时淘汰最久未使用的租户 """
+        self._cache[route.tenant_id] = (time.monotonic() + self._ttl, route)
+        self._cache.move_to_end(route.tenant_id)
+        while len(self._cache) > self._capacity:
+            self._cache.popitem(last=False)
+
+
+@lru_cache()
+def get_tenant_router() -> TenantRouter:
+    """ 获取租户路由实例，使用 lru_cache 缓存以确保单例模式 """
+    return TenantRouter()
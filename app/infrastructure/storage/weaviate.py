@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 10:12
+@Author : YangFei
+@File   : weaviate.py
+@Desc   : Weaviate 向量数据库客户端封装类，文档分块按租户隔离存储
+"""
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Optional
+
+from core.startup import import_on_first_use
+from core.system_config import get_settings, Settings
+from .shards import DEFAULT_SHARD, ShardConfig, get_shard_config
+
+if TYPE_CHECKING:
+    from weaviate import WeaviateClient
+    from weaviate.collections import Collection
+
+logger = logging.getLogger(__name__)
+
+
+class Weaviate:
+    """ Weaviate 客户端封装类 """
+
+    def __init__(self, shard: Optional[ShardConfig] = None):
+        """ 构造函数，完成 Weaviate 客户端的初始化
+        :param shard: 所属的存储分片，默认为默认分片
+        """
+        self._client: Optional["WeaviateClient"] = None
+        self._settings: Settings = get_settings()
+        self._shard = shard or get_shard_config(DEFAULT_SHARD)
+
+    async def init(self) -> None:
+        """ 初始化 Weaviate 连接，并确保文档分块集合存在 """
+        if self._client:
+            logger.warning("Weaviate 客户端已初始化，跳过重复初始化")
+            return
+
+        try:
+            # 客户端是同步的，连接和创建集合在线程中执行，避免阻塞事件循环和并发初始化的其它组件
+            await asyncio.to_thread(self._connect)
+            logger.info("Weaviate 客户端初始化成功, 分片: %s", self._shard.name)
+        except Exception as e:
+            logger.error("初始化 Weaviate 客户端失败: %s", e)
+            raise
+
+    def _connect(self) -> None:
+        """ 建立连接，并确保文档分块集合存在 """
+        # weaviate 客户端导入较慢，使用 Weaviate 作为向量存储时才导入
+        weaviate = import_on_first_use("weaviate")
+        from weaviate.classes.config import Configure, Property, DataType
+
+        # 创建 Weaviate 客户端实例(创建时会自动建立连接)
+        self._client = weaviate.connect_to_custom(
+            http_host=self._shard.weaviate_http_host,
+            http_port=self._shard.weaviate_http_port,
+            http_secure=self._shard.weaviate_http_secure,
+            grpc_host=self._shard.weaviate_grpc_host,
+            grpc_port=self._shard.weaviate_grpc_port,
+            grpc_secure=self._shard.weaviate_grpc_secure,
+        )
+
+        # 集合不存在时创建，开启多租户并自动创建租户，向量由嵌入服务在外部生成
+        name = self._shard.weaviate_collection_name
+        if not self._client.collections.exists(name):
+            self._client.collections.create(
+                name,
+                multi_tenancy_config=Configure.multi_tenancy(enabled=True, auto_tenant_creation=True),
+                vectorizer_config=Configure.Vectorizer.none(),
+                properties=[
+                    Property(name="document_id", data_type=DataType.TEXT),
+                    Property(name="content", data_type=DataType.TEXT),
+                    Property(name="keywords", data_type=DataType.TEXT_ARRAY),
+                    # 分块元数据中可以过滤的字段(见 vector/base.py 的 FILTERABLE_METADATA)，其它元数据字段由自动模式创建
+                    Property(name="category", data_type=DataType.TEXT),
+                    Property(name="page_number", data_type=DataType.INT),
+                    Property(name="filename", data_type=DataType.TEXT),
+                    Property(name="filetype", data_type=DataType.TEXT),
+                ],
+            )
+            logger.info("Weaviate 集合 %s 创建成功", name)
+
+    async def shutdown(self) -> None:
+        """ 关闭 Weaviate 连接 """
+        if self._client:
+            self._client.close()
+            self._client = None
+
+        # 清除缓存(避免重复使用已关闭的客户端)
+        _instances.pop(self._shard.name, None)
+        logger.info("Weaviate 客户端连接已关闭, 分片: %s", self._shard.name)
+
+    @property
+    def client(self) -> "WeaviateClient":
+        """ 获取 Weaviate 客户端实例, 只读属性 """
+        if not self._client:
+            raise RuntimeError("Weaviate 客户端未初始化，请先调用 init 方法")
+        return self._client
+
+    def collection(self, tenant_id: str) -> "Collection":
+        """ 获取指定租户下的文档分块集合
+        :param tenant_id: 租户 ID
+        :return: 绑定了租户的集合对象
+        """
+        return self.client.collections.get(self._shard.weaviate_collection_name).with_tenant(tenant_id)
+
+
+# 每个存储分片一个 Weaviate 客户端实例
+_instances: dict[str, Weaviate] = {}
+
+
+def get_weaviate(shard: Optional[str] = None) -> Weaviate:
+    """ 获取存储分片的 Weaviate 客户端实例，每个分片只创建一次
+    :param shard: 分片名称，默认为默认分片，租户数据应通过租户路由获取所在分片
+    """
+    name = shard or DEFAULT_SHARD
+    instance = _instances.get(name)
+    if instance is None:
+        instance = _instances.setdefault(name, Weaviate(get_shard_config(name)))
+    return instance
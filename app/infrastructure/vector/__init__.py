@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 09:05
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 向量存储，通过 vector_store_backend 配置选择 Weaviate 或本地嵌入式索引
+"""
+import asyncio
+from typing import Optional
+
+from .base import FILTERABLE_METADATA, MetadataFilter, VectorMetric, VectorRecord, SearchHit, VectorStore
+
+
+def get_vector_store(shard: Optional[str] = None) -> VectorStore:
+    """ 根据配置获取向量存储实例，实现模块按需导入，使用本地索引时不需要安装 Weaviate 客户端
+    :param shard: 存储分片名称，默认为默认分片，租户数据应通过租户路由获取所在分片
+    """
+    from core.system_config import get_settings
+
+    backend = get_settings().vector_store_backend
+    if backend == "local":
+        from .local_index import get_local_vector_index
+        return get_local_vector_index(shard)
+    if backend == "weaviate":
+        from .weaviate_store import WeaviateVectorStore
+        return WeaviateVectorStore(shard)
+    raise ValueError(f"不支持的向量存储后端: {backend}")
+
+
+def _backend_clients() -> list:
+    """ 所有存储分片的向量存储客户端: Weaviate 连接或本地索引 """
+    from core.system_config import get_settings
+    from app.infrastructure.storage.shards import get_shard_configs
+
+    backend = get_settings().vector_store_backend
+    if backend == "local":
+        from .local_index import get_local_vector_index as get_client
+    elif backend == "weaviate":
+        from app.infrastructure.storage.weaviate import get_weaviate as get_client
+    else:
+        raise ValueError(f"不支持的向量存储后端: {backend}")
+    return [get_client(name) for name in get_shard_configs()]
+
+
+async def init_vector_stores() -> None:
+    """ 并发初始化所有存储分片的向量存储，应用启动时调用 """
+    await asyncio.gather(*(client.init() for client in _backend_clients()))
+
+
+async def shutdown_vector_stores() -> None:
+    """ 关闭所有存储分片的向量存储 """
+    await asyncio.gather(*(client.shutdown() for client in _backend_clients()))
+
+
+__all__ = [
+    "FILTERABLE_METADATA",
+    "MetadataFilter",
+    "VectorMetric",
+    "VectorRecord",
+    "SearchHit",
+    "VectorStore",
+    "get_vector_store",
+    "init_vector_stores",
+    "shutdown_vector_stores",
+]
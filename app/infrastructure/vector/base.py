@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 09:10
+@Author : YangFei
+@File   : base.py
+@Desc   : 向量存储的通用接口，检索服务只依赖这里的定义，具体实现可以是 Weaviate 或本地嵌入式索引
+"""
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Protocol, Sequence
+
+# 元数据过滤条件，键为元数据字段名；值为列表、元组或集合时表示取值为其中之一，否则表示等于该值
+MetadataFilter = dict[str, Any]
+
+# 检索时可以过滤的元数据字段。写入时向量存储的元数据与 Postgres 分块表的 meta 列包含相同的字段，
+# 向量检索和关键词检索对这些字段的过滤结果一致；其它字段只有一侧能够判断，检索服务直接拒绝
+FILTERABLE_METADATA = ("document_id", "category", "page_number", "filename", "filetype")
+
+
+class VectorMetric:
+    """ 向量相似度的计算方式 """
+    COSINE = "cosine"  # 余弦相似度
+    DOT = "dot"  # 内积
+
+
+@dataclass(slots=True)
+class VectorRecord:
+    """ 写入向量存储的一条记录 """
+    id: uuid.UUID
+    vector: Sequence[float]
+    metadata: dict = field(default_factory=dict)  # 元数据，值需要能够序列化为 JSON
+
+
+@dataclass(slots=True)
+class SearchHit:
+    """ 一条检索结果，分数越大越相似 """
+    id: uuid.UUID
+    score: float
+    metadata: dict = field(default_factory=dict)
+
+
+class VectorStore(Protocol):
+    """ 向量存储接口，数据按租户隔离 """
+
+    async def upsert(self, tenant_id: str, records: Sequence[VectorRecord]) -> None:
+        """ 写入记录，ID 已存在时覆盖 """
+        ...
+
+    async def delete(self, tenant_id: str, ids: Sequence[uuid.UUID]) -> None:
+        """ 按 ID 删除记录 """
+        ...
+
+    async def search(
+            self,
+            tenant_id: str,
+            vector: Sequence[float],
+            top_k: int = 10,
+            filters: MetadataFilter | None = None,
+    ) -> list[SearchHit]:
+        """ 检索与查询向量最相似的 top_k 条记录，按分数从高到低排列 """
+        ...
+
+    async def search_batch(
+            self,
+            tenant_id: str,
+            vectors: Sequence[Sequence[float]],
+            top_k: int = 10,
+            filters: MetadataFilter | None = None,
+    ) -> list[list[SearchHit]]:
+        """ 批量检索，每个查询向量对应一组结果 """
+        ...
+
+    def scan(self, tenant_id: str, batch_size: int = 500) -> AsyncIterator[list[VectorRecord]]:
+        """ 按批次读取租户的全部记录(包含向量)，用于在存储分片之间迁移租户 """
+        ...
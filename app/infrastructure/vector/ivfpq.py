@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 11:20
+@Author : YangFei
+@File   : ivfpq.py
+@Desc   : 倒排文件加乘积量化(IVF-PQ)近似最近邻索引，只依赖 NumPy
+
+量化器(粗聚类中心和乘积量化码本)按租户分区训练一次，之后每个新段直接用它编码，索引随段增量构建。
+每个段在内存中只保留 uint8 编码，原始向量留在内存映射文件中，只在重排时读取少量候选行。
+
+检索时先按查询向量与粗聚类中心的内积选出 nprobe 个倒排列表，再用查表法估算列表内候选的内积:
+    q·x ≈ q·c + Σ_j LUT[j, code_j]，其中 LUT[j, k] = q_j·codebook[j, k]
+最后对估算分数最高的 top_k * rerank 个候选用原始向量计算精确分数。
+nprobe 和 rerank 越大召回率越高、延迟越大。
+"""
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 每个子空间的码本大小，编码为 uint8
+PQ_CODEBOOK_SIZE = 256
+# 聚类和编码时每次处理的行数，限制临时内存
+_BLOCK_ROWS = 65536
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """ 按欧氏距离为每个向量找到最近的中心，分块计算 """
+    centroid_norms = (centroids * centroids).sum(axis=1)
+    result = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+        # ||x - c||² = ||x||² - 2x·c + ||c||²，||x||² 与中心无关可以省略
+        distances = centroid_norms - 2.0 * (block @ centroids.T)
+        result[start:start + len(block)] = distances.argmin(axis=1)
+    return result
+
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """ Lloyd k-means，空簇重新随机选取一个样本作为中心 """
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assign = _nearest(vectors, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        non_empty = counts > 0
+        sums = np.add.reduceat(vectors[order], starts[non_empty], axis=0)
+        centroids[non_empty] = sums / counts[non_empty, None]
+        empty = np.flatnonzero(~non_empty)
+        if empty.size:
+            centroids[empty] = vectors[rng.choice(len(vectors), empty.size, replace=False)]
+    return centroids
+
+
+class IVFPQQuantizer:
+    """ IVF-PQ 量化器，包括粗聚类中心和每个子空间的码本 """
+
+    def __init__(self, centroids: np.ndarray, codebooks: np.ndarray):
+        """ 构造函数
+        :param centroids: 粗聚类中心，形状为 (nlist, dim)
+        :param codebooks: 残差的乘积量化码本，形状为 (m, 256, dim // m)
+        """
+        self.centroids = centroids.astype(np.float32, copy=False)
+        self.codebooks = codebooks.astype(np.float32, copy=False)
+        self.nlist = len(centroids)
+        self.m = codebooks.shape[0]
+        self.dsub = codebooks.shape[2]
+
+    @classmethod
+    def train(
+            cls,
+            samples: np.ndarray,
+            nlist: int,
+            m: int,
+            iterations: int = 10,
+            seed: int = 0,
+    ) -> "IVFPQQuantizer":
+        """ 在样本上训练量化器
+        :param samples: 训练样本，形状为 (n, dim)
+        :param nlist: 倒排列表数量，样本不足时自动减少(每个列表至少约 39 个样本)
+        :param m: 子空间数量，不能整除维度时取不大于 m 的最大约数
+        :param iterations: k-means 迭代次数
+        :param seed: 随机种子
+        :return: 训练好的量化器
+        """
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        dim = samples.shape[1]
+        m = max(divisor for divisor in range(1, min(m, dim) + 1) if dim % divisor == 0)
+        nlist = max(1, min(nlist, len(samples) // 39))
+        rng = np.random.default_rng(seed)
+
+        centroids = _kmeans(samples, nlist, iterations, rng)
+        residuals = samples - centroids[_nearest(samples, centroids)]
+        dsub = dim // m
+        codebooks = np.zeros((m, PQ_CODEBOOK_SIZE, dsub), dtype=np.float32)
+        for j in range(m):
+            trained = _kmeans(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), PQ_CODEBOOK_SIZE, iterations, rng)
+            codebooks[j, :len(trained)] = trained
+
+        logger.info("IVF-PQ 量化器训练完成: 样本数 %d, nlist=%d, m=%d", len(samples), nlist, m)
+        return cls(centroids, codebooks)
+
+    def save(self, path: Path) -> None:
+        """ 保存到文件，先写临时文件再替换 """
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp_path, centroids=self.centroids, codebooks=self.codebooks)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFPQQuantizer":
+        """ 从文件加载 """
+        with np.load(path) as data:
+            return cls(data["centroids"], data["codebooks"])
+
+    def encode(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """ 分块编码向量
+        :return: 每个向量所属的倒排列表 (n,) 以及残差的乘积量化编码 (n, m)
+        """
+        assign = _nearest(vectors, self.centroids)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, len(vectors))
+            residuals = np.asarray(vectors[start:stop], dtype=np.float32) - self.centroids[assign[start:stop]]
+            for j in range(self.m):
+                codes[start:stop, j] = _nearest(residuals[:, j * self.dsub:(j + 1) * self.dsub], self.codebooks[j])
+        return assign, codes
+
+    def probe(self, queries: np.ndarray, nprobe: int) -> tuple[np.ndarray, np.ndarray]:
+        """ 为每个查询向量选出内积最大的 nprobe 个倒排列表
+        :return: 列表编号 (b, nprobe) 以及查询向量与这些列表中心的内积 (b, nprobe)
+        """
+        nprobe = min(nprobe, self.nlist)
+        scores = queries @ self.centroids.T
+        lists = np.argpartition(-scores, nprobe - 1, axis=1)[:, :nprobe]
+        return lists, np.take_along_axis(scores, lists, axis=1)
+
+    def lookup_table(self, query: np.ndarray) -> np.ndarray:
+        """ 计算查询向量每个子空间与码本的内积，形状为 (m, 256) """
+        return np.einsum("jd,jkd->jk", query.reshape(self.m, self.dsub), self.codebooks)
+
+
+class IVFPQSegmentIndex:
+    """ 单个段的倒排列表，行按所属列表排序存放，offsets[l]:offsets[l + 1] 是列表 l 的范围 """
+
+    def __init__(self, rows: np.ndarray, codes: np.ndarray, offsets: np.ndarray):
+        """ 构造函数
+        :param rows: 按列表排序后的段内行号
+        :param codes: 与 rows 对应的乘积量化编码
+        :param offsets: 每个列表在 rows 中的起止位置，长度为 nlist + 1
+        """
+        self.rows = rows
+        self.codes = codes
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, quantizer: IVFPQQuantizer, vectors: np.ndarray) -> "IVFPQSegmentIndex":
+        """ 用已训练的量化器为段内所有向量构建倒排列表 """
+        assign, codes = quantizer.encode(vectors)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(quantizer.nlist + 1))
+        return cls(order.astype(np.int64), codes[order], offsets.astype(np.int64))
+
+    def save(self, path: Path) -> None:
+        """ 保存到文件 """
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp_path, rows=self.rows, codes=self.codes, offsets=self.offsets)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["IVFPQSegmentIndex"]:
+        """ 从文件加载，文件不存在时返回 None """
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(data["rows"], data["codes"], data["offsets"])
+
+    def search(
+            self,
+            quantizer: IVFPQQuantizer,
+            vectors: np.ndarray,
+            query: np.ndarray,
+            lists: np.ndarray,
+            coarse_scores: np.ndarray,
+            mask: np.ndarray,
+            top_k: int,
+            rerank: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """ 单个查询向量的近似检索
+        :param quantizer: 量化器
+        :param vectors: 段内原始向量，用于重排
+        :param query: 查询向量
+        :param lists: 需要扫描的倒排列表
+        :param coarse_scores: 查询向量与这些列表中心的内积
+        :param mask: 段内参与检索的行
+        :param top_k: 返回的结果数量
+        :param rerank: 用原始向量重排的候选数为 top_k 的倍数
+        :return: 精确分数和对应的段内行号，按分数从高到低排列
+        """
+        starts, stops = self.offsets[lists], self.offsets[lists + 1]
+        sizes = stops - starts
+        if not sizes.sum():
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        positions = np.concatenate([np.arange(start, stop) for start, stop in zip(starts, stops)])
+        rows = self.rows[positions]
+        keep = mask[rows]
+        if not keep.any():
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        table = quantizer.lookup_table(query)
+        approx = np.repeat(coarse_scores, sizes)[keep] + table[np.arange(quantizer.m), self.codes[positions[keep]]].sum(axis=1)
+        rows = rows[keep]
+
+        candidates = min(len(rows), top_k * max(rerank, 1))
+        if candidates < len(rows):
+            top = np.argpartition(-approx, candidates - 1)[:candidates]
+            rows = rows[top]
+        # 按行号顺序读取原始向量，减少内存映射文件的随机访问
+        rows = np.sort(rows)
+        exact = np.asarray(vectors[rows], dtype=np.float32) @ query
+        order = np.argsort(-exact)[:top_k]
+        return exact[order], rows[order]
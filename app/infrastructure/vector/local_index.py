@@ -0,0 +1,622 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 09:32
+@Author : YangFei
+@File   : local_index.py
+@Desc   : 基于内存映射文件的本地向量索引，不依赖外部服务，用于边缘和离线部署以及测试
+
+存储结构(每个租户一个目录):
+    manifest.json       当前有效的段列表、向量维度和数据类型，通过原子替换更新
+    seg-XXXXXXXX.npy    段内的向量矩阵，写入后只读，检索时以内存映射方式打开
+    seg-XXXXXXXX.jsonl  段内每一行向量对应的 ID 和元数据
+    seg-XXXXXXXX.del.npy 段内已删除行的标记
+    seg-XXXXXXXX.ivfpq.npz 段的 IVF-PQ 倒排列表(启用近似检索时)
+    quantizer.npz       IVF-PQ 量化器(启用近似检索时)
+
+写入只追加新段，覆盖和删除通过标记旧行实现；段数量或已删除行的比例超过阈值时，
+在后台线程中将所有段合并为一个段并丢弃已删除的行。默认对所有段做精确的分块矩阵乘法，
+用 argpartition 选出 top_k，元数据过滤在计算相似度之前完成。
+启用 IVF-PQ 后，分区行数达到阈值时在合并过程中训练量化器，此后每个新段写入时直接编码，
+有倒排列表的段走近似检索，其余段仍然精确检索。
+"""
+import os
+import json
+import uuid
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from urllib.parse import quote
+from typing import AsyncIterator, Optional, Sequence
+
+import numpy as np
+
+from core.system_config import get_settings
+from app.infrastructure.storage.shards import DEFAULT_SHARD, get_shard_config
+
+from .base import MetadataFilter, VectorMetric, VectorRecord, SearchHit
+from .ivfpq import IVFPQQuantizer, IVFPQSegmentIndex
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+QUANTIZER_NAME = "quantizer.npz"
+# 训练量化器时最多使用的样本数
+QUANTIZER_MAX_SAMPLES = 100_000
+# 已删除行超过该比例时触发合并
+COMPACT_DELETED_RATIO = 0.2
+
+
+class _Segment:
+    """ 索引段，向量和元数据写入后不再修改，只有删除标记会变化 """
+
+    def __init__(self, directory: Path, name: str):
+        """ 构造函数，以只读内存映射方式打开段文件
+        :param directory: 所在租户目录
+        :param name: 段名称
+        """
+        self.directory = directory
+        self.name = name
+        self.vectors: np.ndarray = np.load(directory / f"{name}.npy", mmap_mode="r")
+        self.ids: list[uuid.UUID] = []
+        self.metadata: list[dict] = []
+        with open(directory / f"{name}.jsonl", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                self.ids.append(uuid.UUID(row["id"]))
+                self.metadata.append(row["metadata"])
+        deleted_path = directory / f"{name}.del.npy"
+        self.deleted: np.ndarray = (
+            np.load(deleted_path) if deleted_path.exists() else np.zeros(len(self.ids), dtype=bool)
+        )
+        self.ann: Optional[IVFPQSegmentIndex] = IVFPQSegmentIndex.load(directory / f"{name}.ivfpq.npz")
+        # 元数据列缓存，过滤时按字段构建一次
+        self._columns: dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def create(cls, directory: Path, name: str, vectors: np.ndarray, ids: list[uuid.UUID], metadata: list[dict]) -> "_Segment":
+        """ 写入一个新段，先写数据文件再由调用方更新清单，未进入清单的段文件会在下次合并时被忽略 """
+        with open(directory / f"{name}.jsonl", "w", encoding="utf-8") as f:
+            for record_id, meta in zip(ids, metadata):
+                f.write(json.dumps({"id": str(record_id), "metadata": meta}, ensure_ascii=False))
+                f.write("\n")
+        array = np.lib.format.open_memmap(directory / f"{name}.npy", mode="w+", dtype=vectors.dtype, shape=vectors.shape)
+        array[:] = vectors
+        array.flush()
+        del array
+        return cls(directory, name)
+
+    @property
+    def alive(self) -> int:
+        """ 未删除的行数 """
+        return len(self.ids) - int(self.deleted.sum())
+
+    def mark_deleted(self, rows: list[int]) -> None:
+        """ 标记删除若干行并原子地持久化，先写临时文件再替换，进程中途退出时不会留下损坏的删除标记文件 """
+        self.deleted[rows] = True
+        path = self.directory / f"{self.name}.del.npy"
+        tmp_path = self.directory / f"{self.name}.del.npy.tmp"
+        # 传入文件对象，避免 np.save 给临时文件名追加 .npy 后缀
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.deleted)
+        os.replace(tmp_path, path)
+
+    def mask(self, filters: Optional[MetadataFilter]) -> np.ndarray:
+        """ 计算参与检索的行，排除已删除的行和不满足过滤条件的行 """
+        mask = ~self.deleted
+        for key, value in (filters or {}).items():
+            column = self._columns.get(key)
+            if column is None:
+                column = np.empty(len(self.metadata), dtype=object)
+                column[:] = [meta.get(key) for meta in self.metadata]
+                self._columns[key] = column
+            if isinstance(value, (list, tuple, set, frozenset)):
+                mask &= np.isin(column, list(value))
+            else:
+                mask &= column == value
+        return mask
+
+    def build_ann(self, quantizer: IVFPQQuantizer) -> None:
+        """ 用量化器为段构建倒排列表并持久化 """
+        ann = IVFPQSegmentIndex.build(quantizer, self.vectors)
+        ann.save(self.directory / f"{self.name}.ivfpq.npz")
+        self.ann = ann
+
+    def remove_files(self) -> None:
+        """ 删除段文件，已经打开的内存映射在 Linux 上仍然可以继续读取 """
+        for suffix in (".npy", ".jsonl", ".del.npy", ".del.npy.tmp", ".ivfpq.npz"):
+            try:
+                os.remove(self.directory / f"{self.name}{suffix}")
+            except FileNotFoundError:
+                pass
+
+
+class _Partition:
+    """ 单个租户的索引分区，所有方法都是同步的，在线程中调用 """
+
+    def __init__(self, directory: Path, metric: str, dtype: str, block_rows: int, ann: bool, ann_min_rows: int):
+        """ 构造函数，加载清单中的所有段
+        :param directory: 租户目录
+        :param metric: 相似度计算方式
+        :param dtype: 向量的存储类型
+        :param block_rows: 检索时每次参与矩阵乘法的行数，限制临时内存
+        :param ann: 是否启用 IVF-PQ 近似检索
+        :param ann_min_rows: 分区存活行数达到该值后训练量化器
+        """
+        self.directory = directory
+        self.metric = metric
+        self.dtype = np.dtype(dtype)
+        self.block_rows = block_rows
+        self.ann = ann
+        self.ann_min_rows = ann_min_rows
+        self.quantizer: Optional[IVFPQQuantizer] = None
+        self.dim: Optional[int] = None
+        self.segments: list[_Segment] = []
+        self.next_segment = 1
+        # ID 到所在段和行号的映射，用于覆盖和删除
+        self.locations: dict[uuid.UUID, tuple[_Segment, int]] = {}
+        # 写入、删除和合并替换段列表时持有，检索只在获取段列表快照时持有
+        self.lock = threading.Lock()
+        # 同一时间只允许一个合并任务
+        self.compact_lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """ 读取清单并打开所有段 """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.directory / MANIFEST_NAME
+        if not manifest_path.exists():
+            return
+
+        if self.ann and (self.directory / QUANTIZER_NAME).exists():
+            self.quantizer = IVFPQQuantizer.load(self.directory / QUANTIZER_NAME)
+
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        self.dim = manifest["dim"]
+        self.dtype = np.dtype(manifest["dtype"])
+        self.next_segment = manifest["next_segment"]
+        for name in manifest["segments"]:
+            segment = _Segment(self.directory, name)
+            self.segments.append(segment)
+            for row, record_id in enumerate(segment.ids):
+                if not segment.deleted[row]:
+                    self.locations[record_id] = (segment, row)
+
+    def _save_manifest(self) -> None:
+        """ 原子地写入清单 """
+        manifest = {
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "metric": self.metric,
+            "next_segment": self.next_segment,
+            "segments": [segment.name for segment in self.segments],
+        }
+        tmp_path = self.directory / f"{MANIFEST_NAME}.tmp"
+        tmp_path.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp_path, self.directory / MANIFEST_NAME)
+
+    def _new_segment_name(self) -> str:
+        """ 分配新的段名称，调用方需要持有 lock """
+        name = f"seg-{self.next_segment:08d}"
+        self.next_segment += 1
+        return name
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """ 检查维度，余弦相似度下先归一化，检索时只需要计算内积 """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError("向量必须是二维矩阵")
+        if self.dim is not None and vectors.shape[1] != self.dim:
+            raise ValueError(f"向量维度不匹配，索引维度为 {self.dim}，实际为 {vectors.shape[1]}")
+        if self.metric == VectorMetric.COSINE:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _tombstone(self, ids: Sequence[uuid.UUID]) -> int:
+        """ 标记删除已存在的记录，调用方需要持有 lock
+        :return: 实际删除的记录数
+        """
+        rows_by_segment: dict[str, tuple[_Segment, list[int]]] = {}
+        for record_id in ids:
+            location = self.locations.pop(record_id, None)
+            if location is not None:
+                segment, row = location
+                rows_by_segment.setdefault(segment.name, (segment, []))[1].append(row)
+        for segment, rows in rows_by_segment.values():
+            segment.mark_deleted(rows)
+        return sum(len(rows) for _, rows in rows_by_segment.values())
+
+    def upsert(self, records: Sequence[VectorRecord]) -> None:
+        """ 写入一个新段，ID 已存在时标记删除旧行 """
+        # 同一批次中重复的 ID 只保留最后一条
+        latest = {record.id: record for record in records}
+        if not latest:
+            return
+
+        vectors = self._prepare(np.array([record.vector for record in latest.values()], dtype=np.float32))
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            name = self._new_segment_name()
+
+        # 在锁外写入段文件和构建倒排列表，不阻塞检索
+        segment = _Segment.create(
+            self.directory,
+            name,
+            vectors.astype(self.dtype, copy=False),
+            list(latest.keys()),
+            [record.metadata for record in latest.values()],
+        )
+        if self.quantizer is not None:
+            segment.build_ann(self.quantizer)
+
+        with self.lock:
+            self._tombstone(list(latest.keys()))
+            self.segments.append(segment)
+            self._save_manifest()
+            for row, record_id in enumerate(segment.ids):
+                self.locations[record_id] = (segment, row)
+
+    def delete(self, ids: Sequence[uuid.UUID]) -> int:
+        """ 按 ID 删除记录 """
+        with self.lock:
+            return self._tombstone(ids)
+
+    def snapshot(self) -> list[tuple[uuid.UUID, _Segment, int]]:
+        """ 获取当前所有存活记录的位置，合并后旧段文件被删除，已打开的内存映射仍然可以读取 """
+        with self.lock:
+            return [(record_id, segment, row) for record_id, (segment, row) in self.locations.items()]
+
+    def search(
+            self,
+            queries: np.ndarray,
+            top_k: int,
+            filters: Optional[MetadataFilter],
+            nprobe: int,
+            rerank: int,
+    ) -> list[list[SearchHit]]:
+        """ 检索所有段，每个段得到 top_k 个候选后逐段合并
+        :param queries: 查询向量，形状为 (b, dim)
+        :param top_k: 返回的结果数量
+        :param filters: 元数据过滤条件
+        :param nprobe: 近似检索时扫描的倒排列表数量，0 表示全部精确检索
+        :param rerank: 近似检索时用原始向量重排的候选数为 top_k 的倍数
+        """
+        with self.lock:
+            segments = list(self.segments)
+            quantizer = self.quantizer
+        if self.dim is None or not segments or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        queries = self._prepare(queries)
+        batch = len(queries)
+        # 当前的 top_k 候选：分数、段序号和行号
+        best_scores = np.full((batch, top_k), -np.inf, dtype=np.float32)
+        best_segments = np.full((batch, top_k), -1, dtype=np.int64)
+        best_rows = np.full((batch, top_k), -1, dtype=np.int64)
+
+        # 所有段共用同一个量化器，粗聚类中心只需要计算一次
+        probe = quantizer.probe(queries, nprobe) if quantizer is not None and nprobe > 0 else None
+
+        for segment_index, segment in enumerate(segments):
+            mask = segment.mask(filters)
+            if not mask.any():
+                continue
+            if probe is not None and segment.ann is not None:
+                candidates = self._search_ann(segment, quantizer, queries, probe, mask, top_k, rerank)
+            else:
+                candidates = self._search_flat(segment, queries, mask, top_k)
+            for scores, rows in candidates:
+                best_scores, best_segments, best_rows = _merge_top_k(
+                    (best_scores, best_segments, best_rows),
+                    (scores, np.full(scores.shape, segment_index, dtype=np.int64), rows),
+                    top_k,
+                )
+
+        order = np.argsort(-best_scores, axis=1)
+        results: list[list[SearchHit]] = []
+        for query_index in range(batch):
+            hits = []
+            for position in order[query_index]:
+                score = best_scores[query_index, position]
+                if not np.isfinite(score):
+                    break
+                segment = segments[best_segments[query_index, position]]
+                row = int(best_rows[query_index, position])
+                hits.append(SearchHit(id=segment.ids[row], score=float(score), metadata=segment.metadata[row]))
+            results.append(hits)
+        return results
+
+    def _search_flat(self, segment: _Segment, queries: np.ndarray, mask: np.ndarray, top_k: int):
+        """ 精确检索一个段，按块产出 (分数, 行号)，过滤后剩余行较少时只读取这些行 """
+        alive = int(mask.sum())
+        if alive * 4 < len(segment):
+            rows = np.flatnonzero(mask)
+            for start in range(0, len(rows), self.block_rows):
+                block_rows = rows[start:start + self.block_rows]
+                scores = queries @ np.asarray(segment.vectors[block_rows], dtype=np.float32).T
+                yield scores, np.broadcast_to(block_rows, scores.shape)
+            return
+
+        for start in range(0, len(segment), self.block_rows):
+            stop = min(start + self.block_rows, len(segment))
+            block_mask = mask[start:stop]
+            if not block_mask.any():
+                continue
+            scores = queries @ np.asarray(segment.vectors[start:stop], dtype=np.float32).T
+            scores[:, ~block_mask] = -np.inf
+            yield scores, np.broadcast_to(np.arange(start, stop, dtype=np.int64), scores.shape)
+
+    @staticmethod
+    def _search_ann(
+            segment: _Segment,
+            quantizer: IVFPQQuantizer,
+            queries: np.ndarray,
+            probe: tuple[np.ndarray, np.ndarray],
+            mask: np.ndarray,
+            top_k: int,
+            rerank: int,
+    ):
+        """ 近似检索一个段，产出补齐到 top_k 列的 (分数, 行号) """
+        lists, coarse_scores = probe
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        rows = np.zeros((len(queries), top_k), dtype=np.int64)
+        for query_index, query in enumerate(queries):
+            exact, found = segment.ann.search(
+                quantizer, segment.vectors, query, lists[query_index], coarse_scores[query_index], mask, top_k, rerank
+            )
+            scores[query_index, :len(found)] = exact
+            rows[query_index, :len(found)] = found
+        yield scores, rows
+
+    def needs_compaction(self, max_segments: int) -> bool:
+        """ 段数量过多、已删除的行过多，或者行数达到阈值需要训练量化器时需要合并 """
+        with self.lock:
+            total = sum(len(segment) for segment in self.segments)
+            alive = sum(segment.alive for segment in self.segments)
+            if self.ann and self.quantizer is None and alive >= self.ann_min_rows:
+                return True
+            return len(self.segments) > max_segments or (total > 0 and 1 - alive / total > COMPACT_DELETED_RATIO)
+
+    def _train_quantizer(self, segment: _Segment, nlist: int, m: int) -> None:
+        """ 从段中抽样训练量化器并持久化 """
+        rows = np.flatnonzero(~segment.deleted)
+        if rows.size > QUANTIZER_MAX_SAMPLES:
+            rows = np.sort(np.random.default_rng(0).choice(rows, QUANTIZER_MAX_SAMPLES, replace=False))
+        quantizer = IVFPQQuantizer.train(np.asarray(segment.vectors[rows], dtype=np.float32), nlist, m)
+        quantizer.save(self.directory / QUANTIZER_NAME)
+        self.quantizer = quantizer
+
+    def compact(self, nlist: int, m: int) -> None:
+        """ 将当前所有段合并为一个段，合并期间允许继续写入和检索
+        :param nlist: 训练量化器时的倒排列表数量
+        :param m: 训练量化器时的子空间数量
+        """
+        with self.compact_lock:
+            with self.lock:
+                sources = list(self.segments)
+                name = self._new_segment_name()
+                deleted_snapshot = [segment.deleted.copy() for segment in sources]
+            train = self.ann and self.quantizer is None and sum(int((~deleted).sum()) for deleted in deleted_snapshot) >= self.ann_min_rows
+            if len(sources) <= 1 and not train and all(not deleted.any() for deleted in deleted_snapshot):
+                return
+
+            # 在锁外读取所有存活的行并写入新段，这一步耗时最长
+            origins: list[tuple[_Segment, int]] = []
+            vectors, ids, metadata = [], [], []
+            for segment, deleted in zip(sources, deleted_snapshot):
+                rows = np.flatnonzero(~deleted)
+                if rows.size == 0:
+                    continue
+                vectors.append(np.asarray(segment.vectors[rows]))
+                for row in rows.tolist():
+                    origins.append((segment, row))
+                    ids.append(segment.ids[row])
+                    metadata.append(segment.metadata[row])
+
+            merged: Optional[_Segment] = None
+            if ids:
+                merged = _Segment.create(self.directory, name, np.concatenate(vectors), ids, metadata)
+                if train:
+                    self._train_quantizer(merged, nlist, m)
+                if self.quantizer is not None:
+                    merged.build_ann(self.quantizer)
+
+            with self.lock:
+                # 合并期间被删除或被覆盖的行，在新段中同样标记删除
+                stale = [
+                    row for row, (segment, origin_row) in enumerate(origins)
+                    if segment.deleted[origin_row]
+                ]
+                if merged is not None:
+                    if stale:
+                        merged.mark_deleted(stale)
+                    for row, record_id in enumerate(merged.ids):
+                        if not merged.deleted[row]:
+                            self.locations[record_id] = (merged, row)
+
+                source_names = {segment.name for segment in sources}
+                remaining = [segment for segment in self.segments if segment.name not in source_names]
+                self.segments = ([merged] if merged is not None else []) + remaining
+                self._save_manifest()
+
+            for segment in sources:
+                segment.remove_files()
+            logger.info("本地向量索引 %s 合并完成: %d 个段合并为 1 个，存活 %d 行",
+                        self.directory.name, len(sources), len(ids) - len(stale))
+
+
+def _merge_top_k(best: tuple[np.ndarray, ...], new: tuple[np.ndarray, ...], top_k: int) -> tuple[np.ndarray, ...]:
+    """ 合并当前候选和新候选，按分数重新选出 top_k，每个元组依次是分数、段序号和行号 """
+    merged = [np.concatenate([old, added], axis=1) for old, added in zip(best, new)]
+    top = np.argpartition(-merged[0], top_k - 1, axis=1)[:, :top_k]
+    return tuple(np.take_along_axis(array, top, axis=1) for array in merged)
+
+
+def _read_records(locations: list[tuple[uuid.UUID, _Segment, int]]) -> list[VectorRecord]:
+    """ 读取一批记录的向量和元数据 """
+    return [
+        VectorRecord(id=record_id, vector=segment.vectors[row].astype(np.float32).tolist(), metadata=segment.metadata[row])
+        for record_id, segment, row in locations
+    ]
+
+
+class LocalVectorIndex:
+    """ 本地向量索引，按租户分区，实现 VectorStore 接口，计算在线程中执行，不阻塞事件循环 """
+
+    def __init__(
+            self,
+            root: Optional[str] = None,
+            metric: Optional[str] = None,
+            dtype: Optional[str] = None,
+            shard: Optional[str] = None,
+    ):
+        """ 构造函数
+        :param root: 索引根目录，默认取存储分片的配置
+        :param shard: 所属的存储分片，默认为默认分片
+        :param metric: 相似度计算方式，cosine 或 dot
+        :param dtype: 向量的存储类型，float32 或 float16，float16 占用一半的磁盘和内存
+        """
+        settings = get_settings()
+        self._shard = shard or DEFAULT_SHARD
+        self._root = Path(root or get_shard_config(self._shard).local_vector_dir)
+        self._metric = metric or settings.local_vector_metric
+        self._dtype = dtype or settings.local_vector_dtype
+        if self._metric not in (VectorMetric.COSINE, VectorMetric.DOT):
+            raise ValueError(f"不支持的相似度计算方式: {self._metric}")
+        if np.dtype(self._dtype) not in (np.float32, np.float16):
+            raise ValueError(f"不支持的向量存储类型: {self._dtype}")
+        self._block_rows = settings.local_vector_block_rows
+        self._max_segments = settings.local_vector_max_segments
+        if settings.local_vector_index_type not in ("flat", "ivfpq"):
+            raise ValueError(f"不支持的本地向量索引类型: {settings.local_vector_index_type}")
+        self._ann = settings.local_vector_index_type == "ivfpq"
+        self._ann_min_rows = settings.local_vector_ann_min_rows
+        self._nlist = settings.local_vector_nlist
+        self._pq_m = settings.local_vector_pq_m
+        self._nprobe = settings.local_vector_nprobe
+        self._rerank = settings.local_vector_rerank
+        self._partitions: dict[str, _Partition] = {}
+        self._partitions_lock = threading.Lock()
+        self._compactions: dict[str, asyncio.Task] = {}
+
+    async def init(self) -> None:
+        """ 创建索引根目录，租户分区在第一次访问时加载 """
+        await asyncio.to_thread(self._root.mkdir, parents=True, exist_ok=True)
+        logger.info("本地向量索引初始化成功: %s", self._root)
+
+    async def shutdown(self) -> None:
+        """ 等待后台合并任务完成 """
+        if self._compactions:
+            await asyncio.gather(*self._compactions.values(), return_exceptions=True)
+        self._partitions.clear()
+
+        if _instances.get(self._shard) is self:
+            _instances.pop(self._shard, None)
+        logger.info("本地向量索引已关闭: %s", self._root)
+
+    def _partition(self, tenant_id: str) -> _Partition:
+        """ 获取租户分区，不存在时加载或创建 """
+        partition = self._partitions.get(tenant_id)
+        if partition is None:
+            with self._partitions_lock:
+                partition = self._partitions.get(tenant_id)
+                if partition is None:
+                    directory = self._root / quote(tenant_id or "_default", safe="-_.")
+                    partition = _Partition(
+                        directory, self._metric, self._dtype, self._block_rows, self._ann, self._ann_min_rows
+                    )
+                    self._partitions[tenant_id] = partition
+        return partition
+
+    async def upsert(self, tenant_id: str, records: Sequence[VectorRecord]) -> None:
+        """ 写入记录，ID 已存在时覆盖 """
+        if not records:
+            return
+        partition = await asyncio.to_thread(self._partition, tenant_id)
+        await asyncio.to_thread(partition.upsert, records)
+        self._schedule_compaction(tenant_id, partition)
+
+    async def delete(self, tenant_id: str, ids: Sequence[uuid.UUID]) -> None:
+        """ 按 ID 删除记录 """
+        if not ids:
+            return
+        partition = await asyncio.to_thread(self._partition, tenant_id)
+        await asyncio.to_thread(partition.delete, ids)
+        self._schedule_compaction(tenant_id, partition)
+
+    async def search(
+            self,
+            tenant_id: str,
+            vector: Sequence[float],
+            top_k: int = 10,
+            filters: MetadataFilter | None = None,
+            nprobe: Optional[int] = None,
+    ) -> list[SearchHit]:
+        """ 检索与查询向量最相似的 top_k 条记录 """
+        return (await self.search_batch(tenant_id, [vector], top_k, filters, nprobe))[0]
+
+    async def search_batch(
+            self,
+            tenant_id: str,
+            vectors: Sequence[Sequence[float]],
+            top_k: int = 10,
+            filters: MetadataFilter | None = None,
+            nprobe: Optional[int] = None,
+    ) -> list[list[SearchHit]]:
+        """ 批量检索，多个查询向量合并为一次矩阵乘法
+        :param nprobe: 近似检索时扫描的倒排列表数量，默认取系统配置，0 表示强制精确检索
+        """
+        if len(vectors) == 0:
+            return []
+        partition = await asyncio.to_thread(self._partition, tenant_id)
+        queries = np.asarray(vectors, dtype=np.float32)
+        nprobe = self._nprobe if nprobe is None else nprobe
+        return await asyncio.to_thread(partition.search, queries, top_k, filters, nprobe, self._rerank)
+
+    async def scan(self, tenant_id: str, batch_size: int = 500) -> AsyncIterator[list[VectorRecord]]:
+        """ 按批次读取租户的全部存活记录，余弦相似度下读出的是归一化后的向量 """
+        partition = await asyncio.to_thread(self._partition, tenant_id)
+        locations = await asyncio.to_thread(partition.snapshot)
+        for start in range(0, len(locations), batch_size):
+            yield await asyncio.to_thread(_read_records, locations[start:start + batch_size])
+
+    async def compact(self, tenant_id: str) -> None:
+        """ 立即合并指定租户的所有段 """
+        partition = await asyncio.to_thread(self._partition, tenant_id)
+        await asyncio.to_thread(partition.compact, self._nlist, self._pq_m)
+
+    def _schedule_compaction(self, tenant_id: str, partition: _Partition) -> None:
+        """ 需要合并时在后台启动合并任务，同一租户同时只有一个合并任务 """
+        if tenant_id in self._compactions or not partition.needs_compaction(self._max_segments):
+            return
+
+        task = asyncio.create_task(asyncio.to_thread(partition.compact, self._nlist, self._pq_m))
+        self._compactions[tenant_id] = task
+
+        def _done(finished: asyncio.Task) -> None:
+            self._compactions.pop(tenant_id, None)
+            if not finished.cancelled() and finished.exception() is not None:
+                logger.error("本地向量索引合并失败, 租户: %s, 错误: %s", tenant_id, finished.exception())
+
+        task.add_done_callback(_done)
+
+
+# 每个存储分片一个本地向量索引实例
+_instances: dict[str, LocalVectorIndex] = {}
+
+
+def get_local_vector_index(shard: Optional[str] = None) -> LocalVectorIndex:
+    """ 获取存储分片的本地向量索引实例，每个分片只创建一次
+    :param shard: 分片名称，默认为默认分片
+    """
+    name = shard or DEFAULT_SHARD
+    instance = _instances.get(name)
+    if instance is None:
+        instance = _instances.setdefault(name, LocalVectorIndex(shard=name))
+    return instance
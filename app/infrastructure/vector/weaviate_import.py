@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 18:20
+@Author : YangFei
+@File   : weaviate_import.py
+@Desc   : 向多租户 Weaviate 批量导入向量，并发、限速，并在 Postgres 中记录检查点
+
+记录按租户切分为固定大小的批次(Weaviate 的一次批量写入只能属于一个租户)，最多 weaviate_import_concurrency 个批次同时在途，
+所有租户共用这些并发槽位。批次大小在批次之间根据服务端耗时调整：按最近批次的单条耗时估算达到目标耗时的批次大小，
+出现写入失败时减半。批次中只有写入失败的对象会被重试。
+
+检查点记录连续完成的记录数(position)：并发批次可能乱序完成，只有某个位置之前的批次全部完成后检查点才前进。
+重试后仍然失败的对象计入 failed 并跳过；整个批次请求失败(例如 Weaviate 不可用)时导入中止，
+检查点停在最后一个连续完成的位置，使用相同的任务ID重新导入时从该位置继续。记录来源必须每次按相同的顺序产出记录。
+"""
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterable, Callable, Iterable, Optional, Protocol, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.infrastructure.models import VectorImportCheckpoint
+from app.infrastructure.storage.postgres import get_postgres
+from app.infrastructure.storage.weaviate import get_weaviate
+from app.infrastructure.storage.tenant_router import get_tenant_router
+from core.system_config import get_settings
+
+from .base import VectorRecord
+from .weaviate_store import to_data_objects
+
+logger = logging.getLogger(__name__)
+
+# 重试退避时间的上限(秒)
+RETRY_BACKOFF_CAP = 10.0
+# 导入报告中保留的错误信息数量
+MAX_REPORTED_ERRORS = 20
+
+
+@dataclass(slots=True)
+class ImportCheckpoint:
+    """ 导入检查点 """
+    position: int = 0  # 已完成的记录数
+    imported: int = 0  # 写入成功的记录数
+    failed: int = 0  # 重试后仍然失败的记录数
+    status: str = "running"  # running/completed/failed
+    error: str = ""
+
+
+@dataclass(slots=True)
+class ImportReport:
+    """ 单个租户的导入结果 """
+    job_id: str
+    tenant_id: str
+    imported: int = 0  # 写入成功的记录数(包括之前运行中完成的)
+    failed: int = 0  # 重试后仍然失败的记录数
+    skipped: int = 0  # 按检查点跳过的记录数
+    batches: int = 0  # 本次运行发送的批次数
+    retries: int = 0  # 本次运行重试的次数
+    errors: list[str] = field(default_factory=list)  # 部分失败原因
+
+
+class CheckpointStore(Protocol):
+    """ 检查点存储接口 """
+
+    async def load(self, job_id: str, tenant_id: str) -> Optional[ImportCheckpoint]: ...
+
+    async def save(self, job_id: str, tenant_id: str, checkpoint: ImportCheckpoint) -> None: ...
+
+
+class PostgresCheckpointStore:
+    """ 检查点保存在 Postgres 的 vector_import_checkpoint 表中 """
+
+    async def load(self, job_id: str, tenant_id: str) -> Optional[ImportCheckpoint]:
+        """ 读取检查点，不存在时返回 None """
+        async with get_postgres().session_factory() as session:
+            row = await session.scalar(
+                select(VectorImportCheckpoint).where(
+                    VectorImportCheckpoint.job_id == job_id,
+                    VectorImportCheckpoint.tenant_id == tenant_id,
+                )
+            )
+        if row is None:
+            return None
+        return ImportCheckpoint(
+            position=row.position, imported=row.imported, failed=row.failed, status=row.status, error=row.error
+        )
+
+    async def save(self, job_id: str, tenant_id: str, checkpoint: ImportCheckpoint) -> None:
+        """ 写入检查点，已存在时覆盖 """
+        values = {
+            "position": checkpoint.position,
+            "imported": checkpoint.imported,
+            "failed": checkpoint.failed,
+            "status": checkpoint.status,
+            "error": checkpoint.error,
+        }
+        stmt = insert(VectorImportCheckpoint).values(job_id=job_id, tenant_id=tenant_id, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[VectorImportCheckpoint.job_id, VectorImportCheckpoint.tenant_id],
+            set_={**values, "updated_at": stmt.excluded.updated_at},
+        )
+        async with get_postgres().session_factory() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+
+class AdaptiveBatchSize:
+    """ 根据服务端耗时调整批次大小 """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_latency: float):
+        """ 构造函数
+        :param initial: 初始批次大小
+        :param minimum: 最小批次大小
+        :param maximum: 最大批次大小
+        :param target_latency: 单个批次的目标耗时(秒)
+        """
+        self._minimum = minimum
+        self._maximum = maximum
+        self._target = target_latency
+        self._size = float(min(max(initial, minimum), maximum))
+
+    @property
+    def size(self) -> int:
+        """ 下一个批次的大小 """
+        return int(self._size)
+
+    def observe(self, size: int, elapsed: float, failed: bool) -> None:
+        """ 记录一个批次的耗时
+        :param size: 批次中的对象数量
+        :param elapsed: 批次耗时(秒)
+        :param failed: 批次中是否有写入失败的对象
+        """
+        if failed:
+            # 并发批次会同时报告失败，只有按当前大小发出的批次才减半，避免连续减半过度收缩
+            if size >= self.size:
+                self._size = max(self._minimum, self._size / 2)
+            return
+        # 耗时大致与批次大小成正比，按单条耗时估算目标批次大小，再与当前值平滑
+        wanted = self._target / max(elapsed / max(size, 1), 1e-6)
+        self._size = min(self._maximum, max(self._minimum, 0.5 * self._size + 0.5 * wanted))
+
+
+@dataclass(slots=True)
+class _TenantImport:
+    """ 单个租户导入过程中的状态 """
+    report: ImportReport
+    checkpoint: ImportCheckpoint
+    # 已完成但前面还有未完成批次的批次，起始位置到(批次大小, 成功数, 失败数)的映射
+    finished: dict[int, tuple[int, int, int]] = field(default_factory=dict)
+    save_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class WeaviateBatchImporter:
+    """ Weaviate 批量导入器 """
+
+    def __init__(
+            self,
+            checkpoints: Optional[CheckpointStore] = None,
+            insert_many: Optional[Callable[[str, Sequence[VectorRecord]], dict[int, str]]] = None,
+            batch_size: Optional[int] = None,
+            concurrency: Optional[int] = None,
+            max_retries: Optional[int] = None,
+    ):
+        """ 构造函数
+        :param checkpoints: 检查点存储，默认保存在 Postgres
+        :param insert_many: 同步写入一个批次的函数，返回写入失败的对象下标到原因的映射，默认写入 Weaviate
+        :param batch_size: 初始批次大小，默认取系统配置
+        :param concurrency: 同时在途的批次数，默认取系统配置
+        :param max_retries: 失败对象的最大重试次数，默认取系统配置
+        """
+        settings = get_settings()
+        self._checkpoints = checkpoints or PostgresCheckpointStore()
+        self._insert_many = insert_many or self._insert_weaviate
+        self._sizer = AdaptiveBatchSize(
+            batch_size or settings.weaviate_import_batch_size,
+            settings.weaviate_import_min_batch_size,
+            settings.weaviate_import_max_batch_size,
+            settings.weaviate_import_target_latency_ms / 1000,
+        )
+        self._slots = asyncio.Semaphore(concurrency or settings.weaviate_import_concurrency)
+        self._max_retries = settings.weaviate_import_max_retries if max_retries is None else max_retries
+        self._backoff = settings.weaviate_import_retry_backoff
+        # 租户ID -> 所在的存储分片，导入开始时确定
+        self._shards: dict[str, str] = {}
+
+    def _insert_weaviate(self, tenant_id: str, records: Sequence[VectorRecord]) -> dict[int, str]:
+        """ 同步写入一个批次，ID 已存在时覆盖 """
+        result = get_weaviate(self._shards.get(tenant_id)).collection(tenant_id).data.insert_many(to_data_objects(records))
+        return {index: error.message for index, error in result.errors.items()}
+
+    async def import_tenants(
+            self,
+            job_id: str,
+            sources: dict[str, Iterable[VectorRecord] | AsyncIterable[VectorRecord]],
+    ) -> list[ImportReport]:
+        """ 并发导入多个租户，所有租户共用在途批次的并发槽位
+        :param job_id: 导入任务ID
+        :param sources: 租户ID到记录来源的映射
+        :return: 各租户的导入结果
+        """
+        return list(await asyncio.gather(*(
+            self.import_tenant(job_id, tenant_id, records) for tenant_id, records in sources.items()
+        )))
+
+    async def import_tenant(
+            self,
+            job_id: str,
+            tenant_id: str,
+            records: Iterable[VectorRecord] | AsyncIterable[VectorRecord],
+    ) -> ImportReport:
+        """ 导入一个租户的记录，存在检查点时跳过已完成的记录
+        :param job_id: 导入任务ID，中断后使用相同的任务ID从检查点继续
+        :param tenant_id: 租户ID
+        :param records: 记录来源，每次必须按相同的顺序产出记录
+        :return: 导入结果
+        """
+        # 租户迁移中时抛出 TenantMovingError，迁移完成后使用相同的任务ID继续
+        self._shards[tenant_id] = (await get_tenant_router().resolve_for_write(tenant_id)).shard
+        checkpoint = await self._checkpoints.load(job_id, tenant_id) or ImportCheckpoint()
+        report = ImportReport(job_id, tenant_id, imported=checkpoint.imported, failed=checkpoint.failed)
+        if checkpoint.status == "completed":
+            report.skipped = checkpoint.position
+            logger.info("导入任务 %s 租户 %s 已完成，跳过", job_id, tenant_id)
+            return report
+
+        state = _TenantImport(report, checkpoint)
+        checkpoint.status, checkpoint.error = "running", ""
+        tasks: set[asyncio.Task] = set()
+        offset = 0
+        batch: list[VectorRecord] = []
+        try:
+            async for record in _iterate(records):
+                if offset < checkpoint.position:
+                    offset += 1
+                    report.skipped += 1
+                    continue
+                batch.append(record)
+                offset += 1
+                if len(batch) >= self._sizer.size:
+                    await self._submit(state, tasks, offset - len(batch), batch)
+                    batch = []
+            if batch:
+                await self._submit(state, tasks, offset - len(batch), batch)
+            # 任一批次中止导入时立即抛出异常
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    task.result()
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            checkpoint.status, checkpoint.error = "failed", str(e) or type(e).__name__
+            await self._save(job_id, tenant_id, state)
+            logger.error("导入任务 %s 租户 %s 中止于第 %d 条记录: %s", job_id, tenant_id, checkpoint.position, e)
+            raise
+
+        checkpoint.status = "completed"
+        await self._save(job_id, tenant_id, state)
+        logger.info(
+            "导入任务 %s 租户 %s 完成: 成功 %d 条, 失败 %d 条, 跳过 %d 条",
+            job_id, tenant_id, report.imported, report.failed, report.skipped,
+        )
+        return report
+
+    async def _submit(self, state: _TenantImport, tasks: set[asyncio.Task], start: int, batch: list[VectorRecord]) -> None:
+        """ 等待空闲的并发槽位后发送批次；已经有批次中止导入时不再发送 """
+        for task in [task for task in tasks if task.done()]:
+            tasks.discard(task)
+            task.result()
+        await self._slots.acquire()
+        task = asyncio.create_task(self._run_batch(state, start, batch))
+        task.add_done_callback(lambda _: self._slots.release())
+        tasks.add(task)
+
+    async def _run_batch(self, state: _TenantImport, start: int, batch: list[VectorRecord]) -> None:
+        """ 写入一个批次，完成后推进检查点 """
+        report = state.report
+        report.batches += 1
+        imported, errors = await self._write_with_retry(report, batch)
+        for message in errors[:max(0, MAX_REPORTED_ERRORS - len(report.errors))]:
+            report.errors.append(message)
+
+        # 推进连续完成的位置
+        checkpoint = state.checkpoint
+        state.finished[start] = (len(batch), imported, len(batch) - imported)
+        while checkpoint.position in state.finished:
+            size, ok, failed = state.finished.pop(checkpoint.position)
+            checkpoint.position += size
+            checkpoint.imported += ok
+            checkpoint.failed += failed
+        report.imported, report.failed = checkpoint.imported, checkpoint.failed
+        await self._save(report.job_id, report.tenant_id, state)
+
+    async def _write_with_retry(self, report: ImportReport, batch: list[VectorRecord]) -> tuple[int, list[str]]:
+        """ 写入批次，只重试写入失败的对象；整个请求在重试后仍然失败时抛出异常
+        :return: 写入成功的数量，以及重试后仍然失败的对象的原因
+        """
+        pending = batch
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                failures = await asyncio.to_thread(self._insert_many, report.tenant_id, pending)
+            except Exception as e:
+                if attempt >= self._max_retries:
+                    raise
+                self._sizer.observe(len(pending), time.perf_counter() - start, True)
+                logger.warning("批量写入请求失败，第 %d 次重试: %s", attempt + 1, e)
+            else:
+                self._sizer.observe(len(pending), time.perf_counter() - start, bool(failures))
+                if not failures:
+                    return len(batch), []
+                if attempt >= self._max_retries:
+                    return len(batch) - len(failures), [f"{pending[index].id}: {message}" for index, message in failures.items()]
+                pending = [pending[index] for index in sorted(failures)]
+                logger.warning("批次中 %d 个对象写入失败，第 %d 次重试", len(pending), attempt + 1)
+
+            report.retries += 1
+            await asyncio.sleep(random.uniform(0, min(RETRY_BACKOFF_CAP, self._backoff * 2 ** attempt)))
+            attempt += 1
+
+    async def _save(self, job_id: str, tenant_id: str, state: _TenantImport) -> None:
+        """ 保存检查点，加锁保证并发完成的批次按顺序写入，检查点不会回退 """
+        async with state.save_lock:
+            checkpoint = state.checkpoint
+            await self._checkpoints.save(job_id, tenant_id, ImportCheckpoint(
+                position=checkpoint.position,
+                imported=checkpoint.imported,
+                failed=checkpoint.failed,
+                status=checkpoint.status,
+                error=checkpoint.error,
+            ))
+
+
+async def _iterate(records: Iterable[VectorRecord] | AsyncIterable[VectorRecord]):
+    """ 统一按异步方式遍历同步或异步的记录来源 """
+    if isinstance(records, AsyncIterable):
+        async for record in records:
+            yield record
+    else:
+        for record in records:
+            yield record
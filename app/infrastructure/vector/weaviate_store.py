@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 10:05
+@Author : YangFei
+@File   : weaviate_store.py
+@Desc   : 基于 Weaviate 的向量存储实现，元数据对应集合中的属性
+"""
+import uuid
+import asyncio
+from typing import AsyncIterator, Optional, Sequence
+
+from weaviate.classes.data import DataObject
+from weaviate.classes.query import Filter, MetadataQuery
+
+from app.infrastructure.storage.weaviate import get_weaviate
+
+from .base import MetadataFilter, VectorRecord, SearchHit
+
+
+class WeaviateVectorStore:
+    """ Weaviate 向量存储，Weaviate 客户端是同步的，调用在线程中执行 """
+
+    def __init__(self, shard: Optional[str] = None):
+        """ 构造函数
+        :param shard: 存储分片名称，默认为默认分片
+        """
+        self._shard = shard
+
+    async def upsert(self, tenant_id: str, records: Sequence[VectorRecord]) -> None:
+        """ 批量写入，ID 已存在时覆盖，存在写入失败的对象时抛出异常 """
+        if records:
+            await asyncio.to_thread(self._upsert, tenant_id, records)
+
+    def _upsert(self, tenant_id: str, records: Sequence[VectorRecord]) -> None:
+        """ 同步批量写入 """
+        result = get_weaviate(self._shard).collection(tenant_id).data.insert_many(to_data_objects(records))
+        if result.has_errors:
+            first_error: Optional[str] = next(iter(result.errors.values())).message
+            raise RuntimeError(f"写入向量数据库失败 {len(result.errors)} 条: {first_error}")
+
+    async def delete(self, tenant_id: str, ids: Sequence[uuid.UUID]) -> None:
+        """ 按 ID 批量删除 """
+        if ids:
+            await asyncio.to_thread(
+                lambda: get_weaviate(self._shard).collection(tenant_id).data.delete_many(
+                    where=Filter.by_id().contains_any(list(ids))
+                )
+            )
+
+    async def search(
+            self,
+            tenant_id: str,
+            vector: Sequence[float],
+            top_k: int = 10,
+            filters: MetadataFilter | None = None,
+    ) -> list[SearchHit]:
+        """ 向量检索，分数为 1 - 余弦距离 """
+        return await asyncio.to_thread(self._search, tenant_id, vector, top_k, filters)
+
+    async def search_batch(
+            self,
+            tenant_id: str,
+            vectors: Sequence[Sequence[float]],
+            top_k: int = 10,
+            filters: MetadataFilter | None = None,
+    ) -> list[list[SearchHit]]:
+        """ 批量检索，Weaviate 不支持一次请求多个查询向量，并发发送 """
+        return list(await asyncio.gather(*(self.search(tenant_id, vector, top_k, filters) for vector in vectors)))
+
+    def _search(self, tenant_id: str, vector: Sequence[float], top_k: int, filters: MetadataFilter | None) -> list[SearchHit]:
+        """ 同步向量检索 """
+        response = get_weaviate(self._shard).collection(tenant_id).query.near_vector(
+            near_vector=list(vector),
+            limit=top_k,
+            filters=_to_weaviate_filter(filters),
+            return_metadata=MetadataQuery(distance=True),
+        )
+        return [
+            SearchHit(id=obj.uuid, score=1.0 - (obj.metadata.distance or 0.0), metadata=dict(obj.properties))
+            for obj in response.objects
+        ]
+
+    async def scan(self, tenant_id: str, batch_size: int = 500) -> AsyncIterator[list[VectorRecord]]:
+        """ 按对象 ID 翻页读取租户的全部对象(包含向量) """
+        after: Optional[uuid.UUID] = None
+        while True:
+            records = await asyncio.to_thread(self._fetch_page, tenant_id, after, batch_size)
+            if not records:
+                return
+            yield records
+            after = records[-1].id
+
+    def _fetch_page(self, tenant_id: str, after: Optional[uuid.UUID], limit: int) -> list[VectorRecord]:
+        """ 同步读取 after 之后的一页对象 """
+        response = get_weaviate(self._shard).collection(tenant_id).query.fetch_objects(
+            limit=limit,
+            after=after,
+            include_vector=True,
+        )
+        return [
+            VectorRecord(id=obj.uuid, vector=obj.vector["default"], metadata=dict(obj.properties))
+            for obj in response.objects
+        ]
+
+
+def to_data_objects(records: Sequence[VectorRecord]) -> list[DataObject]:
+    """ 将向量记录转换为 Weaviate 的数据对象，元数据作为对象属性 """
+    return [
+        DataObject(uuid=record.id, vector=list(record.vector), properties=record.metadata)
+        for record in records
+    ]
+
+
+def _to_weaviate_filter(filters: MetadataFilter | None):
+    """ 将元数据过滤条件转换为 Weaviate 的过滤器 """
+    if not filters:
+        return None
+
+    conditions = []
+    for key, value in filters.items():
+        if isinstance(value, (list, tuple, set, frozenset)):
+            conditions.append(Filter.by_property(key).contains_any(list(value)))
+        else:
+            conditions.append(Filter.by_property(key).equal(value))
+    return conditions[0] if len(conditions) == 1 else Filter.all_of(conditions)
@@ -1,5 +1,7 @@
 from .routes import router
+from .metrics_routes import metrics_router
 
 __all__ = [
     "router",
+    "metrics_router",
 ]
@@ -0,0 +1,58 @@
+import os
+import hmac
+import asyncio
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import PlainTextResponse
+
+from app.application.errors import ForbiddenException, NotFoundException, TooManyRequestsException, ValidationException
+from core.profiler import ProfilerBusyError, render_collapsed, sample_stacks
+from core.system_config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+async def verify_admin_token(x_admin_token: str = Header("", description="管理接口令牌，与配置项 admin_token 相同")):
+    """ 校验管理接口令牌，未配置令牌时管理接口不可用 """
+    token = get_settings().admin_token
+    if not token:
+        raise NotFoundException("管理接口未启用")
+    # 按固定时间比较，避免通过响应时间猜测令牌
+    if not hmac.compare_digest(x_admin_token.encode("utf-8"), token.encode("utf-8")):
+        raise ForbiddenException("管理接口令牌无效")
+
+
+admin_router = APIRouter(prefix="/admin", tags=["管理模块"], dependencies=[Depends(verify_admin_token)])
+
+
+@admin_router.get(
+    "/profile",
+    response_class=PlainTextResponse,
+    summary="在线性能分析",
+    description="在处理该请求的工作进程中采样所有线程的调用栈，返回折叠栈格式(flamegraph.pl、speedscope 可以直接读取)。"
+                "多进程部署时只分析处理该请求的进程，进程 ID 见响应头 X-Profile-Pid。同一进程同时只允许一个分析任务。",
+)
+async def profile(
+        seconds: float = Query(10.0, gt=0, description="采样时长(秒)，不超过配置项 profiler_max_seconds"),
+        interval_ms: Optional[float] = Query(None, ge=1, le=1000, description="采样间隔(毫秒)，默认取配置项 profiler_interval_ms"),
+        idle: bool = Query(False, description="是否包括空闲线程(等待事件、等待任务)的调用栈"),
+        limit: Optional[int] = Query(None, ge=1, description="只返回次数最多的调用栈数量"),
+):
+    """ 性能分析接口，采样在线程中进行，不阻塞事件循环，采样期间该进程照常处理其它请求 """
+    settings = get_settings()
+    if seconds > settings.profiler_max_seconds:
+        raise ValidationException(f"采样时长不能超过 {settings.profiler_max_seconds} 秒")
+    interval = (interval_ms or settings.profiler_interval_ms) / 1000
+
+    logger.warning("开始性能分析: 进程 %d，%.1f 秒，采样间隔 %.1fms", os.getpid(), seconds, interval * 1000)
+    try:
+        counts, rounds = await asyncio.to_thread(sample_stacks, seconds, interval, idle)
+    except ProfilerBusyError as e:
+        raise TooManyRequestsException(str(e))
+    logger.warning("性能分析完成: 进程 %d，采样 %d 轮，%d 个调用栈", os.getpid(), rounds, len(counts))
+
+    return PlainTextResponse(
+        render_collapsed(counts, limit),
+        headers={"X-Profile-Pid": str(os.getpid()), "X-Profile-Rounds": str(rounds)},
+    )
@@ -0,0 +1,23 @@
+import uuid
+import logging
+from fastapi import APIRouter, Query
+
+from app.interfaces.schemas import ChunkExportItem
+from app.interfaces.responses import NDJSONResponse
+from app.application.services.documents import open_chunk_export
+
+logger = logging.getLogger(__name__)
+document_router = APIRouter(prefix="/documents", tags=["文档模块"])
+
+
+@document_router.get(
+    "/{document_id}/chunks/export",
+    response_class=NDJSONResponse,
+    summary="导出文档分块",
+    description="以 NDJSON 格式流式导出文档的所有分块，每行是一个 code/msg/data 结构，data 为一个分块。",
+    responses={200: {"content": {"application/x-ndjson": {"schema": ChunkExportItem.model_json_schema()}}}},
+)
+async def export_chunks(document_id: uuid.UUID, tenant_id: str = Query(..., min_length=1, max_length=255, description="租户ID")):
+    """ 导出文档分块接口，分块边读取边发送，大文档不会占用大量内存 """
+    chunks = await open_chunk_export(tenant_id, document_id)
+    return NDJSONResponse(chunks)
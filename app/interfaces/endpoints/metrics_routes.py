@@ -0,0 +1,17 @@
+import asyncio
+import logging
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from core.metrics import CONTENT_TYPE, get_metrics_registry
+
+logger = logging.getLogger(__name__)
+metrics_router = APIRouter(tags=["状态模块"])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """ Prometheus 指标接口，多进程模式下需要读写指标文件，放到线程中执行 """
+    registry = get_metrics_registry()
+    content = await asyncio.to_thread(registry.render) if registry.multiprocess else registry.render()
+    return Response(content, media_type=CONTENT_TYPE)
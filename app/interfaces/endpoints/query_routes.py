@@ -0,0 +1,29 @@
+import logging
+from fastapi import APIRouter
+
+from app.interfaces.schemas import QueryRequest
+from app.interfaces.responses import EventSourceResponse
+from app.application.services.answer import get_answer_service
+from app.application.services.retrieval import RetrievalQuery
+
+logger = logging.getLogger(__name__)
+query_router = APIRouter(prefix="/query", tags=["问答模块"])
+
+
+@query_router.post(
+    "/stream",
+    response_class=EventSourceResponse,
+    summary="流式问答",
+    description=(
+        "以 Server-Sent Events 流式返回问答结果。事件依次为: retrieval(检索结果，data 结构同混合检索接口)、"
+        "token(回答的增量文本，data 为 {\"text\": ...})、done(结束原因和各阶段耗时)；"
+        "出现错误时发送 error 事件，data 为 code/msg/data 结构。空闲时发送以冒号开头的心跳注释行。"
+    ),
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_query(request: QueryRequest):
+    """ 流式问答接口，检索完成后立即返回检索结果，回答边生成边发送，客户端断开时取消检索和生成 """
+    events = get_answer_service().stream(
+        RetrievalQuery(tenant_id=request.tenant_id, text=request.query, top_k=request.top_k, filters=request.filters)
+    )
+    return EventSourceResponse(events)
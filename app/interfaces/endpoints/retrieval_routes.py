@@ -0,0 +1,23 @@
+import logging
+from fastapi import APIRouter
+
+from app.interfaces.schemas import Response, SearchRequest, SearchResult
+from app.interfaces.responses import success_response
+from app.application.services.retrieval import RetrievalQuery, get_hybrid_retrieval_service
+
+logger = logging.getLogger(__name__)
+retrieval_router = APIRouter(prefix="/retrieval", tags=["检索模块"])
+
+
+@retrieval_router.post(
+    "/search",
+    response_model=Response[SearchResult],
+    summary="混合检索",
+    description="同时进行向量检索和关键词检索，融合后返回最相关的分块。",
+)
+async def search(request: SearchRequest):
+    """ 混合检索接口，检索结果由服务层生成，结构已经确定，直接编码返回，不再按 response_model 校验 """
+    result = await get_hybrid_retrieval_service().retrieve(
+        RetrievalQuery(tenant_id=request.tenant_id, text=request.query, top_k=request.top_k, filters=request.filters)
+    )
+    return success_response(result)
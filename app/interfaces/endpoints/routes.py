@@ -1,5 +1,9 @@
 from fastapi import APIRouter
 from .status_routes import status_router
+from .query_routes import query_router
+from .retrieval_routes import retrieval_router
+from .document_routes import document_router
+from .admin_routes import admin_router
 
 
 def create_routes() -> APIRouter:
@@ -9,6 +13,13 @@ def create_routes() -> APIRouter:
 
     # 包含状态模块路由
     main_router.include_router(status_router)
+    # 包含问答模块路由
+    main_router.include_router(query_router)
+    # 包含检索模块和文档模块路由
+    main_router.include_router(retrieval_router)
+    main_router.include_router(document_router)
+    # 包含管理模块路由(需要管理接口令牌)
+    main_router.include_router(admin_router)
 
     # 返回主路由器
     return main_router
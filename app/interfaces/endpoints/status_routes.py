@@ -1,17 +1,38 @@
+import time
 import logging
 from fastapi import APIRouter
 
-from app.interfaces.schemas import Response
+from app.interfaces.schemas import Response, HealthStatus
+from app.interfaces.responses import FastJSONResponse, envelope, success_response
+from app.application.services.health import get_health_service
 
 logger = logging.getLogger(__name__)
 status_router = APIRouter(prefix="/status", tags=["状态模块"])
 
 
-@status_router.get("/", response_model=Response, summary="系统健康检查", description="检查系统是否运行正常。")
+@status_router.get(
+    "/",
+    response_model=Response[HealthStatus],
+    summary="系统健康检查",
+    description="并发探测 Postgres、Redis、MinIO 和分词模型，返回各依赖的状态和耗时。"
+                "结果会缓存几秒，关键依赖异常时返回 503，可以作为负载均衡器的就绪探测。",
+)
 async def health_check():
     """ 健康检查接口，返回系统各服务的运行状态 """
-    logger.debug("执行健康检查")
+    report = await get_health_service().check()
+    data = {
+        "status": report.status,
+        "checked_at": report.checked_at,
+        "age_ms": round(max(time.time() - report.checked_at, 0) * 1000, 2),
+        "duration_ms": report.duration_ms,
+        "dependencies": report.dependencies,
+    }
+    if not report.healthy:
+        return FastJSONResponse(envelope(data, msg="服务依赖异常", code=503), status_code=503)
+    return success_response(data)
 
-    # TODO: 实现具体的健康检查逻辑
 
-    return Response.success()
+@status_router.get("/live", response_model=Response, summary="存活检查", description="只确认进程可以处理请求，不访问任何依赖。")
+async def liveness():
+    """ 存活检查接口，用于容器的存活探测，依赖异常时不应重启进程 """
+    return success_response()
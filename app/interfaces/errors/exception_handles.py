@@ -1,9 +1,8 @@
 import logging
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException
 
-from app.interfaces.schemas import Response
+from app.interfaces.responses import FastJSONResponse, envelope
 from app.application.errors import AppException
 
 logger = logging.getLogger(__name__)
@@ -13,46 +12,46 @@ def register_exception_handlers(app: FastAPI):
     """ 注册全局异常处理器 """
 
     @app.exception_handler(AppException)
-    async def app_exception_handler(req: Request, e: AppException) -> JSONResponse:
+    async def app_exception_handler(req: Request, e: AppException) -> FastJSONResponse:
         """ 处理应用程序异常，返回统一的错误响应 """
         # 记录异常日志
-        logger.error(f"捕获到应用程序异常: {e.msg}")
+        logger.error("捕获到应用程序异常: %s", e.msg)
 
         # 组装错误响应内容
-        error_content = Response(code=e.status_code, msg=e.msg).model_dump()
+        error_content = envelope(msg=e.msg, code=e.status_code)
 
         # 返回 JSON 响应
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=e.status_code,
             content=error_content,
         )
 
     @app.exception_handler(HTTPException)
-    async def http_exception_handler(req: Request, e: HTTPException) -> JSONResponse:
+    async def http_exception_handler(req: Request, e: HTTPException) -> FastJSONResponse:
         """ 处理 HTTP 异常，返回统一的错误响应 """
         # 记录异常日志
-        logger.warning(f"捕获到 HTTP 异常: {e.detail}")
+        logger.warning("捕获到 HTTP 异常: %s", e.detail)
 
         # 组装错误响应内容
-        error_content = Response(code=e.status_code, msg=e.detail).model_dump()
+        error_content = envelope(msg=e.detail, code=e.status_code)
 
         # 返回 JSON 响应
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=e.status_code,
             content=error_content,
         )
 
     @app.exception_handler(Exception)
-    async def exception_handler(req: Request, e: Exception) -> JSONResponse:
+    async def exception_handler(req: Request, e: Exception) -> FastJSONResponse:
         """ 处理未捕获的异常，返回统一的错误响应 """
         # 记录异常日志
-        logger.error(f"捕获到异常: {e}")
+        logger.error("捕获到异常: %s", e)
 
         # 组装错误响应内容
-        error_content = Response(code=500, msg="服务器出现异常，请稍后重试。").model_dump()
+        error_content = envelope(msg="服务器出现异常，请稍后重试。", code=500)
 
         # 返回 JSON 响应
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content=error_content,
         )
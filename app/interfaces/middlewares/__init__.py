@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 09:40
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 接口中间件
+"""
+from .metrics import MetricsMiddleware, route_template
+from .request_id import RequestIdMiddleware
+from .tracing import TracingMiddleware
+
+__all__ = [
+    "MetricsMiddleware",
+    "RequestIdMiddleware",
+    "TracingMiddleware",
+    "route_template",
+]
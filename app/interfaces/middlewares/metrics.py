@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 09:40
+@Author : YangFei
+@File   : metrics.py
+@Desc   : 请求计时中间件，记录每个路由的请求数、状态码、耗时分布和进行中的请求数
+
+实现为纯 ASGI 中间件，不使用 BaseHTTPMiddleware，不包装请求体和响应体，流式响应不受影响，每个请求只多几次字典操作。
+路由标签取路由模板(例如 /api/documents/{document_id}/chunks/export)而不是实际路径，未匹配任何路由的请求记为 <unmatched>，
+避免标签组合随 URL 无限增长。流式响应的耗时计到最后一个字节发送完毕为止。
+"""
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import get_metrics_registry
+
+HTTP_REQUESTS = get_metrics_registry().counter(
+    "neon_http_requests_total", "HTTP 请求数", ["method", "route", "status"],
+)
+HTTP_REQUEST_SECONDS = get_metrics_registry().histogram(
+    "neon_http_request_duration_seconds", "HTTP 请求耗时(秒)", ["method", "route"],
+)
+HTTP_REQUESTS_IN_PROGRESS = get_metrics_registry().gauge(
+    "neon_http_requests_in_progress", "进行中的 HTTP 请求数", ["method"],
+)
+# 未匹配任何路由的请求的路由标签
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope: Scope) -> str:
+    """ 请求匹配到的路由模板
+    通过 include_router 加前缀的路由，scope["route"].path 不含前缀，FastAPI 把包含前缀的完整模板记录在 scope["fastapi"] 中；
+    取不到时退回到 scope["route"].path
+    """
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    template = getattr(context, "path_format", None) or getattr(scope.get("route"), "path", None)
+    return template or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ 请求计时中间件 """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc((method,))
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_PROGRESS.dec((method,))
+            route = route_template(scope)
+            HTTP_REQUESTS.inc((method, route, str(status)))
+            HTTP_REQUEST_SECONDS.observe(elapsed, (method, route))
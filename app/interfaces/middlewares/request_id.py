@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 18:10
+@Author : YangFei
+@File   : request_id.py
+@Desc   : 请求 ID 中间件，为每个请求设置请求 ID，请求处理过程中的日志都带有该 ID，并通过响应头返回给调用方
+
+调用方(网关、前端)在请求头 X-Request-ID 中传入 ID 时沿用该 ID，便于跨服务关联日志，否则生成新的 ID。
+传入的 ID 过长或包含控制字符时忽略，避免日志注入。实现为纯 ASGI 中间件，流式响应不受影响。
+"""
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.request_context import new_request_id, request_id_var
+
+REQUEST_ID_HEADER = "x-request-id"
+# 沿用调用方传入的 ID 时的最大长度
+MAX_REQUEST_ID_LENGTH = 128
+
+
+def _incoming_request_id(scope: Scope) -> str | None:
+    """ 调用方传入的请求 ID，不合法时返回 None """
+    for name, value in scope["headers"]:
+        if name == REQUEST_ID_HEADER.encode():
+            request_id = value.decode("latin-1")
+            if 0 < len(request_id) <= MAX_REQUEST_ID_LENGTH and request_id.isprintable():
+                return request_id
+            return None
+    return None
+
+
+class RequestIdMiddleware:
+    """ 请求 ID 中间件 """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _incoming_request_id(scope) or new_request_id()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
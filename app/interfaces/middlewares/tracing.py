@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 21:10
+@Author : YangFei
+@File   : tracing.py
+@Desc   : 请求阶段耗时中间件，为每个请求创建 RequestTrace(见 core/tracing.py)，请求结束时在日志中输出各阶段耗时
+
+耗时超过 tracing_slow_request_ms 的请求以 WARNING 级别输出，其余请求在 DEBUG 级别输出，日志带有请求 ID，
+线上出现延迟尖峰时可以按请求 ID 看到时间花在了分词、SQL、Redis、对象存储还是序列化上。
+开启 tracing_response_header 时通过 Server-Timing 响应头返回阶段耗时。响应头在响应开始时发送，
+流式响应(SSE、NDJSON)的响应头只包含发送响应头之前的阶段，完整的明细见请求结束时的日志。
+实现为纯 ASGI 中间件，流式响应不受影响。
+"""
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.system_config import get_settings
+from core.tracing import RequestTrace, trace_var
+
+from .metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_HEADER = "server-timing"
+
+
+class TracingMiddleware:
+    """ 请求阶段耗时中间件 """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        settings = get_settings()
+        self._response_header = settings.tracing_response_header
+        self._slow_seconds = settings.tracing_slow_request_ms / 1000
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self._response_header:
+                    MutableHeaders(scope=message).append(SERVER_TIMING_HEADER, trace.server_timing())
+            await send(message)
+
+        token = trace_var.set(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            trace_var.reset(token)
+            elapsed = trace.elapsed()
+            level = logging.WARNING if elapsed >= self._slow_seconds else logging.DEBUG
+            if logger.isEnabledFor(level):
+                logger.log(
+                    level, "%s %s %d %.1fms 阶段耗时: %s",
+                    scope["method"], route_template(scope), status, elapsed * 1000, trace.summary(),
+                )
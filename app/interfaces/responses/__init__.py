@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 22:10
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 接口响应类
+"""
+from .fast_json import JSON_ENCODER, json_dumps, envelope, FastJSONResponse, NDJSONResponse, success_response
+from .sse import HEARTBEAT, encode_event, EventSourceResponse
+
+__all__ = [
+    "JSON_ENCODER",
+    "json_dumps",
+    "envelope",
+    "FastJSONResponse",
+    "NDJSONResponse",
+    "success_response",
+    "HEARTBEAT",
+    "encode_event",
+    "EventSourceResponse",
+]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 22:10
+@Author : YangFei
+@File   : fast_json.py
+@Desc   : 高性能 JSON 响应：快速编码器、跳过二次校验的响应、NDJSON 流式响应
+
+FastAPI 默认先用 response_model 校验一遍返回值，再转换为可 JSON 序列化的对象，最后用标准库 json 编码。
+检索结果通常包含数百个分块及其元数据，校验和编码占了请求耗时的很大一部分。
+
+编码器优先使用 orjson(可选依赖，pip install orjson)，未安装时使用 pydantic-core 的 to_json，
+两者都是原生实现，都可以直接编码 pydantic 模型、dataclass、UUID、datetime 和 numpy 数值。
+编码耗时累加到所属请求的 serialize 阶段(见 core/tracing.py)，JSON 响应、NDJSON 和 SSE 事件都经过 json_dumps。
+数据在服务层已经是确定的结构时，接口直接返回 success_response，FastAPI 不再按 response_model 校验，
+response_model 只用于生成接口文档。
+"""
+import time
+import logging
+from typing import Any, AsyncIterable, Iterable, Optional
+
+import pydantic_core
+from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.application.errors import AppException
+from core.tracing import record_span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 是可选依赖
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 当前使用的编码器，便于在日志和基准测试中确认
+JSON_ENCODER = "orjson" if orjson is not None else "pydantic-core"
+
+
+def _fallback(obj: Any) -> Any:
+    """ 编码器不支持的类型：numpy 数组等带 tolist 的对象转换为列表，pydantic 模型转换为基础类型 """
+    if isinstance(obj, BaseModel):
+        return pydantic_core.to_jsonable_python(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"无法序列化为 JSON 的类型: {type(obj).__name__}")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_fallback, option=_ORJSON_OPTIONS)
+else:
+    def _dumps(obj: Any) -> bytes:
+        return pydantic_core.to_json(obj, inf_nan_mode="null", fallback=_fallback)
+
+
+def json_dumps(obj: Any) -> bytes:
+    """ 编码为 UTF-8 JSON，NaN 和无穷大编码为 null """
+    start = time.perf_counter()
+    try:
+        return _dumps(obj)
+    finally:
+        record_span("serialize", time.perf_counter() - start)
+
+
+def envelope(data: Any = None, msg: str = "success", code: int = 200) -> dict:
+    """ 组装与 Response 模型相同的 code/msg/data 响应结构，不做校验 """
+    return {"code": code, "msg": msg, "data": data if data is not None else {}}
+
+
+class FastJSONResponse(JSONResponse):
+    """ 使用快速编码器的 JSON 响应，作为应用的默认响应类 """
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+def success_response(data: Any = None, msg: str = "success", status_code: int = 200) -> FastJSONResponse:
+    """ 直接返回已经确定结构的数据，跳过 response_model 的校验
+    :param data: 响应数据，可以是字典、列表、pydantic 模型或 dataclass
+    :param msg: 响应消息
+    :param status_code: HTTP 状态码
+    """
+    return FastJSONResponse(envelope(data, msg), status_code=status_code)
+
+
+class NDJSONResponse(StreamingResponse):
+    """ NDJSON 流式响应，每行是一个 code/msg/data 结构，data 为一条记录
+
+    大结果集和导出接口边生成边发送，不需要在内存中组装完整的响应。
+    编码后的行先写入缓冲区，缓冲区超过 flush_bytes 或距离上次发送超过 flush_interval 时发送一次，
+    第一条记录立即发送。生成过程中出现异常时发送一行失败结构后结束，此时状态码已经发送，无法再修改。
+    """
+    media_type = "application/x-ndjson"
+
+    def __init__(
+            self,
+            content: Iterable[Any] | AsyncIterable[Any],
+            status_code: int = 200,
+            headers: Optional[dict[str, str]] = None,
+            background: Optional[BackgroundTask] = None,
+            flush_bytes: int = 64 * 1024,
+            flush_interval: float = 0.05,
+    ):
+        """ 构造函数
+        :param content: 记录来源，同步或异步可迭代对象
+        :param flush_bytes: 缓冲区达到该大小(字节)时发送
+        :param flush_interval: 距离上次发送超过该时间(秒)时发送
+        """
+        self._flush_bytes = flush_bytes
+        self._flush_interval = flush_interval
+        super().__init__(self._encode(content), status_code, headers, self.media_type, background)
+
+    async def _encode(self, content: Iterable[Any] | AsyncIterable[Any]):
+        """ 逐条编码并按缓冲规则产出字节块 """
+        buffer = bytearray()
+        last_flush: Optional[float] = None
+        try:
+            async for item in _iterate(content):
+                buffer += json_dumps(envelope(item))
+                buffer += b"\n"
+                now = time.monotonic()
+                if last_flush is None or len(buffer) >= self._flush_bytes or now - last_flush >= self._flush_interval:
+                    yield bytes(buffer)
+                    buffer.clear()
+                    last_flush = now
+        except AppException as e:
+            logger.error("NDJSON 响应生成过程中出现应用程序异常: %s", e.msg)
+            buffer += json_dumps(envelope(msg=e.msg, code=e.status_code)) + b"\n"
+        except Exception as e:
+            logger.error("NDJSON 响应生成过程中出现异常: %s", e)
+            buffer += json_dumps(envelope(msg="服务器出现异常，请稍后重试。", code=500)) + b"\n"
+        if buffer:
+            yield bytes(buffer)
+
+
+async def _iterate(content: Iterable[Any] | AsyncIterable[Any]):
+    """ 统一以异步方式遍历同步或异步的记录来源 """
+    if hasattr(content, "__aiter__"):
+        async for item in content:
+            yield item
+    else:
+        for item in content:
+            yield item
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 23:20
+@Author : YangFei
+@File   : sse.py
+@Desc   : Server-Sent Events 流式响应：断开即取消、心跳保活、按字节限制缓冲区
+
+事件由生产协程编码后写入缓冲区，发送循环从缓冲区取出并发送给客户端，同时有一个协程监听客户端断开:
+    - 客户端断开时立即取消生产协程，正在进行的检索、大模型请求随之取消，不必等到下一次发送失败才发现
+    - 一段时间没有事件时发送注释行作为心跳，防止代理和负载均衡器因空闲断开连接，也能及时发现已经断开的客户端
+    - 缓冲区中未发送的数据达到上限时生产协程等待(背压)，慢速客户端不会让单个连接占用无限内存；
+      单次发送超过超时时间时视为客户端无响应，结束响应
+生成过程中出现异常时发送一个 error 事件后结束，此时状态码已经发送，无法再修改。
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterable, Optional
+
+from fastapi.responses import Response
+from starlette.background import BackgroundTask
+from starlette.types import Receive, Scope, Send
+
+from app.application.errors import AppException
+from core.system_config import get_settings
+
+from .fast_json import json_dumps, envelope
+
+logger = logging.getLogger(__name__)
+
+# 心跳使用注释行，EventSource 会忽略以冒号开头的行
+HEARTBEAT = b": ping\n\n"
+
+
+def encode_event(data: Any, event: Optional[str] = None) -> bytes:
+    """ 编码一个事件，数据编码为单行 JSON
+    :param data: 事件数据
+    :param event: 事件类型，为空时客户端按 message 事件处理
+    """
+    head = f"event: {event}\n".encode("utf-8") if event else b""
+    return head + b"data: " + json_dumps(data) + b"\n\n"
+
+
+class _StreamBuffer:
+    """ 生产协程与发送循环之间的字节缓冲区，未发送的数据达到上限时写入方等待 """
+
+    def __init__(self, max_bytes: int):
+        self._chunks: deque[bytes] = deque()
+        self._size = 0
+        self._max_bytes = max_bytes
+        self._closed = False
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+    async def put(self, chunk: bytes) -> None:
+        """ 写入一个事件，缓冲区为空时即使单个事件超过上限也允许写入 """
+        while self._size >= self._max_bytes and not self._closed:
+            self._writable.clear()
+            await self._writable.wait()
+        if self._closed:
+            return
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        self._readable.set()
+
+    async def get(self, timeout: float) -> Optional[bytes]:
+        """ 取出缓冲区中的全部数据，多个事件合并为一次发送
+        :return: 等待超时返回 None，缓冲区已关闭且没有数据时返回空字节串
+        """
+        if not self._chunks and not self._closed:
+            self._readable.clear()
+            try:
+                await asyncio.wait_for(self._readable.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if not self._chunks:
+            return b""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self._size = 0
+        self._writable.set()
+        return data
+
+    def close(self) -> None:
+        """ 关闭缓冲区，唤醒等待的读写方 """
+        self._closed = True
+        self._readable.set()
+        self._writable.set()
+
+
+class EventSourceResponse(Response):
+    """ Server-Sent Events 流式响应
+
+    内容中带有 event 和 data 属性的对象(例如 AnswerEvent)编码为对应类型的事件，其它对象编码为 message 事件。
+    """
+    media_type = "text/event-stream"
+
+    def __init__(
+            self,
+            content: AsyncIterable[Any],
+            status_code: int = 200,
+            headers: Optional[dict[str, str]] = None,
+            background: Optional[BackgroundTask] = None,
+            heartbeat_interval: Optional[float] = None,
+            max_buffer_bytes: Optional[int] = None,
+            send_timeout: Optional[float] = None,
+    ):
+        """ 构造函数
+        :param content: 事件来源，异步可迭代对象
+        :param heartbeat_interval: 没有事件时发送心跳的间隔(秒)，默认取系统配置
+        :param max_buffer_bytes: 单个连接未发送数据的上限(字节)，默认取系统配置
+        :param send_timeout: 单次发送的超时时间(秒)，默认取系统配置
+        """
+        settings = get_settings()
+        self.body_iterator = content
+        self.status_code = status_code
+        self.background = background
+        self._heartbeat_interval = heartbeat_interval or settings.sse_heartbeat_interval
+        self._max_buffer_bytes = max_buffer_bytes or settings.sse_max_buffer_bytes
+        self._send_timeout = send_timeout or settings.sse_send_timeout
+        # 禁止代理缓存和缓冲，否则事件会被攒到一起才到达客户端
+        self.init_headers({"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        buffer = _StreamBuffer(self._max_buffer_bytes)
+        producer = asyncio.create_task(self._produce(buffer))
+        watcher = asyncio.create_task(self._watch_disconnect(receive))
+        watcher.add_done_callback(lambda _: (producer.cancel(), buffer.close()))
+
+        completed = False
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            while True:
+                chunk = await buffer.get(self._heartbeat_interval)
+                if watcher.done() or chunk == b"":
+                    break
+                await asyncio.wait_for(
+                    send({"type": "http.response.body", "body": chunk or HEARTBEAT, "more_body": True}),
+                    self._send_timeout,
+                )
+            if not watcher.done():
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                completed = True
+        except asyncio.TimeoutError:
+            logger.warning("SSE 客户端超过 %.1f 秒未接收数据，结束响应", self._send_timeout)
+        except OSError as e:
+            logger.info("SSE 客户端已断开: %s", e)
+        finally:
+            # 断开时生产协程已经被取消，不能重复取消，否则会打断其正在执行的清理(例如关闭大模型服务的连接)
+            if not producer.cancelling():
+                producer.cancel()
+            watcher.cancel()
+            await asyncio.gather(producer, watcher, return_exceptions=True)
+
+        if not completed:
+            logger.info("SSE 响应未完成，已取消事件的生成")
+        elif self.background is not None:
+            await self.background()
+
+    async def _produce(self, buffer: _StreamBuffer) -> None:
+        """ 逐个编码事件并写入缓冲区，被取消或结束时关闭事件来源 """
+        try:
+            async for item in self.body_iterator:
+                if hasattr(item, "event") and hasattr(item, "data"):
+                    await buffer.put(encode_event(item.data, item.event))
+                else:
+                    await buffer.put(encode_event(item))
+        except AppException as e:
+            logger.error("SSE 响应生成过程中出现应用程序异常: %s", e.msg)
+            await buffer.put(encode_event(envelope(msg=e.msg, code=e.status_code), "error"))
+        except Exception as e:
+            logger.error("SSE 响应生成过程中出现异常: %s", e)
+            await buffer.put(encode_event(envelope(msg="服务器出现异常，请稍后重试。", code=500), "error"))
+        finally:
+            buffer.close()
+            # 在写入缓冲区时被取消，事件来源停在 yield 处，需要显式关闭以执行其清理逻辑
+            if hasattr(self.body_iterator, "aclose"):
+                await self.body_iterator.aclose()
+
+    @staticmethod
+    async def _watch_disconnect(receive: Receive) -> None:
+        """ 等待客户端断开，请求体已经被读取，之后只会收到断开消息 """
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
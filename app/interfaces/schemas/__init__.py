@@ -7,7 +7,17 @@
 @Desc   : 
 """
 from .base import Response
+from .retrieval import SearchRequest, RetrievedChunkItem, SearchResult, ChunkExportItem
+from .query import QueryRequest
+from .status import DependencyStatus, HealthStatus
 
 __all__ = [
     "Response",
+    "SearchRequest",
+    "RetrievedChunkItem",
+    "SearchResult",
+    "ChunkExportItem",
+    "QueryRequest",
+    "DependencyStatus",
+    "HealthStatus",
 ]
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 23:30
+@Author : YangFei
+@File   : query.py
+@Desc   : 流式问答接口的请求结构
+"""
+from typing import Any, Optional
+from pydantic import BaseModel, Field
+
+
+class QueryRequest(BaseModel):
+    """ 流式问答请求 """
+    tenant_id: str = Field(..., min_length=1, max_length=255, description="租户ID")
+    query: str = Field(..., min_length=1, max_length=2000, description="用户的问题")
+    top_k: int = Field(5, ge=1, le=50, description="作为参考资料的分块数量")
+    filters: Optional[dict[str, Any]] = Field(
+        None,
+        description="元数据过滤条件，值为列表时表示取值为其中之一，"
+                    "可以过滤的字段: document_id、category、page_number、filename、filetype",
+    )
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 22:30
+@Author : YangFei
+@File   : retrieval.py
+@Desc   : 检索和文档导出接口的请求与响应结构
+"""
+import uuid
+from typing import Any, Optional
+from pydantic import BaseModel, Field
+
+
+class SearchRequest(BaseModel):
+    """ 混合检索请求 """
+    tenant_id: str = Field(..., min_length=1, max_length=255, description="租户ID")
+    query: str = Field(..., min_length=1, max_length=2000, description="查询语句")
+    top_k: int = Field(10, ge=1, le=200, description="返回的分块数量")
+    filters: Optional[dict[str, Any]] = Field(
+        None,
+        description="元数据过滤条件，值为列表时表示取值为其中之一，"
+                    "可以过滤的字段: document_id、category、page_number、filename、filetype",
+    )
+
+
+class RetrievedChunkItem(BaseModel):
+    """ 一条检索结果 """
+    id: uuid.UUID
+    score: float = Field(..., description="融合分数")
+    document_id: str
+    content: str
+    metadata: dict = Field(default_factory=dict)
+    ranks: dict[str, int] = Field(default_factory=dict, description="在各检索来源中的排名，从 1 开始")
+    scores: dict[str, float] = Field(default_factory=dict, description="在各检索来源中的原始分数")
+
+
+class SearchResult(BaseModel):
+    """ 混合检索结果 """
+    chunks: list[RetrievedChunkItem]
+    timings: dict[str, float] = Field(default_factory=dict, description="各阶段耗时(毫秒)")
+    degraded: dict[str, str] = Field(default_factory=dict, description="超时或失败而被跳过的检索来源及原因")
+    cached: bool = Field(False, description="是否来自语义查询缓存")
+
+
+class ChunkExportItem(BaseModel):
+    """ 导出的一个分块，NDJSON 响应中每行的 data 字段 """
+    id: uuid.UUID
+    document_id: uuid.UUID
+    chunk_index: int
+    content: str
+    keywords: list[str]
+    metadata: dict
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 11:30
+@Author : YangFei
+@File   : status.py
+@Desc   : 健康检查接口的响应结构
+"""
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class DependencyStatus(BaseModel):
+    """ 单个依赖的探测结果 """
+    name: str = Field(..., description="依赖名称，其它分片的依赖带有分片后缀，例如 postgres:s1")
+    status: str = Field(..., description="ok / error / timeout / not_ready")
+    latency_ms: float = Field(..., description="探测耗时(毫秒)")
+    critical: bool = Field(..., description="是否为关键依赖，关键依赖异常时整体状态为 down")
+    error: Optional[str] = Field(None, description="异常信息")
+
+
+class HealthStatus(BaseModel):
+    """ 健康检查结果 """
+    status: str = Field(..., description="ok / degraded / down")
+    checked_at: float = Field(..., description="完成探测的时间戳(秒)")
+    age_ms: float = Field(..., description="结果的缓存时长(毫秒)，0 表示本次请求刚刚探测")
+    duration_ms: float = Field(..., description="探测的总耗时(毫秒)")
+    dependencies: list[DependencyStatus] = Field(default_factory=list, description="各依赖的探测结果")
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 19:10
+@Author : YangFei
+@File   : __init__.py
+@Desc   : Celery 异步任务，启动工作进程: python -m app.interfaces.tasks.worker interactive|bulk
+"""
+from .celery_app import QUEUE_BULK, QUEUE_INTERACTIVE, QUEUES, celery_app, create_celery_app
+from .ingestion import dump_task, enqueue_ingestion, ingest_documents, load_task, set_pipeline_factory
+
+__all__ = [
+    "QUEUE_BULK",
+    "QUEUE_INTERACTIVE",
+    "QUEUES",
+    "celery_app",
+    "create_celery_app",
+    "dump_task",
+    "enqueue_ingestion",
+    "ingest_documents",
+    "load_task",
+    "set_pipeline_factory",
+]
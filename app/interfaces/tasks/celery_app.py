@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 19:10
+@Author : YangFei
+@File   : celery_app.py
+@Desc   : Celery 应用，消息代理和结果存储使用项目的 Redis 配置
+
+任务按优先级分为两个队列，分别由各自的工作进程消费，批量导入积压大量任务时不影响用户上传的文档:
+    - interactive  用户上传等需要尽快完成的任务，任务较短，工作进程多、预取多
+    - bulk         批量导入、重建索引等后台任务，任务耗时长，工作进程少、不预取
+预取数和工作进程数按队列在启动工作进程时指定(见 worker.py)，Celery 的这两项配置只能按工作进程设置。
+
+任务在执行完成后才确认(acks_late)，工作进程异常退出时任务重新投递，入库流水线按分块内容生成稳定的 ID，重复执行是幂等的。
+任务参数和结果只使用 JSON，结果只保存汇总信息，每个文档的进度和结果由入库流水线写入 Redis 和 Postgres。
+"""
+from urllib.parse import quote
+
+from celery import Celery
+from kombu import Queue
+
+from core.system_config import get_settings, Settings
+
+# 队列名称
+QUEUE_INTERACTIVE = "interactive"
+QUEUE_BULK = "bulk"
+QUEUES = (QUEUE_INTERACTIVE, QUEUE_BULK)
+
+
+def redis_url(settings: Settings) -> str:
+    """ 根据 Redis 配置生成 Celery 使用的连接地址 """
+    scheme = "rediss" if settings.redis_use_ssl else "redis"
+    auth = ""
+    if settings.redis_username or settings.redis_password:
+        auth = f"{quote(settings.redis_username or '', safe='')}:{quote(settings.redis_password or '', safe='')}@"
+    url = f"{scheme}://{auth}{settings.redis_host}:{settings.redis_port}/{settings.celery_redis_db}"
+    # 使用 TLS 连接时 Celery 要求显式指定证书校验方式
+    return f"{url}?ssl_cert_reqs=required" if settings.redis_use_ssl else url
+
+
+def create_celery_app() -> Celery:
+    """ 创建 Celery 应用 """
+    settings = get_settings()
+    broker_url = settings.celery_broker_url or redis_url(settings)
+
+    app = Celery(
+        "neon_rag",
+        broker=broker_url,
+        backend=settings.celery_result_backend or broker_url,
+        include=["app.interfaces.tasks.ingestion", "app.interfaces.tasks.runtime"],
+    )
+    app.conf.update(
+        # 队列和路由，未指定队列的任务进入 bulk 队列
+        task_queues=[Queue(name, routing_key=name) for name in QUEUES],
+        task_default_queue=QUEUE_BULK,
+        task_default_routing_key=QUEUE_BULK,
+        task_routes={
+            "neon_rag.ingest_documents": {"queue": QUEUE_BULK},
+        },
+        # 只使用 JSON 序列化，结果只保存任务的返回值，不保存参数等扩展信息
+        task_serializer="json",
+        result_serializer="json",
+        accept_content=["json"],
+        result_extended=False,
+        result_expires=settings.celery_result_expires,
+        # 执行完成后才确认，工作进程异常退出时重新投递
+        task_acks_late=True,
+        task_reject_on_worker_lost=True,
+        broker_transport_options={"visibility_timeout": settings.celery_visibility_timeout},
+        result_backend_transport_options={"visibility_timeout": settings.celery_visibility_timeout},
+        broker_connection_retry_on_startup=True,
+        # 默认不预取，消费 interactive 队列的工作进程在启动时单独指定
+        worker_prefetch_multiplier=1,
+        worker_max_tasks_per_child=settings.celery_max_tasks_per_child or None,
+        # 日志由项目的日志系统配置，不使用 Celery 的默认配置
+        worker_hijack_root_logger=False,
+        # 测试时在调用方进程中同步执行，异常直接抛出给调用方
+        task_always_eager=settings.celery_task_always_eager,
+        task_eager_propagates=True,
+    )
+    return app
+
+
+celery_app = create_celery_app()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 19:30
+@Author : YangFei
+@File   : ingestion.py
+@Desc   : 文档入库任务
+
+一个任务处理一批文档(celery_ingestion_batch_size)，而不是每个文档或每个分块一个任务：
+同一批文档在一条入库流水线中处理，各阶段在文档之间流水作业，分块按批次嵌入和写入，
+消息代理的往返、任务调度和结果写入的开销按批摊薄。
+任务结果只包含汇总的计数和失败文档的错误信息，每个文档的进度和结果由流水线写入 Redis 和 Postgres。
+
+连接失败、超时等临时错误(例如工作进程初始化组件时 Redis 或 Postgres 不可用)使整批任务按指数退避重试，
+入库流水线是幂等的，重试时已完成的文档只会跳过未变化的分块。单个文档的失败记录在结果中，不触发重试。
+"""
+import time
+import uuid
+import asyncio
+from functools import partial
+from typing import Callable, Iterable, Optional
+
+import httpx
+from celery import Task
+from redis import exceptions as redis_exceptions
+from sqlalchemy.exc import OperationalError
+
+from app.application.services.ingestion import IngestionPipeline, IngestionTask, create_ingestion_pipeline
+from core.system_config import get_settings
+
+from .celery_app import QUEUE_BULK, QUEUES, celery_app
+from .runtime import run_in_worker, worker_pipeline
+
+# 结果中每个失败文档的错误信息的最大长度
+MAX_ERROR_LENGTH = 200
+
+# 触发任务重试的临时错误
+TRANSIENT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    redis_exceptions.ConnectionError,
+    redis_exceptions.TimeoutError,
+    OperationalError,
+    httpx.TransportError,
+)
+
+# 创建入库流水线的函数，测试时可以替换为使用本地实现的流水线
+_pipeline_factory: Callable[[], IngestionPipeline] = create_ingestion_pipeline
+
+
+def set_pipeline_factory(factory: Optional[Callable[[], IngestionPipeline]]) -> None:
+    """ 替换创建入库流水线的函数，传入 None 时恢复默认 """
+    global _pipeline_factory
+    _pipeline_factory = factory or create_ingestion_pipeline
+
+
+def dump_task(task: IngestionTask) -> dict:
+    """ 入库任务转换为任务参数，省略为空的字段 """
+    payload = {"document_id": str(task.document_id), "tenant_id": task.tenant_id, "object_name": task.object_name}
+    if task.file_name:
+        payload["file_name"] = task.file_name
+    if task.bucket_name:
+        payload["bucket_name"] = task.bucket_name
+    return payload
+
+
+def load_task(payload: dict) -> IngestionTask:
+    """ 任务参数转换为入库任务 """
+    return IngestionTask(
+        document_id=uuid.UUID(payload["document_id"]),
+        tenant_id=payload["tenant_id"],
+        object_name=payload["object_name"],
+        file_name=payload.get("file_name", ""),
+        bucket_name=payload.get("bucket_name"),
+    )
+
+
+async def _ingest(get_pipeline: Callable[[], IngestionPipeline], tasks: list[IngestionTask]) -> dict:
+    """ 在一条流水线中处理一批文档，返回汇总结果。流水线在事件循环中、组件初始化之后获取 """
+    start = time.perf_counter()
+    results = await get_pipeline().run(tasks)
+    failed = [result for result in results if not result.success]
+    return {
+        "documents": len(tasks),
+        "succeeded": len(results) - len(failed),
+        "written_chunks": sum(result.written_chunks for result in results),
+        "skipped_chunks": sum(result.skipped_chunks for result in results),
+        "failed": {str(result.document_id): result.error[:MAX_ERROR_LENGTH] for result in failed},
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
+
+
+@celery_app.task(
+    name="neon_rag.ingest_documents",
+    bind=True,
+    autoretry_for=TRANSIENT_ERRORS,
+    max_retries=get_settings().celery_task_max_retries,
+    retry_backoff=get_settings().celery_task_retry_backoff,
+    retry_backoff_max=get_settings().celery_task_retry_backoff_max,
+    retry_jitter=True,
+)
+def ingest_documents(self: Task, payloads: list[dict]) -> dict:
+    """ 入库一批文档
+    :param payloads: 入库任务参数，由 dump_task 生成
+    :return: 汇总结果，包括文档数、成功数、写入和跳过的分块数、失败文档的错误信息和耗时(秒)
+    """
+    tasks = [load_task(payload) for payload in payloads]
+    if self.request.is_eager:
+        # 同步执行时在调用方进程中运行，每次使用新的事件循环，不复用工作进程的事件循环、组件和流水线
+        return asyncio.run(_ingest(_pipeline_factory, tasks))
+    # 工作进程中的任务复用同一条流水线，去重索引在任务之间保留
+    return run_in_worker(_ingest(partial(worker_pipeline, _pipeline_factory), tasks))
+
+
+def enqueue_ingestion(
+        tasks: Iterable[IngestionTask],
+        queue: str = QUEUE_BULK,
+        batch_size: Optional[int] = None,
+) -> list[str]:
+    """ 按批次投递入库任务，投递是同步的网络调用，在异步代码中应通过 asyncio.to_thread 调用
+    :param tasks: 入库任务
+    :param queue: 队列名称，interactive 或 bulk
+    :param batch_size: 每个任务处理的文档数，默认取系统配置
+    :return: 投递的 Celery 任务 ID
+    """
+    if queue not in QUEUES:
+        raise ValueError(f"未知的队列: {queue}")
+    batch_size = max(batch_size or get_settings().celery_ingestion_batch_size, 1)
+    payloads = [dump_task(task) for task in tasks]
+    return [
+        ingest_documents.apply_async(args=(payloads[start:start + batch_size],), queue=queue, routing_key=queue).id
+        for start in range(0, len(payloads), batch_size)
+    ]
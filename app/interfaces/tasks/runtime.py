@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 19:20
+@Author : YangFei
+@File   : runtime.py
+@Desc   : Celery 工作进程的运行环境：日志、预加载共享数据、每个进程的事件循环和基础设施组件
+
+与 gunicorn 部署相同(见 app/infrastructure/prefork.py)，Celery 的主进程在 fork 出执行任务的子进程之前加载分词模型并冻结堆，
+子进程以写时复制的方式共享模型；子进程 fork 后丢弃从主进程继承的连接类单例。
+
+每个子进程有一个常驻的事件循环，Postgres、Redis 等异步连接池绑定在创建它们的事件循环上，
+同一进程中的所有任务都在这个事件循环中执行，复用同一组 Fenci、MinIO、Postgres 单例和连接池，
+以及同一条入库流水线(分块去重和图片去重的内存索引只在第一次处理某个租户时从 Redis 加载)。
+组件在子进程执行第一个任务时初始化(工作进程的初始化信号有 4 秒的超时限制，组件重试时可能超过)，子进程退出时关闭。
+执行任务的进程池需要使用 prefork(默认)或 solo，threads 等进程池中多个线程共用一个事件循环会出错。
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Coroutine, Optional, TypeVar
+
+from celery import signals
+
+from core.startup import StartupStep, run_shutdown, run_startup
+from core.system_config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 工作进程需要的组件，不需要大模型客户端
+WORKER_STEPS = ("redis", "postgres", "minio", "shards", "vector", "embedding", "parser_pool", "image_pool", "metrics")
+
+# 本进程的事件循环和已初始化的组件
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_steps: Optional[list[StartupStep]] = None
+# 本进程复用的入库流水线及创建它的函数
+_pipeline: Optional[tuple[Callable[[], Any], Any]] = None
+
+
+@signals.setup_logging.connect
+def _setup_logging(**kwargs) -> None:
+    """ 使用项目的日志配置(连接该信号后 Celery 不再配置日志) """
+    from core.log_config import setup_logging
+
+    setup_logging()
+
+
+@signals.worker_init.connect
+def _preload(**kwargs) -> None:
+    """ 主进程在 fork 出子进程之前加载共享的只读数据并冻结堆 """
+    from app.infrastructure.prefork import freeze_heap, preload_shared_data
+
+    if get_settings().server_preload_models:
+        preload_shared_data()
+        freeze_heap()
+
+
+@signals.worker_process_init.connect
+def _reset_after_fork(**kwargs) -> None:
+    """ 子进程 fork 后丢弃从主进程继承的单例，组件在第一个任务执行时重新初始化 """
+    from app.infrastructure.prefork import reset_after_fork
+
+    global _loop, _steps, _pipeline
+    reset_after_fork()
+    _loop = None
+    _steps = None
+    _pipeline = None
+
+
+@signals.worker_process_shutdown.connect
+@signals.worker_shutdown.connect
+def _shutdown(**kwargs) -> None:
+    """ 子进程(使用 solo 进程池时为主进程)退出时关闭组件和事件循环 """
+    global _loop, _steps, _pipeline
+    _pipeline = None
+    if _loop is None:
+        return
+    try:
+        if _steps is not None:
+            _loop.run_until_complete(run_shutdown(_steps))
+    finally:
+        _loop.close()
+        _loop = None
+        _steps = None
+
+
+def worker_pipeline(factory: Callable[[], T]) -> T:
+    """ 获取本进程复用的入库流水线，第一次调用或创建函数被替换时重新创建 """
+    global _pipeline
+    if _pipeline is None or _pipeline[0] is not factory:
+        _pipeline = (factory, factory())
+    return _pipeline[1]
+
+
+def run_in_worker(coro: Coroutine[Any, Any, T]) -> T:
+    """ 在本进程的事件循环中执行协程，第一次执行时初始化组件 """
+    from app.infrastructure.lifecycle import startup_steps
+
+    global _loop, _steps
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    if _steps is None:
+        steps = startup_steps(WORKER_STEPS)
+        try:
+            _loop.run_until_complete(run_startup(steps))
+        except BaseException:
+            coro.close()
+            raise
+        _steps = steps
+        logger.info("工作进程组件初始化完成: %s", ", ".join(WORKER_STEPS))
+    return _loop.run_until_complete(coro)
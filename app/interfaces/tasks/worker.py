@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 19:40
+@Author : YangFei
+@File   : worker.py
+@Desc   : 按队列启动 Celery 工作进程，工作进程数和预取数取自系统配置中该队列的配置
+
+用法:
+    python -m app.interfaces.tasks.worker interactive
+    python -m app.interfaces.tasks.worker bulk --concurrency 1
+
+每个队列单独启动工作进程，批量任务积压时不占用 interactive 队列的工作进程。
+使用 -O fair 调度：子进程空闲时才分配任务，耗时长的任务不会排在正在执行任务的子进程后面等待。
+"""
+import argparse
+
+from core.system_config import get_settings
+
+from .celery_app import QUEUE_BULK, QUEUE_INTERACTIVE, QUEUES, celery_app
+
+
+def worker_argv(queue: str, concurrency: int = 0, prefetch: int = 0) -> list[str]:
+    """ 生成消费指定队列的工作进程的启动参数
+    :param queue: 队列名称
+    :param concurrency: 子进程数，0 表示取系统配置
+    :param prefetch: 每个子进程预取的任务数，0 表示取系统配置
+    """
+    settings = get_settings()
+    defaults = {
+        QUEUE_INTERACTIVE: (settings.celery_interactive_concurrency, settings.celery_interactive_prefetch),
+        QUEUE_BULK: (settings.celery_bulk_concurrency, settings.celery_bulk_prefetch),
+    }
+    default_concurrency, default_prefetch = defaults[queue]
+    return [
+        "worker",
+        f"--queues={queue}",
+        f"--hostname={queue}@%h",
+        f"--concurrency={concurrency or default_concurrency}",
+        f"--prefetch-multiplier={prefetch or default_prefetch}",
+        "--optimization=fair",
+        f"--loglevel={settings.log_level.upper()}",
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按队列启动 Celery 工作进程")
+    parser.add_argument("queue", choices=QUEUES, help="消费的队列")
+    parser.add_argument("--concurrency", type=int, default=0, help="子进程数，默认取系统配置")
+    parser.add_argument("--prefetch", type=int, default=0, help="每个子进程预取的任务数，默认取系统配置")
+    args = parser.parse_args()
+    celery_app.worker_main(worker_argv(args.queue, args.concurrency, args.prefetch))
+
+
+if __name__ == "__main__":
+    main()
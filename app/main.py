@@ -6,21 +6,34 @@
 @File   : main.py
 @Desc   : 入口文件
 """
+import time
+import asyncio
 import logging
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
+from core.startup import get_startup_profile, run_startup, run_shutdown
+
+# 0. 按层次依次导入并记录耗时，作为启动概况中的导入耗时明细(之后的导入语句直接使用已经导入的模块)
+get_startup_profile().import_modules([
+    "fastapi", "sqlalchemy", "redis.asyncio", "minio", "httpx", "numpy",
+    "core.metrics", "app.infrastructure.storage.tenant_router", "app.application.services.retrieval",
+    "app.application.services.answer", "app.application.services.health", "app.interfaces.endpoints",
+])
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
 
 from core.system_config import get_settings
 from core.log_config import setup_logging
 
-from app.interfaces.endpoints import router
+from app.interfaces.endpoints import router, metrics_router
+from app.interfaces.middlewares import MetricsMiddleware, RequestIdMiddleware, TracingMiddleware
 from app.interfaces.errors import register_exception_handlers
+from app.interfaces.responses import FastJSONResponse
 
-from app.infrastructure.storage.redis import get_redis
-from app.infrastructure.storage.postgres import get_postgres
-from app.infrastructure.storage.minio import get_minio
+from app.infrastructure.lifecycle import PROCESS_POOL_STEPS, startup_steps
+from app.infrastructure.external.fenci import get_fenci_client
+from app.application.services.health import get_health_service
 
 # 1. 获取配置实例(一定要基于 fastapi 项目运行，否则路径解析会出问题，例如找不到 core 模块)
 settings = get_settings()
@@ -30,16 +43,29 @@ setup_logging()
 logger = logging.getLogger(__name__)
 
 
+async def preload_tokenizer() -> None:
+    """ 在后台加载分词模型，不阻塞启动，失败时在第一次使用时再加载 """
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(get_fenci_client)
+    except Exception as e:
+        logger.warning("后台加载分词模型失败，将在第一次使用时重新加载: %s", e)
+        return
+    get_startup_profile().record("tokenizer(后台)", time.perf_counter() - start)
+    logger.info("分词模型加载完成, 耗时 %.0fms", (time.perf_counter() - start) * 1000)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """ 创建 FastAPI 应用的异步生命周期的上下文管理器 """
-    # 启动时初始化资源
+    # 启动时并发初始化各组件，单个组件超时或失败时退避重试，入库使用的子进程池只在 Celery 工作进程中启动
     logger.info("Neon Rag 正在初始化...")
+    steps = startup_steps(exclude=PROCESS_POOL_STEPS)
+    await run_startup(steps)
+    get_startup_profile().log()
 
-    # 初始化 Redis、Postgres 和 OSS 客户端
-    await get_redis().init()
-    await get_postgres().init()
-    await get_minio().init()
+    # 分词模型加载需要数秒，放在后台进行
+    preload = asyncio.create_task(preload_tokenizer()) if settings.fenci_preload else None
 
     try:
         # yield 之前的代码在应用启动时执行
@@ -49,17 +75,34 @@ async def lifespan(app: FastAPI):
     finally:
         # 关闭时释放资源
         logger.info("Neon Rag 正在关闭...")
-        # 关闭 Redis、Postgres 和 OSS 客户端连接
-        await get_redis().shutdown()
-        await get_postgres().shutdown()
-        await get_minio().shutdown()
+        # 先停止后台任务和使用存储的健康检查，再并发关闭各组件
+        if preload is not None:
+            preload.cancel()
+        await get_health_service().shutdown()
+        await run_shutdown(steps)
 
 
 # 3. 定义 FastAPI 路由 tags 标签
 tags_metadata = [
     {
         "name": "状态模块",
-        "description": "包含 **状态检测** 等 API 接口。用于检测系统的运行状态。",
+        "description": "包含 **健康检查** 和 **存活检查** 等 API 接口。用于检测系统及其依赖的运行状态。",
+    },
+    {
+        "name": "问答模块",
+        "description": "包含 **流式问答** 等 API 接口，检索结果和回答以 Server-Sent Events 逐步返回。",
+    },
+    {
+        "name": "检索模块",
+        "description": "包含 **混合检索** 等 API 接口。",
+    },
+    {
+        "name": "文档模块",
+        "description": "包含 **分块导出** 等 API 接口，大结果集以 NDJSON 流式返回。",
+    },
+    {
+        "name": "管理模块",
+        "description": "包含 **在线性能分析** 等 API 接口，需要在请求头 X-Admin-Token 中传入管理接口令牌。",
     },
 ]
 
@@ -70,6 +113,7 @@ app = FastAPI(
     version="1.0.0",
     openapi_tags=tags_metadata,
     lifespan=lifespan,  # 异步生命周期管理
+    default_response_class=FastJSONResponse,  # 默认使用快速 JSON 编码器
 )
 
 
@@ -81,13 +125,28 @@ app.add_middleware(
     allow_credentials=True,  # 允许携带凭证
     allow_methods=["*"],  # 允许所有方法
     allow_headers=["*"],  # 允许所有请求头
+    expose_headers=["X-Request-ID", "Server-Timing"],  # 允许前端读取请求 ID 和阶段耗时响应头
 )
 
+# 记录每个路由的请求数、耗时和进行中的请求数(在跨域中间件之后添加，位于其外层，耗时包括其它中间件)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# 记录每个请求各阶段的耗时(位于请求 ID 中间件内层，输出阶段明细的日志带有请求 ID)
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware)
+
+# 为每个请求设置请求 ID(在其它中间件之后添加，位于其外层，其它中间件和路由中的日志同样带有请求 ID)
+app.add_middleware(RequestIdMiddleware)
+
 # 6. 注册全局异常处理器
 register_exception_handlers(app)
 
 # 7. 导入并注册路由
 app.include_router(router=router, prefix="/api")
+# Prometheus 指标接口不加前缀，使用默认的抓取路径 /metrics
+if settings.metrics_enabled:
+    app.include_router(router=metrics_router)
 
 # 开发环境启动项目
 # 使用 . 替代路径中的 /，避免跨平台问题
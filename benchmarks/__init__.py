@@ -0,0 +1,8 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 14:40
+@Author : YangFei
+@File   : __init__.py
+@Desc   : 性能基准测试脚本，在项目根目录下以模块方式运行，例如 python -m benchmarks.bench_parser_pool
+"""
@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 20:10
+@Author : YangFei
+@File   : backends.py
+@Desc   : 存储服务(Redis、MinIO、Postgres)的进程内替身，用于在没有完整部署环境时压测应用
+
+用法:
+    backends = LocalBackends()
+    backends.add_chunks(rows)     # 写入内存中的 document / document_chunk 表
+    backends.install()            # 在应用启动之前替换 Redis、MinIO、Postgres 单例
+    async with app.router.lifespan_context(app): ...
+
+替身只在单例的注册位置替换连接对象，应用的路由、服务层和 SQL 语句都不变:
+    Redis     内存中的字典，实现请求路径上用到的命令(GET/SET/INCR/哈希/过期时间)
+    MinIO     内存中的存储桶和对象
+    Postgres  内存中的表，会话对 SQLAlchemy 语句的查询条件、排序和分页直接求值，
+              支持 =、IN、数组重叠(&&)、JSONB 包含(@>)、= ANY(...)、CAST 和加法，遇到不支持的语句时抛出 NotImplementedError
+向量存储使用本地索引(vector_store_backend=local)，嵌入和大模型服务使用 embedding_server、llm_server 的替身，不在本模块中。
+"""
+import io
+import time
+import uuid
+import asyncio
+import functools
+import operator
+from collections import namedtuple
+from typing import Any, Iterable, Optional
+
+from sqlalchemy.sql import elements, operators
+from sqlalchemy.sql.selectable import Select
+
+from app.infrastructure.storage import minio as minio_module
+from app.infrastructure.storage import postgres as postgres_module
+from app.infrastructure.storage.minio import MinIO
+from app.infrastructure.storage.postgres import Postgres
+from app.infrastructure.storage.redis import get_redis
+from app.infrastructure.storage.shards import DEFAULT_SHARD, get_shard_config
+
+
+class LocalRedis:
+    """ 内存中的 Redis，值按 decode_responses=True 的方式返回字符串 """
+
+    def __init__(self):
+        self._data: dict[str, Any] = {}
+        self._expires: dict[str, float] = {}
+
+    def _alive(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _expire_at(self, key: str, ex: Optional[float]) -> None:
+        if ex:
+            self._expires[key] = time.monotonic() + ex
+        else:
+            self._expires.pop(key, None)
+
+    async def ping(self) -> bool:
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._data[key] if self._alive(key) else None
+
+    async def set(self, key: str, value: Any, ex: Optional[float] = None, nx: bool = False) -> Optional[bool]:
+        if nx and self._alive(key):
+            return None
+        self._data[key] = str(value)
+        self._expire_at(key, ex)
+        return True
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        value = int(self._data[key]) + amount if self._alive(key) else amount
+        self._data[key] = str(value)
+        return value
+
+    async def delete(self, *keys: str) -> int:
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+        return removed
+
+    async def expire(self, key: str, seconds: float) -> bool:
+        if not self._alive(key):
+            return False
+        self._expire_at(key, seconds)
+        return True
+
+    async def hset(self, key: str, field: Optional[str] = None, value: Any = None, mapping: Optional[dict] = None) -> int:
+        self._alive(key)
+        hash_ = self._data.setdefault(key, {})
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        added = sum(name not in hash_ for name in items)
+        hash_.update({name: str(item) for name, item in items.items()})
+        return added
+
+    async def hget(self, key: str, field: str) -> Optional[str]:
+        return self._data[key].get(field) if self._alive(key) else None
+
+    async def hgetall(self, key: str) -> dict[str, str]:
+        return dict(self._data[key]) if self._alive(key) else {}
+
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        self._alive(key)
+        hash_ = self._data.setdefault(key, {})
+        value = int(hash_.get(field, 0)) + amount
+        hash_[field] = str(value)
+        return value
+
+    async def aclose(self) -> None:
+        self._data.clear()
+        self._expires.clear()
+
+
+class _LocalObject:
+    """ get_object 返回的响应，与 urllib3 的响应一样需要 close 和 release_conn """
+
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+        self.data = data
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._stream.read(amt)
+
+    def stream(self, amt: int = 64 * 1024) -> Iterable[bytes]:
+        while chunk := self._stream.read(amt):
+            yield chunk
+
+    def close(self) -> None:
+        pass
+
+    def release_conn(self) -> None:
+        pass
+
+
+class LocalMinioClient:
+    """ 内存中的对象存储，实现 minio.Minio 中请求路径上用到的方法 """
+
+    def __init__(self, buckets: Iterable[str] = ()):
+        self._buckets: dict[str, dict[str, bytes]] = {name: {} for name in buckets}
+
+    def list_buckets(self) -> list[str]:
+        return list(self._buckets)
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return bucket_name in self._buckets
+
+    def make_bucket(self, bucket_name: str) -> None:
+        self._buckets.setdefault(bucket_name, {})
+
+    def put_object(self, bucket_name: str, object_name: str, data, length: int, **kwargs) -> None:
+        self._buckets[bucket_name][object_name] = data.read(length) if length >= 0 else data.read()
+
+    def get_object(self, bucket_name: str, object_name: str, **kwargs) -> _LocalObject:
+        try:
+            return _LocalObject(self._buckets[bucket_name][object_name])
+        except KeyError:
+            raise FileNotFoundError(f"对象不存在: {bucket_name}/{object_name}") from None
+
+    def remove_object(self, bucket_name: str, object_name: str, **kwargs) -> None:
+        self._buckets[bucket_name].pop(object_name, None)
+
+
+class LocalMinIO(MinIO):
+    """ 使用内存对象存储的 MinIO 单例 """
+
+    def __init__(self, client: LocalMinioClient, shard: Optional[str] = None):
+        super().__init__(get_shard_config(shard or DEFAULT_SHARD))
+        self._local = client
+
+    async def init(self) -> None:
+        self._client = self._local  # type: ignore[assignment]
+
+
+class _Result:
+    """ 查询结果，实现会话 execute 返回值中常用的方法 """
+
+    def __init__(self, rows: list):
+        self._rows = rows
+
+    def all(self) -> list:
+        return list(self._rows)
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def scalar(self):
+        return self._rows[0][0] if self._rows else None
+
+    def scalar_one_or_none(self):
+        if len(self._rows) > 1:
+            raise RuntimeError("查询结果多于一行")
+        return self.scalar()
+
+    def scalars(self) -> "_Scalars":
+        return _Scalars([row[0] for row in self._rows])
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class _Scalars:
+    """ 只包含第一列的查询结果 """
+
+    def __init__(self, values: list):
+        self._values = values
+
+    def all(self) -> list:
+        return list(self._values)
+
+    def first(self):
+        return self._values[0] if self._values else None
+
+    def __iter__(self):
+        return iter(self._values)
+
+
+class _StreamResult:
+    """ session.stream 返回的异步结果，逐行返回时让出事件循环，与服务端游标分批读取的行为相近 """
+
+    def __init__(self, rows: list, batch: int = 500):
+        self._rows = rows
+        self._batch = batch
+
+    async def __aiter__(self):
+        for index, row in enumerate(self._rows):
+            if index and index % self._batch == 0:
+                await asyncio.sleep(0)
+            yield row
+
+    async def close(self) -> None:
+        pass
+
+
+# 求值时支持的二元运算
+_BINARY_OPERATORS = {
+    operators.eq: operator.eq,
+    operators.ne: operator.ne,
+    operators.lt: operator.lt,
+    operators.le: operator.le,
+    operators.gt: operator.gt,
+    operators.ge: operator.ge,
+    operators.add: operator.add,
+    operators.in_op: lambda left, right: left in right,
+    operators.not_in_op: lambda left, right: left not in right,
+}
+# 自定义运算符(PostgreSQL 的数组和 JSONB 运算)
+_CUSTOM_OPERATORS = {
+    "&&": lambda left, right: bool(set(left or ()) & set(right or ())),
+    "@>": lambda left, right: all(left is not None and left.get(key) == value for key, value in right.items())
+    if isinstance(right, dict) else set(right) <= set(left or ()),
+}
+
+
+def _evaluate(expr, row: dict) -> Any:
+    """ 对一行数据求 SQL 表达式的值 """
+    if isinstance(expr, elements.BooleanClauseList):
+        values = [_evaluate(clause, row) for clause in expr.clauses]
+        return all(values) if expr.operator is operators.and_ else any(values)
+    if isinstance(expr, elements.BinaryExpression):
+        # column = ANY(array)
+        if isinstance(expr.right, elements.CollectionAggregate) and expr.operator is operators.eq:
+            return _evaluate(expr.left, row) in (_evaluate(expr.right.element, row) or ())
+        left, right = _evaluate(expr.left, row), _evaluate(expr.right, row)
+        if expr.operator in _BINARY_OPERATORS:
+            return _BINARY_OPERATORS[expr.operator](left, right)
+        opstring = getattr(expr.operator, "opstring", None)
+        if opstring in _CUSTOM_OPERATORS:
+            return _CUSTOM_OPERATORS[opstring](left, right)
+        raise NotImplementedError(f"本地替身不支持的运算符: {expr.operator}")
+    if isinstance(expr, elements.ExpressionClauseList) and expr.operator in _BINARY_OPERATORS:
+        # a + b + c 这样的连续运算
+        return functools.reduce(_BINARY_OPERATORS[expr.operator], (_evaluate(clause, row) for clause in expr.clauses))
+    if isinstance(expr, elements.Cast):
+        value = _evaluate(expr.clause, row)
+        return int(value) if expr.type.python_type is int else value
+    if isinstance(expr, (elements.Grouping, elements.Label)):
+        return _evaluate(expr.element, row)
+    if isinstance(expr, elements.BindParameter):
+        return expr.effective_value
+    if isinstance(expr, elements.ColumnClause):
+        return row[expr.name]
+    if isinstance(expr, elements.Null):
+        return None
+    raise NotImplementedError(f"本地替身不支持的表达式: {type(expr).__name__}")
+
+
+def _is_descending(clause) -> bool:
+    """ 排序子句是否为降序 """
+    return isinstance(clause, elements.UnaryExpression) and clause.modifier is operators.desc_op
+
+
+def _sort_value(clause, row: dict, values: dict) -> Any:
+    """ 排序子句对应的值 """
+    if isinstance(clause, elements.UnaryExpression):
+        clause = clause.element
+    # desc("matched") 按名称引用结果中的列
+    if type(clause).__name__ == "_textual_label_reference":
+        return values[clause.element]
+    return _evaluate(clause, row)
+
+
+class LocalSession:
+    """ 内存中的数据库会话，只支持查询，语句中的查询条件、排序和分页直接对内存中的行求值 """
+
+    def __init__(self, tables: dict[str, list[dict]]):
+        self._tables = tables
+
+    async def __aenter__(self) -> "LocalSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+    def _query(self, statement) -> list:
+        if isinstance(statement, elements.TextClause):
+            if statement.text.strip().upper() == "SELECT 1":
+                return [(1,)]
+            raise NotImplementedError(f"本地替身不支持的语句: {statement.text}")
+        if not isinstance(statement, Select):
+            raise NotImplementedError(f"本地替身只支持查询语句: {type(statement).__name__}")
+
+        froms = statement.get_final_froms()
+        if len(froms) != 1:
+            raise NotImplementedError("本地替身不支持多表查询")
+        rows = self._tables.get(froms[0].name, [])
+        if statement.whereclause is not None:
+            rows = [row for row in rows if _evaluate(statement.whereclause, row)]
+
+        names = tuple(description["name"] for description in statement.column_descriptions)
+        columns = list(statement.selected_columns)
+        results = []
+        for row in rows:
+            values = {name: _evaluate(column, row) for name, column in zip(names, columns)}
+            results.append((row, values))
+
+        # 按排序子句从后往前依次稳定排序
+        for clause in reversed(statement._order_by_clauses):
+            results.sort(key=lambda item: _sort_value(clause, item[0], item[1]), reverse=_is_descending(clause))
+        offset = statement._offset or 0
+        limit = statement._limit
+        results = results[offset:offset + limit if limit is not None else None]
+
+        row_type = _row_type(names)
+        return [row_type(*(values[name] for name in names)) for _, values in results]
+
+    async def execute(self, statement, *args, **kwargs) -> _Result:
+        return _Result(self._query(statement))
+
+    async def scalar(self, statement, *args, **kwargs):
+        return _Result(self._query(statement)).scalar()
+
+    async def stream(self, statement, *args, **kwargs) -> _StreamResult:
+        return _StreamResult(self._query(statement))
+
+    async def commit(self) -> None:
+        pass
+
+    async def rollback(self) -> None:
+        pass
+
+
+_ROW_TYPES: dict[tuple[str, ...], type] = {}
+
+
+def _row_type(names: tuple[str, ...]) -> type:
+    """ 查询结果的行类型，与 SQLAlchemy 的 Row 一样可以按位置和列名访问 """
+    row_type = _ROW_TYPES.get(names)
+    if row_type is None:
+        row_type = _ROW_TYPES.setdefault(names, namedtuple("Row", names, rename=True))
+    return row_type
+
+
+class LocalPostgres(Postgres):
+    """ 使用内存表的 Postgres 单例 """
+
+    def __init__(self, tables: dict[str, list[dict]], shard: Optional[str] = None):
+        super().__init__(get_shard_config(shard or DEFAULT_SHARD))
+        self._tables = tables
+
+    async def init(self) -> None:
+        self._session_factory = lambda: LocalSession(self._tables)  # type: ignore[assignment]
+
+    async def shutdown(self) -> None:
+        self._session_factory = None
+        postgres_module._instances.pop(self._shard.name, None)
+
+
+class LocalBackends:
+    """ 默认分片的 Redis、MinIO、Postgres 替身 """
+
+    def __init__(self):
+        self.redis = LocalRedis()
+        self.tables: dict[str, list[dict]] = {"document": [], "document_chunk": [], "tenant_shard": []}
+        self.minio = LocalMinioClient([get_shard_config(DEFAULT_SHARD).minio_bucket_name])
+
+    def add_document(self, tenant_id: str, document_id: uuid.UUID, name: str, **columns: Any) -> None:
+        """ 写入一行 document 表 """
+        self.tables["document"].append({
+            "id": document_id, "tenant_id": tenant_id, "name": name, "object_name": name,
+            "status": "completed", "stage": "", "chunk_count": 0, "error": "", **columns,
+        })
+
+    def add_chunks(self, rows: Iterable[dict]) -> None:
+        """ 写入 document_chunk 表，每行的键为列名: id、document_id、tenant_id、chunk_index、content、keywords、meta """
+        self.tables["document_chunk"].extend(rows)
+
+    def install(self) -> None:
+        """ 在应用启动之前替换单例，应用启动时各组件的 init 不再连接外部服务 """
+        # Redis 客户端已存在时 init 跳过初始化
+        get_redis()._client = self.redis  # type: ignore[assignment]
+        postgres_module._instances[DEFAULT_SHARD] = LocalPostgres(self.tables)
+        minio_module._instances[DEFAULT_SHARD] = LocalMinIO(self.minio)
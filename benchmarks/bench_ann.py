@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 13:10
+@Author : YangFei
+@File   : bench_ann.py
+@Desc   : 本地向量索引 IVF-PQ 近似检索基准测试
+
+用法:
+    python -m benchmarks.bench_ann --rows 200000 --dim 512 --queries 1000 --top-k 10 --nprobe 4,16,64
+
+生成带聚类结构的随机向量写入本地索引并训练量化器，以精确检索结果为基准，
+对每个 nprobe 输出 recall@k，以及单进程和所有 CPU 核(每核一个进程)的 QPS。
+BLAS 线程数固定为 1，单核与多核的对比只反映进程数的差异。
+每个进程在计时之前先执行一批预热查询(--warmup)，把段文件读入页缓存、完成分区和倒排列表的加载，
+避免第一个计时的 nprobe(精确检索)承担冷启动开销。
+"""
+import os
+
+# 必须在导入 NumPy 之前设置
+for _name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_name, "1")
+
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+import multiprocessing as mp
+from multiprocessing.pool import Pool
+
+import numpy as np
+
+TENANT_ID = "bench"
+
+# 子进程中的索引实例
+_index = None
+
+
+def _configure(root: str, args: argparse.Namespace) -> None:
+    """ 通过环境变量配置本地索引，需要在读取配置之前调用 """
+    os.environ.update({
+        "VECTOR_STORE_BACKEND": "local",
+        "LOCAL_VECTOR_DIR": root,
+        "LOCAL_VECTOR_INDEX_TYPE": "ivfpq",
+        "LOCAL_VECTOR_ANN_MIN_ROWS": "1",
+        "LOCAL_VECTOR_NLIST": str(args.nlist),
+        "LOCAL_VECTOR_PQ_M": str(args.pq_m),
+        "LOCAL_VECTOR_RERANK": str(args.rerank),
+        "LOCAL_VECTOR_DTYPE": args.dtype,
+        "LOCAL_VECTOR_MAX_SEGMENTS": "1000000",
+    })
+
+
+def _generate(rows: int, dim: int, clusters: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """ 生成聚类中心附近的随机向量，返回数据和查询使用的聚类中心 """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    assign = rng.integers(0, clusters, rows)
+    data = centers[assign] + 0.5 * rng.normal(size=(rows, dim)).astype(np.float32)
+    return data, centers
+
+
+async def _build(data: np.ndarray, batch: int) -> float:
+    """ 写入所有向量并合并为一个段，返回耗时 """
+    from app.infrastructure.vector import VectorRecord
+    from app.infrastructure.vector.local_index import LocalVectorIndex
+
+    index = LocalVectorIndex()
+    await index.init()
+    start = time.perf_counter()
+    for offset in range(0, len(data), batch):
+        records = [VectorRecord(id=uuid.uuid4(), vector=vector) for vector in data[offset:offset + batch]]
+        await index.upsert(TENANT_ID, records)
+    await index.compact(TENANT_ID)
+    elapsed = time.perf_counter() - start
+    await index.shutdown()
+    return elapsed
+
+
+def _init_worker(root: str, args: argparse.Namespace, warmup: np.ndarray, nprobes: list[int], ready) -> None:
+    """ 子进程初始化，加载索引(段文件通过内存映射在进程间共享页缓存)并执行预热查询，
+    最后在屏障上等待同一进程池的其它进程，任一进程开始执行任务时整个进程池都已预热完成 """
+    global _index
+    _configure(root, args)
+    from app.infrastructure.vector.local_index import LocalVectorIndex
+
+    _index = LocalVectorIndex()
+    # 预先加载租户分区，避免计入检索耗时
+    _index._partition(TENANT_ID)
+    # 精确检索读取全部向量，近似检索读取量化器和倒排列表，两种路径都预热一遍
+    for nprobe in nprobes:
+        _search(warmup, args.top_k, nprobe)
+    ready.wait()
+
+
+def _ready() -> None:
+    """ 空任务，用于等待进程池初始化完成 """
+
+
+def _search(queries: np.ndarray, top_k: int, nprobe: int) -> list[list[uuid.UUID]]:
+    """ 在当前进程中逐条检索 """
+
+    async def _run():
+        return [
+            [hit.id for hit in await _index.search(TENANT_ID, query, top_k, nprobe=nprobe)]
+            for query in queries
+        ]
+
+    return asyncio.run(_run())
+
+
+def _timed_search(pool: Pool, processes: int, queries: np.ndarray, top_k: int, nprobe: int):
+    """ 把查询平均分给各个进程，返回结果和 QPS """
+    parts = np.array_split(queries, processes)
+    start = time.perf_counter()
+    results = pool.starmap(_search, [(part, top_k, nprobe) for part in parts], chunksize=1)
+    elapsed = time.perf_counter() - start
+    return [ids for part in results for ids in part], len(queries) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地向量索引 IVF-PQ 近似检索基准测试")
+    parser.add_argument("--rows", type=int, default=200_000, help="向量数量")
+    parser.add_argument("--dim", type=int, default=512, help="向量维度")
+    parser.add_argument("--clusters", type=int, default=2000, help="生成数据的聚类数量")
+    parser.add_argument("--queries", type=int, default=1000, help="查询数量")
+    parser.add_argument("--top-k", type=int, default=10, help="每次检索返回的结果数量")
+    parser.add_argument("--nlist", type=int, default=1024, help="倒排列表数量")
+    parser.add_argument("--pq-m", type=int, default=16, help="乘积量化的子空间数量")
+    parser.add_argument("--rerank", type=int, default=4, help="重排候选数为 top_k 的倍数")
+    parser.add_argument("--nprobe", default="1,4,16,64", help="逗号分隔的 nprobe 取值")
+    parser.add_argument("--dtype", default="float32", help="向量存储类型 float32/float16")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="多核测试的进程数")
+    parser.add_argument("--warmup", type=int, default=100, help="每个进程计时前执行的预热查询数量，0 表示不预热")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_ann_")
+    _configure(root, args)
+
+    data, centers = _generate(args.rows, args.dim, args.clusters, seed=0)
+    rng = np.random.default_rng(1)
+    queries = (centers[rng.integers(0, len(centers), args.queries)]
+               + 0.5 * rng.normal(size=(args.queries, args.dim))).astype(np.float32)
+
+    elapsed = asyncio.run(_build(data, batch=10_000))
+    print(f"rows={args.rows} dim={args.dim} nlist={args.nlist} m={args.pq_m} build={elapsed:.1f}s index={root}")
+
+    nprobes = [int(value) for value in args.nprobe.split(",")]
+    # 预热查询与计时查询来自同一分布，但不重复使用计时查询
+    warmup = (centers[rng.integers(0, len(centers), args.warmup)]
+              + 0.5 * rng.normal(size=(args.warmup, args.dim))).astype(np.float32)
+    warmup_nprobes = [0, max(nprobes)] if args.warmup > 0 else []
+
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1, initializer=_init_worker, initargs=(root, args, warmup, warmup_nprobes, ctx.Barrier(1))) as single, \
+            ctx.Pool(args.processes, initializer=_init_worker,
+                     initargs=(root, args, warmup, warmup_nprobes, ctx.Barrier(args.processes))) as multi:
+        # 进程池的初始化是异步的，等预热完成后再开始计时
+        single.apply(_ready)
+        multi.apply(_ready)
+        truth, exact_qps = _timed_search(single, 1, queries, args.top_k, nprobe=0)
+        _, exact_multi_qps = _timed_search(multi, args.processes, queries, args.top_k, nprobe=0)
+        print(f"{'exact':<10} recall@{args.top_k}=1.0000 qps(1 core)={exact_qps:9.1f} "
+              f"qps({args.processes} cores)={exact_multi_qps:9.1f}")
+
+        for nprobe in nprobes:
+            found, qps = _timed_search(single, 1, queries, args.top_k, nprobe)
+            _, multi_qps = _timed_search(multi, args.processes, queries, args.top_k, nprobe)
+            recall = np.mean([len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(found, truth)])
+            print(f"nprobe={nprobe:<4} recall@{args.top_k}={recall:.4f} qps(1 core)={qps:9.1f} "
+                  f"qps({args.processes} cores)={multi_qps:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 19:40
+@Author : YangFei
+@File   : bench_dedup.py
+@Desc   : 近似重复检测基准测试：MinHash 签名吞吐量、LSH 索引插入和查找延迟、重复检出率
+
+用法:
+    python -m benchmarks.bench_dedup --chunks 100000 --tokens 200 --dup-ratio 0.2 --edit-ratio 0.02
+
+生成随机词序列作为分块的分词结果，其中 dup-ratio 比例的分块由已有分块随机替换 edit-ratio 比例的词得到(近似重复)。
+先为全部分块计算签名并插入索引，再用新的近似重复和不重复的分块查询，输出查找延迟分位数、重复的检出率和误报率。
+指定 --fenci 时先用 Fenci 分词生成的文本测量分词耗时(需要加载分词模型)。
+"""
+import time
+import random
+import argparse
+import uuid
+
+import numpy as np
+
+
+def _vocabulary(size: int, rnd: random.Random) -> list[str]:
+    """ 生成随机词表 """
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rnd.choice(letters) for _ in range(rnd.randint(2, 8))) for _ in range(size)]
+
+
+def _mutate(tokens: list[str], ratio: float, vocabulary: list[str], rnd: random.Random) -> list[str]:
+    """ 随机替换一部分词，得到近似重复的分块 """
+    tokens = list(tokens)
+    for position in rnd.sample(range(len(tokens)), max(1, int(len(tokens) * ratio))):
+        tokens[position] = rnd.choice(vocabulary)
+    return tokens
+
+
+def _percentiles(values: list[float]) -> str:
+    """ 格式化延迟分位数(微秒) """
+    array = np.asarray(values) * 1e6
+    return " ".join(f"p{q}={np.percentile(array, q):.1f}us" for q in (50, 95, 99))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="近似重复检测基准测试")
+    parser.add_argument("--chunks", type=int, default=50000, help="索引中的分块数")
+    parser.add_argument("--tokens", type=int, default=200, help="每个分块的词数")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="词表大小")
+    parser.add_argument("--dup-ratio", type=float, default=0.2, help="近似重复分块的比例")
+    parser.add_argument("--edit-ratio", type=float, default=0.02, help="近似重复分块中被替换的词的比例")
+    parser.add_argument("--queries", type=int, default=2000, help="查询次数，一半为近似重复，一半为不重复")
+    parser.add_argument("--num-perm", type=int, default=128, help="MinHash 签名长度")
+    parser.add_argument("--bands", type=int, default=16, help="LSH 分段数")
+    parser.add_argument("--shingle", type=int, default=3, help="每个片段包含的连续词数")
+    parser.add_argument("--threshold", type=float, default=0.8, help="相似度阈值")
+    parser.add_argument("--fenci", action="store_true", help="同时测量 Fenci 分词的吞吐量")
+    args = parser.parse_args()
+
+    from app.application.services.ingestion.dedup import MinHasher, MinHashLSH
+
+    rnd = random.Random(42)
+    vocabulary = _vocabulary(args.vocabulary, rnd)
+    corpus: list[list[str]] = []
+    for _ in range(args.chunks):
+        if corpus and rnd.random() < args.dup_ratio:
+            corpus.append(_mutate(rnd.choice(corpus), args.edit_ratio, vocabulary, rnd))
+        else:
+            corpus.append([rnd.choice(vocabulary) for _ in range(args.tokens)])
+    print(f"chunks={args.chunks} tokens/chunk={args.tokens} num_perm={args.num_perm} bands={args.bands}")
+
+    if args.fenci:
+        from app.infrastructure.external.fenci import get_fenci_client
+
+        fenci = get_fenci_client()
+        texts = [" ".join(tokens) for tokens in corpus[:1000]]
+        start = time.perf_counter()
+        for text in texts:
+            fenci.get_tokens(text)
+        elapsed = time.perf_counter() - start
+        print(f"fenci      chunks/s={len(texts) / elapsed:10.1f}")
+
+    hasher = MinHasher(args.num_perm, args.shingle)
+    start = time.perf_counter()
+    signatures = [hasher.signature(tokens) for tokens in corpus]
+    elapsed = time.perf_counter() - start
+    print(f"signature  chunks/s={len(corpus) / elapsed:10.1f} tokens/s={len(corpus) * args.tokens / elapsed:12.1f}")
+
+    index = MinHashLSH(args.bands, args.num_perm // args.bands)
+    document_id = uuid.uuid4()
+    start = time.perf_counter()
+    for signature in signatures:
+        index.insert(uuid.uuid4(), document_id, signature)
+    elapsed = time.perf_counter() - start
+    print(f"insert     chunks/s={len(corpus) / elapsed:10.1f}")
+
+    # 一半查询是已有分块的近似重复，一半是随机生成的新分块
+    duplicates = [_mutate(rnd.choice(corpus), args.edit_ratio, vocabulary, rnd) for _ in range(args.queries // 2)]
+    uniques = [[rnd.choice(vocabulary) for _ in range(args.tokens)] for _ in range(args.queries // 2)]
+    query_document = uuid.uuid4()
+    latencies, found, false_positives = [], 0, 0
+    for expected, queries in ((True, duplicates), (False, uniques)):
+        for tokens in queries:
+            signature = hasher.signature(tokens)
+            start = time.perf_counter()
+            match = index.query(signature, args.threshold, exclude_document=query_document)
+            latencies.append(time.perf_counter() - start)
+            if match is not None and expected:
+                found += 1
+            elif match is not None:
+                false_positives += 1
+    print(f"lookup     {_percentiles(latencies)}")
+    print(f"detected={found / len(duplicates):.3f} false_positive={false_positives / len(uniques):.3f}")
+
+
+if __name__ == "__main__":
+    main()
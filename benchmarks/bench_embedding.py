@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 14:48
+@Author : YangFei
+@File   : bench_embedding.py
+@Desc   : 嵌入服务客户端微批处理基准测试
+
+用法:
+    python -m benchmarks.bench_embedding --callers 200 --calls 20 --tail-ratio 0.02
+    python -m benchmarks.bench_embedding --url http://127.0.0.1:8001   # 使用已启动的服务
+
+模拟大量并发调用方每次嵌入一条文本(例如检索时的查询语句)，分别在不合并批次(批次大小为 1)
+和微批处理两种配置下运行，输出吞吐量、调用延迟 p50/p95/p99、HTTP 请求数和平均批次大小。
+未指定 --url 时在进程内通过 httpx.ASGITransport 调用本地替身服务。
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+
+async def _run(args: argparse.Namespace, max_batch_size: int, hedge_quantile: float) -> None:
+    """ 使用指定的批次大小运行一轮 """
+    os.environ["EMBEDDING_MAX_BATCH_SIZE"] = str(max_batch_size)
+    os.environ["EMBEDDING_MAX_WAIT_MS"] = str(args.max_wait_ms)
+    os.environ["EMBEDDING_HEDGE_QUANTILE"] = str(hedge_quantile)
+    if args.url:
+        os.environ["EMBEDDING_SERVICE_URL"] = args.url
+
+    import httpx
+    from core.system_config import get_settings
+    from app.infrastructure.external.embedding import EmbeddingClient
+    from benchmarks.embedding_server import create_app
+
+    get_settings.cache_clear()
+    transport = None
+    if not args.url:
+        transport = httpx.ASGITransport(app=create_app(
+            base_ms=args.base_ms,
+            per_item_ms=args.per_item_ms,
+            slots=args.slots,
+            tail_ratio=args.tail_ratio,
+            tail_ms=args.tail_ms,
+        ))
+    client = EmbeddingClient(transport=transport)
+    await client.init()
+
+    latencies: list[float] = []
+
+    async def _caller(caller: int) -> None:
+        for call in range(args.calls):
+            start = time.perf_counter()
+            await client.embed_text(f"查询语句 {caller}-{call}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_caller(caller) for caller in range(args.callers)))
+    elapsed = time.perf_counter() - start
+    stats = client.stats
+    await client.shutdown()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    name = f"batch={max_batch_size} hedge={hedge_quantile}"
+    print(
+        f"{name:<22} texts/s={len(latencies) / elapsed:8.1f} "
+        f"p50={quantiles[49] * 1000:7.1f}ms p95={quantiles[94] * 1000:7.1f}ms p99={quantiles[98] * 1000:7.1f}ms "
+        f"requests={stats['requests']:<6} hedges={stats['hedges']:<4} avg_batch={stats['texts'] / max(stats['batches'], 1):6.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="嵌入服务客户端微批处理基准测试")
+    parser.add_argument("--url", default=None, help="嵌入服务地址，不指定时使用进程内替身服务")
+    parser.add_argument("--callers", type=int, default=200, help="并发调用方数量")
+    parser.add_argument("--calls", type=int, default=20, help="每个调用方的调用次数")
+    parser.add_argument("--batch-size", type=int, default=64, help="微批处理的最大批次大小")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="批次未满时最多等待的时间(毫秒)")
+    parser.add_argument("--base-ms", type=float, default=20.0, help="替身服务每个批次的固定耗时(毫秒)")
+    parser.add_argument("--per-item-ms", type=float, default=0.5, help="替身服务每条文本的耗时(毫秒)")
+    parser.add_argument("--slots", type=int, default=4, help="替身服务同时推理的批次数")
+    parser.add_argument("--tail-ratio", type=float, default=0.02, help="替身服务长尾请求的比例")
+    parser.add_argument("--tail-ms", type=float, default=300.0, help="长尾请求额外增加的耗时(毫秒)")
+    args = parser.parse_args()
+
+    asyncio.run(_run(args, max_batch_size=1, hedge_quantile=0))
+    asyncio.run(_run(args, max_batch_size=args.batch_size, hedge_quantile=0))
+    asyncio.run(_run(args, max_batch_size=args.batch_size, hedge_quantile=0.95))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 20:30
+@Author : YangFei
+@File   : bench_load.py
+@Desc   : 端到端压测：在进程内启动 app.main:app，存储服务使用本地替身，按请求配比并发发送请求，输出每个路由的吞吐和延迟分位数
+
+用法:
+    python -m benchmarks.bench_load --concurrency 32 --duration 30
+    python -m benchmarks.bench_load --mix "search=6,answer=1,health=1,live=1,export=1" --output results/load.json
+    python -m benchmarks.bench_load --baseline results/load.json --max-regression 15
+
+应用完整执行启动和关闭流程，路由、中间件、服务层和 SQL 语句都与线上相同，只替换外部依赖:
+Redis、MinIO、Postgres 使用 benchmarks/backends.py 中的内存替身，向量存储使用临时目录中的本地索引，
+嵌入服务和大模型服务使用 embedding_server、llm_server 的替身应用，通过 httpx 的 ASGI 传输层在进程内调用，不经过网络。
+压测前写入一个合成语料(--documents 个文档，每个文档 --chunks 个分块)的分块表和向量。
+
+压测是闭环的: --concurrency 个客户端各自连续发送请求，收到响应后立即发送下一个，按 --mix 的权重随机选择路由。
+先预热 --warmup 秒(不计入结果)，再压测 --duration 秒或直到完成 --requests 个请求。
+查询语句从 --query-pool 个问题中随机选择，问题数越少，语义查询缓存的命中率越高。
+ASGI 传输层会读完整个响应再返回，流式问答(answer)的延迟是整个回答流的耗时，而不是首个 token 的耗时。
+关键词检索依赖 hanlp 分词，没有安装时关键词检索失败，检索降级为只使用向量检索，分词器的健康检查也会失败。
+
+结果保存为 JSON(--output)，包括压测参数、运行环境和每个路由的统计。指定 --baseline 时与之前的结果比较，
+某个路由的 p95 延迟上升或吞吐下降超过 --max-regression 百分比时以非零状态退出，可以在持续集成中作为检查。
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+from typing import Optional
+
+# 压测的路由: 名称 -> 方法、路径
+ROUTES = {
+    "search": ("POST", "/api/retrieval/search"),
+    "answer": ("POST", "/api/query/stream"),
+    "export": ("GET", "/api/documents/{document_id}/chunks/export"),
+    "health": ("GET", "/api/status/"),
+    "live": ("GET", "/api/status/live"),
+    "metrics": ("GET", "/metrics"),
+}
+DEFAULT_MIX = "search=6,answer=1,export=1,health=1,live=1"
+
+# 压测使用的租户
+TENANT_ID = "bench"
+
+# 合成语料的词表，检索和问答的问题也由这些词组成
+VOCABULARY = (
+    "向量 检索 分块 文档 租户 缓存 索引 嵌入 模型 查询 排序 过滤 延迟 吞吐 存储 分片 "
+    "数据库 对象 压缩 并发 队列 批次 日志 指标 健康 超时 重试 熔断 部署 进程"
+).split()
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """ 解析请求配比，例如 "search=6,answer=1" """
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in ROUTES:
+            raise SystemExit(f"未知的路由: {name}，可选: {', '.join(ROUTES)}")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise SystemExit("请求配比中至少有一个路由的权重大于 0")
+    return mix
+
+
+def _sentence(rnd: random.Random, words: int) -> str:
+    return "".join(rnd.choice(VOCABULARY) for _ in range(words))
+
+
+def seed_corpus(backends, documents: int, chunks: int, seed: int) -> tuple[list[uuid.UUID], list[dict]]:
+    """ 写入合成语料的文档和分块表
+    :return: 文档ID，分块(用于写入向量存储)
+    """
+    rnd = random.Random(seed)
+    document_ids, rows = [], []
+    for doc_index in range(documents):
+        document_id = uuid.UUID(int=rnd.getrandbits(128), version=4)
+        document_ids.append(document_id)
+        backends.add_document(TENANT_ID, document_id, f"doc-{doc_index}.txt", chunk_count=chunks)
+        for chunk_index in range(chunks):
+            content = _sentence(rnd, 40)
+            rows.append({
+                "id": uuid.UUID(int=rnd.getrandbits(128), version=4),
+                "document_id": document_id,
+                "tenant_id": TENANT_ID,
+                "chunk_index": chunk_index,
+                "content": content,
+                "content_hash": "",
+                "keywords": sorted(set(rnd.sample(VOCABULARY, 5))),
+                "meta": {"page": chunk_index // 4},
+            })
+    backends.add_chunks(rows)
+    return document_ids, rows
+
+
+async def index_corpus(rows: list[dict], dim: int, batch: int = 512) -> None:
+    """ 分块的向量写入本地向量索引，向量与嵌入服务替身对同一文本生成的向量相同 """
+    from app.infrastructure.vector import get_vector_store
+    from app.infrastructure.vector.base import VectorRecord
+    from benchmarks.embedding_server import hash_vector
+
+    store = get_vector_store()
+    for start in range(0, len(rows), batch):
+        await store.upsert(TENANT_ID, [
+            VectorRecord(
+                id=row["id"],
+                vector=hash_vector(row["content"], dim),
+                metadata={"document_id": str(row["document_id"]), "content": row["content"], **row["meta"]},
+            )
+            for row in rows[start:start + batch]
+        ])
+
+
+class LoadGenerator:
+    """ 闭环压测客户端，按权重随机选择路由，记录每个请求的路由、状态码和耗时 """
+
+    def __init__(self, client, mix: dict[str, float], queries: list[str], document_ids: list[uuid.UUID], seed: int):
+        self._client = client
+        self._names = list(mix)
+        self._weights = [mix[name] for name in self._names]
+        self._queries = queries
+        self._document_ids = document_ids
+        self._rnd = random.Random(seed)
+        # 路由 -> [(耗时(秒), 状态码)]，状态码为 0 表示请求异常
+        self.samples: dict[str, list[tuple[float, int]]] = {name: [] for name in self._names}
+        self.errors: dict[str, dict[str, int]] = {name: {} for name in self._names}
+
+    def _build(self, name: str) -> tuple[str, str, dict]:
+        """ 生成一个请求的方法、路径和参数 """
+        method, path = ROUTES[name]
+        if name == "search":
+            return method, path, {"json": {"tenant_id": TENANT_ID, "query": self._rnd.choice(self._queries), "top_k": 10}}
+        if name == "answer":
+            return method, path, {"json": {"tenant_id": TENANT_ID, "query": self._rnd.choice(self._queries), "top_k": 5}}
+        if name == "export":
+            document_id = self._rnd.choice(self._document_ids)
+            return method, path.format(document_id=document_id), {"params": {"tenant_id": TENANT_ID}}
+        return method, path, {}
+
+    async def _once(self, record: bool) -> None:
+        name = self._rnd.choices(self._names, self._weights)[0]
+        method, path, kwargs = self._build(name)
+        start = time.perf_counter()
+        try:
+            response = await self._client.request(method, path, **kwargs)
+            status = response.status_code
+        except Exception as e:
+            status = 0
+            if record:
+                key = type(e).__name__
+                self.errors[name][key] = self.errors[name].get(key, 0) + 1
+        elapsed = time.perf_counter() - start
+        if record:
+            self.samples[name].append((elapsed, status))
+            if status >= 400:
+                self.errors[name][str(status)] = self.errors[name].get(str(status), 0) + 1
+
+    async def run(self, concurrency: int, duration: float, requests: int = 0, record: bool = True) -> float:
+        """ 并发发送请求直到超过 duration 秒或完成 requests 个请求，返回实际耗时(秒) """
+        deadline = time.perf_counter() + duration
+        remaining = [requests]
+
+        async def _client_loop() -> None:
+            while time.perf_counter() < deadline:
+                if requests:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                await self._once(record)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_client_loop() for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """ 线性插值的分位数，values 已排序 """
+    if len(values) == 1:
+        return values[0]
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples: list[tuple[float, int]], elapsed: float, errors: Optional[dict] = None) -> dict:
+    """ 一个路由的吞吐和延迟统计，延迟单位为毫秒 """
+    latencies = sorted(latency * 1000 for latency, _ in samples)
+    failed = sum(1 for _, status in samples if status == 0 or status >= 400)
+    stats = {
+        "requests": len(samples),
+        "errors": failed,
+        "error_detail": errors or {},
+        "throughput": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+    }
+    if latencies:
+        stats.update({
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "p50_ms": round(_percentile(latencies, 0.50), 3),
+            "p95_ms": round(_percentile(latencies, 0.95), 3),
+            "p99_ms": round(_percentile(latencies, 0.99), 3),
+            "max_ms": round(latencies[-1], 3),
+        })
+    return stats
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list[str]:
+    """ 与之前的结果比较，返回 p95 延迟上升或吞吐下降超过 max_regression 百分比的路由说明 """
+    regressions = []
+    for name, stats in current["routes"].items():
+        base = baseline.get("routes", {}).get(name)
+        if not base or not base.get("requests") or not stats.get("requests"):
+            continue
+        if base.get("p95_ms"):
+            change = (stats["p95_ms"] / base["p95_ms"] - 1) * 100
+            if change > max_regression:
+                regressions.append(f"{name}: p95 {base['p95_ms']:.1f}ms -> {stats['p95_ms']:.1f}ms (+{change:.1f}%)")
+        if base.get("throughput"):
+            change = (1 - stats["throughput"] / base["throughput"]) * 100
+            if change > max_regression:
+                regressions.append(f"{name}: 吞吐 {base['throughput']:.1f} -> {stats['throughput']:.1f} req/s (-{change:.1f}%)")
+    return regressions
+
+
+def _print_report(result: dict) -> None:
+    print(f"{'路由':<10}{'请求数':>8}{'错误':>6}{'req/s':>9}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, stats in result["routes"].items():
+        if not stats["requests"]:
+            continue
+        print(
+            f"{name:<10}{stats['requests']:>8}{stats['errors']:>6}{stats['throughput']:>9.1f}"
+            f"{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}"
+        )
+        if stats["error_detail"]:
+            print(f"{'':<10}错误明细: {stats['error_detail']}")
+    print("延迟单位为毫秒")
+
+
+def _configure_environment(args: argparse.Namespace, vector_dir: str) -> None:
+    """ 导入应用之前设置配置项，配置在第一次读取后缓存 """
+    os.environ["VECTOR_STORE_BACKEND"] = "local"
+    os.environ["LOCAL_VECTOR_DIR"] = vector_dir
+    os.environ["LOG_LEVEL"] = args.log_level
+    os.environ["RETRIEVAL_CACHE_ENABLED"] = "true" if args.cache else "false"
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    import httpx
+
+    from benchmarks import embedding_server, llm_server
+    from benchmarks.backends import LocalBackends
+
+    # 配置项设置完成后才导入应用
+    from app.main import app
+    from app.infrastructure.external.embedding import get_embedding_client
+    from app.infrastructure.external.llm import get_llm_client
+
+    backends = LocalBackends()
+    document_ids, rows = seed_corpus(backends, args.documents, args.chunks, args.seed)
+    backends.install()
+    get_embedding_client()._transport = httpx.ASGITransport(app=embedding_server.create_app(
+        dim=args.dim, base_ms=args.embedding_ms, per_item_ms=args.embedding_item_ms, slots=args.embedding_slots,
+    ))
+    get_llm_client()._transport = httpx.ASGITransport(app=llm_server.create_app(
+        prefill_ms=args.llm_prefill_ms, token_ms=args.llm_token_ms, tokens=args.llm_tokens,
+    ))
+
+    rnd = random.Random(args.seed)
+    queries = [_sentence(rnd, rnd.randint(3, 8)) for _ in range(args.query_pool)]
+    mix = parse_mix(args.mix)
+
+    async with app.router.lifespan_context(app):
+        await index_corpus(rows, args.dim)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            generator = LoadGenerator(client, mix, queries, document_ids, args.seed)
+            if args.warmup > 0:
+                await generator.run(args.concurrency, args.warmup, record=False)
+            duration = args.duration if not args.requests else float("inf")
+            elapsed = await generator.run(args.concurrency, duration, args.requests)
+
+    routes = {
+        name: summarize(samples, elapsed, generator.errors[name])
+        for name, samples in generator.samples.items()
+    }
+    routes["total"] = summarize([sample for samples in generator.samples.values() for sample in samples], elapsed)
+    return {
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "baseline", "max_regression")
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "elapsed": round(elapsed, 3),
+        "routes": routes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="端到端压测(存储服务使用本地替身)")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发客户端数")
+    parser.add_argument("--duration", type=float, default=20.0, help="压测时长(秒)")
+    parser.add_argument("--requests", type=int, default=0, help="压测的请求总数，指定时忽略 --duration")
+    parser.add_argument("--warmup", type=float, default=3.0, help="预热时长(秒)，不计入结果")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"请求配比，可选路由: {', '.join(ROUTES)}")
+    parser.add_argument("--query-pool", type=int, default=200, help="问题数量，越少语义查询缓存的命中率越高")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="关闭语义查询缓存")
+    parser.add_argument("--documents", type=int, default=100, help="合成语料的文档数")
+    parser.add_argument("--chunks", type=int, default=50, help="每个文档的分块数")
+    parser.add_argument("--dim", type=int, default=512, help="向量维度")
+    parser.add_argument("--embedding-ms", type=float, default=10.0, help="嵌入服务替身每个批次的耗时(毫秒)")
+    parser.add_argument("--embedding-item-ms", type=float, default=0.5, help="嵌入服务替身每条文本的耗时(毫秒)")
+    parser.add_argument("--embedding-slots", type=int, default=4, help="嵌入服务替身同时推理的批次数")
+    parser.add_argument("--llm-prefill-ms", type=float, default=50.0, help="大模型替身首个 token 之前的耗时(毫秒)")
+    parser.add_argument("--llm-token-ms", type=float, default=2.0, help="大模型替身相邻 token 之间的耗时(毫秒)")
+    parser.add_argument("--llm-tokens", type=int, default=32, help="大模型替身每个回答的 token 数")
+    parser.add_argument("--timeout", type=float, default=30.0, help="客户端请求超时(秒)")
+    parser.add_argument("--log-level", default="ERROR", help="应用的日志级别")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", help="结果保存为 JSON 文件")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="允许的 p95 延迟上升和吞吐下降(百分比)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="neon_bench_") as vector_dir:
+        _configure_environment(args, vector_dir)
+        result = asyncio.run(_run(args))
+
+    _print_report(result)
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.max_regression)
+        if regressions:
+            print(f"与 {args.baseline} 相比性能下降超过 {args.max_regression}%:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"与 {args.baseline} 相比没有超过 {args.max_regression}% 的性能下降")
+
+
+if __name__ == "__main__":
+    main()
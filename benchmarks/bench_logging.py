@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 18:30
+@Author : YangFei
+@File   : bench_logging.py
+@Desc   : 日志基准测试：请求路径上单次日志调用在调用线程中的耗时
+
+用法:
+    python -m benchmarks.bench_logging --calls 20000 --sink-latency-us 50
+    python -m benchmarks.bench_logging --sink-latency-us 0 --request-id
+
+日志写入一个模拟的输出流，每次写入耗时 --sink-latency-us 微秒(模拟终端、管道或日志采集进程处理慢时的阻塞写入)，
+逐次测量调用 logger.info 等方法的耗时，即事件循环线程被占用的时间，分别对比:
+    - 同步写入与后台线程写入(log_async)，文本与 JSON 格式(log_format)
+    - 按日志器采样(log_sampling)后的调试日志
+    - DEBUG 关闭时 f-string 与 % 参数的调试日志(f-string 在判断日志等级之前就已经拼接好了消息)
+后台线程写入时写入速度跟不上调用速度的部分会因队列满被丢弃，丢弃的条数一并输出。
+"""
+import sys
+import time
+import logging
+import argparse
+import statistics
+
+# 模拟请求路径上的日志内容
+TEXT = "预先加载的分词模型由所有工作进程共享，写时复制只复制被修改的页面。" * 4
+TOKENS = ["分词", "模型", "工作", "进程", "共享", "复制", "页面"]
+
+
+class _SlowSink:
+    """ 每次写入阻塞指定时间的输出流 """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        self.lines += 1
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _configure(sink: _SlowSink, log_async: bool, log_format: str, level: str = "DEBUG",
+               sampling: dict | None = None) -> None:
+    """ 按指定配置重新初始化日志系统，输出写入模拟的输出流 """
+    from core.log_config import setup_logging
+    from core.system_config import get_settings
+
+    settings = get_settings()
+    settings.log_async = log_async
+    settings.log_format = log_format
+    settings.log_level = level
+    settings.log_sampling = sampling or {}
+    settings.log_rate_limits = {}
+    stderr, sys.stderr = sys.stderr, sink
+    try:
+        setup_logging()
+    finally:
+        sys.stderr = stderr
+
+
+def _measure(call, calls: int) -> list[float]:
+    """ 逐次调用并测量耗时(微秒) """
+    timings = []
+    for i in range(calls):
+        start = time.perf_counter_ns()
+        call(i)
+        timings.append((time.perf_counter_ns() - start) / 1000)
+    return timings
+
+
+def _dropped() -> int:
+    from core.log_config import LOG_RECORDS_DROPPED
+
+    return int(sum(value for _, value in LOG_RECORDS_DROPPED.samples()))
+
+
+def _report(name: str, timings: list[float], dropped: int, elapsed: float) -> None:
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<32}{statistics.fmean(timings):>9.2f}{timings[len(timings) // 2]:>9.2f}{p99:>9.2f}"
+          f"{max(timings):>10.1f}{elapsed:>9.2f}s{dropped:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日志调用耗时基准测试")
+    parser.add_argument("--calls", type=int, default=20000, help="每种方式的日志调用次数")
+    parser.add_argument("--sink-latency-us", type=float, default=20.0, help="模拟的输出流每次写入的耗时(微秒)")
+    parser.add_argument("--request-id", action="store_true", help="在请求上下文中记录日志(附带请求 ID)")
+    args = parser.parse_args()
+
+    from core.log_config import _stop_listener
+    from core.request_context import new_request_id, request_id_var
+
+    if args.request_id:
+        request_id_var.set(new_request_id())
+    logger = logging.getLogger("bench.request")
+
+    def _info(i: int) -> None:
+        logger.info("检索完成: kb=%s, 命中 %d 条, 耗时 %.1fms", "kb-1", i % 50, 12.5)
+
+    def _debug_fstring(i: int) -> None:
+        logger.debug(f"开始分割文本: {TEXT[:20]}..., 提取的分词: {TOKENS}")
+
+    def _debug_args(i: int) -> None:
+        logger.debug("开始分割文本: %.20s..., 提取的分词: %s", TEXT, TOKENS)
+
+    # 名称, 是否后台写入, 格式, 日志等级, 采样规则, 调用
+    cases = [
+        ("同步写入 text", False, "text", "DEBUG", None, _info),
+        ("同步写入 json", False, "json", "DEBUG", None, _info),
+        ("后台写入 text", True, "text", "DEBUG", None, _info),
+        ("后台写入 json", True, "json", "DEBUG", None, _info),
+        ("后台写入 json 采样 1%", True, "json", "DEBUG", {"bench": 0.01}, _debug_args),
+        ("DEBUG 关闭 f-string", True, "json", "INFO", None, _debug_fstring),
+        ("DEBUG 关闭 % 参数", True, "json", "INFO", None, _debug_args),
+    ]
+
+    print(f"输出流每次写入 {args.sink_latency_us:g}us, 每种方式 {args.calls} 次调用, 单位微秒")
+    print(f"{'方式':<30}{'平均':>8}{'p50':>9}{'p99':>9}{'最大':>8}{'总耗时':>8}{'丢弃':>6}")
+    for name, log_async, log_format, level, sampling, call in cases:
+        sink = _SlowSink(args.sink_latency_us / 1_000_000)
+        _configure(sink, log_async, log_format, level, sampling)
+        dropped = _dropped()
+        start = time.perf_counter()
+        timings = _measure(call, args.calls)
+        elapsed = time.perf_counter() - start
+        _stop_listener()
+        _report(name, timings, _dropped() - dropped, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 10:05
+@Author : YangFei
+@File   : bench_metrics.py
+@Desc   : 请求指标开销基准测试：计时中间件对单个请求的额外耗时，以及输出 /metrics 的耗时
+
+用法:
+    python -m benchmarks.bench_metrics --requests 5000 --routes 20 --multiproc 8
+
+直接以 ASGI 方式调用一个只返回固定内容的 FastAPI 应用(不经过网络和 HTTP 客户端)，
+交替测量不加中间件和加上 MetricsMiddleware 时的单次请求耗时，差值即中间件的开销。
+再测量输出 Prometheus 文本格式的耗时(包含上面的请求产生的 --routes 个路由的指标)，
+指定 --multiproc 时在临时目录中模拟多个进程的指标文件，测量合并文件的耗时。
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+
+def _create_app(with_middleware: bool, routes: int) -> FastAPI:
+    """ 创建测试应用，路由带路径参数，与实际接口的路由匹配开销相近 """
+    from app.interfaces.middlewares import MetricsMiddleware
+
+    app = FastAPI()
+    for i in range(routes):
+        app.add_api_route(f"/route{i}/{{item_id}}", lambda item_id: PlainTextResponse("ok"), methods=["GET"])
+    if with_middleware:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def _call(app: FastAPI, path: str) -> None:
+    """ 以 ASGI 方式调用一次，丢弃响应 """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8000),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def _bench_requests(app: FastAPI, requests: int, routes: int) -> list[float]:
+    """ 依次调用各路由，返回每次请求的耗时(秒) """
+    for i in range(routes):
+        await _call(app, f"/route{i}/warmup")
+    latencies = []
+    for i in range(requests):
+        path = f"/route{i % routes}/{i}"
+        start = time.perf_counter()
+        await _call(app, path)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _summary(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return (f"mean={sum(latencies) / n * 1e6:7.1f}us  p50={latencies[n // 2] * 1e6:7.1f}us  "
+            f"p99={latencies[int(n * 0.99)] * 1e6:7.1f}us")
+
+
+def _bench_render(registry, iterations: int) -> float:
+    """ 输出指标的平均耗时(秒) """
+    registry.render()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        registry.render()
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="请求指标开销基准测试")
+    parser.add_argument("--requests", type=int, default=5000, help="每种方式的请求次数")
+    parser.add_argument("--routes", type=int, default=20, help="路由数量")
+    parser.add_argument("--rounds", type=int, default=5, help="交替运行的轮数")
+    parser.add_argument("--multiproc", type=int, default=0, help="模拟的工作进程数，0 表示只测量单进程")
+    args = parser.parse_args()
+
+    from core.metrics import MetricsRegistry, get_metrics_registry
+
+    # 两种方式交替运行多轮，各取平均耗时最低的一轮，减少机器负载波动的影响
+    apps = {"无中间件": _create_app(False, args.routes), "MetricsMiddleware": _create_app(True, args.routes)}
+    best: dict[str, list[float]] = {}
+    for _ in range(args.rounds):
+        for name, app in apps.items():
+            latencies = asyncio.run(_bench_requests(app, args.requests, args.routes))
+            if name not in best or sum(latencies) < sum(best[name]):
+                best[name] = latencies
+    for name, latencies in best.items():
+        print(f"{name:<18}{_summary(latencies)}")
+    overhead = (sum(best["MetricsMiddleware"]) - sum(best["无中间件"])) / args.requests
+    print(f"中间件平均开销: {overhead * 1e6:.1f}us/请求")
+
+    registry = get_metrics_registry()
+    print(f"输出 /metrics(单进程, {args.routes} 个路由): {_bench_render(registry, 50) * 1000:.2f}ms")
+
+    if args.multiproc:
+        with tempfile.TemporaryDirectory() as directory:
+            # 每个模拟进程写入一份与本进程相同的指标，合并时按标签累加
+            snapshot = registry.snapshot()
+            for i in range(args.multiproc):
+                worker = MetricsRegistry(directory)
+                worker._process_key = f"{os.getpid()}_{i}"
+                worker.snapshot = lambda: snapshot
+                worker.flush()
+            merged = MetricsRegistry(directory)
+            print(f"输出 /metrics({args.multiproc} 个进程的指标文件): {_bench_render(merged, 20) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
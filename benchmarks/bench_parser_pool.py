@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/18 14:42
+@Author : YangFei
+@File   : bench_parser_pool.py
+@Desc   : 文档解析进程池吞吐量基准测试
+
+用法:
+    python -m benchmarks.bench_parser_pool --corpus ./samples --workers 4 --repeat 3 --inline
+
+对样例目录中的所有文件并发解析，输出文档/秒、MB/秒、元素/秒以及失败数量；
+指定 --inline 时额外在当前进程中顺序解析一遍作为对比基线。
+"""
+import os
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+
+def _load_corpus(corpus: Path) -> list[tuple[str, bytes]]:
+    """ 读取样例目录中的所有文件 """
+    files = [path for path in sorted(corpus.rglob("*")) if path.is_file()]
+    if not files:
+        raise SystemExit(f"样例目录为空: {corpus}")
+    return [(path.name, path.read_bytes()) for path in files]
+
+
+def _report(name: str, docs: int, size: int, elements: int, failures: int, elapsed: float) -> None:
+    """ 输出一组测试结果 """
+    print(
+        f"{name:<8} docs={docs:<5} failures={failures:<3} elapsed={elapsed:8.2f}s "
+        f"docs/s={docs / elapsed:8.2f} MB/s={size / elapsed / 1024 / 1024:7.2f} elements/s={elements / elapsed:9.1f}"
+    )
+
+
+async def _bench_pool(corpus: list[tuple[str, bytes]], repeat: int) -> None:
+    """ 使用解析进程池并发解析 """
+    from app.infrastructure.external.parser_pool import get_parser_pool, DocumentParseError
+
+    pool = get_parser_pool()
+    started = time.perf_counter()
+    await pool.init()
+    print(f"进程池启动耗时: {time.perf_counter() - started:.2f}s, 进程数: {pool.size}")
+
+    elements = failures = 0
+    # 并发度与进程数相同，更多的并发只会在进程池上排队
+    semaphore = asyncio.Semaphore(pool.size)
+
+    async def _parse(file_name: str, data: bytes) -> None:
+        nonlocal elements, failures
+        async with semaphore:
+            try:
+                async for _ in pool.parse(file_name, data):
+                    elements += 1
+            except DocumentParseError as e:
+                failures += 1
+                print(f"解析失败: {e}")
+
+    jobs = corpus * repeat
+    started = time.perf_counter()
+    await asyncio.gather(*(_parse(file_name, data) for file_name, data in jobs))
+    elapsed = time.perf_counter() - started
+    await pool.shutdown()
+
+    _report("pool", len(jobs), sum(len(data) for _, data in jobs), elements, failures, elapsed)
+
+
+def _bench_inline(corpus: list[tuple[str, bytes]], repeat: int) -> None:
+    """ 在当前进程中顺序解析，作为对比基线 """
+    import io
+    from unstructured.partition.auto import partition
+
+    elements = failures = 0
+    jobs = corpus * repeat
+    started = time.perf_counter()
+    for file_name, data in jobs:
+        try:
+            elements += sum(1 for element in partition(file=io.BytesIO(data), metadata_filename=file_name)
+                            if element.text and element.text.strip())
+        except Exception as e:
+            failures += 1
+            print(f"解析失败: {file_name}, {e}")
+    elapsed = time.perf_counter() - started
+
+    _report("inline", len(jobs), sum(len(data) for _, data in jobs), elements, failures, elapsed)
+
+
+def main() -> None:
+    """ 解析命令行参数并运行基准测试 """
+    parser = argparse.ArgumentParser(description="文档解析进程池吞吐量基准测试")
+    parser.add_argument("--corpus", type=Path, required=True, help="样例文件目录")
+    parser.add_argument("--workers", type=int, default=0, help="解析进程数，0 表示使用 CPU 核数")
+    parser.add_argument("--repeat", type=int, default=1, help="样例重复次数")
+    parser.add_argument("--inline", action="store_true", help="同时在当前进程中顺序解析作为对比")
+    args = parser.parse_args()
+
+    # 进程池读取系统配置，需要在导入之前设置
+    os.environ["PARSER_WORKERS"] = str(args.workers)
+    corpus = _load_corpus(args.corpus)
+    print(f"样例文件: {len(corpus)} 个, 共 {sum(len(data) for _, data in corpus) / 1024 / 1024:.2f} MB")
+
+    asyncio.run(_bench_pool(corpus, args.repeat))
+    if args.inline:
+        _bench_inline(corpus, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
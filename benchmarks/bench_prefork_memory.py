@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 16:40
+@Author : YangFei
+@File   : bench_prefork_memory.py
+@Desc   : 多进程部署的内存测量：对比工作进程各自加载模型、主进程预加载、主进程预加载并冻结堆时每个工作进程独占的内存
+
+用法:
+    python -m benchmarks.bench_prefork_memory --workers 4 --objects 1000000 --weights-mb 200
+    python -m benchmarks.bench_prefork_memory --workers 4 --fenci
+
+与 gunicorn 的预加载方式相同：主进程(每种方式一个新进程)加载模型后 fork 出工作进程，
+工作进程执行 reset_after_fork，再模拟处理请求: 查找词表并执行完整的垃圾回收，之后测量其内存:
+    USS  进程独占的物理内存，即与其它进程共享的页面被复制后的部分，工作进程越多，总内存按 USS 增长
+    PSS  共享页面按共享进程数平摊后的内存
+主进程都先导入应用(与 preload_app 相同)，三种方式的差别只在模型由谁加载、是否冻结堆。
+默认使用合成的模型：大量小对象组成的词表(与分词模型中的词表、字典树相近，会被垃圾回收遍历)加上一个大数组(模型权重)。
+指定 --fenci 时加载真实的 HanLP 分词模型(需要安装 hanlp 并下载模型)。
+"""
+import gc
+import os
+import sys
+import json
+import random
+import argparse
+import subprocess
+
+MODES = ("worker", "preload", "preload+freeze")
+
+
+class _SyntheticModel:
+    """ 合成的模型：词表和权重 """
+
+    def __init__(self, objects: int, weights_mb: int):
+        import numpy as np
+
+        # 每个词对应一个包含 ID 和子词列表的元组，都是会被垃圾回收跟踪的容器对象
+        self.vocab = {f"词{i}": (i, [i % 97, i % 89]) for i in range(objects)}
+        self.weights = np.ones(weights_mb * 1024 * 1024 // 4, dtype=np.float32)
+
+    def lookup(self, keys: list[str]) -> int:
+        """ 只读地查找词表，与分词时的访问方式相同 """
+        return sum(self.vocab[key][0] for key in keys if key in self.vocab) + int(self.weights[0])
+
+
+def _load_model(args: argparse.Namespace):
+    if args.fenci:
+        from app.infrastructure.external.fenci import get_fenci_client
+        return get_fenci_client()
+    return _SyntheticModel(args.objects, args.weights_mb)
+
+
+def _serve(model, args: argparse.Namespace) -> None:
+    """ 模拟处理请求 """
+    if args.fenci:
+        model.get_tokens("预先加载的分词模型由所有工作进程共享。")
+    else:
+        rng = random.Random(os.getpid())
+        keys = [f"词{rng.randrange(args.objects)}" for _ in range(args.lookups)]
+        model.lookup(keys)
+    # 请求处理过程中会发生垃圾回收，执行一次完整回收模拟长时间运行后的状态
+    gc.collect()
+
+
+def _run_master(mode: str, args: argparse.Namespace) -> dict:
+    """ 作为主进程运行一种方式，返回各工作进程的内存(MB) """
+    import psutil
+
+    if mode == "preload+freeze":
+        gc.disable()
+    # 三种方式都与 preload_app 相同，由主进程导入应用，差别只在模型由谁加载
+    import app.main  # noqa: F401
+    from app.infrastructure.prefork import freeze_heap, reset_after_fork
+
+    model = _load_model(args) if mode != "worker" else None
+    if mode == "preload+freeze":
+        freeze_heap()
+
+    children = []
+    for _ in range(args.workers):
+        ready_r, ready_w = os.pipe()
+        exit_r, exit_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            os.close(exit_w)
+            reset_after_fork()
+            # 各自加载时模型需要在测量期间保持存活
+            worker_model = model if model is not None else _load_model(args)
+            _serve(worker_model, args)
+            os.write(ready_w, b"1")
+            os.read(exit_r, 1)
+            os._exit(0)
+        os.close(ready_w)
+        os.close(exit_r)
+        children.append((pid, ready_r, exit_w))
+
+    usage = []
+    for pid, ready_r, _ in children:
+        os.read(ready_r, 1)
+    for pid, _, _ in children:
+        info = psutil.Process(pid).memory_full_info()
+        usage.append({"uss": info.uss / 1024 / 1024, "pss": info.pss / 1024 / 1024, "rss": info.rss / 1024 / 1024})
+    for pid, ready_r, exit_w in children:
+        os.write(exit_w, b"1")
+        os.waitpid(pid, 0)
+    return {"mode": mode, "workers": usage, "master_rss": psutil.Process().memory_info().rss / 1024 / 1024}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多进程部署的内存测量")
+    parser.add_argument("--workers", type=int, default=4, help="工作进程数")
+    parser.add_argument("--objects", type=int, default=1_000_000, help="合成词表的词数")
+    parser.add_argument("--weights-mb", type=int, default=200, help="合成权重的大小(MB)")
+    parser.add_argument("--lookups", type=int, default=1000, help="每个工作进程模拟请求时查找的词数")
+    parser.add_argument("--fenci", action="store_true", help="使用真实的 HanLP 分词模型")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print("RESULT " + json.dumps(_run_master(args.mode, args)))
+        return
+
+    print(f"{'方式':<16}{'USS/进程':>10}{'PSS/进程':>10}{'RSS/进程':>10}{'工作进程 USS 合计':>18}")
+    for mode in MODES:
+        # 每种方式在新进程中运行，互不影响
+        command = [sys.executable, "-m", "benchmarks.bench_prefork_memory", "--mode", mode] + sys.argv[1:]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(next(line[7:] for line in output.splitlines() if line.startswith("RESULT ")))
+        workers = result["workers"]
+        mean = {key: sum(item[key] for item in workers) / len(workers) for key in ("uss", "pss", "rss")}
+        total = sum(item["uss"] for item in workers)
+        print(f"{mode:<16}{mean['uss']:>9.1f}M{mean['pss']:>9.1f}M{mean['rss']:>9.1f}M{total:>17.1f}M")
+
+
+if __name__ == "__main__":
+    main()
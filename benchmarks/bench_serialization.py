@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 22:45
+@Author : YangFei
+@File   : bench_serialization.py
+@Desc   : 响应序列化基准测试：FastAPI 默认路径(校验 + 标准库 json)与快速路径(跳过校验 + orjson / pydantic-core)的对比
+
+用法:
+    python -m benchmarks.bench_serialization --chunks 300 --iterations 500
+
+构造包含指定数量分块的检索结果，分别测量:
+    validate+json  按 Response[SearchResult] 校验 -> 转换为 JSON 基础类型 -> 标准库 json.dumps
+    pydantic-core  跳过校验，pydantic-core 的 to_json 直接编码
+    orjson         跳过校验，orjson 直接编码(未安装时跳过)
+    ndjson         NDJSON 流式响应逐行编码的总耗时
+指定 --asgi 时再通过 httpx 的 ASGI 传输分别请求两个接口，测量包含框架开销的端到端延迟:
+    /default  返回字典，由 FastAPI 按 response_model 校验后编码
+    /fast     返回 success_response，跳过校验
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+
+import numpy as np
+import pydantic_core
+from pydantic import TypeAdapter
+
+
+def _make_result(chunks: int, content_chars: int):
+    """ 构造检索结果 """
+    from app.application.services.retrieval.entities import RetrievalResult, RetrievedChunk
+
+    rnd = random.Random(42)
+    text = "企业知识库检索结果的分块内容，包含中文和 English 混合文本。" * (content_chars // 30 + 1)
+    return RetrievalResult(
+        chunks=[
+            RetrievedChunk(
+                id=uuid.UUID(int=rnd.getrandbits(128)),
+                score=rnd.random(),
+                document_id=str(uuid.UUID(int=rnd.getrandbits(128))),
+                content=text[:content_chars],
+                metadata={"page": i % 50, "category": "NarrativeText", "file_name": f"report-{i}.pdf", "keywords": ["检索", "分块"]},
+                ranks={"vector": i + 1, "keyword": i + 2},
+                scores={"vector": rnd.random(), "keyword": rnd.random()},
+            )
+            for i in range(chunks)
+        ],
+        timings={"embed": 12.5, "vector": 20.1, "keyword": 8.3, "total": 35.2},
+    )
+
+
+def _measure(name: str, func, iterations: int, size_of=None) -> None:
+    """ 测量并输出单次耗时分位数 """
+    func()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        output = func()
+        latencies.append(time.perf_counter() - start)
+    array = np.asarray(latencies) * 1000
+    size = f" bytes={len(output)}" if size_of is None else f" bytes={size_of(output)}"
+    print(f"{name:14s} p50={np.percentile(array, 50):8.3f}ms p95={np.percentile(array, 95):8.3f}ms "
+          f"p99={np.percentile(array, 99):8.3f}ms{size}")
+
+
+async def _bench_asgi(result, iterations: int) -> None:
+    """ 通过 ASGI 传输请求默认路径和快速路径的接口 """
+    import httpx
+    from fastapi import FastAPI
+    from app.interfaces.schemas import Response, SearchResult
+    from app.interfaces.responses import success_response
+
+    app = FastAPI()
+
+    @app.get("/default", response_model=Response[SearchResult])
+    async def default():
+        return {"code": 200, "msg": "success", "data": result}
+
+    @app.get("/fast", response_model=Response[SearchResult])
+    async def fast():
+        return success_response(result)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for path in ("/default", "/fast"):
+            await client.get(path)
+            latencies = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+            array = np.asarray(latencies) * 1000
+            print(f"asgi {path:9s} p50={np.percentile(array, 50):8.3f}ms p95={np.percentile(array, 95):8.3f}ms "
+                  f"p99={np.percentile(array, 99):8.3f}ms bytes={len(response.content)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="响应序列化基准测试")
+    parser.add_argument("--chunks", type=int, default=300, help="检索结果中的分块数量")
+    parser.add_argument("--content-chars", type=int, default=400, help="每个分块的内容长度(字符)")
+    parser.add_argument("--iterations", type=int, default=300, help="每种方式的测量次数")
+    parser.add_argument("--asgi", action="store_true", help="同时测量经过 FastAPI 的端到端延迟")
+    args = parser.parse_args()
+
+    from app.interfaces.schemas import Response, SearchResult
+    from app.interfaces.responses import JSON_ENCODER, envelope, json_dumps
+    from app.interfaces.responses.fast_json import _fallback
+
+    result = _make_result(args.chunks, args.content_chars)
+    adapter = TypeAdapter(Response[SearchResult])
+    print(f"chunks={args.chunks} content_chars={args.content_chars} encoder={JSON_ENCODER}")
+
+    def validate_json() -> bytes:
+        validated = adapter.validate_python(envelope(result), from_attributes=True)
+        content = adapter.dump_python(validated, mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    _measure("validate+json", validate_json, args.iterations)
+    _measure("pydantic-core", lambda: pydantic_core.to_json(envelope(result), inf_nan_mode="null", fallback=_fallback), args.iterations)
+    try:
+        import orjson
+        _measure("orjson", lambda: orjson.dumps(envelope(result), option=orjson.OPT_NON_STR_KEYS), args.iterations)
+    except ImportError:
+        print("orjson         未安装，跳过")
+    _measure(
+        "ndjson",
+        lambda: [json_dumps(envelope(chunk)) for chunk in result.chunks],
+        args.iterations,
+        size_of=lambda lines: sum(len(line) + 1 for line in lines),
+    )
+
+    if args.asgi:
+        asyncio.run(_bench_asgi(result, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 14:40
+@Author : YangFei
+@File   : bench_startup.py
+@Desc   : 冷启动基准测试：全新进程导入应用的耗时明细、按需导入的模块是否被提前导入，以及并发初始化与顺序初始化的对比
+
+用法:
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 3000
+    python -m benchmarks.bench_startup --latency-ms 300 --lifespan
+
+每轮启动一个新的 Python 进程导入 app.main(没有模块缓存在内存中，接近容器刚启动时的情况)，
+输出启动概况中各部分导入耗时的中位数，并检查 hanlp、unstructured、weaviate 等模块没有在导入时被加载。
+再用模拟的组件(每个组件初始化耗时 --latency-ms)分别顺序初始化和并发初始化，对比耗时。
+指定 --lifespan 时在新进程中完整执行一次应用的启动和关闭，需要各依赖服务已经运行。
+导入耗时超过 --budget-ms 或按需导入的模块被提前导入时以非零状态退出，可以在持续集成中作为检查。
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+# 应在第一次使用时才导入的模块
+LAZY_MODULES = ("hanlp", "opencc", "unstructured", "weaviate", "torch")
+
+# 子进程中执行的代码，结果以 RESULT 开头的一行 JSON 输出(日志输出到标准错误)
+_CHILD = """
+import sys, json, asyncio
+import app.main
+from core.startup import get_startup_profile
+
+if {lifespan}:
+    async def _lifespan():
+        async with app.main.app.router.lifespan_context(app.main.app):
+            pass
+    asyncio.run(_lifespan())
+
+print("RESULT " + json.dumps({{
+    "summary": get_startup_profile().summary(),
+    "loaded": [name for name in {lazy!r} if name in sys.modules],
+}}))
+"""
+
+
+def _run_child(lifespan: bool) -> dict:
+    """ 在新进程中导入应用，返回启动概况 """
+    code = _CHILD.format(lifespan=lifespan, lazy=LAZY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise SystemExit(f"子进程执行失败:\n{result.stderr[-2000:]}")
+
+
+async def _bench_init(names: list[str], latency: float) -> tuple[float, float]:
+    """ 模拟组件分别顺序初始化和并发初始化，返回两种方式的耗时(秒) """
+    from core.startup import StartupProfile, StartupStep, run_startup
+    from core.system_config import get_settings
+
+    # 提前读取配置，不计入初始化耗时
+    get_settings()
+
+    async def _init() -> None:
+        await asyncio.sleep(latency)
+
+    start = time.perf_counter()
+    for _ in names:
+        await _init()
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await run_startup([StartupStep(name, _init) for name in names], StartupProfile())
+    concurrent = time.perf_counter() - start
+    return sequential, concurrent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="冷启动基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="新进程导入应用的次数")
+    parser.add_argument("--budget-ms", type=float, default=0, help="导入耗时中位数的上限(毫秒)，0 表示不检查")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="模拟的单个组件初始化耗时(毫秒)")
+    parser.add_argument("--lifespan", action="store_true", help="在新进程中完整执行一次启动和关闭(需要依赖服务)")
+    args = parser.parse_args()
+
+    runs = [_run_child(False) for _ in range(args.runs)]
+    import_ms = statistics.median(run["summary"]["import_ms"] for run in runs)
+    print(f"导入应用(新进程, {args.runs} 次中位数): {import_ms:.0f}ms")
+    for name in runs[0]["summary"]["imports"]:
+        print(f"  {name:<45}{statistics.median(run['summary']['imports'][name] for run in runs):8.1f}ms")
+    print(f"  {'其它':<43}{statistics.median(run['summary']['imports_other_ms'] for run in runs):8.1f}ms")
+
+    loaded = sorted({name for run in runs for name in run["loaded"]})
+    print(f"导入时被提前加载的按需模块: {', '.join(loaded) or '无'}")
+
+    names = ["redis", "postgres", "minio", "shards", "vector", "embedding", "llm", "metrics"]
+    sequential, concurrent = asyncio.run(_bench_init(names, args.latency_ms / 1000))
+    print(f"初始化 {len(names)} 个组件(每个 {args.latency_ms:.0f}ms): "
+          f"顺序 {sequential * 1000:.0f}ms, 并发 {concurrent * 1000:.0f}ms")
+
+    if args.lifespan:
+        summary = _run_child(True)["summary"]
+        print(f"完整启动: 总耗时 {summary['total_ms']:.0f}ms(导入 {summary['import_ms']:.0f}ms, "
+              f"初始化 {summary['init_ms']:.0f}ms)")
+        for name, phase in summary["phases"].items():
+            print(f"  {name:<12}{phase['ms']:8.1f}ms  尝试 {phase['attempts']} 次")
+
+    failed = bool(loaded)
+    if args.budget_ms and import_ms > args.budget_ms:
+        print(f"导入耗时 {import_ms:.0f}ms 超过上限 {args.budget_ms:.0f}ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
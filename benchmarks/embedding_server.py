@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 14:20
+@Author : YangFei
+@File   : embedding_server.py
+@Desc   : 嵌入模型服务的本地替身，接口与 AI 计算节点上的 Chinese-CLIP 服务一致，用于测试和压测
+
+用法:
+    python -m benchmarks.embedding_server --port 8001 --base-ms 20 --per-item-ms 0.5 --slots 1
+
+模拟 GPU 推理的耗时特征：每个批次的耗时为固定开销加每条文本的耗时，同一时间只有 slots 个批次在推理，
+其余批次排队；可以按比例注入长尾延迟和 503 错误。向量由文本哈希确定性生成并归一化。
+也可以不启动进程，直接用 create_app 配合 httpx.ASGITransport 在进程内调用。
+"""
+import random
+import asyncio
+import hashlib
+import argparse
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+
+class EmbedTextRequest(BaseModel):
+    """ 文本嵌入请求 """
+    texts: list[str]
+
+
+class EmbedImageRequest(BaseModel):
+    """ 图片嵌入请求，图片内容为 base64 编码 """
+    images: list[str]
+
+
+class EmbedResponse(BaseModel):
+    """ 嵌入结果 """
+    embeddings: list[list[float]]
+
+
+def hash_vector(text: str, dim: int) -> list[float]:
+    """ 根据文本哈希生成确定性的归一化向量 """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_app(
+        dim: int = 512,
+        base_ms: float = 20.0,
+        per_item_ms: float = 0.5,
+        slots: int = 1,
+        tail_ratio: float = 0.0,
+        tail_ms: float = 200.0,
+        error_ratio: float = 0.0,
+        seed: int = 0,
+) -> FastAPI:
+    """ 创建替身服务
+    :param dim: 向量维度
+    :param base_ms: 每个批次的固定耗时(毫秒)
+    :param per_item_ms: 每条文本的耗时(毫秒)
+    :param slots: 同时推理的批次数，模拟 GPU 数量
+    :param tail_ratio: 出现长尾延迟的请求比例
+    :param tail_ms: 长尾请求额外增加的耗时(毫秒)
+    :param error_ratio: 返回 503 的请求比例
+    :param seed: 随机种子
+    :return: FastAPI 应用
+    """
+    app = FastAPI(title="Embedding stand-in")
+    semaphore = asyncio.Semaphore(slots)
+    rnd = random.Random(seed)
+    app.state.stats = {"requests": 0, "texts": 0, "images": 0, "errors": 0}
+
+    async def _infer(items: list[str]) -> EmbedResponse:
+        """ 模拟一次批量推理 """
+        app.state.stats["requests"] += 1
+        if rnd.random() < error_ratio:
+            app.state.stats["errors"] += 1
+            raise HTTPException(status_code=503, detail="模拟的服务不可用")
+
+        delay = base_ms + per_item_ms * len(items)
+        if rnd.random() < tail_ratio:
+            delay += tail_ms
+        async with semaphore:
+            await asyncio.sleep(delay / 1000)
+        return EmbedResponse(embeddings=[hash_vector(item, dim) for item in items])
+
+    @app.post("/embeddings/text", response_model=EmbedResponse)
+    async def embed_text(request: EmbedTextRequest) -> EmbedResponse:
+        app.state.stats["texts"] += len(request.texts)
+        return await _infer(request.texts)
+
+    @app.post("/embeddings/image", response_model=EmbedResponse)
+    async def embed_image(request: EmbedImageRequest) -> EmbedResponse:
+        app.state.stats["images"] += len(request.images)
+        return await _infer(request.images)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="嵌入模型服务的本地替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--base-ms", type=float, default=20.0)
+    parser.add_argument("--per-item-ms", type=float, default=0.5)
+    parser.add_argument("--slots", type=int, default=1)
+    parser.add_argument("--tail-ratio", type=float, default=0.0)
+    parser.add_argument("--tail-ms", type=float, default=200.0)
+    parser.add_argument("--error-ratio", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(
+        dim=args.dim,
+        base_ms=args.base_ms,
+        per_item_ms=args.per_item_ms,
+        slots=args.slots,
+        tail_ratio=args.tail_ratio,
+        tail_ms=args.tail_ms,
+        error_ratio=args.error_ratio,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
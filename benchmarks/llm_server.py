@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/19 23:40
+@Author : YangFei
+@File   : llm_server.py
+@Desc   : 大模型服务的本地替身，提供 OpenAI 兼容的流式 /v1/chat/completions 接口，用于测试和压测
+
+用法:
+    python -m benchmarks.llm_server --port 8002 --prefill-ms 200 --token-ms 20 --tokens 64
+
+模拟大模型推理的耗时特征：收到请求后先等待 prefill-ms(首个 token 的延迟)，之后每隔 token-ms 返回一个 token。
+app.state.stats 中记录开始、完成和被客户端中途断开的请求数，可以用来确认断开后服务端停止了生成。
+也可以不启动进程，直接用 create_app 配合 httpx.ASGITransport 在进程内调用。
+"""
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+class ChatRequest(BaseModel):
+    """ 对话请求，只解析替身需要的字段 """
+    model: str = "stand-in"
+    messages: list[dict[str, Any]]
+    max_tokens: Optional[int] = None
+    stream: bool = False
+
+
+def create_app(prefill_ms: float = 200.0, token_ms: float = 20.0, tokens: int = 64) -> FastAPI:
+    """ 创建替身服务
+    :param prefill_ms: 首个 token 之前的耗时(毫秒)
+    :param token_ms: 相邻 token 之间的耗时(毫秒)
+    :param tokens: 每个回答的 token 数，不超过请求中的 max_tokens
+    """
+    app = FastAPI(title="LLM stand-in")
+    app.state.stats = {"started": 0, "completed": 0, "cancelled": 0}
+
+    def _chunk(request: ChatRequest, created: int, content: str, finish_reason: Optional[str] = None) -> bytes:
+        """ 编码一个 chat.completion.chunk 事件 """
+        delta = {"content": content} if content else {}
+        body = {
+            "id": f"chatcmpl-{created}",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": request.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(body, ensure_ascii=False)}\n\n".encode("utf-8")
+
+    async def _generate(request: ChatRequest):
+        """ 按设定的节奏逐个产出 token，被取消时记录中途断开 """
+        app.state.stats["started"] += 1
+        created = int(time.time())
+        count = min(tokens, request.max_tokens or tokens)
+        try:
+            await asyncio.sleep(prefill_ms / 1000)
+            for i in range(count):
+                yield _chunk(request, created, f"词{i} ")
+                await asyncio.sleep(token_ms / 1000)
+            yield _chunk(request, created, "", "length" if count < tokens else "stop")
+            yield b"data: [DONE]\n\n"
+            app.state.stats["completed"] += 1
+        except (asyncio.CancelledError, GeneratorExit):
+            app.state.stats["cancelled"] += 1
+            raise
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: ChatRequest):
+        return StreamingResponse(_generate(request), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="大模型服务的本地替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--prefill-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(prefill_ms=args.prefill_ms, token_ms=args.token_ms, tokens=args.tokens)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
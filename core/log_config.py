@@ -1,42 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2025/11/10 23:20
+@Author : YangFei
+@File   : log_config.py
+@Desc   : 日志系统配置
+
+默认由后台线程写日志(log_async)：调用方的处理器是 QueueHandler，只在调用线程中合并日志参数、附加请求 ID、
+执行采样和限流，然后把日志放入队列；格式化和写入标准错误都在 QueueListener 的后台线程中完成，
+事件循环线程不做阻塞 I/O，终端或日志采集进程处理变慢时也不会拖慢请求。队列满时丢弃新的日志并计入指标。
+
+日志格式(log_format)为 text 时输出带颜色的文本，为 json 时每行输出一条 JSON，字段包括 ts、level、logger、line、msg、
+request_id、pid，异常时另有 exc。请求 ID 由 RequestIdMiddleware 写入上下文，同一请求的所有日志都带有同一个 ID。
+
+log_sampling、log_rate_limits 按日志器名称对 WARNING 以下的日志采样和限流，规则对子日志器同样生效(取最近的上级规则)，
+用于分词、向量检索等热点路径上的调试日志。
+"""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
 import logging
 import datetime
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
 import colorlog
+
+from core.metrics import get_metrics_registry
+from core.request_context import request_id_var
 from core.system_config import get_settings
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    orjson = None
+
+LOG_RECORDS_DROPPED = get_metrics_registry().counter(
+    "neon_log_records_dropped_total", "被丢弃的日志条数", ["logger", "reason"],
+)
+
+# 请求之外的日志(启动、后台任务)的请求 ID
+NO_REQUEST_ID = "-"
+
+# 当前的后台写日志线程，重新配置或进程退出时停止
+_listener: Optional["_QueueListener"] = None
+_queue_handler: Optional["_QueueHandler"] = None
+
+
+class _SecondCache:
+    """ 按秒缓存格式化后的时间，同一秒内的日志只在第一条时调用 strftime """
+    __slots__ = ("second", "text")
+
+    def __init__(self):
+        self.second = -1
+        self.text = ""
+
+    def format(self, created: float, datefmt: str) -> str:
+        second = int(created)
+        if second != self.second:
+            # 先算出文本再更新秒数，其它线程不会读到秒数和文本不一致的结果
+            text = time.strftime(datefmt, time.localtime(second))
+            self.second, self.text = second, text
+        return self.text
+
 
 class MicrosecondFormatter(colorlog.ColoredFormatter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._seconds = _SecondCache()
+
     def formatTime(self, record, datefmt=None):
-        # 生成包含微秒的时间对象
-        ct = datetime.datetime.fromtimestamp(record.created)
         # 自定义格式化时间字符串
         if datefmt:
-            s = ct.strftime(datefmt)
-        else:
-            # 默认格式（包含微秒, 保留到毫秒）
-            s = ct.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        return s
+            return datetime.datetime.fromtimestamp(record.created).strftime(datefmt)
+        # 默认格式（保留到毫秒），秒以前的部分按秒缓存，只拼接毫秒
+        return "%s.%03d" % (self._seconds.format(record.created, "%Y-%m-%d %H:%M:%S"), record.msecs)
 
 
-def setup_logging():
-    """ 配置日志系统，涵盖日志等级、输出格式、输出位置等 """
+class JsonFormatter(logging.Formatter):
+    """ 结构化 JSON 格式化器，每条日志一行 """
 
-    # 1、获取项目配置
-    settings = get_settings()
+    def __init__(self):
+        super().__init__()
+        self._seconds = _SecondCache()
+        self._offsets = _SecondCache()
 
-    # 2、获取根日志处理器
-    root_logger = logging.getLogger()
-    # 清空已有处理器（避免重复输出）
-    if root_logger.hasHandlers():
-        root_logger.handlers.clear()
+    def format(self, record: logging.LogRecord) -> str:
+        created = record.created
+        data = {
+            # ISO 8601 格式的本地时间，带时区偏移，例如 2026-10-20T18:05:01.123+0800
+            "ts": "%s.%03d%s" % (self._seconds.format(created, "%Y-%m-%dT%H:%M:%S"), record.msecs,
+                                 self._offsets.format(created, "%z")),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", NO_REQUEST_ID),
+            "pid": record.process,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = record.stack_info
+        if orjson is not None:
+            return orjson.dumps(data, default=str).decode()
+        return json.dumps(data, ensure_ascii=False, default=str)
 
-    # 3、设置日志等级
-    log_level = getattr(logging, settings.log_level.upper())
-    root_logger.setLevel(log_level)
 
-    # 4、创建日志格式化器
-    log_formatter = MicrosecondFormatter(
-        # 日志输出格式，包含时间、日志器名称、日志等级和日志消息
-        fmt="[%(asctime)s] - %(name)s:%(lineno)d - %(log_color)s%(levelname)s%(reset)s - %(message)s",
+class RequestIdFilter(logging.Filter):
+    """ 为日志记录附加当前请求的 ID，在调用线程中执行，后台线程中取不到请求上下文 """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or NO_REQUEST_ID
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """ 按日志器名称对 WARNING 以下的日志采样和限流
+    :param sampling: 日志器名称 -> 保留的比例(0~1)
+    :param rate_limits: 日志器名称 -> 每秒最多输出的条数
+    规则对子日志器同样生效，取名称最近的上级规则，例如 app.infrastructure 的规则对 app.infrastructure.external.fenci 生效；
+    限流按规则计数，同一规则下的所有子日志器共用每秒的条数。
+    """
+
+    def __init__(self, sampling: dict[str, float], rate_limits: dict[str, float]):
+        super().__init__()
+        self.sampling = dict(sampling)
+        self.rate_limits = dict(rate_limits)
+        # 日志器名称 -> (采样规则名称, 限流规则名称)，日志器数量有限，缓存查找结果
+        self._rules: dict[str, tuple[Optional[str], Optional[str]]] = {}
+        # 限流规则名称 -> [当前秒, 本秒已输出的条数]
+        self._windows: dict[str, list] = {name: [0, 0] for name in self.rate_limits}
+        self._lock = threading.Lock()
+
+    def _lookup(self, name: str) -> tuple[Optional[str], Optional[str]]:
+        rule = self._rules.get(name)
+        if rule is None:
+            rule = (self._nearest(name, self.sampling), self._nearest(name, self.rate_limits))
+            self._rules[name] = rule
+        return rule
+
+    @staticmethod
+    def _nearest(name: str, rules: dict[str, float]) -> Optional[str]:
+        """ 名称最近的上级规则的名称，没有规则时返回 None """
+        current = name
+        while current:
+            if current in rules:
+                return current
+            current = current.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        sampling_rule, limit_rule = self._lookup(record.name)
+        if sampling_rule is not None and random.random() >= self.sampling[sampling_rule]:
+            LOG_RECORDS_DROPPED.inc((record.name, "sampled"))
+            return False
+        if limit_rule is not None:
+            second = int(record.created)
+            with self._lock:
+                window = self._windows[limit_rule]
+                if window[0] != second:
+                    window[0], window[1] = second, 0
+                window[1] += 1
+                allowed = window[1] <= self.rate_limits[limit_rule]
+            if not allowed:
+                LOG_RECORDS_DROPPED.inc((record.name, "rate_limited"))
+                return False
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    """ 把日志放入队列的处理器
+    与标准库的 QueueHandler 相比:
+        - 调用线程中只合并日志参数，不格式化整行，时间、颜色、JSON 等格式化在后台线程中完成
+        - 不复制日志记录
+        - 队列满时丢弃并计入指标，不阻塞调用方
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 参数可能是可变对象，必须在调用线程中合并到消息里；异常对象引用了调用栈，同样先转成文本
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc((record.name, "queue_full"))
+
+
+class _QueueListener(QueueListener):
+    """ 后台写日志线程，停止时等待队列中已有的日志写完 """
+
+    def enqueue_sentinel(self) -> None:
+        # 标准库使用 put_nowait，队列满时停止会失败；写日志线程一直在消费队列，这里阻塞等待即可
+        self.queue.put(self._sentinel)
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+def _build_formatter(log_format: str) -> logging.Formatter:
+    """ 根据日志格式创建格式化器 """
+    if log_format.lower() == "json":
+        return JsonFormatter()
+    return MicrosecondFormatter(
+        # 日志输出格式，包含时间、请求 ID、日志器名称、日志等级和日志消息
+        fmt="[%(asctime)s] [%(request_id)s] - %(name)s:%(lineno)d - %(log_color)s%(levelname)s%(reset)s - %(message)s",
         log_colors={
             "DEBUG": "cyan",
             "INFO": "green",
@@ -48,13 +232,69 @@ def setup_logging():
         reset=True,
     )
 
-    # 5、创建控制台处理器并设置格式化器
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(log_formatter)
+
+def _stop_listener() -> None:
+    """ 停止后台写日志线程，等待队列中已有的日志写完 """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork() -> None:
+    """ fork 出的子进程中没有后台写日志线程，队列的锁可能处于被持有的状态，重新创建队列并启动写日志线程 """
+    global _listener
+    if _listener is None or _queue_handler is None:
+        return
+    _queue_handler.queue = queue.Queue(_queue_handler.queue.maxsize)
+    _listener = _QueueListener(_queue_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+atexit.register(_stop_listener)
+
+
+def setup_logging():
+    """ 配置日志系统，涵盖日志等级、输出格式、输出位置等，可以重复调用 """
+    global _listener, _queue_handler
+
+    # 1、获取项目配置
+    settings = get_settings()
+
+    # 2、获取根日志处理器
+    root_logger = logging.getLogger()
+    # 清空已有处理器（避免重复输出），停止上一次配置的写日志线程
+    if root_logger.hasHandlers():
+        root_logger.handlers.clear()
+    _stop_listener()
+    _queue_handler = None
+
+    # 3、设置日志等级
+    log_level = getattr(logging, settings.log_level.upper())
+    root_logger.setLevel(log_level)
+
+    # 4、创建控制台处理器并设置格式化器
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(_build_formatter(settings.log_format))
     console_handler.setLevel(log_level)
 
-    # 6、将处理器添加到根日志处理器
-    root_logger.addHandler(console_handler)
+    # 5、异步模式下根日志器的处理器只把日志放入队列，由后台线程交给控制台处理器写出
+    if settings.log_async:
+        _queue_handler = _QueueHandler(queue.Queue(settings.log_queue_size))
+        _queue_handler.setLevel(log_level)
+        _listener = _QueueListener(_queue_handler.queue, console_handler, respect_handler_level=True)
+        _listener.start()
+        front_handler = _queue_handler
+    else:
+        front_handler = console_handler
+
+    # 6、请求 ID、采样和限流都需要在调用线程中执行，挂在根日志器的处理器上
+    front_handler.addFilter(RequestIdFilter())
+    if settings.log_sampling or settings.log_rate_limits:
+        front_handler.addFilter(SamplingFilter(settings.log_sampling, settings.log_rate_limits))
+    root_logger.addHandler(front_handler)
 
     # 7、日志系统初始化完成提示
-    root_logger.info("日志系统初始化完成，日志等级：%s", settings.log_level)
+    root_logger.info("日志系统初始化完成，日志等级：%s，格式：%s，后台写入：%s",
+                     settings.log_level, settings.log_format, settings.log_async)
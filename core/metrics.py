@@ -0,0 +1,420 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 09:10
+@Author : YangFei
+@File   : metrics.py
+@Desc   : 进程内指标(计数器、仪表、直方图)及 Prometheus 文本格式输出，支持多进程部署时汇总各工作进程的指标
+
+指标的更新只修改进程内存中的数值，开销为一次加锁和一次字典操作，可以放在请求路径上。
+直方图按桶计数，不保存原始样本，内存只与标签组合的数量有关；标签取值必须是有限集合(例如路由模板而不是 URL)。
+
+单进程时 /metrics 直接输出本进程的指标。gunicorn 等多进程部署时配置 metrics_multiproc_dir，
+每个进程定期(以及输出指标前)将自己的指标原子地写入该目录下的一个文件，输出时合并所有文件:
+    - 计数器和直方图按标签累加，已退出进程的数值保留，合并到 dead.json 中，总数不会因为进程重建而减少
+    - 仪表只累加仍在运行的进程，已退出进程的仪表(例如进行中的请求数、连接池大小)被丢弃
+目录应在主进程启动前清空，否则会累加上一次运行的数值。
+"""
+import os
+import copy
+import json
+import time
+import fcntl
+import bisect
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+from typing import Callable, Iterable, Optional
+
+from core.system_config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图默认的桶上限(秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Prometheus 文本格式的内容类型
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# 已退出进程的计数器和直方图合并后保存的文件
+DEAD_FILE = "dead.json"
+
+LabelValues = tuple[str, ...]
+
+
+class _Metric:
+    """ 指标基类，数值按标签取值的元组保存 """
+    type: str = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+
+    def _check(self, labels: LabelValues) -> None:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要 {len(self.labelnames)} 个标签取值，实际为 {len(labels)} 个")
+
+    def samples(self) -> list[list]:
+        """ 当前数值的快照，可以编码为 JSON: [[标签取值列表, 数值], ...] """
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def clear(self) -> None:
+        """ 清空所有数值 """
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """ 只增不减的计数器，名称按惯例以 _total 结尾 """
+    type = "counter"
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        """ 增加计数
+        :param labels: 标签取值，顺序与 labelnames 一致
+        :param amount: 增加的数量，不能为负数
+        """
+        with self._lock:
+            value = self._values.get(labels)
+            if value is None:
+                self._check(labels)
+                value = 0.0
+            self._values[labels] = value + amount
+
+
+class Gauge(_Metric):
+    """ 可增可减的仪表，例如进行中的请求数、连接池中的连接数 """
+    type = "gauge"
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        """ 设置数值 """
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        """ 增加数值 """
+        with self._lock:
+            value = self._values.get(labels)
+            if value is None:
+                self._check(labels)
+                value = 0.0
+            self._values[labels] = value + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        """ 减少数值 """
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    """ 直方图，数值为 [各桶的计数(不累计), 总和, 次数] """
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        """ 记录一次观测值
+        :param value: 观测值，例如耗时(秒)
+        :param labels: 标签取值
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                self._check(labels)
+                # 最后一个桶对应 +Inf
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> list[list]:
+        with self._lock:
+            return [[list(labels), [list(state[0]), state[1], state[2]]] for labels, state in self._values.items()]
+
+    def time(self, labels: LabelValues = ()) -> "_Timer":
+        """ 计时的上下文管理器，退出时记录耗时(秒)，出现异常时同样记录 """
+        return _Timer(self, labels)
+
+
+class _Timer:
+    """ Histogram.time 返回的上下文管理器 """
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: Histogram, labels: LabelValues):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, self._labels)
+
+
+class MetricsRegistry:
+    """ 指标注册表，负责创建指标、在输出前调用采集函数，并在多进程模式下读写指标文件 """
+
+    def __init__(self, multiproc_dir: Optional[str] = None):
+        """ 构造函数
+        :param multiproc_dir: 多进程模式下保存各进程指标文件的目录，为空时只输出本进程的指标
+        """
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._multiproc_dir = multiproc_dir or None
+        # 进程号加启动时间作为文件名，进程号被复用时不会覆盖已退出进程的文件
+        self._process_key = f"{os.getpid()}_{time.time_ns()}"
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def multiprocess(self) -> bool:
+        """ 是否为多进程模式 """
+        return self._multiproc_dir is not None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        """ 注册指标，同名指标已存在时返回已有的指标，重复导入模块不会重复注册 """
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if existing.type != metric.type or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"指标 {metric.name} 已注册为不同的类型或标签")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """ 创建或获取计数器 """
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """ 创建或获取仪表 """
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """ 创建或获取直方图 """
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """ 注册采集函数，在输出和写入文件之前调用，用于更新连接池大小等只能在采集时读取的仪表 """
+        self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        """ 调用采集函数并返回本进程所有指标的快照，可以编码为 JSON """
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("指标采集函数执行失败: %s", e)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {
+                "type": metric.type,
+                "documentation": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": metric.samples(),
+            }
+            for metric in metrics
+        }
+
+    def render(self) -> str:
+        """ 输出 Prometheus 文本格式，多进程模式下先写入本进程的指标，再合并所有进程的指标 """
+        if not self.multiprocess:
+            return _render(self.snapshot())
+        self.flush()
+        return _render(self._merge_files())
+
+    # ---------------------------------------------------------------- 多进程模式
+
+    def flush(self) -> None:
+        """ 将本进程的指标原子地写入指标文件 """
+        if not self.multiprocess:
+            return
+        os.makedirs(self._multiproc_dir, exist_ok=True)
+        path = os.path.join(self._multiproc_dir, f"metrics_{self._process_key}.json")
+        _write_json(path, {"pid": os.getpid(), "metrics": self.snapshot()})
+
+    async def start(self) -> None:
+        """ 多进程模式下启动定期写入指标文件的后台协程 """
+        if not self.multiprocess or self._flusher is not None:
+            return
+        # fork 出的工作进程继承了主进程的注册表，进程号变化后使用新的文件名
+        self._process_key = f"{os.getpid()}_{time.time_ns()}"
+        self._flusher = asyncio.create_task(self._run_flusher())
+        logger.info("多进程指标已开启，目录: %s", self._multiproc_dir)
+
+    async def stop(self) -> None:
+        """ 停止后台协程，并最后写入一次 """
+        if self._flusher is None:
+            return
+        self._flusher.cancel()
+        await asyncio.gather(self._flusher, return_exceptions=True)
+        self._flusher = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run_flusher(self) -> None:
+        interval = get_settings().metrics_flush_interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.warning("写入指标文件失败: %s", e)
+
+    def _merge_files(self) -> dict:
+        """ 合并目录中所有进程的指标，已退出进程的文件合并到 dead.json 后删除 """
+        directory = self._multiproc_dir
+        with open(os.path.join(directory, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                dead = _read_json(os.path.join(directory, DEAD_FILE)) or {}
+                merged: dict = {}
+                _merge(merged, dead, include_gauges=False)
+                compacted = False
+                for name in os.listdir(directory):
+                    if not (name.startswith("metrics_") and name.endswith(".json")):
+                        continue
+                    path = os.path.join(directory, name)
+                    data = _read_json(path)
+                    if data is None:
+                        continue
+                    alive = _pid_alive(data["pid"])
+                    _merge(merged, data["metrics"], include_gauges=alive)
+                    if not alive:
+                        _merge(dead, data["metrics"], include_gauges=False)
+                        os.remove(path)
+                        compacted = True
+                if compacted:
+                    _write_json(os.path.join(directory, DEAD_FILE), dead)
+                return merged
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def mark_process_dead(pid: int, multiproc_dir: Optional[str] = None) -> None:
+    """ 工作进程退出后由主进程调用(例如 gunicorn 的 child_exit 钩子)，立即丢弃该进程的仪表并合并其计数
+    不调用时，下一次输出指标时也会根据进程是否存活完成同样的处理
+    """
+    directory = multiproc_dir or get_settings().metrics_multiproc_dir
+    if not directory or not os.path.isdir(directory):
+        return
+    with open(os.path.join(directory, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            dead = _read_json(os.path.join(directory, DEAD_FILE)) or {}
+            changed = False
+            for name in os.listdir(directory):
+                if name.startswith(f"metrics_{pid}_") and name.endswith(".json"):
+                    data = _read_json(os.path.join(directory, name))
+                    if data is not None:
+                        _merge(dead, data["metrics"], include_gauges=False)
+                    os.remove(os.path.join(directory, name))
+                    changed = True
+            if changed:
+                _write_json(os.path.join(directory, DEAD_FILE), dead)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    """ 读取 JSON 文件，文件不存在或正在被替换时返回 None """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(path: str, data: dict) -> None:
+    """ 先写入临时文件再替换，读取方不会读到写了一半的文件 """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    """ 判断进程是否存活 """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(target: dict, metrics: dict, include_gauges: bool) -> None:
+    """ 将一个快照按标签累加到目标快照中 """
+    for name, metric in metrics.items():
+        if metric["type"] == "gauge" and not include_gauges:
+            continue
+        entry = target.setdefault(name, {**metric, "samples": []})
+        index = {tuple(labels): i for i, (labels, _) in enumerate(entry["samples"])}
+        for labels, value in metric["samples"]:
+            i = index.get(tuple(labels))
+            if i is None:
+                entry["samples"].append([labels, copy.deepcopy(value)])
+                index[tuple(labels)] = len(entry["samples"]) - 1
+            elif metric["type"] == "histogram":
+                current = entry["samples"][i][1]
+                current[0] = [a + b for a, b in zip(current[0], value[0])]
+                current[1] += value[1]
+                current[2] += value[2]
+            else:
+                entry["samples"][i][1] += value
+
+
+def _escape(value: str) -> str:
+    """ 转义标签取值中的反斜杠、双引号和换行 """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _render(metrics: dict) -> str:
+    """ 将快照编码为 Prometheus 文本格式 """
+    lines: list[str] = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        documentation = metric["documentation"].replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric["labelnames"]
+        for values, value in sorted(metric["samples"], key=lambda sample: sample[0]):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(names, values)} {_number(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip([*metric["buckets"], float("inf")], counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{name}_bucket{_labels(names, values, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, values)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(names, values)} {count}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+@lru_cache()
+def get_metrics_registry() -> MetricsRegistry:
+    """ 获取指标注册表实例，使用 lru_cache 缓存以确保单例模式 """
+    return MetricsRegistry(get_settings().metrics_multiproc_dir)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 21:00
+@Author : YangFei
+@File   : profiler.py
+@Desc   : 采样性能分析：在后台线程中按固定间隔读取本进程所有线程的调用栈，汇总为火焰图工具可以直接读取的折叠栈格式
+
+折叠栈格式每行是一个调用栈和它被采到的次数，栈帧从根到叶以分号分隔:
+    MainThread;asyncio.base_events:BaseEventLoop.run_forever;...;app.infrastructure.external.fenci:Fenci._split_tokens 42
+可以直接交给 flamegraph.pl、speedscope、py-spy 的火焰图查看工具。
+
+采样不需要修改被分析的代码，也不需要重启进程，开销只与采样频率和线程数有关，可以在线上的工作进程中短时间运行。
+只能采到 Python 栈帧，C 扩展(分词模型、numpy)内部的耗时记在调用它的 Python 函数上。
+事件循环线程空闲时停在 selector 上，线程池的空闲线程停在队列上，这些空闲栈默认不计入结果。
+同一进程同时只允许一个分析任务。
+"""
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Optional
+
+
+class ProfilerBusyError(RuntimeError):
+    """ 本进程已有正在进行的性能分析 """
+
+
+# 空闲线程停留的叶子栈帧: (模块, 函数)
+IDLE_FRAMES = frozenset({
+    ("selectors", "EpollSelector.select"),
+    ("selectors", "PollSelector.select"),
+    ("selectors", "SelectSelector.select"),
+    ("selectors", "KqueueSelector.select"),
+    ("threading", "Condition.wait"),
+    ("threading", "Event.wait"),
+    ("threading", "Thread._wait_for_tstate_lock"),
+    ("queue", "Queue.get"),
+    ("concurrent.futures.thread", "_worker"),
+})
+
+# 同一进程同时只允许一个分析任务
+_running = threading.Lock()
+
+
+def _frame_name(frame) -> tuple[str, str]:
+    """ 栈帧的模块名和限定函数名 """
+    code = frame.f_code
+    return frame.f_globals.get("__name__", "?"), code.co_qualname
+
+
+def _collapse(frame, thread_name: str, max_depth: int) -> tuple[str, tuple[str, str]]:
+    """ 从叶子栈帧向上生成折叠栈，返回折叠栈和叶子栈帧 """
+    names = []
+    leaf = _frame_name(frame)
+    while frame is not None and len(names) < max_depth:
+        module, function = _frame_name(frame)
+        names.append(f"{module}:{function}")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names)), leaf
+
+
+def sample_stacks(seconds: float, interval: float, idle: bool = False, max_depth: int = 128) -> tuple[Counter, int]:
+    """ 在当前线程中按间隔采样本进程其它线程的调用栈，阻塞 seconds 秒，应在单独的线程中调用
+    :param seconds: 采样时长(秒)
+    :param interval: 采样间隔(秒)
+    :param idle: 是否包括空闲线程的调用栈
+    :param max_depth: 每个调用栈最多保留的栈帧数，超出部分(靠近根的栈帧)丢弃
+    :return: 折叠栈及其次数，采样轮数
+    """
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusyError("已有正在进行的性能分析")
+    try:
+        counts: Counter = Counter()
+        me = threading.get_ident()
+        deadline = time.perf_counter() + seconds
+        rounds = 0
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack, leaf = _collapse(frame, names.get(ident, f"thread-{ident}"), max_depth)
+                if idle or leaf not in IDLE_FRAMES:
+                    counts[stack] += 1
+            rounds += 1
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
+        return counts, rounds
+    finally:
+        _running.release()
+
+
+def render_collapsed(counts: Counter, limit: Optional[int] = None) -> str:
+    """ 输出折叠栈格式，次数多的在前
+    :param limit: 只输出次数最多的 limit 个调用栈
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common(limit))
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 18:05
+@Author : YangFei
+@File   : request_context.py
+@Desc   : 请求上下文：当前请求的 ID 保存在 ContextVar 中，同一请求中的日志都带有该 ID
+
+ContextVar 会随 asyncio.create_task 和 asyncio.to_thread 复制到新的任务和线程中，
+请求中启动的后台协程(例如 SSE 的生产协程)和线程中的日志同样带有请求 ID。
+"""
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+# 当前请求的 ID，请求之外(启动、后台任务)为 None
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def get_request_id() -> Optional[str]:
+    """ 获取当前请求的 ID """
+    return request_id_var.get()
+
+
+def new_request_id() -> str:
+    """ 生成新的请求 ID """
+    return uuid.uuid4().hex
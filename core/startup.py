@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 14:05
+@Author : YangFei
+@File   : startup.py
+@Desc   : 应用启动与关闭：并发初始化互不依赖的组件，记录启动过程中各阶段和导入的耗时
+
+启动时各组件(Redis、Postgres、MinIO、向量库、外部服务客户端等)并发初始化，总耗时约等于最慢的组件:
+    - 每个组件的单次初始化有超时时间，超时或失败后按指数退避加随机抖动重试，依赖比应用晚几秒就绪时不会直接启动失败
+    - 重试前先调用组件的关闭方法，清理上一次创建了一半的连接，否则再次初始化时会被当作已经初始化而跳过
+    - 任一组件重试后仍然失败时取消其它组件的初始化，关闭所有组件后抛出异常
+关闭时各组件同样并发关闭，单个组件关闭超时或失败不影响其它组件。
+
+hanlp、unstructured、weaviate 等导入很慢的模块通过 import_on_first_use 在第一次使用时导入，不拖慢启动，
+导入耗时同样记录在启动概况中。
+"""
+import sys
+import time
+import random
+import asyncio
+import logging
+import importlib
+from dataclasses import dataclass
+from functools import lru_cache
+from types import ModuleType
+from typing import Awaitable, Callable, Iterable, Optional
+
+# 本模块被导入的时间，入口文件最先导入本模块，近似为开始导入应用的时间(系统配置在函数中导入，不计入这之前)
+PROCESS_STARTED = time.perf_counter()
+
+# 单次重试等待时间的上限(秒)
+RETRY_BACKOFF_CAP = 10.0
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class StartupStep:
+    """ 一个需要在启动时初始化、关闭时释放的组件 """
+    name: str
+    init: Callable[[], Awaitable[None]]  # 初始化，每次调用都应重新获取实例(关闭后实例缓存会被清除)
+    shutdown: Optional[Callable[[], Awaitable[None]]] = None  # 关闭，组件未初始化时也可以调用
+    timeout: Optional[float] = None  # 单次初始化的超时时间(秒)，默认取系统配置
+
+
+@dataclass(slots=True)
+class PhaseTiming:
+    """ 启动过程中一个阶段的耗时 """
+    name: str
+    seconds: float
+    attempts: int = 1
+    ok: bool = True
+
+
+class StartupProfile:
+    """ 启动概况：导入耗时明细和各组件的初始化耗时 """
+
+    def __init__(self):
+        self.imports: list[PhaseTiming] = []
+        self.phases: list[PhaseTiming] = []
+        # 开始初始化和可以接收请求的时间(time.perf_counter)
+        self.init_started: Optional[float] = None
+        self.ready_at: Optional[float] = None
+
+    def import_modules(self, names: Iterable[str]) -> None:
+        """ 按顺序导入模块并记录耗时，每一项包括该模块及其依赖中尚未被前面的项导入的部分 """
+        for name in names:
+            start = time.perf_counter()
+            importlib.import_module(name)
+            self.imports.append(PhaseTiming(name, time.perf_counter() - start))
+
+    def import_module(self, name: str) -> ModuleType:
+        """ 导入模块，第一次导入时记录耗时 """
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed = time.perf_counter() - start
+        self.imports.append(PhaseTiming(f"{name}(首次使用)", elapsed))
+        logger.info("首次使用时导入 %s, 耗时 %.0fms", name, elapsed * 1000)
+        return module
+
+    def record(self, name: str, seconds: float, attempts: int = 1, ok: bool = True) -> None:
+        """ 记录一个阶段的耗时 """
+        self.phases.append(PhaseTiming(name, seconds, attempts, ok))
+
+    def summary(self) -> dict:
+        """ 汇总为字典，单位为毫秒，用于日志和基准测试 """
+        init_started = self.init_started or time.perf_counter()
+        import_ms = (init_started - PROCESS_STARTED) * 1000
+        measured = sum(item.seconds for item in self.imports if not item.name.endswith("(首次使用)")) * 1000
+        return {
+            "import_ms": round(import_ms, 1),
+            "imports": {item.name: round(item.seconds * 1000, 1) for item in self.imports},
+            # 未单独记录的导入，例如入口文件导入的标准库和本模块自身
+            "imports_other_ms": round(max(import_ms - measured, 0), 1),
+            "init_ms": round(((self.ready_at or init_started) - init_started) * 1000, 1),
+            "phases": {
+                item.name: {"ms": round(item.seconds * 1000, 1), "attempts": item.attempts, "ok": item.ok}
+                for item in self.phases
+            },
+            "total_ms": round(((self.ready_at or init_started) - PROCESS_STARTED) * 1000, 1),
+        }
+
+    def log(self) -> None:
+        """ 输出启动概况 """
+        summary = self.summary()
+        imports = ", ".join(f"{name} {ms:.0f}ms" for name, ms in summary["imports"].items())
+        phases = ", ".join(
+            f"{name} {item['ms']:.0f}ms" + (f"({item['attempts']} 次)" if item["attempts"] > 1 else "")
+            for name, item in summary["phases"].items()
+        )
+        logger.info("启动完成, 总耗时 %.0fms(导入 %.0fms, 初始化 %.0fms)",
+                    summary["total_ms"], summary["import_ms"], summary["init_ms"])
+        logger.info("导入耗时: %s, 其它 %.0fms", imports or "无", summary["imports_other_ms"])
+        logger.info("初始化耗时: %s", phases or "无")
+
+
+@lru_cache()
+def get_startup_profile() -> StartupProfile:
+    """ 获取本进程的启动概况，使用 lru_cache 缓存以确保单例模式 """
+    return StartupProfile()
+
+
+def import_on_first_use(name: str) -> ModuleType:
+    """ 在第一次使用时导入耗时较长的模块，并记录导入耗时
+    :param name: 模块名称，例如 hanlp
+    """
+    return get_startup_profile().import_module(name)
+
+
+async def _init_step(step: StartupStep, profile: StartupProfile) -> None:
+    """ 初始化单个组件，超时或失败后退避重试 """
+    from core.system_config import get_settings
+
+    settings = get_settings()
+    timeout = step.timeout or settings.startup_timeouts.get(step.name, settings.startup_timeout)
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            await asyncio.wait_for(step.init(), timeout)
+            break
+        except Exception as e:
+            error = f"超过 {timeout:g} 秒未完成" if isinstance(e, asyncio.TimeoutError) else str(e)
+            # 清理本次尝试创建了一半的资源
+            if step.shutdown is not None:
+                try:
+                    await step.shutdown()
+                except Exception as cleanup_error:
+                    logger.warning("清理 %s 失败: %s", step.name, cleanup_error)
+            if attempt > settings.startup_retries:
+                profile.record(step.name, time.perf_counter() - start, attempt, ok=False)
+                logger.error("%s 初始化失败, 已尝试 %d 次: %s", step.name, attempt, error)
+                raise
+            delay = random.uniform(0, min(RETRY_BACKOFF_CAP, settings.startup_retry_backoff * 2 ** (attempt - 1)))
+            logger.warning("%s 初始化失败，%.0fms 后第 %d 次重试: %s", step.name, delay * 1000, attempt, error)
+            await asyncio.sleep(delay)
+    profile.record(step.name, time.perf_counter() - start, attempt)
+
+
+async def run_startup(steps: list[StartupStep], profile: Optional[StartupProfile] = None) -> None:
+    """ 并发初始化所有组件，任一组件失败时取消其它组件的初始化，关闭所有组件后抛出该组件的异常
+    :param steps: 互不依赖的组件
+    :param profile: 记录耗时的启动概况，默认为本进程的启动概况
+    """
+    profile = profile or get_startup_profile()
+    # 同一进程中再次启动(例如测试中多次进入生命周期)时重新计时
+    profile.phases.clear()
+    profile.init_started = time.perf_counter()
+    profile.ready_at = None
+    try:
+        async with asyncio.TaskGroup() as group:
+            for step in steps:
+                group.create_task(_init_step(step, profile))
+    except BaseExceptionGroup as e:
+        await run_shutdown(steps)
+        raise e.exceptions[0] from None
+    profile.ready_at = time.perf_counter()
+
+
+async def run_shutdown(steps: list[StartupStep], timeout: Optional[float] = None) -> None:
+    """ 并发关闭所有组件，单个组件关闭超时或失败时记录日志，不影响其它组件
+    :param steps: 互不依赖的组件
+    :param timeout: 单个组件关闭的超时时间(秒)，默认取系统配置
+    """
+    from core.system_config import get_settings
+
+    timeout = timeout or get_settings().shutdown_timeout
+
+    async def _shutdown(step: StartupStep) -> None:
+        try:
+            await asyncio.wait_for(step.shutdown(), timeout)
+        except asyncio.TimeoutError:
+            logger.error("关闭 %s 超过 %g 秒，已放弃等待", step.name, timeout)
+        except Exception as e:
+            logger.error("关闭 %s 失败: %s", step.name, e)
+
+    await asyncio.gather(*(_shutdown(step) for step in steps if step.shutdown is not None))
@@ -6,6 +6,7 @@
 @File   : config.py
 @Desc   : 系统配置项
 """
+from typing import Any
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 
@@ -15,6 +16,11 @@ class Settings(BaseSettings):
     # 项目环境，如 development、production 等
     env: str = "development"
     log_level: str = "DEBUG"
+    log_format: str = "text"  # 日志输出格式：text 为带颜色的文本，json 为每行一条的结构化 JSON(便于日志平台采集)
+    log_async: bool = True  # 是否由后台线程写日志，调用方只把日志放入队列，不在事件循环线程中做阻塞 I/O
+    log_queue_size: int = 10000  # 日志队列的容量，队列满时丢弃新的日志并计入指标，不阻塞调用方
+    log_sampling: dict[str, float] = {}  # 按日志器名称(包括其子日志器)采样 WARNING 以下的日志，值为保留的比例，例如 {"app.infrastructure.external.fenci": 0.01}
+    log_rate_limits: dict[str, float] = {}  # 按日志器名称(包括其子日志器)限制 WARNING 以下的日志每秒最多输出的条数，例如 {"httpx": 10}
 
     # 数据库相关配置
     # 数据库异步操作连接字符串
@@ -37,6 +43,192 @@ class Settings(BaseSettings):
     minio_bucket_name: str = "neon-rag" # 存储桶名称
     minio_secure: bool = False  # 是否使用 HTTPS 连接 MinIO
 
+    # oss 相关配置
+    oss_endpoint: str = ""  # OSS 访问域名，例如 "https://oss-cn-hangzhou.aliyuncs.com"
+    oss_access_key_id: str = ""  # 访问密钥 ID
+    oss_access_key_secret: str = ""  # 访问密钥
+    oss_bucket_name: str = ""  # 存储桶名称
+    oss_multipart_threshold: int = 10 * 1024 * 1024  # 超过该大小(字节)的文件使用分片上传/下载
+    oss_part_size: int = 5 * 1024 * 1024  # 分片大小(字节)，OSS 要求除最后一片外不小于 100KB
+    oss_num_threads: int = 4  # 分片上传/下载、批量删除的并发线程数
+    oss_checkpoint_dir: str = ".oss_checkpoints"  # 断点续传记录文件的保存目录
+
+    # weaviate 向量数据库相关配置
+    weaviate_http_host: str = "127.0.0.1"
+    weaviate_http_port: int = 8080
+    weaviate_http_secure: bool = False
+    weaviate_grpc_host: str = "127.0.0.1"
+    weaviate_grpc_port: int = 50051
+    weaviate_grpc_secure: bool = False
+    weaviate_collection_name: str = "DocumentChunk"  # 文档分块所在的集合名称，按租户隔离
+    weaviate_import_batch_size: int = 200  # 批量导入的初始批次大小，之后根据服务端耗时调整
+    weaviate_import_min_batch_size: int = 20  # 批量导入的最小批次大小
+    weaviate_import_max_batch_size: int = 1000  # 批量导入的最大批次大小
+    weaviate_import_target_latency_ms: float = 1000.0  # 单个批次的目标耗时(毫秒)
+    weaviate_import_concurrency: int = 4  # 同时在途的批次数，所有租户共用
+    weaviate_import_max_retries: int = 3  # 写入失败的对象的最大重试次数
+    weaviate_import_retry_backoff: float = 0.5  # 重试的基础退避时间(秒)，按指数增长并加随机抖动
+
+    # 租户分片相关配置
+    storage_shards: dict[str, dict[str, Any]] = {}  # 除默认分片外的存储分片(JSON)，键为分片名称，值为与默认分片不同的连接配置
+    storage_shard_cache_ttl: float = 10.0  # 进程内缓存租户所在分片的时间(秒)，迁移租户时会等待该时间让所有进程看到新状态
+    storage_shard_cache_size: int = 100_000  # 进程内最多缓存的租户数量
+    storage_shard_redis_ttl: int = 3600  # Redis 中缓存租户所在分片的时间(秒)
+    storage_shard_move_batch_size: int = 500  # 迁移租户时每批复制的行数、对象数和向量数
+
+    # 向量存储相关配置
+    vector_store_backend: str = "weaviate"  # 向量存储后端: weaviate(独立服务) / local(本地嵌入式索引，用于边缘、离线部署和测试)
+    local_vector_dir: str = ".vector_index"  # 本地向量索引的存储目录，每个租户一个子目录
+    local_vector_metric: str = "cosine"  # 相似度计算方式: cosine / dot
+    local_vector_dtype: str = "float32"  # 向量存储类型: float32 / float16(占用减半，精度略有损失)
+    local_vector_block_rows: int = 65536  # 检索时每次参与矩阵乘法的向量行数，限制临时内存占用
+    local_vector_max_segments: int = 8  # 段数量超过该值时在后台合并
+    local_vector_index_type: str = "flat"  # 本地索引类型: flat(精确检索) / ivfpq(倒排加乘积量化的近似检索，内存只保留量化编码)
+    local_vector_ann_min_rows: int = 100_000  # 租户分区行数达到该值后训练量化器并启用近似检索
+    local_vector_nlist: int = 1024  # 倒排列表数量
+    local_vector_pq_m: int = 16  # 乘积量化的子空间数量，每个向量编码为 m 个字节
+    local_vector_nprobe: int = 16  # 检索时扫描的倒排列表数量，越大召回率越高、延迟越大
+    local_vector_rerank: int = 4  # 近似检索的候选数为 top_k 的倍数，候选用原始向量重新计算精确分数
+
+    # 嵌入模型服务相关配置(Chinese-CLIP 部署在 AI 计算节点)
+    embedding_service_url: str = "http://127.0.0.1:8001"  # 嵌入服务地址
+    embedding_timeout: float = 30.0  # 单次请求超时时间(秒)
+    embedding_max_batch_size: int = 64  # 并发的嵌入调用合并为批次，单个批次的最大文本数
+    embedding_max_wait_ms: float = 5.0  # 批次未满时最多等待的时间(毫秒)，越大批次越满、单次延迟越高
+    embedding_max_concurrency: int = 8  # 同时在途的批次请求数
+    embedding_max_retries: int = 3  # 网络错误、超时、429 和 5xx 的最大重试次数
+    embedding_retry_backoff: float = 0.1  # 重试退避的基准时间(秒)，按指数增长并加随机抖动
+    embedding_hedge_quantile: float = 0.95  # 请求耗时超过近期耗时的该分位数时发送对冲请求，0 表示关闭对冲
+    embedding_hedge_min_delay_ms: float = 50.0  # 对冲延迟的下限(毫秒)
+
+    # 文档入库流水线相关配置
+    ingestion_queue_size: int = 16  # 相邻阶段之间队列的最大长度，队列满时上游阶段会等待(背压)
+    ingestion_chunk_batch_size: int = 32  # 分块后按批次向下游传递，关键词提取、嵌入和写入都按批处理
+    ingestion_fetch_concurrency: int = 4  # 从 MinIO 拉取文件的并发数(IO 密集)
+    ingestion_partition_concurrency: int = 2  # 文档解析的并发数(CPU 密集)
+    ingestion_chunk_concurrency: int = 2  # 分块的并发数
+    ingestion_keyword_concurrency: int = 2  # 关键词提取的并发数(CPU 密集)
+    ingestion_embed_concurrency: int = 4  # 嵌入请求的并发数(IO 密集)
+    ingestion_write_concurrency: int = 4  # 写入向量库和 Postgres 的并发数(IO 密集)
+    ingestion_incremental: bool = True  # 重新入库时只处理新增或内容变化的分块
+    ingestion_delete_batch_size: int = 500  # 重新入库时删除旧分块的批次大小
+    ingestion_dedup_concurrency: int = 2  # 去重阶段(分词和计算签名)的并发数(CPU 密集)
+    ingestion_dedup_mode: str = "link"  # 近似重复分块的处理方式: skip(不写入) / link(只写入 Postgres 并记录 duplicate_of) / off
+    ingestion_dedup_threshold: float = 0.8  # 估算的 Jaccard 相似度达到该值时视为重复
+    ingestion_dedup_num_perm: int = 128  # MinHash 签名长度，修改后已保存的签名失效
+    ingestion_dedup_bands: int = 16  # LSH 分段数，num_perm 必须能被整除，段数越多召回越高、候选越多
+    ingestion_dedup_shingle: int = 3  # 每个片段包含的连续词数
+    ingestion_dedup_max_tenants: int = 100  # 内存中最多保存的租户索引数量，超出后淘汰最久未使用的租户
+
+    # 大模型服务相关配置(OpenAI 兼容接口，例如 vLLM、Ollama、Xinference)
+    llm_service_url: str = "http://127.0.0.1:8002/v1"  # 大模型服务地址，包含 /v1 前缀
+    llm_api_key: str = ""  # 接口密钥，为空时不发送 Authorization 请求头
+    llm_model: str = "qwen2.5-7b-instruct"  # 模型名称
+    llm_timeout: float = 60.0  # 读超时(秒)，即两段增量之间的最长间隔
+    llm_connect_timeout: float = 5.0  # 连接超时(秒)
+    llm_max_tokens: int = 1024  # 单个回答最多生成的 token 数
+    llm_temperature: float = 0.3  # 采样温度
+    llm_max_concurrency: int = 32  # 同时生成的回答数，超出的请求排队等待
+    llm_max_retries: int = 2  # 收到第一段文本之前，网络错误、超时、429 和 5xx 的最大重试次数
+    llm_retry_backoff: float = 0.2  # 重试退避的基准时间(秒)，按指数增长并加随机抖动
+
+    # 流式问答相关配置
+    answer_context_max_chars: int = 6000  # 提供给大模型的参考资料的最大字符数，超出时丢弃排名靠后的分块
+    sse_heartbeat_interval: float = 15.0  # 没有事件时发送心跳的间隔(秒)
+    sse_max_buffer_bytes: int = 256 * 1024  # 单个连接未发送数据的上限(字节)，达到上限时暂停生成
+    sse_send_timeout: float = 30.0  # 单次发送的超时时间(秒)，超时视为客户端无响应并结束响应
+
+    # 混合检索相关配置
+    retrieval_candidates: int = 50  # 每个检索来源召回的候选数量，融合后再截取 top_k
+    retrieval_vector_timeout_ms: float = 800.0  # 向量检索的截止时间(毫秒)，包括生成查询向量
+    retrieval_keyword_timeout_ms: float = 300.0  # 关键词检索的截止时间(毫秒)，包括提取关键词
+    retrieval_keyword_top_n: int = 8  # 从查询语句中提取的关键词数量
+    retrieval_fusion: str = "rrf"  # 融合方式: rrf(倒数排名融合) / weighted(加权分数融合)
+    retrieval_rrf_k: int = 60  # 倒数排名融合的平滑常数
+    retrieval_vector_weight: float = 1.0  # 向量检索结果的融合权重
+    retrieval_keyword_weight: float = 1.0  # 关键词检索结果的融合权重
+    retrieval_cache_enabled: bool = True  # 是否开启语义查询缓存
+    retrieval_cache_threshold: float = 0.95  # 查询向量的余弦相似度达到该值时复用缓存的检索结果
+    retrieval_cache_ttl: float = 300.0  # 缓存条目的有效时间(秒)，分块变化时也会立即失效
+    retrieval_cache_capacity: int = 1024  # 每个租户缓存的查询数量
+    retrieval_cache_max_tenants: int = 1000  # 最多缓存的租户数量，超出后淘汰最久未使用的租户
+    retrieval_cache_timeout_ms: float = 20.0  # 读取集合版本号的超时时间(毫秒)，超时后本次检索不使用缓存
+
+    # 文档分块相关配置
+    chunk_max_tokens: int = 480  # 单个分块的最大 token 数，取嵌入模型与 HanLP 分词模型输入上限(512，含特殊 token)中的较小值
+    chunk_overlap_tokens: int = 64  # 相邻分块之间重叠的最大 token 数，按整句重叠
+    chunk_token_cjk_weight: float = 1.0  # token 估算器中每个中日韩字符的权重，可以用 benchmarks/bench_chunker.py --calibrate 的输出替换
+    chunk_token_word_weight: float = 1.5  # token 估算器中单词每 4 个字符(不足 4 个按 4 个计)的权重
+    chunk_token_other_weight: float = 1.0  # token 估算器中其它非空白符号的权重
+
+    # 文档解析进程池相关配置
+    parser_workers: int = 0  # 解析进程数量，0 表示使用 CPU 核数
+    parser_max_tasks_per_worker: int = 50  # 每个解析进程处理多少个文档后重建，释放解析库残留的内存
+    parser_timeout: float = 300.0  # 单个文档的解析超时时间(秒)
+    parser_max_rss_mb: int = 2048  # 单个解析进程(含子进程)允许占用的最大物理内存(MB)，超出后终止该进程
+
+    # 图片预处理相关配置
+    image_workers: int = 0  # 图片预处理进程数量，0 表示使用 CPU 核数
+    image_max_tasks_per_worker: int = 500  # 每个预处理进程处理多少张图片后重建
+    image_model_size: int = 224  # 嵌入模型的输入尺寸，图片短边缩小到该值(Chinese-CLIP 为 224)
+    image_jpeg_quality: int = 90  # 发送给嵌入服务的图片的 JPEG 质量
+    image_thumbnail_size: int = 256  # 缩略图长边的最大值
+    image_thumbnail_quality: int = 80  # 缩略图的 JPEG 质量
+    image_max_pixels: int = 100_000_000  # 允许解码的最大像素数，防止解压炸弹
+    image_dedup_enabled: bool = True  # 是否按感知哈希跳过同一租户中已入库的图片
+    image_phash_distance: int = 4  # 感知哈希的汉明距离不超过该值时视为同一张图片
+
+    # 监控指标相关配置
+    metrics_enabled: bool = True  # 是否记录请求指标并开放 /metrics 接口
+    metrics_multiproc_dir: str = ""  # 多进程部署(gunicorn)时各工作进程写入指标文件的目录，为空表示单进程；主进程启动前需要清空
+    metrics_flush_interval: float = 5.0  # 多进程模式下工作进程写入指标文件的间隔(秒)
+
+    # 生产环境服务器(gunicorn)相关配置
+    server_host: str = "0.0.0.0"  # 监听地址
+    server_port: int = 7000  # 监听端口
+    server_workers: int = 0  # 工作进程数，0 表示使用 CPU 核数
+    server_worker_class: str = "uvicorn.workers.UvicornWorker"  # 工作进程类型，新版 uvicorn 可以使用 uvicorn_worker.UvicornWorker
+    server_max_requests: int = 0  # 工作进程处理多少个请求后重启(新进程同样从主进程 fork，继续共享模型)，0 表示不重启
+    server_preload_models: bool = True  # 是否在主进程中预加载分词模型等只读数据，由工作进程共享
+
+    # 启动与关闭相关配置
+    startup_timeout: float = 30.0  # 单个组件单次初始化的超时时间(秒)
+    startup_timeouts: dict[str, float] = {}  # 按组件名称(redis/postgres/minio/shards/vector/embedding/llm)覆盖初始化超时时间
+    startup_retries: int = 3  # 组件初始化失败后的重试次数
+    startup_retry_backoff: float = 0.5  # 初始化重试的基础退避时间(秒)，按指数增长并加入随机抖动
+    shutdown_timeout: float = 10.0  # 单个组件关闭的超时时间(秒)
+    fenci_preload: bool = True  # 启动完成后在后台加载分词模型，加载完成前健康检查中分词模型为 not_ready
+
+    # 健康检查相关配置
+    health_cache_ttl: float = 2.0  # 健康检查结果的缓存时间(秒)，有效期内的探测请求直接返回缓存
+    health_probe_timeout: float = 1.0  # 单个依赖的默认探测超时时间(秒)
+    health_probe_timeouts: dict[str, float] = {}  # 按依赖类型(postgres/redis/minio/tokenizer)覆盖探测超时时间，例如 {"minio": 2.0}
+
+    # 请求阶段耗时追踪和性能分析相关配置
+    tracing_enabled: bool = True  # 是否记录每个请求各阶段(分词、SQL、Redis、MinIO、序列化、检索)的耗时
+    tracing_response_header: bool = False  # 是否通过 Server-Timing 响应头返回阶段耗时(浏览器开发者工具可以直接展示)
+    tracing_slow_request_ms: float = 1000.0  # 耗时超过该值(毫秒)的请求以 WARNING 级别输出阶段明细，其余请求在 DEBUG 级别输出
+    admin_token: str = ""  # 管理接口的访问令牌，通过请求头 X-Admin-Token 传入，为空时管理接口不可用
+    profiler_max_seconds: float = 60.0  # 单次性能分析的最长采样时间(秒)
+    profiler_interval_ms: float = 10.0  # 性能分析默认的采样间隔(毫秒)
+
+    # Celery 任务队列相关配置
+    celery_broker_url: str | None = None  # 消息代理地址，为空时使用上面的 Redis 配置，数据库为 celery_redis_db
+    celery_result_backend: str | None = None  # 结果存储地址，为空时与消息代理相同
+    celery_redis_db: int = 1  # 使用 Redis 配置时 Celery 使用的数据库，与缓存分开
+    celery_task_always_eager: bool = False  # 任务在调用方进程中同步执行，不经过消息代理，用于测试
+    celery_result_expires: int = 3600  # 任务结果的保存时间(秒)
+    celery_visibility_timeout: int = 7200  # 任务被取走后未确认的最长时间(秒)，超时后重新投递，需要大于单个任务的最长耗时
+    celery_ingestion_batch_size: int = 16  # 每个入库任务处理的文档数，同一批文档在一条流水线中处理
+    celery_interactive_concurrency: int = 4  # interactive 队列(用户上传等需要尽快完成的任务)工作进程数
+    celery_interactive_prefetch: int = 4  # interactive 队列每个工作进程预取的任务数，任务较短，预取减少等待消息的时间
+    celery_bulk_concurrency: int = 2  # bulk 队列(批量导入、重建索引)工作进程数
+    celery_bulk_prefetch: int = 1  # bulk 队列每个工作进程预取的任务数，任务耗时长，不预取以免任务积压在忙碌的进程中
+    celery_max_tasks_per_child: int = 0  # 工作进程执行多少个任务后重启，0 表示不重启
+    celery_task_max_retries: int = 3  # 入库任务遇到连接失败、超时等临时错误时的最大重试次数
+    celery_task_retry_backoff: int = 10  # 第一次重试前等待的时间(秒)，之后每次翻倍并加入随机抖动
+    celery_task_retry_backoff_max: int = 600  # 重试前等待的最长时间(秒)
+
     # 获取环境变量中的配置
     model_config = SettingsConfigDict(
         env_file=".env",  # 指定环境变量文件
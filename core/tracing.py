@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 20:50
+@Author : YangFei
+@File   : tracing.py
+@Desc   : 请求阶段耗时追踪：每个请求在 ContextVar 中保存一个 RequestTrace，分词、SQL、Redis、MinIO、序列化等阶段把耗时累加到其中
+
+用法:
+    with span("fenci"):
+        ...
+    record_span("postgres", elapsed)    # 已经自己计时的位置直接记录耗时(秒)
+
+请求之外(启动、后台任务、Celery 任务)没有 RequestTrace，记录直接跳过，开销只有一次 ContextVar 读取。
+每个阶段只累加总耗时和次数，不保存每一次的记录，流式导出等长请求的内存占用不会增长。
+ContextVar 会随 asyncio.create_task、asyncio.to_thread 以及 SQLAlchemy 执行语句的 greenlet 复制，
+复制的是对 RequestTrace 的引用，线程和子任务中记录的耗时同样累加到所属的请求中。
+阶段之间可能嵌套(检索阶段中包含 SQL)或并发(向量检索和关键词检索同时进行)，各阶段耗时之和可以超过请求总耗时。
+"""
+import time
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+
+class RequestTrace:
+    """ 一个请求的各阶段耗时，线程中也会记录，累加时加锁 """
+
+    __slots__ = ("start", "_stages", "_lock")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # 阶段名称 -> [总耗时(秒), 次数]
+        self._stages: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        """ 累加一个阶段的耗时(秒) """
+        with self._lock:
+            entry = self._stages.get(name)
+            if entry is None:
+                self._stages[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def elapsed(self) -> float:
+        """ 请求开始至今的耗时(秒) """
+        return time.perf_counter() - self.start
+
+    def stages(self) -> dict[str, tuple[float, int]]:
+        """ 各阶段的总耗时(毫秒)和次数，按耗时从大到小排列 """
+        with self._lock:
+            items = [(name, entry[0], entry[1]) for name, entry in self._stages.items()]
+        items.sort(key=lambda item: item[1], reverse=True)
+        return {name: (round(seconds * 1000, 3), count) for name, seconds, count in items}
+
+    def summary(self) -> str:
+        """ 日志中的阶段明细，例如 postgres=12.3ms/4 redis=0.8ms/2 """
+        return " ".join(f"{name}={ms:.1f}ms/{count}" for name, (ms, count) in self.stages().items()) or "-"
+
+    def server_timing(self) -> str:
+        """ Server-Timing 响应头的值，最后一项 total 为到目前为止的请求耗时 """
+        entries = [f'{name};dur={ms:.3f};desc="{count}"' for name, (ms, count) in self.stages().items()]
+        entries.append(f"total;dur={self.elapsed() * 1000:.3f}")
+        return ", ".join(entries)
+
+
+# 当前请求的阶段耗时，请求之外为 None
+trace_var: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def get_trace() -> Optional[RequestTrace]:
+    """ 获取当前请求的阶段耗时 """
+    return trace_var.get()
+
+
+def record_span(name: str, seconds: float) -> None:
+    """ 把一个阶段的耗时(秒)累加到当前请求，请求之外不记录 """
+    trace = trace_var.get()
+    if trace is not None:
+        trace.record(name, seconds)
+
+
+class span:
+    """ 记录一段代码耗时的上下文管理器，同步和异步代码中都可以使用；请求之外不计时 """
+
+    __slots__ = ("_name", "_trace", "_start")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._trace: Optional[RequestTrace] = None
+        self._start = 0.0
+
+    def __enter__(self) -> "span":
+        self._trace = trace_var.get()
+        if self._trace is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._trace is not None:
+            self._trace.record(self._name, time.perf_counter() - self._start)
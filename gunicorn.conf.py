@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/20 16:20
+@Author : YangFei
+@File   : gunicorn.conf.py
+@Desc   : 生产环境的 gunicorn 配置：主进程预加载应用和分词模型后 fork 工作进程，工作进程共享模型占用的内存
+
+用法(在项目根目录执行，gunicorn 默认读取当前目录下的 gunicorn.conf.py):
+    gunicorn app.main:app
+
+监听地址、进程数等通过 SERVER_* 配置项设置，命令行参数优先于本文件。
+"""
+import gc
+import os
+import shutil
+
+from core.system_config import get_settings
+
+settings = get_settings()
+
+bind = f"{settings.server_host}:{settings.server_port}"
+workers = settings.server_workers or os.cpu_count() or 1
+worker_class = settings.server_worker_class
+# 主进程导入应用后再 fork，导入的模块和预加载的数据由工作进程共享
+preload_app = True
+max_requests = settings.server_max_requests
+max_requests_jitter = settings.server_max_requests // 10
+# 工作进程收到退出信号后等待进行中的请求完成的时间，需要覆盖各组件的关闭
+graceful_timeout = int(settings.shutdown_timeout) + 5
+
+# 主进程尽早关闭自动垃圾回收，避免在堆中留下空洞(工作进程 fork 后重新开启)
+if settings.server_preload_models:
+    gc.disable()
+
+
+def on_starting(server):
+    """ 主进程启动时清空多进程指标目录，上次运行留下的文件会被错误地合并 """
+    directory = settings.metrics_multiproc_dir
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def when_ready(server):
+    """ 主进程准备就绪、fork 工作进程之前，加载共享的只读数据并冻结堆 """
+    if not settings.server_preload_models:
+        return
+    from app.infrastructure.prefork import preload_shared_data, freeze_heap
+
+    preload_shared_data()
+    freeze_heap()
+
+
+def post_fork(server, worker):
+    """ 工作进程 fork 后，丢弃从主进程继承的连接，由工作进程的启动流程重新创建 """
+    from app.infrastructure.prefork import reset_after_fork
+
+    reset_after_fork()
+
+
+def child_exit(server, worker):
+    """ 工作进程退出后，合并其计数类指标并丢弃其仪表类指标 """
+    from core.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
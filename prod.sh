@@ -0,0 +1,14 @@
+#!/usr/bin/env bash
+
+
+exec gunicorn app.main:app -c gunicorn.conf.py
+
+# 解释
+# 启动生产环境的命令
+# 主进程导入应用并预加载分词模型，然后 fork 出 SERVER_WORKERS 个 uvicorn 工作进程，工作进程共享模型占用的内存
+# exec 表示用后面的命令替换当前 Shell 进程，确保信号正确传递给 gunicorn 主进程.
+#
+# 具体参数说明：
+# gunicorn app.main:app -c gunicorn.conf.py
+# -c gunicorn.conf.py 指定配置文件，监听地址、进程数等在配置文件中通过 SERVER_* 配置项设置
+# 多进程部署时需要设置 METRICS_MULTIPROC_DIR，/metrics 接口才能汇总所有工作进程的指标
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/21 10:00
+@Author : YangFei
+@File   : test_oss.py
+@Desc   : OSS 封装的测试，使用内存中的 OSS 替身(LocalBucket)，覆盖并行分片上传、中断后断点续传、NoSuchKey 映射和超过 1000 个文件的批量删除
+"""
+import os
+import uuid
+import threading
+
+import pytest
+from oss2.exceptions import NoSuchKey, NoSuchUpload
+from oss2.models import PartInfo
+
+from app.infrastructure.storage.oss import BATCH_DELETE_LIMIT, OSS
+from core.system_config import get_settings
+
+# 分片大小，OSS 要求除最后一片外不小于 100KB
+PART_SIZE = 100 * 1024
+
+
+class _Result:
+    """ 替身接口的返回结果，只包含用到的属性 """
+
+    def __init__(self, **attrs):
+        self.status = 200
+        self.__dict__.update(attrs)
+
+
+def _no_such(error_type, key: str):
+    return error_type(404, {}, b"", {"Code": error_type.code, "Message": key})
+
+
+class LocalBucket:
+    """ 内存中的 OSS 存储桶，实现 OSS 封装和 oss2 断点续传用到的接口 """
+
+    bucket_name = "local"
+    enable_crc = False
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.uploads: dict[str, dict[int, bytes]] = {}
+        self.aborted: list[str] = []
+        self.calls: dict[str, int] = {}
+        # 按接口名称注入的异常，每次调用取出一个，取完后恢复正常
+        self.failures: dict[str, list[Exception]] = {}
+        self._lock = threading.Lock()
+
+    def _enter(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            failures = self.failures.get(name)
+            if failures:
+                raise failures.pop(0)
+
+    def put_object(self, key, data, headers=None):
+        self._enter("put_object")
+        self.objects[key] = bytes(data)
+        return _Result(etag=uuid.uuid4().hex, crc=None)
+
+    def object_exists(self, key):
+        return key in self.objects
+
+    def get_object_to_file(self, key, filename, **kwargs):
+        self._enter("get_object_to_file")
+        if key not in self.objects:
+            raise _no_such(NoSuchKey, key)
+        with open(filename, "wb") as f:
+            f.write(self.objects[key])
+
+    def head_object(self, key, **kwargs):
+        self._enter("head_object")
+        if key not in self.objects:
+            raise _no_such(NoSuchKey, key)
+        return _Result(content_length=len(self.objects[key]), etag="etag", last_modified=0, object_type="Normal")
+
+    def init_multipart_upload(self, key, headers=None, params=None):
+        self._enter("init_multipart_upload")
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {}
+        return _Result(upload_id=upload_id)
+
+    def upload_part(self, key, upload_id, part_number, data, headers=None, **kwargs):
+        self._enter("upload_part")
+        if upload_id not in self.uploads:
+            raise _no_such(NoSuchUpload, upload_id)
+        content = data.read() if hasattr(data, "read") else bytes(data)
+        self.uploads[upload_id][part_number] = content
+        return _Result(etag=f"etag-{part_number}", crc=None)
+
+    def list_parts(self, key, upload_id, marker="", max_parts=1000, headers=None):
+        self._enter("list_parts")
+        if upload_id not in self.uploads:
+            raise _no_such(NoSuchUpload, upload_id)
+        start = int(marker or 0)
+        numbers = sorted(number for number in self.uploads[upload_id] if number > start)
+        page = numbers[:max_parts]
+        return _Result(
+            parts=[PartInfo(number, f"etag-{number}", size=len(self.uploads[upload_id][number])) for number in page],
+            is_truncated=len(numbers) > len(page),
+            next_marker=str(page[-1]) if page else "",
+        )
+
+    def complete_multipart_upload(self, key, upload_id, parts, headers=None):
+        self._enter("complete_multipart_upload")
+        uploaded = self.uploads.pop(upload_id)
+        self.objects[key] = b"".join(uploaded[part.part_number] for part in sorted(parts, key=lambda p: p.part_number))
+        return _Result(etag="etag", crc=None)
+
+    def abort_multipart_upload(self, key, upload_id, headers=None):
+        self._enter("abort_multipart_upload")
+        self.uploads.pop(upload_id, None)
+        self.aborted.append(upload_id)
+
+    def batch_delete_objects(self, keys, headers=None):
+        self._enter("batch_delete_objects")
+        # 与服务端一致: 不接受空列表和超过上限的列表
+        if not keys or len(keys) > BATCH_DELETE_LIMIT:
+            raise ValueError(f"单次批量删除的文件数量不合法: {len(keys)}")
+        with self._lock:
+            deleted = [key for key in keys if self.objects.pop(key, None) is not None]
+        return _Result(deleted_keys=deleted)
+
+
+@pytest.fixture()
+def bucket() -> LocalBucket:
+    return LocalBucket()
+
+
+@pytest.fixture()
+def oss(bucket: LocalBucket, tmp_path) -> OSS:
+    """ 使用替身存储桶的 OSS 实例，分片阈值和分片大小调到 OSS 允许的最小值附近，便于构造多分片的文件 """
+    instance = OSS()
+    instance._settings = get_settings().model_copy(update={
+        "oss_multipart_threshold": 2 * PART_SIZE,
+        "oss_part_size": PART_SIZE,
+        "oss_num_threads": 4,
+        "oss_checkpoint_dir": str(tmp_path / "checkpoints"),
+    })
+    instance._client = bucket
+    return instance
+
+
+def _content(size: int) -> bytes:
+    return os.urandom(size)
+
+
+def test_small_file_uses_single_put(oss: OSS, bucket: LocalBucket):
+    content = _content(100)
+    oss.file_upload("small.bin", content)
+    assert bucket.objects["small.bin"] == content
+    assert "init_multipart_upload" not in bucket.calls
+
+
+def test_multipart_upload_assembles_parts_in_order(oss: OSS, bucket: LocalBucket):
+    content = _content(PART_SIZE * 10 + 17)
+    oss.file_upload("large.bin", content)
+    assert bucket.objects["large.bin"] == content
+    assert bucket.calls["upload_part"] == 11
+    assert bucket.uploads == {}
+
+
+def test_multipart_upload_failure_aborts_upload(oss: OSS, bucket: LocalBucket):
+    bucket.failures["upload_part"] = [ConnectionError("part failed")]
+    with pytest.raises(ConnectionError, match="part failed"):
+        oss.file_upload("large.bin", _content(PART_SIZE * 3))
+    assert "large.bin" not in bucket.objects
+    assert len(bucket.aborted) == 1
+
+
+def test_multipart_abort_failure_keeps_original_error(oss: OSS, bucket: LocalBucket):
+    bucket.failures["upload_part"] = [ConnectionError("part failed")]
+    bucket.failures["abort_multipart_upload"] = [TimeoutError("abort failed")]
+    with pytest.raises(ConnectionError, match="part failed"):
+        oss.file_upload("large.bin", _content(PART_SIZE * 3))
+
+
+def test_resumable_upload_resumes_after_interruption(oss: OSS, bucket: LocalBucket, tmp_path):
+    content = _content(PART_SIZE * 8)
+    local_file = tmp_path / "upload.bin"
+    local_file.write_bytes(content)
+    # 单线程按顺序上传，第 4 个分片失败时前 3 个分片已经上传
+    oss._settings = oss._settings.model_copy(update={"oss_num_threads": 1})
+    original_upload_part = bucket.upload_part
+    attempts = []
+
+    def interrupted_upload_part(key, upload_id, part_number, data, headers=None, **kwargs):
+        attempts.append(part_number)
+        if len(attempts) == 4:
+            raise ConnectionError("interrupted")
+        return original_upload_part(key, upload_id, part_number, data, headers, **kwargs)
+
+    bucket.upload_part = interrupted_upload_part
+    with pytest.raises(ConnectionError, match="interrupted"):
+        oss.file_upload_resumable("resumed.bin", str(local_file))
+    assert "resumed.bin" not in bucket.objects
+    assert bucket.calls["upload_part"] == 3
+
+    # 再次调用时沿用断点记录中的上传任务，只上传剩余的分片
+    bucket.upload_part = original_upload_part
+    oss.file_upload_resumable("resumed.bin", str(local_file))
+    assert bucket.objects["resumed.bin"] == content
+    assert bucket.calls["init_multipart_upload"] == 1
+    assert bucket.calls["upload_part"] == 8
+    # 上传完成后删除断点记录
+    assert not any(files for _, _, files in os.walk(oss._settings.oss_checkpoint_dir))
+
+
+def test_download_missing_key_raises_file_not_found(oss: OSS, tmp_path):
+    with pytest.raises(FileNotFoundError, match="missing.bin"):
+        oss.file_download("missing.bin", str(tmp_path / "out.bin"))
+
+
+def test_resumable_download_missing_key_raises_file_not_found(oss: OSS, tmp_path):
+    with pytest.raises(FileNotFoundError, match="missing.bin"):
+        oss.file_download_resumable("missing.bin", str(tmp_path / "out.bin"))
+
+
+def test_download_existing_key(oss: OSS, bucket: LocalBucket, tmp_path):
+    bucket.objects["file.bin"] = b"content"
+    target = tmp_path / "out.bin"
+    oss.file_download("file.bin", str(target))
+    assert target.read_bytes() == b"content"
+
+
+def test_batch_delete_splits_more_than_limit(oss: OSS, bucket: LocalBucket):
+    keys = [f"chunk/{i}" for i in range(BATCH_DELETE_LIMIT * 2 + 500)]
+    for key in keys:
+        bucket.objects[key] = b"x"
+    # 重复和空路径被过滤，不存在的文件不计入已删除
+    deleted = oss.delete_files(keys + keys[:10] + ["", "chunk/missing"])
+    assert sorted(deleted) == sorted(keys)
+    assert bucket.calls["batch_delete_objects"] == 3
+    assert bucket.objects == {}
+
+
+def test_batch_delete_single_batch_and_empty(oss: OSS, bucket: LocalBucket):
+    assert oss.delete_files([]) == []
+    assert "batch_delete_objects" not in bucket.calls
+    bucket.objects.update({"a": b"1", "b": b"2"})
+    assert sorted(oss.delete_files(["a", "b"])) == ["a", "b"]
+    assert bucket.calls["batch_delete_objects"] == 1
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/21 14:00
+@Author : YangFei
+@File   : test_pipeline.py
+@Desc   : 入库流水线的测试，各阶段使用本地实现(local.py)，覆盖正常入库、单个文档拉取失败、重新入库删除旧分块、
+          解析失败关闭元素流、分块失败停止解析，以及 link 模式下被关联分块删除后重复分块的提升
+"""
+import uuid
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+
+from app.application.services.ingestion import IngestionResult, IngestionTask
+from app.application.services.ingestion.dedup import MinHashDeduplicator
+from app.application.services.ingestion.entities import DocumentElement
+from app.application.services.ingestion.images import PoolImagePreprocessor
+from app.application.services.ingestion.local import (
+    HashEmbedder, InMemoryChunkWriter, LocalFetcher, PlainTextPartitioner, SimpleKeywordExtractor, tokenize_words,
+)
+from app.application.services.ingestion.pipeline import IngestionPipeline, IngestionStages, PipelineConfig
+from app.application.services.ingestion.progress import InMemoryProgressTracker
+from app.application.services.ingestion.stages import ElementChunker
+from app.infrastructure.models import DocumentStatus
+
+TENANT = "tenant"
+
+# 每个段落 30 到 60 个字符，按 60 个字符分块时一个段落对应一个分块
+INTRO = "the quarterly report covers revenue and cost"
+DISCLAIMER = "this confidential notice applies to every page of the draft"
+SUMMARY = "regional sales grew while logistics spending fell"
+OUTLOOK = "next quarter focuses on hiring and new product lines"
+
+
+class FailingPartitioner(PlainTextPartitioner):
+    """ 扩展名为 .pdf 的文件产出指定数量的段落后抛出解析错误，其它文件按纯文本解析 """
+
+    def __init__(self, elements: int):
+        self.elements = elements
+
+    async def partition(self, task: IngestionTask, data: bytes) -> AsyncIterator[DocumentElement]:
+        if not task.file_name.endswith(".pdf"):
+            async for element in super().partition(task, data):
+                yield element
+            return
+        for i in range(self.elements):
+            yield DocumentElement(text=f"paragraph number {i} of a malformed file")
+        raise ValueError("malformed file")
+
+
+class CountingPartitioner:
+    """ 持续产出段落，记录已产出的数量 """
+
+    def __init__(self, elements: int):
+        self.elements = elements
+        self.produced = 0
+
+    async def partition(self, task: IngestionTask, data: bytes) -> AsyncIterator[DocumentElement]:
+        for i in range(self.elements):
+            self.produced += 1
+            yield DocumentElement(text=f"paragraph number {i} of a long file")
+
+
+class FailingChunker:
+    """ 读取第一个元素后抛出异常 """
+    signature = "failing"
+
+    async def chunk(self, task: IngestionTask, elements) -> AsyncIterator:
+        async for _ in elements:
+            raise RuntimeError("chunker bug")
+        yield
+
+
+class Harness:
+    """ 使用本地阶段实现的入库流水线，文件内容和写入结果都在内存中 """
+
+    def __init__(self, dedup_mode: str = "link", **stages):
+        self.objects: dict[str, bytes] = {}
+        self.writer = InMemoryChunkWriter()
+        self.tracker = InMemoryProgressTracker()
+        self.deduplicator = MinHashDeduplicator(tokenize=tokenize_words, mode=dedup_mode, persistent=False)
+        stages = {
+            "fetcher": LocalFetcher(self.objects),
+            "image_preprocessor": PoolImagePreprocessor(persistent=False),
+            "partitioner": PlainTextPartitioner(),
+            "chunker": ElementChunker(max_chars=60),
+            "deduplicator": self.deduplicator,
+            "keyword_extractor": SimpleKeywordExtractor(),
+            "embedder": HashEmbedder(dim=64),
+            "writer": self.writer,
+            "tracker": self.tracker,
+            **stages,
+        }
+        config = PipelineConfig(
+            queue_size=2,
+            batch_size=2,
+            fetch_concurrency=2,
+            partition_concurrency=2,
+            chunk_concurrency=2,
+            dedup_concurrency=2,
+            keyword_concurrency=2,
+            embed_concurrency=2,
+            write_concurrency=2,
+        )
+        self.pipeline = IngestionPipeline(IngestionStages(**stages), config)
+
+    def add(self, name: str, *paragraphs: str) -> IngestionTask:
+        """ 放入一个纯文本文件，返回对应的入库任务 """
+        self.objects[name] = "\n\n".join(paragraphs).encode()
+        return IngestionTask(
+            document_id=uuid.uuid5(uuid.NAMESPACE_URL, name), tenant_id=TENANT, object_name=name, file_name=name,
+        )
+
+    async def run(self, *tasks: IngestionTask) -> dict[uuid.UUID, IngestionResult]:
+        """ 执行入库，流水线卡住时测试失败而不是一直等待 """
+        results = await asyncio.wait_for(self.pipeline.run(tasks), timeout=10)
+        assert len(results) == len(tasks)
+        return {result.document_id: result for result in results}
+
+    def chunks(self, task: IngestionTask) -> list:
+        """ 文档已写入的分块，按序号排列 """
+        return sorted(
+            (chunk for chunk in self.writer.chunks.values() if chunk.document_id == task.document_id),
+            key=lambda chunk: chunk.chunk_index,
+        )
+
+
+def test_documents_are_ingested():
+    harness = Harness()
+    first = harness.add("first.txt", INTRO, SUMMARY, OUTLOOK)
+    second = harness.add("second.txt", DISCLAIMER)
+    results = asyncio.run(harness.run(first, second))
+
+    assert results[first.document_id].success
+    assert results[first.document_id].chunk_count == 3
+    assert results[first.document_id].written_chunks == 3
+    assert [chunk.content for chunk in harness.chunks(first)] == [INTRO, SUMMARY, OUTLOOK]
+    assert all(chunk.vector and chunk.keywords for chunk in harness.writer.chunks.values())
+    assert harness.tracker.progress[first.document_id]["status"] == DocumentStatus.COMPLETED.value
+    assert harness.tracker.progress[first.document_id]["written"] == 3
+    assert results[second.document_id].success
+
+
+def test_fetch_failure_does_not_affect_other_documents():
+    harness = Harness()
+    missing = IngestionTask(document_id=uuid.uuid4(), tenant_id=TENANT, object_name="missing.txt")
+    tasks = [harness.add(f"{i}.txt", f"{INTRO} {i}", f"{SUMMARY} {i}") for i in range(4)]
+    results = asyncio.run(harness.run(tasks[0], missing, *tasks[1:]))
+
+    assert not results[missing.document_id].success
+    assert results[missing.document_id].error.startswith("fetch:")
+    progress = harness.tracker.progress[missing.document_id]
+    assert progress["status"] == DocumentStatus.FAILED.value
+    assert progress["stage"] == "fetch"
+    for task in tasks:
+        assert results[task.document_id].success
+        assert len(harness.chunks(task)) == 2
+
+
+def test_reingest_removes_deleted_chunks():
+    harness = Harness()
+    task = harness.add("report.txt", INTRO, SUMMARY, OUTLOOK)
+
+    async def scenario():
+        await harness.run(task)
+        kept = {chunk.content: chunk.id for chunk in harness.chunks(task)}
+        harness.add("report.txt", INTRO, OUTLOOK)
+        return kept, await harness.run(task)
+
+    kept, results = asyncio.run(scenario())
+    result = results[task.document_id]
+    assert result.success
+    assert result.removed_chunks == 1
+    assert result.skipped_chunks == 2
+    assert result.written_chunks == 0
+    chunks = harness.chunks(task)
+    # 未变化的分块保留原ID，位置变化时只更新序号
+    assert [(chunk.id, chunk.chunk_index) for chunk in chunks] == [(kept[INTRO], 0), (kept[OUTLOOK], 1)]
+
+
+def test_parse_error_closes_element_stream():
+    harness = Harness(partitioner=FailingPartitioner(elements=5))
+    broken = harness.add("broken.pdf", "")
+    other = harness.add("other.txt", INTRO, SUMMARY)
+    results = asyncio.run(harness.run(broken, other))
+
+    result = results[broken.document_id]
+    assert not result.success
+    assert result.error == "partition: malformed file"
+    assert harness.tracker.progress[broken.document_id]["stage"] == "partition"
+    assert results[other.document_id].success
+    assert len(harness.chunks(other)) == 2
+
+
+def test_chunk_failure_stops_parsing():
+    partitioner = CountingPartitioner(elements=10_000)
+    harness = Harness(partitioner=partitioner, chunker=FailingChunker())
+    task = harness.add("long.txt", "")
+    results = asyncio.run(harness.run(task))
+
+    assert results[task.document_id].error == "chunk: chunker bug"
+    # 元素流关闭后解析阶段停止，不会把整个文档解析完
+    assert partitioner.produced < 100
+
+
+@pytest.mark.parametrize("duplicates", [1, 3])
+def test_removed_canonical_promotes_duplicate(duplicates: int):
+    harness = Harness(dedup_mode="link")
+    canonical = harness.add("canonical.txt", INTRO, DISCLAIMER)
+    copies = [harness.add(f"copy-{i}.txt", DISCLAIMER, f"{SUMMARY} {i}") for i in range(duplicates)]
+    later = harness.add("later.txt", DISCLAIMER, OUTLOOK)
+
+    async def scenario():
+        await harness.run(canonical)
+        await harness.run(*copies)
+        linked = [harness.chunks(copy)[0] for copy in copies]
+        assert all(chunk.duplicate_of is not None and chunk.vector is None for chunk in linked)
+
+        harness.add("canonical.txt", INTRO)
+        await harness.run(canonical)
+        await harness.run(later)
+
+    asyncio.run(scenario())
+    disclaimers = [chunk for chunk in harness.writer.chunks.values() if chunk.content == DISCLAIMER]
+    promoted = [chunk for chunk in disclaimers if chunk.duplicate_of is None]
+    # 只提升一个重复分块，生成向量，其余重复分块和之后入库的文档都关联到它
+    assert len(promoted) == 1
+    assert promoted[0].vector is not None
+    assert "duplicate_of" not in promoted[0].metadata
+    for chunk in disclaimers:
+        if chunk is not promoted[0]:
+            assert chunk.duplicate_of == promoted[0].id
+            assert chunk.metadata["duplicate_of"] == str(promoted[0].id)
+            assert chunk.vector is None
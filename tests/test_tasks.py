@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 2026/10/21 11:00
+@Author : YangFei
+@File   : test_tasks.py
+@Desc   : Celery 入库任务的测试，任务在 eager 模式下同步执行，入库流水线替换为记录调用的替身(RecordingPipeline)，
+          覆盖按优先级队列路由、按批次投递、汇总结果和临时错误的重试
+"""
+import uuid
+import asyncio
+
+import pytest
+from celery import current_task
+
+from app.application.services.ingestion import IngestionResult, IngestionTask
+from app.interfaces.tasks import (
+    QUEUE_BULK, QUEUE_INTERACTIVE, celery_app, dump_task, enqueue_ingestion, ingest_documents, set_pipeline_factory,
+)
+from app.interfaces.tasks import ingestion, runtime
+from app.interfaces.tasks.ingestion import MAX_ERROR_LENGTH
+
+
+class RecordingPipeline:
+    """ 入库流水线替身，记录每批文档和执行时的路由键，按顺序抛出注入的异常 """
+
+    def __init__(self):
+        self.batches: list[list[IngestionTask]] = []
+        self.routing_keys: list[str] = []
+        # 每次执行取出一个异常，取完后恢复正常
+        self.failures: list[Exception] = []
+        # 入库失败的文档ID -> 错误信息
+        self.errors: dict[uuid.UUID, str] = {}
+
+    async def run(self, tasks: list[IngestionTask]) -> list[IngestionResult]:
+        self.batches.append(list(tasks))
+        # 直接调用任务函数时没有投递信息
+        self.routing_keys.append((current_task.request.delivery_info or {}).get("routing_key"))
+        if self.failures:
+            raise self.failures.pop(0)
+        return [
+            IngestionResult(
+                document_id=task.document_id,
+                success=task.document_id not in self.errors,
+                written_chunks=3,
+                skipped_chunks=1,
+                error=self.errors.get(task.document_id, ""),
+            )
+            for task in tasks
+        ]
+
+
+@pytest.fixture()
+def pipeline(monkeypatch) -> RecordingPipeline:
+    """ 开启 eager 模式并替换入库流水线，测试结束后恢复 """
+    monkeypatch.setitem(celery_app.conf, "task_always_eager", True)
+    monkeypatch.setitem(celery_app.conf, "task_eager_propagates", True)
+    instance = RecordingPipeline()
+    set_pipeline_factory(lambda: instance)
+    yield instance
+    set_pipeline_factory(None)
+
+
+def _tasks(count: int) -> list[IngestionTask]:
+    return [
+        IngestionTask(document_id=uuid.uuid4(), tenant_id="tenant", object_name=f"docs/{i}.txt", file_name=f"{i}.txt")
+        for i in range(count)
+    ]
+
+
+def _apply(tasks: list[IngestionTask]):
+    """ 在本进程中同步执行一批文档的入库任务 """
+    return ingest_documents.apply(args=([dump_task(task) for task in tasks],))
+
+
+def test_default_route_is_bulk_queue():
+    route = celery_app.amqp.router.route({}, ingest_documents.name, args=([],), kwargs={})
+    assert route["queue"].name == QUEUE_BULK
+
+
+@pytest.mark.parametrize("queue", [QUEUE_INTERACTIVE, QUEUE_BULK])
+def test_enqueue_routes_to_priority_queue(pipeline: RecordingPipeline, queue: str):
+    enqueue_ingestion(_tasks(3), queue=queue, batch_size=2)
+    assert pipeline.routing_keys == [queue, queue]
+
+
+def test_enqueue_rejects_unknown_queue(pipeline: RecordingPipeline):
+    with pytest.raises(ValueError, match="urgent"):
+        enqueue_ingestion(_tasks(1), queue="urgent")
+    assert pipeline.batches == []
+
+
+def test_enqueue_splits_documents_into_batches(pipeline: RecordingPipeline):
+    tasks = _tasks(5)
+    task_ids = enqueue_ingestion(tasks, batch_size=2)
+    assert len(task_ids) == 3
+    assert [len(batch) for batch in pipeline.batches] == [2, 2, 1]
+    # 参数经过 JSON 友好的转换后还原为相同的入库任务
+    assert [task for batch in pipeline.batches for task in batch] == tasks
+
+
+def test_enqueue_uses_configured_batch_size(pipeline: RecordingPipeline, monkeypatch):
+    from core.system_config import get_settings
+
+    monkeypatch.setattr(get_settings(), "celery_ingestion_batch_size", 4)
+    enqueue_ingestion(_tasks(9))
+    assert [len(batch) for batch in pipeline.batches] == [4, 4, 1]
+
+
+def test_result_is_compact_summary(pipeline: RecordingPipeline):
+    tasks = _tasks(3)
+    pipeline.errors[tasks[1].document_id] = "解析失败" * 100
+    result = _apply(tasks).get()
+    assert result["documents"] == 3
+    assert result["succeeded"] == 2
+    assert result["written_chunks"] == 9
+    assert result["skipped_chunks"] == 3
+    assert list(result["failed"]) == [str(tasks[1].document_id)]
+    assert len(result["failed"][str(tasks[1].document_id)]) == MAX_ERROR_LENGTH
+
+
+@pytest.fixture()
+def retrying(pipeline: RecordingPipeline, monkeypatch) -> RecordingPipeline:
+    """ eager 模式下异常不抛给调用方时，任务重试会在本进程中立即重新执行，否则 Retry 异常直接抛给调用方 """
+    monkeypatch.setitem(celery_app.conf, "task_eager_propagates", False)
+    return pipeline
+
+
+def test_transient_error_is_retried(retrying: RecordingPipeline):
+    pipeline = retrying
+    pipeline.failures = [ConnectionError("redis unavailable"), TimeoutError("postgres timeout")]
+    tasks = _tasks(2)
+    result = _apply(tasks)
+    assert result.get()["succeeded"] == 2
+    # 每次重试处理整批文档
+    assert pipeline.batches == [tasks, tasks, tasks]
+
+
+def test_retries_are_limited(retrying: RecordingPipeline):
+    pipeline = retrying
+    pipeline.failures = [ConnectionError("redis unavailable")] * (ingest_documents.max_retries + 2)
+    result = _apply(_tasks(1))
+    assert result.failed()
+    with pytest.raises(ConnectionError, match="redis unavailable"):
+        result.get()
+    assert len(pipeline.batches) == ingest_documents.max_retries + 1
+
+
+def test_non_transient_error_is_not_retried(pipeline: RecordingPipeline):
+    pipeline.failures = [ValueError("bad payload")]
+    with pytest.raises(ValueError, match="bad payload"):
+        _apply(_tasks(1))
+    assert len(pipeline.batches) == 1
+
+
+def test_worker_reuses_pipeline_across_tasks(monkeypatch):
+    """ 工作进程中的任务复用同一条流水线，替换创建函数后重新创建 """
+    loop = asyncio.new_event_loop()
+    monkeypatch.setattr(ingestion, "run_in_worker", loop.run_until_complete)
+    monkeypatch.setattr(runtime, "_pipeline", None)
+    created: list[RecordingPipeline] = []
+
+    def factory() -> RecordingPipeline:
+        created.append(RecordingPipeline())
+        return created[-1]
+
+    set_pipeline_factory(factory)
+    try:
+        for _ in range(3):
+            ingest_documents([dump_task(task) for task in _tasks(2)])
+        assert len(created) == 1
+        assert len(created[0].batches) == 3
+
+        assert runtime.worker_pipeline(factory) is created[0]
+        assert runtime.worker_pipeline(RecordingPipeline) is not created[0]
+    finally:
+        set_pipeline_factory(None)
+        loop.close()